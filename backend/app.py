@@ -5,12 +5,12 @@
 功能：用户认证、数据爬取、数据存储与管理
 """
 
-from flask import Flask, render_template, request, redirect, url_for, jsonify, session, flash
-import sqlite3
+from flask import Flask, render_template, request, redirect, url_for, jsonify, session, flash, Response, stream_with_context, send_file
 import os
 import sys
-import json
 import datetime
+import functools
+import tempfile
 import requests
 import logging
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -31,11 +31,7 @@ def setup_utf8_support():
 # 初始化UTF-8支持
 setup_utf8_support()
 
-# 添加codedemo目录到系统路径，以便导入baidu_spider
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-PROJECT_DIR = os.path.dirname(BASE_DIR)
-CODEDEMO_DIR = os.path.join(PROJECT_DIR, 'codedemo')
-sys.path.insert(0, CODEDEMO_DIR)
 sys.path.insert(0, BASE_DIR)  # 添加当前目录到系统路径
 
 # 配置日志
@@ -50,10 +46,34 @@ logging.basicConfig(
     ]
 )
 
-# 导入百度爬虫模块
-from baidu_spider import BaiduSpider
-# 导入新的百度搜索爬虫模块
-from baidu_search_spider import BaiduSearchSpider
+# 导入搜索来源注册表（百度等爬虫作为插件注册）
+from sources import create_sources
+# 导入统一的搜索结果类型
+from search_result import SearchResult, dumps
+# 导入批量相关性评分
+from relevance import RelevanceScorer
+# 导入近似重复检测索引
+from near_dup import NearDupIndex, get_repository_index
+# 导入数据库连接池
+from db import init_app as init_db_pool, get_db
+# 导入多爬虫并行调度
+from fanout import fan_out, get_timings
+# 导入共享HTTP连接池
+from http_pool import get_pool
+# 导入后台抓取任务队列
+from crawl_jobs import JobQueue
+# 导入关键词监测调度
+from watchlist import WatchScheduler, DEFAULT_INTERVAL_MINUTES
+# 导入落地页正文补全
+from enrichment import Enricher
+# 导入数据仓库按月归档
+from partitions import RepositoryArchive, ARCHIVE_DIR
+# 导入数据仓库导出
+from export import ARROW_FORMATS, TEXT_FORMATS, ExportUnavailable, export_repository, export_text
+# 导入PDF报告
+from reports import ReportService, report_query, PREVIEW_PAGES
+# 导入数据仓库存储层
+from repository import init_repository, normalize_url, upsert_results, RepositoryPage, DEFAULT_PAGE_SIZE, count_repository, stream_page_json
 
 # 初始化Flask应用
 app = Flask(__name__)
@@ -62,10 +82,37 @@ app.secret_key = 'your_secret_key_here'  # 生产环境需要修改为更安全
 # 数据库配置
 DATABASE = os.path.join(BASE_DIR, 'database.db')
 
+# 按线程复用的数据库连接，请求结束时自动归还
+db_pool = init_db_pool(app, DATABASE)
+
+# 较早月份的数据仓库记录归档到按月划分的文件，按时间查询时自动合并
+repository_archive = RepositoryArchive(ARCHIVE_DIR)
+
+# PDF报告的后台生成与缓存，后台线程在首次提交报告时启动
+report_service = ReportService(db_pool, archive=repository_archive)
+
+# 是否调用爬虫进行实时搜索，默认直接返回四川农业大学的模拟数据
+LIVE_SEARCH = os.environ.get('LIVE_SEARCH', '0') == '1'
+
+# 是否在启动应用时启动关键词监测调度
+WATCH_SCHEDULER = os.environ.get('WATCH_SCHEDULER', '1') == '1'
+
+# 是否在启动应用时启动落地页正文补全
+ENRICHMENT = os.environ.get('ENRICHMENT', '1') == '1'
+
+# 标题近似重复的相似度阈值（字符对集合的Jaccard相似度）
+NEAR_DUP_THRESHOLD = float(os.environ.get('NEAR_DUP_THRESHOLD', '0.8'))
+
+# 实时搜索等待各爬虫返回的总截止时间（秒）
+SEARCH_DEADLINE = float(os.environ.get('SEARCH_DEADLINE', '8'))
+
+# 实时搜索使用的搜索来源（逗号分隔的来源名）
+SEARCH_SOURCES = [name.strip() for name in os.environ.get('SEARCH_SOURCES', 'baidu,baidu_search').split(',') if name.strip()]
+
 # 初始化数据库
 def init_db():
     """初始化SQLite数据库，创建用户表和数据仓库表"""
-    conn = sqlite3.connect(DATABASE)
+    conn = db_pool.connect()
     cursor = conn.cursor()
     
     # 创建用户表
@@ -78,17 +125,14 @@ def init_db():
     )
     ''')
     
-    # 创建数据仓库表
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS data_repository (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        title TEXT NOT NULL,
-        url TEXT NOT NULL,
-        summary TEXT,
-        search_keyword TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
+    # 创建数据仓库表及其全文索引、归档分区清单
+    init_repository(conn)
+    repository_archive.init_schema(conn)
+    
+    # 创建后台抓取任务表、关键词监测表和落地页正文表
+    crawl_queue.init_schema()
+    watch_scheduler.init_schema()
+    enricher.init_schema()
     
     # 检查是否已有管理员用户
     cursor.execute("SELECT * FROM users WHERE username='admin'")
@@ -101,7 +145,6 @@ def init_db():
         )
     
     conn.commit()
-    conn.close()
 
 # 登录装饰器
 def login_required(f):
@@ -124,11 +167,9 @@ def login():
         username = request.form['username']
         password = request.form['password']
         
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
+        cursor = get_db().cursor()
         cursor.execute("SELECT * FROM users WHERE username=?", (username,))
         user = cursor.fetchone()
-        conn.close()
         
         if user and check_password_hash(user[2], password):
             session['user_id'] = user[0]
@@ -206,30 +247,7 @@ def calculate_relevance(text, keyword):
     Returns:
         相关性分数（0-100）
     """
-    import re
-    if not text or not keyword:
-        return 0
-    
-    text_lower = text.lower()
-    keyword_lower = keyword.lower()
-    score = 0
-    
-    # 关键词完全匹配
-    if keyword_lower in text_lower:
-        score += 30
-        # 关键词出现在开头
-        if text_lower.startswith(keyword_lower):
-            score += 20
-    
-    # 关键词分词匹配
-    keyword_parts = re.findall(r'[\u4e00-\u9fa5]+|[a-zA-Z0-9]+', keyword_lower)
-    for part in keyword_parts:
-        if len(part) > 1:  # 忽略单个字符
-            count = text_lower.count(part)
-            score += count * 5
-    
-    # 限制最大分数
-    return min(score, 100)
+    return RelevanceScorer(keyword).score(text)
 
 # 验证搜索结果质量
 def validate_search_results(results, keyword):
@@ -261,73 +279,68 @@ def validate_search_results(results, keyword):
     if isinstance(keyword, str) and '大学' in keyword:
         keyword_variations.append(keyword.replace('大学', ''))
     
+    keyword_lower = [var.lower() for var in keyword_variations if isinstance(var, str)]
+    candidates = []
+    texts = []
     for result in results:
-        # 确保结果是字典
-        if not isinstance(result, dict):
+        # 兼容字典形式的结果
+        if isinstance(result, dict):
+            result = SearchResult.from_dict(result)
+        elif not isinstance(result, SearchResult):
             continue
         
         # 验证URL是否有效
-        url = result.get('url', '')
+        url = result.url
         url_valid = url.startswith(('http://', 'https://'))
         
         # 获取标题和摘要
-        title = str(result.get('title', '')).lower()
-        summary = str(result.get('summary', '')).lower()
+        title = str(result.title).lower()
+        summary = str(result.summary).lower()
         
         # 检查标题、摘要是否包含关键词
         text_to_check = f"{title} {summary}"
-        has_keyword = any(
-            isinstance(var, str) and var.lower() in text_to_check 
-            for var in keyword_variations
-        )
+        has_keyword = any(var in text_to_check for var in keyword_lower)
         
         # 针对模拟数据的特殊处理
-        is_mock = result.get('source') == '模拟数据' or '模拟' in str(result.get('source', '')).lower()
+        is_mock = result.source == '模拟数据' or '模拟' in str(result.source).lower()
         
         # 验证条件：URL有效且(包含关键词或模拟数据)
         if url_valid and (has_keyword or is_mock):
-            # 计算相关性分数
-            combined_text = f"{title} {summary}"
-            result['relevance_score'] = calculate_relevance(combined_text, keyword)
-            
-            # 对于模拟数据，确保相关性分数不为零
-            if is_mock and result['relevance_score'] == 0:
-                result['relevance_score'] = 50  # 给模拟数据一个基础分数
-            
-            validated_results.append(result)
+            candidates.append((result, is_mock))
+            texts.append(text_to_check)
+    
+    # 关键词只切分一次，整批计算相关性分数
+    scores = RelevanceScorer(keyword).score_batch(texts)
+    for (result, is_mock), score in zip(candidates, scores):
+        # 对于模拟数据，确保相关性分数不为零
+        if is_mock and score == 0:
+            score = 50  # 给模拟数据一个基础分数
+        result.relevance_score = score
+        validated_results.append(result)
     
     # 按相关性分数排序
-    validated_results.sort(key=lambda x: x.get('relevance_score', 0), reverse=True)
+    validated_results.sort(key=lambda x: x.relevance_score, reverse=True)
     logging.info(f"验证后保留 {len(validated_results)} 个相关结果")
     
     return validated_results
 
 # 数据去重函数
 def deduplicate(results):
-    """根据URL和标题去重搜索结果"""
-    import re
+    """根据URL和标题近似重复去重搜索结果"""
     seen_urls = set()
-    seen_titles = set()
+    title_index = NearDupIndex(threshold=NEAR_DUP_THRESHOLD, shingle_size=2)
     unique_results = []
     
     for r in results:
-        url = r.get('url', '').strip()
-        title = r.get('title', '').strip().lower()
+        if isinstance(r, dict):
+            r = SearchResult.from_dict(r)
+        url = r.url.strip()
         
         # 基于URL去重
         if url and url not in seen_urls:
             # 基于标题相似度去重
-            normalized_title = re.sub(r'[\s\p{P}]+', '', title)
-            is_duplicate = False
-            
-            for seen_title in seen_titles:
-                if normalized_title in seen_title or seen_title in normalized_title:
-                    is_duplicate = True
-                    break
-            
-            if not is_duplicate:
+            if title_index.check_and_add(len(unique_results), r.title) is None:
                 seen_urls.add(url)
-                seen_titles.add(normalized_title)
                 unique_results.append(r)
     
     return unique_results
@@ -337,256 +350,247 @@ def deduplicate(results):
 def generate_sichuan_agri_data():
     """生成四川农业大学相关的高质量模拟数据"""
     return [
-        {
-            'title': "四川农业大学 - 官方网站",
-            'summary': "四川农业大学是一所以生物科技为特色，农业科技为优势，多学科协调发展的国家'双一流'建设高校。",
-            'url': "https://www.sicau.edu.cn",
-            'source': '模拟数据',
-            'relevance_score': 95
-        },
-        {
-            'title': "四川农业大学 简介 - 百度百科",
-            'summary': "四川农业大学（Sichuan Agricultural University），简称\"川农大\"，坐落于四川省雅安市，是国家\"双一流\"建设高校。",
-            'url': "https://baike.baidu.com/item/四川农业大学",
-            'source': '模拟数据',
-            'relevance_score': 90
-        },
-        {
-            'title': "四川农业大学 招生信息网",
-            'summary': "提供四川农业大学最新的招生计划、录取分数线、招生简章等信息，帮助考生了解学校招生政策。",
-            'url': "https://zs.sicau.edu.cn",
-            'source': '模拟数据',
-            'relevance_score': 85
-        },
-        {
-            'title': "四川农业大学 科研成果展",
-            'summary': "展示四川农业大学在农业科学、生物技术、动物科学等领域的重要科研成果和创新项目。",
-            'url': "https://kyc.sicau.edu.cn",
-            'source': '模拟数据',
-            'relevance_score': 80
-        },
-        {
-            'title': "四川农业大学 校园新闻",
-            'summary': "最新四川农业大学校园动态、学术活动、学生活动等新闻资讯，全面了解学校发展。",
-            'url': "https://news.sicau.edu.cn",
-            'source': '模拟数据',
-            'relevance_score': 75
-        }
+        SearchResult(
+            title="四川农业大学 - 官方网站",
+            summary="四川农业大学是一所以生物科技为特色，农业科技为优势，多学科协调发展的国家'双一流'建设高校。",
+            url="https://www.sicau.edu.cn",
+            source='模拟数据',
+            relevance_score=95
+        ),
+        SearchResult(
+            title="四川农业大学 简介 - 百度百科",
+            summary="四川农业大学（Sichuan Agricultural University），简称\"川农大\"，坐落于四川省雅安市，是国家\"双一流\"建设高校。",
+            url="https://baike.baidu.com/item/四川农业大学",
+            source='模拟数据',
+            relevance_score=90
+        ),
+        SearchResult(
+            title="四川农业大学 招生信息网",
+            summary="提供四川农业大学最新的招生计划、录取分数线、招生简章等信息，帮助考生了解学校招生政策。",
+            url="https://zs.sicau.edu.cn",
+            source='模拟数据',
+            relevance_score=85
+        ),
+        SearchResult(
+            title="四川农业大学 科研成果展",
+            summary="展示四川农业大学在农业科学、生物技术、动物科学等领域的重要科研成果和创新项目。",
+            url="https://kyc.sicau.edu.cn",
+            source='模拟数据',
+            relevance_score=80
+        ),
+        SearchResult(
+            title="四川农业大学 校园新闻",
+            summary="最新四川农业大学校园动态、学术活动、学生活动等新闻资讯，全面了解学校发展。",
+            url="https://news.sicau.edu.cn",
+            source='模拟数据',
+            relevance_score=75
+        )
     ]
 
+def crawl_sources(keyword):
+    """
+    调用各搜索来源实时搜索单个关键词
+
+    Returns:
+        list: 各来源的SearchResult列表，已标记来源名
+    """
+    # 所有搜索来源并行执行，总耗时受SEARCH_DEADLINE约束，超时未返回的来源被取消
+    sources = create_sources(SEARCH_SOURCES)
+    runs = fan_out(
+        {source.name: functools.partial(source.acollect, keyword) for source in sources},
+        deadline=SEARCH_DEADLINE
+    )
+    
+    results = []
+    for run in runs:
+        if run['status'] != 'ok':
+            continue
+        # 结果原地标记来源，不再复制
+        count = 0
+        for item in run['result']:
+            if item.url:
+                item.source = run['name']
+                results.append(item)
+                count += 1
+        logging.info(f'搜索来源 {run["name"]} 执行成功，耗时: {run["elapsed"]:.2f}s, 结果数: {count}')
+    return results
+
+def run_watch_crawl(keyword):
+    """
+    监测关键词的定时抓取：实时搜索并验证、去重，不补充模拟结果
+
+    由关键词监测调度线程调用
+    """
+    return deduplicate(validate_search_results(crawl_sources(keyword), keyword))
+
+def run_live_search(keyword):
+    """
+    调用各搜索来源实时搜索单个关键词，验证、去重后不足时补充模拟结果
+
+    由后台抓取任务的工作线程调用
+
+    Returns:
+        list: SearchResult列表，最多20条
+    """
+    results = crawl_sources(keyword)
+    
+    # 验证搜索结果质量
+    validated_results = validate_search_results(results, keyword)
+    
+    # 去重处理
+    unique_results = deduplicate(validated_results)
+    
+    # 增强模拟结果生成逻辑
+    def generate_quality_mock_results(kw):
+        """生成高质量的模拟结果，确保包含关键词"""
+        # 确保kw是字符串
+        if not isinstance(kw, str):
+            kw = str(kw)
+        
+        # 为"四川农业大学"生成特定的高质量模拟结果
+        if kw and (kw == '四川农业大学' or ('四川' in kw and '农业' in kw and '大学' in kw)):
+            # 使用独立函数生成四川农业大学的高质量模拟数据
+            return generate_sichuan_agri_data()
+        
+        # 通用模拟结果
+        return [
+            SearchResult(
+                title=f"{kw} - 官方信息",
+                summary=f"这是关于{kw}的官方信息介绍，包含基本概况和重要数据。",
+                url=f"https://example.com/official/{kw}",
+                source='模拟数据',
+                relevance_score=90
+            ),
+            SearchResult(
+                title=f"{kw} 最新动态",
+                summary=f"了解{kw}的最新发展和重要事件，获取第一手资讯。",
+                url=f"https://example.com/news/{kw}",
+                source='模拟数据',
+                relevance_score=85
+            ),
+            SearchResult(
+                title=f"{kw} - 详细介绍",
+                summary=f"提供{kw}的详细背景、发展历程、主要特点等全面信息。",
+                url=f"https://example.com/intro/{kw}",
+                source='模拟数据',
+                relevance_score=80
+            )
+        ]
+    
+    # 如果结果不足，生成高质量模拟结果
+    if len(unique_results) < 3:
+        result_type = '完整' if len(unique_results) < 1 else '补充'
+        logging.info(f"结果不足，生成{result_type}模拟结果")
+        mock_results = generate_quality_mock_results(keyword)
+        
+        # 避免重复添加
+        existing_urls = set(item.url for item in unique_results)
+        for mock in mock_results:
+            if mock.url not in existing_urls:
+                unique_results.append(mock)
+                existing_urls.add(mock.url)
+    
+    # 限制返回最多20条结果
+    unique_results = unique_results[:20]
+    
+    logging.info(f'搜索完成，原始结果: {len(results)}, 验证后: {len(validated_results)}, 去重后: {len(unique_results)}')
+    return unique_results
+
+def store_results(conn, results, keyword):
+    """
+    搜索结果入库：近似重复过滤、批量写入，并唤醒落地页正文补全
+
+    新URL的标题与数据仓库中已有记录（或本批次中先出现的记录）近似重复时跳过；
+    已入库的URL交给upsert更新。保存接口和关键词监测调度共用
+
+    Args:
+        conn: SQLite连接
+        results: SearchResult列表
+        keyword: 搜索关键词
+
+    Returns:
+        dict: upsert_results的统计，另加skipped（跳过的近似重复和已归档条数）
+    """
+    repo_index = get_repository_index(DATABASE, NEAR_DUP_THRESHOLD, conn)
+    batch_index = NearDupIndex(threshold=NEAR_DUP_THRESHOLD, shingle_size=2)
+    
+    items = []
+    batch_urls = set()
+    skipped_count = 0
+    with repo_index.lock:
+        for position, item in enumerate(results):
+            url = normalize_url(item.url)
+            if url not in batch_urls and not repo_index.has_url(url) and (
+                    repo_index.index.query(item.title) is not None
+                    or batch_index.check_and_add(position, item.title) is not None):
+                skipped_count += 1
+                continue
+            batch_urls.add(url)
+            items.append(item)
+        
+        # 整批结果在一个事务中写入
+        counts = upsert_results(conn, items, keyword)
+        repo_index.refresh(conn)
+    
+    # 有新记录时唤醒落地页正文补全
+    if counts['inserted']:
+        enricher.wake()
+    
+    counts['skipped'] = skipped_count + counts['archived']
+    return counts
+
+# 后台抓取任务队列，工作线程在首次提交任务时启动
+crawl_queue = JobQueue(db_pool, run_live_search, workers=int(os.environ.get('CRAWL_WORKERS', '2')))
+
+# 关键词监测调度器，调度线程在启动应用时启动
+watch_scheduler = WatchScheduler(db_pool, run_watch_crawl, store=store_results)
+
+# 落地页正文补全，后台线程在启动应用时启动
+enricher = Enricher(db_pool)
+
 @app.route('/search', methods=['GET', 'POST'])
 def search():
-    """搜索路由，直接返回四川农业大学的模拟数据"""
+    """搜索路由，默认返回四川农业大学的模拟数据，开启LIVE_SEARCH后调用爬虫实时搜索"""
     try:
         # 记录请求信息
         client_ip = request.remote_addr
         user_agent = request.headers.get('User-Agent', '')
         logging.info('搜索请求 - IP: %s, UA: %s', client_ip, user_agent)
         
-        # 简化版本：直接返回四川农业大学的模拟数据
-        # 不再依赖关键词解析，避免编码问题
-        logging.info("直接返回四川农业大学的高质量模拟数据")
-        
-        # 直接生成模拟数据
-        sim_data = [
-            {
-                'title': "四川农业大学 - 官方网站",
-                'summary': "四川农业大学是一所以生物科技为特色，农业科技为优势，多学科协调发展的国家'双一流'建设高校。",
-                'url': "https://www.sicau.edu.cn",
-                'source': '模拟数据',
-                'relevance_score': 95
-            },
-            {
-                'title': "四川农业大学 简介 - 百度百科",
-                'summary': "四川农业大学（Sichuan Agricultural University），简称\"川农大\"，坐落于四川省雅安市，是国家\"双一流\"建设高校。",
-                'url': "https://baike.baidu.com/item/四川农业大学",
-                'source': '模拟数据',
-                'relevance_score': 90
-            },
-            {
-                'title': "四川农业大学 招生信息网",
-                'summary': "提供四川农业大学最新的招生计划、录取分数线、招生简章等信息，帮助考生了解学校招生政策。",
-                'url': "https://zs.sicau.edu.cn",
-                'source': '模拟数据',
-                'relevance_score': 85
-            },
-            {
-                'title': "四川农业大学 科研成果展",
-                'summary': "展示四川农业大学在农业科学、生物技术、动物科学等领域的重要科研成果和创新项目。",
-                'url': "https://kyc.sicau.edu.cn",
-                'source': '模拟数据',
-                'relevance_score': 80
-            },
-            {
-                'title': "四川农业大学 校园新闻",
-                'summary': "最新四川农业大学校园动态、学术活动、学生活动等新闻资讯，全面了解学校发展。",
-                'url': "https://news.sicau.edu.cn",
-                'source': '模拟数据',
-                'relevance_score': 75
+        if not LIVE_SEARCH:
+            # 简化版本：直接返回四川农业大学的模拟数据
+            # 不再依赖关键词解析，避免编码问题
+            logging.info("直接返回四川农业大学的高质量模拟数据")
+            sim_data = generate_sichuan_agri_data()
+            response_data = {
+                'status': 'success',
+                'data': sim_data,
+                'keyword': '四川农业大学',
+                'total': len(sim_data)
             }
-        ]
-        
-        # 确保JSON序列化正确处理中文
-        response_data = {
-            'status': 'success',
-            'data': sim_data,
-            'keyword': '四川农业大学',
-            'total': len(sim_data)
-        }
-        
-        # 使用Python标准库的json模块，确保中文正确序列化
-        import json
-        response_json = json.dumps(response_data, ensure_ascii=False)
+            return app.response_class(
+                response=dumps(response_data),
+                status=200,
+                mimetype='application/json; charset=utf-8'
+            )
         
-        # 返回响应，设置正确的Content-Type
-        from flask import Response
-        return Response(
-            response=response_json,
-            status=200,
-            mimetype='application/json; charset=utf-8'
-        )
-            
+        # 关键词可以来自JSON请求体、表单或查询参数
+        payload = request.get_json(silent=True) or {}
+        keyword = str(payload.get('keyword') or request.values.get('keyword', '')).strip()
         if not keyword:
             return jsonify({'error': '请输入搜索关键词'}), 400
         
-        logging.info(f'开始搜索关键词: {keyword}')
-        
-        # 初始化爬虫实例
-        baidu_spider = BaiduSpider()
-        baidu_search_spider = BaiduSearchSpider()
-        
-        # 增强爬虫容错
-        results = []
-        for spider in [baidu_spider, baidu_search_spider]:
-            try:
-                start_time = datetime.datetime.now()
-                spider_results = spider.search(keyword)
-                end_time = datetime.datetime.now()
-                
-                # 处理爬虫返回结果
-                if isinstance(spider_results, dict) and 'results' in spider_results:
-                    processed_results = []
-                    for item in spider_results['results']:
-                        if isinstance(item, dict) and 'url' in item:
-                            processed_item = {
-                                'title': item.get('title', '').strip(),
-                                'url': item['url'],
-                                'summary': item.get('summary', '').strip(),
-                                'source': spider.__class__.__name__
-                            }
-                            processed_results.append(processed_item)
-                    
-                    results.extend(processed_results)
-                    logging.info(f'Spider {spider.__class__.__name__} 执行成功，耗时: {(end_time-start_time).total_seconds():.2f}s, 结果数: {len(processed_results)}')
-                else:
-                    logging.warning(f'Spider {spider.__class__.__name__} 返回非标准格式结果')
-                
-            except requests.exceptions.ConnectionError as e:
-                logging.error(f'Spider {spider.__class__.__name__} 连接错误: {str(e)}')
-            except requests.exceptions.Timeout as e:
-                logging.error(f'Spider {spider.__class__.__name__} 超时错误: {str(e)}')
-            except requests.exceptions.HTTPError as e:
-                if e.response and e.response.status_code == 429:
-                    logging.error(f'Spider {spider.__class__.__name__} 被反爬限制 (429)')
-                else:
-                    logging.error(f'Spider {spider.__class__.__name__} HTTP错误: {str(e)}')
-            except Exception as e:
-                logging.error(f'Spider {spider.__class__.__name__} 失败: {str(e)}')
-        
-        # 验证搜索结果质量
-        validated_results = validate_search_results(results, keyword)
-        
-        # 去重处理
-        unique_results = deduplicate(validated_results)
-        
-        # 增强模拟结果生成逻辑
-        def generate_quality_mock_results(kw):
-            """生成高质量的模拟结果，确保包含关键词"""
-            # 确保kw是字符串
-            if not isinstance(kw, str):
-                kw = str(kw)
-            
-            # 为"四川农业大学"生成特定的高质量模拟结果
-                # 使用独立函数生成四川农业大学的高质量模拟数据
-                if kw and (kw == '四川农业大学' or ('四川' in kw and '农业' in kw and '大学' in kw)):
-                    return generate_sichuan_agri_data()
-            else:
-                # 通用模拟结果
-                return [
-                    {
-                        'title': f"{kw} - 官方信息",
-                        'summary': f"这是关于{kw}的官方信息介绍，包含基本概况和重要数据。",
-                        'url': f"https://example.com/official/{kw}",
-                        'source': '模拟数据',
-                        'relevance_score': 90
-                    },
-                    {
-                        'title': f"{kw} 最新动态",
-                        'summary': f"了解{kw}的最新发展和重要事件，获取第一手资讯。",
-                        'url': f"https://example.com/news/{kw}",
-                        'source': '模拟数据',
-                        'relevance_score': 85
-                    },
-                    {
-                        'title': f"{kw} - 详细介绍",
-                        'summary': f"提供{kw}的详细背景、发展历程、主要特点等全面信息。",
-                        'url': f"https://example.com/intro/{kw}",
-                        'source': '模拟数据',
-                        'relevance_score': 80
-                    }
-                ]
-        
-        # 如果结果不足，生成高质量模拟结果
-        if len(unique_results) < 3:
-            result_type = '完整' if len(unique_results) < 1 else '补充'
-            logging.info(f"结果不足，生成{result_type}模拟结果")
-            mock_results = generate_quality_mock_results(keyword)
-            
-            # 避免重复添加
-            existing_urls = set(item.get('url', '') for item in unique_results)
-            for mock in mock_results:
-                if mock.get('url') not in existing_urls:
-                    unique_results.append(mock)
-                    existing_urls.add(mock.get('url'))
-        
-        # 限制返回最多20条结果
-        unique_results = unique_results[:20]
-        
-        # 添加相关性分数到最终结果
-        final_results = []
-        for item in unique_results:
-            result_item = {
-                'title': item.get('title', ''),
-                'url': item.get('url', ''),
-                'summary': item.get('summary', ''),
-                'source': item.get('source', ''),
-                'relevance_score': item.get('relevance_score', 0)
-            }
-            final_results.append(result_item)
-        
-        logging.info(f'搜索完成，原始结果: {len(results)}, 验证后: {len(validated_results)}, 去重后: {len(unique_results)}')
-        
-        # 返回结果，确保正确编码
-        response_data = {
-            'status': 'success',
-            'data': final_results,
-            'keyword': keyword if keyword else '',
-            'total': len(final_results)
-        }
-        
-        # 确保JSON序列化正确处理中文
-        import json
-        return app.response_class(
-            response=json.dumps(response_data, ensure_ascii=False),
-            status=200,
-            mimetype='application/json'
-        )
+        # 实时抓取放到后台任务中执行，立即返回任务ID，进度通过事件流或轮询获取
+        job, created = crawl_queue.submit([keyword])
+        logging.info(f"搜索关键词 {keyword} {'提交' if created else '复用'}抓取任务 {job['job_id']}")
+        return jsonify({
+            'status': 'queued',
+            'job_id': job['job_id'],
+            'job': job,
+            'status_url': url_for('get_job', job_id=job['job_id']),
+            'events_url': url_for('job_events', job_id=job['job_id'])
+        }), 202
         
-    except KeyError:
-        return jsonify({'error': 'Missing keyword parameter'}), 400
-    except Exception as e:
-        logging.exception("Search failed")
-        return jsonify({'error': str(e)}), 500
     except requests.exceptions.ConnectionError:
         logging.error('搜索过程中发生网络连接异常')
         return jsonify({
@@ -600,11 +604,55 @@ def search():
             'message': '爬虫请求超时，请稍后重试'
         }), 504
     except Exception as e:
-        logging.error(f'搜索过程发生未知错误: {str(e)}')
-        return jsonify({
-            'status': 'error',
-            'message': '系统内部错误，请稍后重试'
-        }), 500
+        logging.exception("Search failed")
+        return jsonify({'error': str(e)}), 500
+
+# 抓取任务路由
+@app.route('/jobs', methods=['POST'])
+@login_required
+def submit_job():
+    """提交批量关键词抓取任务，立即返回任务ID"""
+    payload = request.get_json(silent=True) or {}
+    keywords = payload.get('keywords')
+    if keywords is None:
+        keywords = [payload.get('keyword') or request.values.get('keyword', '')]
+    if not isinstance(keywords, list):
+        return jsonify({'status': 'error', 'message': 'keywords必须是关键词列表'}), 400
+    
+    try:
+        job, created = crawl_queue.submit([str(k) for k in keywords])
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    
+    return jsonify({
+        'status': 'queued',
+        'created': created,
+        'job_id': job['job_id'],
+        'job': job,
+        'status_url': url_for('get_job', job_id=job['job_id']),
+        'events_url': url_for('job_events', job_id=job['job_id'])
+    }), 202
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    """查询抓取任务状态和已完成关键词的结果（与/search一致无需登录，任务ID不可猜测）"""
+    job = crawl_queue.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': '任务不存在'}), 404
+    return app.response_class(
+        response=dumps({'status': 'success', 'data': job}),
+        status=200,
+        mimetype='application/json'
+    )
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """以server-sent events推送抓取任务进度"""
+    return Response(
+        stream_with_context(crawl_queue.events(job_id)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 # 保存数据路由
 @app.route('/save_data', methods=['POST'])
@@ -622,29 +670,21 @@ def save_data():
                 'message': '没有数据需要保存'
             })
         
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        
-        saved_count = 0
-        for item in results:
-            title = item.get('title', '')
-            url = item.get('url', '')
-            summary = item.get('summary', '')
-            
-            # 插入数据
-            cursor.execute(
-                "INSERT INTO data_repository (title, url, summary, search_keyword) VALUES (?, ?, ?, ?)",
-                (title, url, summary, keyword)
-            )
-            saved_count += 1
-        
-        conn.commit()
-        conn.close()
+        counts = store_results(get_db(), [SearchResult.from_dict(item) for item in results], keyword)
+        skipped_count = counts['skipped']
         
+        message = f'成功保存 {counts["inserted"]} 条数据'
+        if counts['updated']:
+            message += f'，更新 {counts["updated"]} 条已有数据'
+        if skipped_count:
+            message += f'，跳过 {skipped_count} 条重复数据'
         return jsonify({
             'status': 'success',
-            'message': f'成功保存 {saved_count} 条数据',
-            'count': saved_count
+            'message': message,
+            'count': counts['inserted'],
+            'inserted': counts['inserted'],
+            'updated': counts['updated'],
+            'skipped': skipped_count
         })
     except Exception as e:
         return jsonify({
@@ -663,63 +703,338 @@ def data_repository():
 @app.route('/get_repository_data')
 @login_required
 def get_repository_data():
-    """获取数据仓库中的数据"""
+    """
+    获取数据仓库中的数据
+
+    查询参数:
+        keyword, date_from, date_to: 查询条件
+        search_keyword: 抓取时使用的搜索关键词（精确匹配），与日期条件一起走 (search_keyword, created_at) 索引
+        按时间排序时同时查询与日期条件相交的归档分区
+        sort: time（按入库时间）或relevance（按标题和摘要的BM25相关性），默认有关键词时按相关性；
+            未指定且日期条件涉及归档分区时按时间排序，响应中的sort为实际排序方式，notice说明原因
+        limit: 每页条数
+        after: 上一页返回的next_cursor
+        total: 为1时统计符合条件的总数
+    """
     try:
         # 获取查询参数
         keyword = request.args.get('keyword', '')
         date_from = request.args.get('date_from', '')
         date_to = request.args.get('date_to', '')
+        search_keyword = request.args.get('search_keyword', '').strip()
+        sort = request.args.get('sort') or None
+        limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+        after = request.args.get('after') or None
         
-        # 构建查询
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        
-        query = "SELECT id, title, url, summary, search_keyword, created_at FROM data_repository WHERE 1=1"
-        params = []
-        
-        if keyword:
-            query += " AND (title LIKE ? OR summary LIKE ? OR search_keyword LIKE ?)"
-            params.extend([f'%{keyword}%', f'%{keyword}%', f'%{keyword}%'])
-        
-        if date_from:
-            query += " AND created_at >= ?"
-            params.append(date_from)
-        
-        if date_to:
-            query += " AND created_at <= ?"
-            params.append(date_to)
-        
-        query += " ORDER BY created_at DESC"
-        
-        cursor.execute(query, params)
-        results = cursor.fetchall()
-        conn.close()
-        
-        # 格式化结果
-        formatted_results = []
-        for row in results:
-            formatted_results.append({
-                'id': row[0],
-                'title': row[1],
-                'url': row[2],
-                'summary': row[3],
-                'search_keyword': row[4],
-                'created_at': row[5]
-            })
-        
+        conn = get_db()
+        page = RepositoryPage(conn, keyword, date_from, date_to, sort, limit, after, search_keyword,
+                              archive=repository_archive)
+        # 总数需要额外的统计查询，只在请求时计算
+        total = None
+        if request.args.get('total') == '1':
+            total = count_repository(conn, keyword, date_from, date_to, search_keyword, archive=page.archive)
+    except ValueError as e:
         return jsonify({
-            'status': 'success',
-            'data': formatted_results
-        })
+            'status': 'error',
+            'message': f'查询参数错误: {str(e)}'
+        }), 400
     except Exception as e:
         return jsonify({
             'status': 'error',
             'message': f'查询失败: {str(e)}'
         })
+    
+    # 边读游标边输出，不在内存中组装整个结果集；连接在响应结束后随应用上下文归还
+    return Response(
+        stream_with_context(stream_page_json(page, total=total)),
+        mimetype='application/json'
+    )
+
+# 关键词监测列表路由
+@app.route('/watchlist', methods=['GET'])
+@login_required
+def list_watchlist():
+    """返回监测关键词列表及最近一次抓取情况"""
+    return jsonify({'status': 'success', 'data': watch_scheduler.list()})
+
+@app.route('/watchlist', methods=['POST'])
+@login_required
+def add_watchlist():
+    """添加或更新监测关键词，参数: keyword、interval_minutes、priority、enabled"""
+    payload = request.get_json(silent=True) or request.form
+    try:
+        watch = watch_scheduler.add(
+            payload.get('keyword'),
+            interval_minutes=payload.get('interval_minutes', DEFAULT_INTERVAL_MINUTES),
+            priority=payload.get('priority', 0),
+            enabled=str(payload.get('enabled', True)).lower() not in ('0', 'false')
+        )
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return jsonify({'status': 'success', 'data': watch})
+
+@app.route('/watchlist/<int:watch_id>', methods=['DELETE'])
+@login_required
+def remove_watchlist(watch_id):
+    """删除监测关键词"""
+    if not watch_scheduler.remove(watch_id):
+        return jsonify({'status': 'error', 'message': '监测关键词不存在'}), 404
+    return jsonify({'status': 'success'})
+
+@app.route('/watchlist/<int:watch_id>/run', methods=['POST'])
+@login_required
+def run_watchlist(watch_id):
+    """让监测关键词在下一轮调度时立即抓取"""
+    if not watch_scheduler.trigger(watch_id):
+        return jsonify({'status': 'error', 'message': '监测关键词不存在'}), 404
+    return jsonify({'status': 'success', 'data': watch_scheduler.get(watch_id)})
+
+# 数据仓库导出路由
+@app.route('/export/<fmt>')
+@login_required
+def export_data(fmt):
+    """
+    按查询条件导出数据仓库为Parquet、Feather、CSV或NDJSON文件
+
+    查询参数:
+        keyword, date_from, date_to, search_keyword: 查询条件，同/get_repository_data
+        gzip: CSV/NDJSON是否gzip压缩，默认为1（下载.gz文件），为0时输出未压缩的文本
+    Parquet/Feather先逐批写入临时文件再分块发送；CSV/NDJSON边读游标边序列化、压缩并输出，
+    两种方式的内存占用都与导出行数无关
+    """
+    if fmt in TEXT_FORMATS:
+        return export_text_data(fmt)
+    if fmt not in ARROW_FORMATS:
+        return jsonify({'status': 'error', 'message': f'不支持的导出格式: {fmt}'}), 404
+    extension, mimetype = ARROW_FORMATS[fmt]
+    output = tempfile.TemporaryFile()
+    try:
+        export_repository(
+            get_db(), output, fmt,
+            keyword=request.args.get('keyword', ''),
+            date_from=request.args.get('date_from', ''),
+            date_to=request.args.get('date_to', ''),
+            search_keyword=request.args.get('search_keyword', '').strip(),
+            archive=repository_archive
+        )
+    except ExportUnavailable as e:
+        output.close()
+        return jsonify({'status': 'error', 'message': str(e)}), 501
+    except ValueError as e:
+        output.close()
+        return jsonify({'status': 'error', 'message': f'查询参数错误: {str(e)}'}), 400
+    except Exception as e:
+        output.close()
+        logging.error(f"数据仓库导出失败: {str(e)}")
+        return jsonify({'status': 'error', 'message': f'导出失败: {str(e)}'}), 500
+
+    def send():
+        try:
+            output.seek(0)
+            while True:
+                chunk = output.read(64 * 1024)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            output.close()
+
+    filename = f"repository_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}"
+    return Response(send(), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+def export_text_data(fmt):
+    """流式导出CSV/NDJSON，连接在响应结束后随应用上下文归还"""
+    extension, mimetype = TEXT_FORMATS[fmt]
+    compress = request.args.get('gzip', '1') != '0'
+    try:
+        chunks = export_text(
+            get_db(), fmt,
+            keyword=request.args.get('keyword', ''),
+            date_from=request.args.get('date_from', ''),
+            date_to=request.args.get('date_to', ''),
+            search_keyword=request.args.get('search_keyword', '').strip(),
+            archive=repository_archive,
+            compress=compress
+        )
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': f'查询参数错误: {str(e)}'}), 400
+    except Exception as e:
+        logging.error(f"数据仓库导出失败: {str(e)}")
+        return jsonify({'status': 'error', 'message': f'导出失败: {str(e)}'}), 500
+
+    def send():
+        try:
+            yield from chunks
+        except Exception as e:
+            # 响应头已发出，只能记录日志并中断传输，客户端得到不完整的文件
+            logging.error(f"数据仓库导出中断: {str(e)}")
+            raise
+        finally:
+            chunks.close()
+
+    if compress:
+        extension += '.gz'
+        mimetype = 'application/gzip'
+    filename = f"repository_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}"
+    return Response(stream_with_context(send()), content_type=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+# 数据仓库归档分区路由
+@app.route('/repository/partitions', methods=['GET'])
+@login_required
+def list_partitions():
+    """返回已归档的月份分区"""
+    return jsonify({'status': 'success', 'data': repository_archive.partitions(get_db())})
+
+@app.route('/repository/partitions/archive', methods=['POST'])
+@login_required
+def archive_partitions():
+    """
+    归档较早月份的数据仓库记录
+
+    请求体:
+        before: 归档早于该月份（YYYY-MM）的记录，默认只保留最近几个月
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        if data.get('before'):
+            archived = repository_archive.archive_before(get_db(), data['before'])
+        else:
+            archived = repository_archive.archive_expired(get_db())
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return jsonify({'status': 'success', 'data': archived})
+
+# PDF报告路由
+def _report_query(args):
+    return report_query(args.get('keyword', ''), args.get('date_from', ''), args.get('date_to', ''),
+                        args.get('search_keyword', ''))
+
+@app.route('/reports', methods=['POST'])
+@login_required
+def submit_report():
+    """
+    提交PDF报告生成任务
+
+    请求体（JSON或表单）:
+        keyword, date_from, date_to, search_keyword: 查询条件，同/get_repository_data
+    数据仓库没有变化时直接返回已缓存的报告，否则返回202和报告编号，通过/reports/<key>查询进度
+    """
+    query = _report_query(request.get_json(silent=True) or request.form)
+    report, _ = report_service.submit(query)
+    report['download_url'] = url_for('download_report', key=report['key'])
+    return jsonify({'status': 'success', 'data': report}), 202 if report['status'] != 'done' else 200
+
+@app.route('/reports/<key>', methods=['GET'])
+@login_required
+def get_report(key):
+    """查询PDF报告的生成状态"""
+    try:
+        report = report_service.get(key)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 404
+    if report is None:
+        return jsonify({'status': 'error', 'message': '报告不存在或已过期'}), 404
+    report['download_url'] = url_for('download_report', key=report['key'])
+    return jsonify({'status': 'success', 'data': report})
+
+@app.route('/reports/<key>/download', methods=['GET'])
+@login_required
+def download_report(key):
+    """下载已生成的PDF报告，报告尚未生成完成时返回409"""
+    try:
+        report = report_service.get(key)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 404
+    if report is None:
+        return jsonify({'status': 'error', 'message': '报告不存在或已过期'}), 404
+    if report['status'] != 'done':
+        return jsonify({'status': 'error', 'message': '报告尚未生成完成', 'data': report}), 409
+    return send_file(report_service.path(report['key']), mimetype='application/pdf', as_attachment=True,
+                     download_name=f'report_{report["key"]}.pdf')
+
+@app.route('/reports/preview', methods=['GET'])
+@login_required
+def preview_report():
+    """
+    预览PDF报告的前几页
+
+    查询参数:
+        keyword, date_from, date_to, search_keyword: 查询条件
+        pages: 预览页数，默认2页，最多10页
+    只读取前几页需要的记录，不等待后台生成完整报告
+    """
+    try:
+        pdf = report_service.preview(get_db(), _report_query(request.args),
+                                     request.args.get('pages', PREVIEW_PAGES, type=int))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': f'查询参数错误: {str(e)}'}), 400
+    except Exception as e:
+        logging.error(f"报告预览失败: {str(e)}")
+        return jsonify({'status': 'error', 'message': f'预览失败: {str(e)}'}), 500
+    return Response(pdf, mimetype='application/pdf',
+                    headers={'Content-Disposition': 'inline; filename=preview.pdf'})
+
+# 数据库连接池状态接口
+@app.route('/debug/db_stats')
+@login_required
+def db_stats():
+    """返回数据库连接池统计信息"""
+    return jsonify({
+        'status': 'success',
+        'data': db_pool.stats()
+    })
+
+# 爬虫耗时统计接口
+@app.route('/debug/spider_stats')
+@login_required
+def spider_stats():
+    """返回各爬虫最近的耗时分位数和超时、失败次数"""
+    return jsonify({
+        'status': 'success',
+        'data': get_timings().stats()
+    })
+
+# 落地页正文接口
+@app.route('/get_repository_content/<int:doc_id>')
+@login_required
+def get_repository_content(doc_id):
+    """返回数据仓库记录的落地页正文，尚未抓取时返回404"""
+    content = enricher.get(doc_id)
+    if content is None:
+        return jsonify({'status': 'error', 'message': '正文尚未抓取'}), 404
+    return jsonify({'status': 'success', 'data': content})
+
+# 落地页正文补全进度接口
+@app.route('/debug/enrichment_stats')
+@login_required
+def enrichment_stats():
+    """返回落地页正文各状态的记录数、待抓取记录数和已读取字节数"""
+    return jsonify({
+        'status': 'success',
+        'data': enricher.stats()
+    })
+
+# HTTP传输统计接口
+@app.route('/debug/http_stats')
+@login_required
+def http_stats():
+    """返回共享连接池的请求数、传输字节数，以及压缩和条件请求（304）节省的字节数"""
+    return jsonify({
+        'status': 'success',
+        'data': get_pool().stats()
+    })
 
 if __name__ == '__main__':
     # 初始化数据库
     init_db()
     
+    # 启动关键词监测调度和落地页正文补全
+    if WATCH_SCHEDULER:
+        watch_scheduler.start()
+    if ENRICHMENT:
+        enricher.start()
+    
     # 启动应用
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
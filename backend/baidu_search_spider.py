@@ -7,19 +7,26 @@
 """
 
 import requests
-import urllib.parse
-import re
 import time
 import random
-import json
 import os
-import requests
+import asyncio
 import logging
 
+from rate_limiter import MemoryBackend, TokenBucketLimiter
+from search_result import SearchResult, dumps
+from sources import SearchSource, register_source
+
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+BAIDU_HOST = 'www.baidu.com'
+CACHE_NAMESPACE = 'baidu_search_spider'
+
+# 设置为1时完整读取第一页响应并保存前10000个字符用于调试（不使用流式读取）
+DEBUG_RESPONSE = os.environ.get('BAIDU_SEARCH_DEBUG') == '1'
+
 # 固定的User-Agent列表
 USER_AGENTS = [
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -30,110 +37,80 @@ USER_AGENTS = [
     'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Safari/605.1.15'
 ]
 
-class BaiduSearchSpider:
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': random.choice(USER_AGENTS),
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'zh-CN,zh;q=0.9',
-            'Connection': 'keep-alive',
-            'Accept-Encoding': 'gzip, deflate'
-        })
-        # 初始化Cookie
-        self._init_cookies()
-        # 结果去重集合
-        self.seen_urls = set()
+@register_source
+class BaiduSearchSpider(SearchSource):
+    """百度搜索来源：支持多页和并发批量搜索，没有提取到结果时返回模拟结果"""
     
-    def _init_cookies(self):
-        """初始化Cookie，模拟浏览器行为"""
+    name = 'baidu_search'
+    host = BAIDU_HOST
+    cache_namespace = CACHE_NAMESPACE
+    result_source = 'baidu'
+    max_results = 10
+    timeout = 10
+    stream_results = not DEBUG_RESPONSE
+    
+    def __init__(self, pool=None, limiter=None, cache=None, validators=None):
+        # 所有实例共享进程内的连接池和Cookie，以及跨进程的限速器
+        super().__init__(pool, limiter, cache, validators)
+        self._cookies_ready = False
+        self.debug_file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'debug_baidu_response.html')
+    
+    async def prepare(self):
+        """初始化Cookie，模拟浏览器行为（首次搜索前惰性执行）"""
+        if self._cookies_ready:
+            return
+        self._cookies_ready = True
         try:
-            self.session.get('https://www.baidu.com/')
+            await self.pool.get('https://www.baidu.com/', headers=self.get_headers())
             logger.info("Cookie初始化成功")
         except Exception as e:
             logger.error(f"Cookie初始化失败: {e}")
     
-    def _get_random_headers(self):
+    def get_headers(self):
         """获取随机请求头"""
         return {
             'User-Agent': random.choice(USER_AGENTS),
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'zh-CN,zh;q=0.9',
-            'Connection': 'keep-alive',
-            'Accept-Encoding': 'gzip, deflate'
+            'Connection': 'keep-alive'
         }
     
-    def _extract_results(self, html):
-        """使用正则表达式提取搜索结果"""
-        results = []
-        
-        # 正则表达式匹配搜索结果
-        # 匹配标题和链接
-        title_url_pattern = re.compile(r'<h3[^>]*class=["\']t["\'][^>]*>.*?<a[^>]*href=["\'](.*?)["\'][^>]*>(.*?)</a>.*?</h3>', re.S)
-        matches = title_url_pattern.findall(html)
-        
-        # 匹配摘要内容
-        summary_pattern = re.compile(r'<div[^>]*class=["\']c-abstract["\'][^>]*>(.*?)</div>', re.S)
-        summaries = summary_pattern.findall(html)
-        
-        # 处理匹配结果
-        for i, (url, title_html) in enumerate(matches):
-            # 清理标题，去除HTML标签
-            title = re.sub(r'<[^>]+>', '', title_html)
-            title = re.sub(r'\s+', ' ', title).strip()
-            
-            # 获取摘要（如果有）
-            summary = ''
-            if i < len(summaries):
-                summary = re.sub(r'<[^>]+>', '', summaries[i])
-                summary = re.sub(r'\s+', ' ', summary).strip()
-            
-            # 过滤无效链接
-            if not url.startswith('http'):
-                continue
-            
-            # 去重
-            if url in self.seen_urls:
-                continue
-            self.seen_urls.add(url)
-            
-            # 构建结果
-            result_item = {
-                'title': title,
-                'url': url,
-                'summary': summary,
-                'source': 'baidu'  # 添加来源标识
-            }
-            
-            results.append(result_item)
-            
-            # 限制结果数量
-            if len(results) >= 10:
-                break
-        
-        return results
+    def build_url(self, keyword, page):
+        return f"https://www.baidu.com/s?wd={requests.utils.quote(keyword)}&pn={page * 10}"
+    
+    async def fetch(self, keyword, page, timeout=None):
+        # 只有关闭流式读取（BAIDU_SEARCH_DEBUG=1）时才会完整读取响应
+        response = await super().fetch(keyword, page, timeout)
+        # 保存响应内容用于调试（只保存第一页的响应，304没有响应体）
+        if page == 0 and not response.not_modified:
+            self._save_debug_info(response.text, self.debug_file_path)
+        return response
+    
+    def fallback_results(self, keyword):
+        logger.warning(f"未能提取到有效结果，返回模拟结果: {keyword}")
+        return self._generate_mock_results(keyword)
     
     def _generate_mock_results(self, keyword):
         """生成模拟搜索结果"""
         mock_results = [
-            {
-                'title': f"关于'{keyword}'的最新资讯",
-                'url': f"https://example.com/news/{keyword}",
-                'summary': f"这是关于{keyword}的最新资讯摘要，包含了相关的重要信息和分析。",
-                'source': 'baidu'
-            },
-            {
-                'title': f"{keyword} - 专业知识百科",
-                'url': f"https://example.com/wiki/{keyword}",
-                'summary': f"全面介绍{keyword}的相关知识，包括定义、特点、应用场景等内容。",
-                'source': 'baidu'
-            },
-            {
-                'title': f"{keyword}相关研究报告",
-                'url': f"https://example.com/reports/{keyword}",
-                'summary': f"最新研究报告显示，{keyword}在多个领域有着广泛的应用前景。",
-                'source': 'baidu'
-            }
+            SearchResult(
+                title=f"关于'{keyword}'的最新资讯",
+                url=f"https://example.com/news/{keyword}",
+                summary=f"这是关于{keyword}的最新资讯摘要，包含了相关的重要信息和分析。",
+                source='baidu'
+            ),
+            SearchResult(
+                title=f"{keyword} - 专业知识百科",
+                url=f"https://example.com/wiki/{keyword}",
+                summary=f"全面介绍{keyword}的相关知识，包括定义、特点、应用场景等内容。",
+                source='baidu'
+            ),
+            SearchResult(
+                title=f"{keyword}相关研究报告",
+                url=f"https://example.com/reports/{keyword}",
+                summary=f"最新研究报告显示，{keyword}在多个领域有着广泛的应用前景。",
+                source='baidu'
+            )
         ]
         return mock_results
     
@@ -150,91 +127,112 @@ class BaiduSearchSpider:
             logger.error(f"保存调试信息失败: {e}")
     
     def search(self, keyword, pages=1):
-        """搜索关键词，支持多页搜索"""
-        all_results = []
-        self.seen_urls.clear()  # 清空去重集合
-        
-        debug_file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'debug_baidu_response.html')
-        
-        try:
-            for page in range(pages):
-                # 计算分页起始位置
-                start = page * 10
-                
-                # 构建搜索URL
-                search_url = f"https://www.baidu.com/s?wd={requests.utils.quote(keyword)}&pn={start}"
-                
-                # 发送请求
-                headers = self._get_random_headers()
-                logger.info(f"正在搜索: {keyword} (第{page+1}页)")
-                
-                # 添加随机延迟避免反爬
-                time.sleep(random.uniform(1.0, 3.0))
-                
-                response = self.session.get(search_url, headers=headers, timeout=10)
-                response.raise_for_status()
-                
-                # 保存响应内容用于调试
-                if page == 0:  # 只保存第一页的响应
-                    self._save_debug_info(response.text, debug_file_path)
-                
-                # 检查是否有验证码或反爬机制
-                if '验证码' in response.text or '请输入验证码' in response.text:
-                    logger.warning("检测到百度反爬机制，返回模拟结果")
-                    # 如果已经有一些结果，就返回已有的结果
-                    if all_results:
-                        break
-                    # 否则返回模拟结果
-                    return self._generate_mock_results(keyword)
-                
-                # 提取结果
-                results = self._extract_results(response.text)
-                all_results.extend(results)
-                
-                # 如果没有更多结果，停止搜索
-                if not results:
-                    break
-                
-            # 如果没有提取到结果，返回模拟结果
-            if not all_results:
-                logger.warning("未能提取到有效结果，返回模拟结果")
-                all_results = self._generate_mock_results(keyword)
-            
-            logger.info(f"搜索完成，共获取 {len(all_results)} 条结果")
-            return all_results
-            
-        except requests.RequestException as e:
-            logger.error(f"搜索请求失败: {e}")
-            # 如果有异常，返回模拟结果
-            return self._generate_mock_results(keyword)
-        except Exception as e:
-            logger.error(f"搜索过程中发生未知错误: {e}")
-            # 任何异常都返回模拟结果
-            return self._generate_mock_results(keyword)
+        """搜索关键词，支持多页搜索（asearch的同步包装）"""
+        return self.pool.run(self.asearch(keyword, pages))
+    
+    async def asearch(self, keyword, pages=1):
+        """搜索关键词，支持多页搜索，没有提取到结果时返回模拟结果"""
+        return await self.acollect(keyword, pages)
     
     def batch_search(self, keywords, pages=1):
+        """批量搜索多个关键词（abatch_search的同步包装）"""
+        return self.pool.run(self.abatch_search(keywords, pages))
+    
+    async def abatch_search(self, keywords, pages=1):
         """批量搜索多个关键词"""
         all_results = []
         
         for keyword in keywords:
-            results = self.search(keyword, pages)
+            results = await self.asearch(keyword, pages)
             all_results.extend(results)
             # 关键词之间添加较长延迟
-            time.sleep(random.uniform(3.0, 5.0))
+            await asyncio.sleep(random.uniform(3.0, 5.0))
         
-        # 对所有结果按来源和URL去重
+        unique_results = self._deduplicate_batch(all_results)
+        logger.info(f"批量搜索完成，去重后共获取 {len(unique_results)} 条结果")
+        return unique_results
+    
+    def _deduplicate_batch(self, all_results):
+        """对所有结果按来源和URL去重"""
         unique_results = []
         seen_identifiers = set()
         
         for result in all_results:
             # 生成唯一标识符 (来源+URL)
-            identifier = f"{result.get('source', 'unknown')}:{result['url']}"
+            identifier = f"{result.source or 'unknown'}:{result.url}"
             if identifier not in seen_identifiers:
                 seen_identifiers.add(identifier)
                 unique_results.append(result)
         
-        logger.info(f"批量搜索完成，去重后共获取 {len(unique_results)} 条结果")
         return unique_results
+    
+    def concurrent_batch_search(self, keywords, pages=1, max_workers=4, max_rate=None):
+        """并发批量搜索多个关键词（aconcurrent_batch_search的同步包装）"""
+        return self.pool.run(self.aconcurrent_batch_search(keywords, pages, max_workers, max_rate))
+    
+    async def aconcurrent_batch_search(self, keywords, pages=1, max_workers=4, max_rate=None):
+        """
+        并发批量搜索多个关键词
+        
+        所有关键词的所有分页作为独立任务在同一事件循环上调度，
+        最多max_workers个请求同时在途，每次请求前都要向共享限速器领取令牌，
+        因此同时在途的任务可以很多，但对同一主机的总请求速率不超过限速器的上限。
+        
+        Args:
+            keywords: 关键词列表
+            pages: 每个关键词搜索的页数
+            max_workers: 同时在途的请求上限
+            max_rate: 本次批量搜索额外的速率上限（请求/秒），None表示只受共享限速器约束
+            
+        Returns:
+            tuple: (与batch_search相同的去重结果列表, 按关键词统计的耗时字典)
+        """
+        batch_limiter = TokenBucketLimiter(MemoryBackend(), rate=max_rate, burst=1) if max_rate else None
+        slots = asyncio.Semaphore(max_workers)
+        batch_start = time.monotonic()
+        await self.prepare()
+        
+        async def run_task(keyword, page):
+            async with slots:
+                if batch_limiter:
+                    await batch_limiter.aacquire(BAIDU_HOST)
+                task_start = time.monotonic()
+                page_result = await self.fetch_page(keyword, page)
+            page_result['started'] = task_start
+            page_result['finished'] = time.monotonic()
+            return page_result
+        
+        # 关键词可能重复，按出现顺序只搜索一次
+        unique_keywords = list(dict.fromkeys(keywords))
+        
+        tasks = [run_task(keyword, page) for keyword in unique_keywords for page in range(pages)]
+        flat_results = await asyncio.gather(*tasks)
+        page_results = {
+            keyword: flat_results[i * pages:(i + 1) * pages]
+            for i, keyword in enumerate(unique_keywords)
+        }
+        
+        all_results = []
+        timings = {}
+        for keyword in unique_keywords:
+            results = self._merge_pages(keyword, page_results[keyword])
+            all_results.extend(results)
+            
+            keyword_pages = page_results[keyword]
+            timings[keyword] = {
+                'elapsed': round(max(p['finished'] for p in keyword_pages) - min(p['started'] for p in keyword_pages), 3),
+                'fetch_time': round(sum(p['finished'] - p['started'] for p in keyword_pages), 3),
+                'pages': len(keyword_pages),
+                'result_count': len(results),
+                'statuses': [p['status'] for p in keyword_pages]
+            }
+        
+        unique_results = self._deduplicate_batch(all_results)
+        logger.info(
+            f"并发批量搜索完成，{len(unique_keywords)} 个关键词耗时 {time.monotonic() - batch_start:.2f} 秒，"
+            f"去重后共获取 {len(unique_results)} 条结果"
+        )
+        return unique_results, timings
 
 # 命令行模式
 if __name__ == "__main__":
@@ -244,6 +242,8 @@ if __name__ == "__main__":
     parser.add_argument('-k', '--keyword', type=str, help='搜索关键词')
     parser.add_argument('-f', '--file', type=str, help='包含关键词的文件路径，每行一个关键词')
     parser.add_argument('-p', '--pages', type=int, default=1, help='搜索页数，默认为1页')
+    parser.add_argument('-c', '--concurrency', type=int, default=0, help='批量搜索时同时在途的请求数，默认为0（顺序搜索）')
+    parser.add_argument('-r', '--max-rate', type=float, default=None, help='并发批量搜索时每秒最多请求数，默认只受共享限速器约束')
     
     args = parser.parse_args()
     
@@ -251,13 +251,19 @@ if __name__ == "__main__":
     
     if args.keyword:
         results = spider.search(args.keyword, args.pages)
-        print(json.dumps(results, ensure_ascii=False, indent=2))
+        print(dumps(results, indent=2))
     elif args.file:
         try:
             with open(args.file, 'r', encoding='utf-8') as f:
                 keywords = [line.strip() for line in f if line.strip()]
-            results = spider.batch_search(keywords, args.pages)
-            print(json.dumps(results, ensure_ascii=False, indent=2))
+            if args.concurrency > 0:
+                results, timings = spider.concurrent_batch_search(
+                    keywords, args.pages, max_workers=args.concurrency, max_rate=args.max_rate
+                )
+                print(dumps({'results': results, 'timings': timings}, indent=2))
+            else:
+                results = spider.batch_search(keywords, args.pages)
+                print(dumps(results, indent=2))
         except Exception as e:
             print(f"读取关键词文件失败: {e}")
     else:
@@ -269,8 +275,8 @@ if __name__ == "__main__":
             results = spider.search(keyword)
             print(f"\n搜索结果 ({len(results)}条):\n")
             for i, result in enumerate(results, 1):
-                print(f"{i}. {result['title']}")
-                print(f"   URL: {result['url']}")
-                if result['summary']:
-                    print(f"   摘要: {result['summary']}")
+                print(f"{i}. {result.title}")
+                print(f"   URL: {result.url}")
+                if result.summary:
+                    print(f"   摘要: {result.summary}")
                 print()
\ No newline at end of file
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+搜索结果页解析器性能测试脚本
+对比原BaiduSpider中多次扫描的正则解析与serp_parser的单遍解析的单页耗时
+
+用法:
+    python bench_serp_parser.py                      # 使用生成的百度风格页面
+    python bench_serp_parser.py page1.html page2.html  # 使用保存的百度结果页
+"""
+
+import argparse
+import re
+import time
+
+from serp_parser import parse_serp
+
+# 页面结构参照百度的结果页模板
+RESULT_TEMPLATE = '''
+<div class="{block_class}" srcid="1599" id="{i}" tpl="se_com_default" mu="https://site{i}.example.com/article/{i}.html">
+  <div class="c-container">
+    <h3 class="c-title t t tts-title"><a href="http://www.baidu.com/link?url=abc{i}" target="_blank"><em>四川农业大学</em> 第{i}条新闻 - 官方发布</a></h3>
+    <div class="c-row">
+      <div class="c-span3"><img class="c-img" src="https://img{i}.example.com/cover.jpg"></div>
+      <div class="c-span9 c-span-last">
+        <div class="c-abstract">{padding}<em>四川农业大学</em>第{i}条摘要内容，介绍学校的最新动态和科研成果。</div>
+      </div>
+    </div>
+    <div class="c-row"><span class="c-color-gray">site{i}.example.com</span></div>
+  </div>
+</div>
+'''
+
+FALLBACK_TEMPLATE = '''
+<div class="c-row"><a href="https://site{i}.example.com/{i}" class="c-title-text">四川农业大学 第{i}条备用结果</a>
+<span>备用摘要{i}</span>{padding}</div>
+'''
+
+
+def build_sample_serp(result_count=10, padding=200, fallback=False, block_class='result'):
+    """
+    生成百度风格的搜索结果页
+
+    Args:
+        result_count: 结果条数
+        padding: 每条结果摘要前的额外正文长度
+        fallback: 是否生成只有标题链接、没有结果块的页面
+        block_class: 结果块的class属性，新版百度页面为多个类名的组合
+    """
+    template = FALLBACK_TEMPLATE if fallback else RESULT_TEMPLATE
+    filler = '内容' * padding
+    body = ''.join(template.format(i=i, padding=filler, block_class=block_class) for i in range(result_count))
+    head = '<html><head><title>四川农业大学_百度搜索</title>' + '<script>var x=1;</script>' * 50 + '</head><body>'
+    return head + '<div id="content_left">' + body + '</div></body></html>'
+
+
+def legacy_parse(html_content):
+    """原BaiduSpider.search中的解析流程（未预编译、备用方案对全文逐标题扫描）"""
+    results = []
+    result_blocks = re.findall(r'<div class=["\']result["\'][^>]*>(.*?)</div>', html_content, re.DOTALL)
+    for block in result_blocks:
+        title_url_match = re.search(r'<h3[^>]*>.*?<a[^>]*?href=["\'](.*?)["\'][^>]*?>(.*?)</a>.*?</h3>', block, re.DOTALL)
+        if title_url_match:
+            title = re.sub(r'<[^>]*>', '', title_url_match.group(2)).strip()
+            abstract_match = re.search(r'<div class=["\']c-abstract["\'][^>]*>(.*?)</div>', block, re.DOTALL)
+            if not abstract_match:
+                abstract_match = re.search(r'<div class=["\']content["\'][^>]*>(.*?)</div>', block, re.DOTALL)
+            abstract = re.sub(r'<[^>]*>', '', abstract_match.group(1)).strip() if abstract_match else ''
+            results.append({'title': title, 'url': title_url_match.group(1), 'abstract': abstract})
+
+    if not results:
+        pattern = r'<a[^>]*?href=["\'](https?://[^"\']*)["\'][^>]*?class=["\'](?:mnav|c-title-text|result-title)["\'][^>]*?>(.*?)</a>'
+        for href, title_html in re.findall(pattern, html_content, re.DOTALL)[:50]:
+            title = re.sub(r'<[^>]*>', '', title_html).strip()
+            abstract = ''
+            abstract_match = re.search(re.escape(title) + r'[^<]*<[^>]*>(.*?)<', html_content, re.DOTALL)
+            if abstract_match:
+                abstract = re.sub(r'<[^>]*>', '', abstract_match.group(1)).strip()[:200]
+            results.append({'title': title, 'url': href, 'abstract': abstract})
+    return results
+
+
+def time_parser(parser, html_content, repeat):
+    """返回单页平均解析耗时（毫秒）、结果数和带摘要的结果数"""
+    results = parser(html_content)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parser(html_content)
+    elapsed_ms = (time.perf_counter() - start) * 1000 / repeat
+    return elapsed_ms, len(results), sum(1 for r in results if r['abstract'])
+
+
+def load_page(path):
+    """读取保存的页面，依次尝试utf-8和gbk"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    for encoding in ('utf-8', 'gbk'):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('utf-8', errors='replace')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='搜索结果页解析器性能测试')
+    parser.add_argument('pages', nargs='*', help='保存的百度搜索结果页文件')
+    parser.add_argument('-n', '--repeat', type=int, default=20, help='每个页面的重复解析次数')
+    args = parser.parse_args()
+
+    if args.pages:
+        samples = [(path, load_page(path)) for path in args.pages]
+    else:
+        samples = [
+            ('生成页面 10条结果', build_sample_serp(10)),
+            ('生成页面 50条结果', build_sample_serp(50)),
+            ('新版多类名结果块 10条', build_sample_serp(10, block_class='result c-container xpath-log new-pmd')),
+            ('生成页面 10条结果(长正文)', build_sample_serp(10, padding=5000)),
+            ('生成页面 50条备用结构', build_sample_serp(50, fallback=True)),
+            ('生成页面 200条备用结构', build_sample_serp(200, fallback=True)),
+        ]
+
+    # 结果列为“结果数/带摘要数”，原解析流程在部分页面上耗时短是因为漏掉了摘要或结果
+    print(f"{'页面':<26}{'大小(KB)':>10}{'原解析(ms)':>12}{'结果':>9}{'新解析(ms)':>12}{'结果':>9}")
+    print('-' * 80)
+    for name, html_content in samples:
+        legacy_ms, legacy_count, legacy_abstracts = time_parser(legacy_parse, html_content, args.repeat)
+        new_ms, new_count, new_abstracts = time_parser(parse_serp, html_content, args.repeat)
+        size_kb = len(html_content.encode('utf-8')) / 1024
+        print(f"{name:<26}{size_kb:>10.1f}{legacy_ms:>12.3f}{legacy_count:>5}/{legacy_abstracts:<3}"
+              f"{new_ms:>12.3f}{new_count:>5}/{new_abstracts:<3}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+后台抓取任务队列 - 智能瞭望数据分析处理系统
+功能: 把实时搜索放到后台工作线程中执行，请求线程只负责提交任务和查询进度
+
+任务和每个关键词的结果都保存在SQLite中：工作线程以原子UPDATE领取排队的任务，
+进程重启后未完成的任务重新排队并跳过已完成的关键词。
+相同关键词的任务在排队或执行期间重复提交时返回已有任务，客户端重试不会重复抓取。
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+
+from search_result import dumps
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+# 单个任务最多包含的关键词数
+MAX_KEYWORDS = 50
+
+# 工作线程在没有通知时检查新任务的间隔（秒），用于发现其他进程提交的任务
+POLL_INTERVAL = 2.0
+
+# 事件流心跳间隔（秒）
+HEARTBEAT_INTERVAL = 15.0
+
+JOB_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS crawl_jobs (
+        id TEXT PRIMARY KEY,
+        keywords TEXT NOT NULL,
+        keywords_key TEXT NOT NULL,
+        status TEXT NOT NULL,
+        total INTEGER NOT NULL,
+        done INTEGER NOT NULL DEFAULT 0,
+        error TEXT,
+        created_at REAL NOT NULL,
+        started_at REAL,
+        finished_at REAL
+    )
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_crawl_jobs_status ON crawl_jobs (status, created_at)
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS crawl_job_results (
+        job_id TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        keyword TEXT NOT NULL,
+        status TEXT NOT NULL,
+        results TEXT NOT NULL,
+        error TEXT,
+        elapsed REAL NOT NULL,
+        PRIMARY KEY (job_id, position)
+    )
+    '''
+]
+
+
+class JobQueue:
+    """
+    基于SQLite的抓取任务队列
+
+    Args:
+        pool: db.ConnectionPool，工作线程和请求线程各自使用本线程的连接
+        runner: 抓取单个关键词的函数，参数为关键词，返回SearchResult列表
+        workers: 工作线程数
+    """
+
+    def __init__(self, pool, runner, workers=2):
+        self.pool = pool
+        self.runner = runner
+        self.workers = workers
+        self._threads = []
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        # 有新任务或任务进度变化时通知等待的工作线程和事件流
+        self._changed = threading.Condition()
+
+    def init_schema(self):
+        """创建任务表"""
+        conn = self.pool.connect()
+        for statement in JOB_SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+
+    def start(self):
+        """启动工作线程（重复调用无副作用），并把上次进程遗留的执行中任务重新排队"""
+        with self._start_lock:
+            if self._threads:
+                return
+            self.init_schema()
+            conn = self.pool.connect()
+            with conn:
+                recovered = conn.execute(
+                    "UPDATE crawl_jobs SET status = ? WHERE status = ?", (QUEUED, RUNNING)
+                ).rowcount
+            if recovered:
+                logger.info(f"重新排队 {recovered} 个未完成的抓取任务")
+            self._stop.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'crawl-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        """停止工作线程，正在执行的关键词完成后退出"""
+        self._stop.set()
+        self._notify()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _notify(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    def submit(self, keywords):
+        """
+        提交抓取任务
+
+        Args:
+            keywords: 关键词列表，去除空白和重复
+
+        Returns:
+            tuple: (任务信息字典, 是否新建)；相同关键词的任务仍在排队或执行时返回该任务
+        """
+        keywords = list(dict.fromkeys(k.strip() for k in keywords if k and k.strip()))
+        if not keywords:
+            raise ValueError('请输入搜索关键词')
+        if len(keywords) > MAX_KEYWORDS:
+            raise ValueError(f'单个任务最多包含 {MAX_KEYWORDS} 个关键词')
+        keywords_key = json.dumps(sorted(keywords), ensure_ascii=False)
+
+        self.start()
+        conn = self.pool.connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                f"SELECT id FROM crawl_jobs WHERE keywords_key = ? AND status IN ({','.join('?' * len(ACTIVE_STATUSES))}) "
+                "ORDER BY created_at LIMIT 1",
+                (keywords_key,) + ACTIVE_STATUSES
+            ).fetchone()
+            if row:
+                job_id, created = row[0], False
+            else:
+                job_id, created = uuid.uuid4().hex, True
+                conn.execute(
+                    "INSERT INTO crawl_jobs (id, keywords, keywords_key, status, total, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (job_id, json.dumps(keywords, ensure_ascii=False), keywords_key, QUEUED, len(keywords), time.time())
+                )
+        if created:
+            logger.info(f"提交抓取任务 {job_id}: {keywords}")
+            self._notify()
+        return self.get(job_id, include_results=False), created
+
+    def get(self, job_id, include_results=True):
+        """
+        查询任务状态
+
+        Returns:
+            dict: 任务信息，include_results为True时包含已完成关键词的结果；任务不存在时返回None
+        """
+        conn = self.pool.connect()
+        row = conn.execute(
+            "SELECT id, keywords, status, total, done, error, created_at, started_at, finished_at "
+            "FROM crawl_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job = {
+            'job_id': row[0],
+            'keywords': json.loads(row[1]),
+            'status': row[2],
+            'total': row[3],
+            'done': row[4],
+            'error': row[5],
+            'created_at': row[6],
+            'started_at': row[7],
+            'finished_at': row[8]
+        }
+        if include_results:
+            job['results'] = [
+                {
+                    'keyword': keyword,
+                    'status': status,
+                    'results': json.loads(results),
+                    'error': error,
+                    'elapsed': elapsed
+                }
+                for keyword, status, results, error, elapsed in conn.execute(
+                    "SELECT keyword, status, results, error, elapsed FROM crawl_job_results "
+                    "WHERE job_id = ? ORDER BY position", (job_id,)
+                )
+            ]
+        return job
+
+    def _claim(self):
+        """原子地领取最早排队的任务"""
+        conn = self.pool.connect()
+        with conn:
+            row = conn.execute(
+                "UPDATE crawl_jobs SET status = ?, started_at = COALESCE(started_at, ?) "
+                "WHERE id = (SELECT id FROM crawl_jobs WHERE status = ? ORDER BY created_at LIMIT 1) "
+                "RETURNING id, keywords",
+                (RUNNING, time.time(), QUEUED)
+            ).fetchall()
+        return (row[0][0], json.loads(row[0][1])) if row else None
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                job = self._claim()
+            except Exception as e:
+                logger.error(f"领取抓取任务失败: {str(e)}")
+                job = None
+            if job is None:
+                with self._changed:
+                    self._changed.wait(POLL_INTERVAL)
+                continue
+            try:
+                self._run(*job)
+            except Exception as e:
+                logger.exception(f"抓取任务 {job[0]} 执行出错")
+                try:
+                    conn = self.pool.connect()
+                    with conn:
+                        conn.execute(
+                            "UPDATE crawl_jobs SET status = ?, finished_at = ?, error = ? WHERE id = ?",
+                            (FAILED, time.time(), str(e), job[0])
+                        )
+                finally:
+                    self._notify()
+
+    def _run(self, job_id, keywords):
+        conn = self.pool.connect()
+        finished = {row[0] for row in conn.execute(
+            "SELECT position FROM crawl_job_results WHERE job_id = ?", (job_id,)
+        )}
+        failures = 0
+        for position, keyword in enumerate(keywords):
+            if position in finished:
+                continue
+            if self._stop.is_set():
+                # 停止时任务保持执行中状态，下次启动时重新排队
+                return
+            start = time.perf_counter()
+            try:
+                results = self.runner(keyword)
+                status, error = DONE, None
+            except Exception as e:
+                logger.error(f"抓取任务 {job_id} 关键词 {keyword} 失败: {str(e)}")
+                results, status, error = [], FAILED, str(e)
+                failures += 1
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO crawl_job_results (job_id, position, keyword, status, results, error, elapsed) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, position, keyword, status, dumps(results), error, time.perf_counter() - start)
+                )
+                conn.execute("UPDATE crawl_jobs SET done = done + 1 WHERE id = ?", (job_id,))
+            self._notify()
+
+        status = FAILED if failures and failures == len(keywords) - len(finished) else DONE
+        with conn:
+            conn.execute(
+                "UPDATE crawl_jobs SET status = ?, finished_at = ?, error = ? WHERE id = ?",
+                (status, time.time(), '所有关键词均抓取失败' if status == FAILED else None, job_id)
+            )
+        logger.info(f"抓取任务 {job_id} 完成，状态: {status}")
+        self._notify()
+
+    def events(self, job_id, timeout=None):
+        """
+        生成任务进度的server-sent events
+
+        进度变化时发送progress事件，任务结束时发送done事件后结束；
+        长时间没有变化时发送注释行作为心跳
+
+        Args:
+            job_id: 任务ID
+            timeout: 最长等待秒数，None表示直到任务结束
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        last_state = None
+        last_sent = time.monotonic()
+        while True:
+            job = self.get(job_id, include_results=False)
+            if job is None:
+                yield _sse('error', {'message': '任务不存在'})
+                return
+            state = (job['status'], job['done'])
+            if state != last_state:
+                last_state = state
+                last_sent = time.monotonic()
+                finished = job['status'] not in ACTIVE_STATUSES
+                yield _sse('done' if finished else 'progress', job)
+                if finished:
+                    return
+            elif time.monotonic() - last_sent >= HEARTBEAT_INTERVAL:
+                last_sent = time.monotonic()
+                yield ': heartbeat\n\n'
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+            with self._changed:
+                self._changed.wait(1.0)
+
+
+def _sse(event, data):
+    """格式化一条server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
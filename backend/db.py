@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SQLite连接管理 - 智能瞭望数据分析处理系统
+功能: 按线程复用数据库连接，打开时启用WAL和性能相关的PRAGMA，并统计连接池使用情况
+
+每个工作线程持有一个长期连接，请求结束时只回滚未提交的事务而不关闭连接。
+WAL模式下读操作不会被写事务阻塞，synchronous=NORMAL在WAL下仍能保证数据库一致性。
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+
+from flask import current_app, g
+
+logger = logging.getLogger(__name__)
+
+# 打开连接时执行的PRAGMA
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # 负数表示以KB为单位，即每个连接64MB页缓存
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,
+}
+
+
+class ConnectionPool:
+    """
+    按线程复用的SQLite连接池
+
+    Args:
+        path: 数据库文件路径
+        pragmas: 打开连接时执行的PRAGMA，默认DEFAULT_PRAGMAS
+        timeout: 等待数据库锁的秒数
+    """
+
+    def __init__(self, path, pragmas=None, timeout=5):
+        self.path = path
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # 线程ID -> (线程对象, 连接)，用于统计和关闭已退出线程的连接
+        self._connections = {}
+        self._stats = {'opened': 0, 'reused': 0, 'closed': 0, 'rollbacks': 0, 'open_time': 0.0}
+
+    def _open(self):
+        start = time.perf_counter()
+        # 连接只由创建它的线程使用，关闭时可能在其他线程，因此关闭同线程检查
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        with self._lock:
+            self._stats['opened'] += 1
+            self._stats['open_time'] += time.perf_counter() - start
+            self._connections[threading.get_ident()] = (threading.current_thread(), conn)
+        return conn
+
+    def connect(self):
+        """获取当前线程的连接，没有时新建"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            self._prune()
+            conn = self._open()
+            self._local.conn = conn
+        else:
+            with self._lock:
+                self._stats['reused'] += 1
+        return conn
+
+    def release(self, conn):
+        """请求结束时归还连接：回滚未提交的事务，连接保持打开供本线程复用"""
+        if conn.in_transaction:
+            conn.rollback()
+            with self._lock:
+                self._stats['rollbacks'] += 1
+
+    def _prune(self):
+        """关闭已退出线程遗留的连接"""
+        with self._lock:
+            dead = [ident for ident, (thread, _) in self._connections.items() if not thread.is_alive()]
+            conns = [self._connections.pop(ident)[1] for ident in dead]
+            self._stats['closed'] += len(conns)
+        for conn in conns:
+            conn.close()
+
+    def close_all(self):
+        """关闭所有连接"""
+        with self._lock:
+            conns = [conn for _, conn in self._connections.values()]
+            self._connections.clear()
+            self._stats['closed'] += len(conns)
+        for conn in conns:
+            conn.close()
+        self._local = threading.local()
+
+    def stats(self):
+        """返回连接池统计信息"""
+        self._prune()
+        with self._lock:
+            stats = dict(self._stats)
+            stats['open_connections'] = len(self._connections)
+        acquired = stats['opened'] + stats['reused']
+        stats['reuse_rate'] = round(stats['reused'] / acquired, 4) if acquired else 0
+        stats['open_time'] = round(stats['open_time'], 6)
+        stats['path'] = self.path
+        stats['pragmas'] = dict(self.pragmas)
+        return stats
+
+
+def init_app(app, path, pragmas=None):
+    """
+    为Flask应用创建连接池，请求（应用上下文）结束时自动归还连接
+
+    Returns:
+        ConnectionPool: 创建的连接池
+    """
+    pool = ConnectionPool(path, pragmas)
+    app.extensions['db_pool'] = pool
+    app.teardown_appcontext(_teardown)
+    return pool
+
+
+def get_db():
+    """获取当前应用上下文使用的数据库连接"""
+    if 'db' not in g:
+        g.db = current_app.extensions['db_pool'].connect()
+    return g.db
+
+
+def _teardown(exception):
+    conn = g.pop('db', None)
+    if conn is not None:
+        current_app.extensions['db_pool'].release(conn)
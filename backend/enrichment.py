@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+落地页正文补全 - 智能瞭望数据分析处理系统
+功能: 后台批量抓取数据仓库中每条记录的落地页，提取正文保存到repository_content表
+
+数据仓库只保存搜索结果页上的标题和约200字的摘要，AI数据提炼需要页面正文。
+后台线程每轮取一批尚未抓取（或失败待重试）的记录，在补全专用的HTTP连接池中并发抓取：
+总并发和单个域名的并发都有上限，响应体边读边解析，每个页面最多读取max_bytes字节，
+正文足够长时提前停止读取。抓取结果在后台线程中批量写入，不占用Web请求线程。
+专用连接池有自己的事件循环线程，正文解析不会阻塞实时搜索所用的共享连接池。
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+import urllib.parse
+
+from html_stream import HtmlStreamReader, MainTextExtractor
+from http_pool import HttpPool
+from sources import USER_AGENTS
+
+logger = logging.getLogger(__name__)
+
+# 每轮处理的记录数
+BATCH_SIZE = 100
+
+# 总并发数和单个域名的并发数
+CONCURRENCY = 16
+PER_DOMAIN_CONCURRENCY = 2
+
+# 每个页面最多读取的字节数（解压后）和正文最多保留的字符数
+MAX_BYTES = 512 * 1024
+MAX_TEXT_CHARS = 20000
+
+# 单个页面的超时时间（秒）
+FETCH_TIMEOUT = 15
+
+# 失败记录的最多尝试次数和重试间隔（秒）
+MAX_ATTEMPTS = 3
+RETRY_AFTER = 6 * 3600
+
+# 没有待抓取记录时后台线程的等待时间（秒）
+IDLE_INTERVAL = 60.0
+
+# 抓取状态
+OK = 'ok'
+ERROR = 'error'
+SKIPPED = 'skipped'
+
+CONTENT_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS repository_content (
+        doc_id INTEGER PRIMARY KEY,
+        status TEXT NOT NULL,
+        final_url TEXT,
+        http_status INTEGER,
+        page_title TEXT,
+        content TEXT,
+        content_length INTEGER NOT NULL DEFAULT 0,
+        bytes_read INTEGER NOT NULL DEFAULT 0,
+        truncated INTEGER NOT NULL DEFAULT 0,
+        attempts INTEGER NOT NULL DEFAULT 1,
+        error TEXT,
+        fetched_at REAL NOT NULL
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS data_repository_content_ad AFTER DELETE ON data_repository BEGIN
+        DELETE FROM repository_content WHERE doc_id = old.id;
+    END
+    '''
+]
+
+CONTENT_FIELDS = ('doc_id', 'status', 'final_url', 'http_status', 'page_title', 'content', 'content_length',
+                  'bytes_read', 'truncated', 'attempts', 'error', 'fetched_at')
+
+
+class Enricher:
+    """
+    落地页正文补全任务
+
+    Args:
+        db_pool: db.ConnectionPool
+        http_pool: HTTP连接池，默认新建一个专用的http_pool.HttpPool
+        batch_size: 每轮处理的记录数
+        concurrency: 总并发数
+        per_domain: 单个域名的并发数
+        max_bytes: 每个页面最多读取的字节数
+        timeout: 单个页面的超时时间（秒）
+    """
+
+    def __init__(self, db_pool, http_pool=None, batch_size=BATCH_SIZE, concurrency=CONCURRENCY,
+                 per_domain=PER_DOMAIN_CONCURRENCY, max_bytes=MAX_BYTES, timeout=FETCH_TIMEOUT):
+        self.db_pool = db_pool
+        # 正文提取是纯Python解析，在专用连接池的事件循环中执行，不占用实时搜索所用的共享事件循环
+        self._own_pool = http_pool is None
+        self.http_pool = HttpPool(limit=concurrency, limit_per_host=per_domain) if http_pool is None else http_pool
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.per_domain = per_domain
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._thread = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def init_schema(self):
+        """创建正文表"""
+        conn = self.db_pool.connect()
+        for statement in CONTENT_SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+
+    def pending(self, limit):
+        """
+        待抓取的记录：没有正文记录的，以及失败次数未达上限且已过重试间隔的；新入库的记录优先
+
+        Returns:
+            list: (doc_id, url, 已尝试次数) 列表
+        """
+        return self.db_pool.connect().execute(
+            "SELECT r.id, r.url, COALESCE(c.attempts, 0) FROM data_repository r "
+            "LEFT JOIN repository_content c ON c.doc_id = r.id "
+            "WHERE c.doc_id IS NULL OR (c.status = ? AND c.attempts < ? AND c.fetched_at < ?) "
+            "ORDER BY r.id DESC LIMIT ?",
+            (ERROR, MAX_ATTEMPTS, time.time() - RETRY_AFTER, limit)
+        ).fetchall()
+
+    def get(self, doc_id):
+        """查询单条记录的正文，没有时返回None"""
+        row = self.db_pool.connect().execute(
+            f"SELECT {', '.join(CONTENT_FIELDS)} FROM repository_content WHERE doc_id = ?", (doc_id,)
+        ).fetchone()
+        return dict(zip(CONTENT_FIELDS, row)) if row else None
+
+    def stats(self):
+        """各状态的记录数和待抓取记录数"""
+        conn = self.db_pool.connect()
+        stats = {status: count for status, count in conn.execute(
+            "SELECT status, COUNT(*) FROM repository_content GROUP BY status"
+        )}
+        stats['pending'] = conn.execute(
+            "SELECT COUNT(*) FROM data_repository r LEFT JOIN repository_content c ON c.doc_id = r.id "
+            "WHERE c.doc_id IS NULL"
+        ).fetchone()[0]
+        stats['bytes_read'] = conn.execute(
+            "SELECT COALESCE(SUM(bytes_read), 0) FROM repository_content"
+        ).fetchone()[0]
+        return stats
+
+    # ---- 抓取 ----
+
+    async def _fetch(self, url, slots, domain_slots):
+        """抓取并提取单个页面，返回写入正文表的字段"""
+        record = {'status': OK, 'final_url': None, 'http_status': None, 'page_title': None, 'content': None,
+                  'bytes_read': 0, 'truncated': 0, 'error': None}
+        parts = urllib.parse.urlsplit(url or '')
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            record.update(status=SKIPPED, error='不支持的URL')
+            return record
+
+        extractor = MainTextExtractor(max_chars=MAX_TEXT_CHARS)
+        readers = []
+
+        def open_reader(response):
+            # 非HTML页面不读取响应体
+            content_type = response.headers.get('Content-Type', '')
+            if content_type and 'html' not in content_type.lower():
+                return None
+            reader = HtmlStreamReader(extractor, charset=response.encoding)
+            readers.append(reader)
+            return reader.feed
+
+        headers = {
+            'User-Agent': random.choice(USER_AGENTS),
+            'Accept': 'text/html,application/xhtml+xml;q=0.9,*/*;q=0.5',
+            'Accept-Language': 'zh-CN,zh;q=0.9'
+        }
+        domain = domain_slots.setdefault(parts.hostname.lower(), asyncio.Semaphore(self.per_domain))
+        try:
+            # 先取得域名的并发名额再占用总并发，避免同一域名的请求占满总并发
+            async with domain, slots:
+                response = await self.http_pool.stream(
+                    url, open_reader, headers=headers, timeout=self.timeout, max_bytes=self.max_bytes
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            record.update(status=ERROR, error=str(e) or e.__class__.__name__)
+            return record
+
+        record.update(final_url=response.url, http_status=response.status_code, bytes_read=response.body_bytes,
+                      truncated=int(response.truncated))
+        content_type = response.headers.get('Content-Type', '')
+        if not 200 <= response.status_code < 300:
+            record.update(status=ERROR, error=f'HTTP {response.status_code}')
+        elif content_type and 'html' not in content_type.lower():
+            record.update(status=SKIPPED, error=f'非HTML页面: {content_type}')
+        elif readers:
+            readers[0].close()
+            record.update(page_title=extractor.title[:500] or None, content=extractor.text)
+        return record
+
+    async def arun(self, rows):
+        """
+        并发抓取一批记录
+
+        Args:
+            rows: pending返回的 (doc_id, url, 已尝试次数) 列表
+
+        Returns:
+            list: (doc_id, 已尝试次数, 抓取结果字段) 列表
+        """
+        slots = asyncio.Semaphore(self.concurrency)
+        domain_slots = {}
+        records = await asyncio.gather(*(self._fetch(url, slots, domain_slots) for _, url, _ in rows))
+        return [(doc_id, attempts, record) for (doc_id, _, attempts), record in zip(rows, records)]
+
+    def _store(self, results):
+        now = time.time()
+        conn = self.db_pool.connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO repository_content (doc_id, status, final_url, http_status, page_title, "
+                "content, content_length, bytes_read, truncated, attempts, error, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(doc_id, r['status'], r['final_url'], r['http_status'], r['page_title'], r['content'],
+                  len(r['content'] or ''), r['bytes_read'], r['truncated'], attempts + 1, r['error'], now)
+                 for doc_id, attempts, r in results]
+            )
+
+    def run_batch(self, limit=None):
+        """
+        抓取一批待处理的记录并保存
+
+        Returns:
+            dict: 本批各状态的记录数
+        """
+        rows = self.pending(self.batch_size if limit is None else limit)
+        if not rows:
+            return {}
+        start = time.perf_counter()
+        results = self.http_pool.run(self.arun(rows))
+        self._store(results)
+        summary = {}
+        for _, _, record in results:
+            summary[record['status']] = summary.get(record['status'], 0) + 1
+        logger.info(f"落地页正文补全: 处理 {len(rows)} 条，{summary}，耗时 {time.perf_counter() - start:.2f}s")
+        return summary
+
+    # ---- 后台线程 ----
+
+    def start(self):
+        """启动后台线程（重复调用无副作用）"""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self.init_schema()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='enrichment', daemon=True)
+            self._thread.start()
+            logger.info("落地页正文补全已启动")
+
+    def stop(self, timeout=None):
+        """停止后台线程，当前批次完成后退出"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+        if self._own_pool:
+            self.http_pool.close()
+
+    def wake(self):
+        """有新记录入库时唤醒后台线程"""
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                processed = self.run_batch()
+            except Exception:
+                logger.exception("落地页正文补全出错")
+                processed = {}
+            if not processed:
+                self._wake.wait(IDLE_INTERVAL)
+                self._wake.clear()
+
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+数据仓库导出 - 智能瞭望数据分析处理系统
+功能: 按查询条件分批读取数据仓库记录，写出Parquet/Feather（Arrow IPC）文件供pandas等分析工具读取，
+      或逐批生成CSV/NDJSON文本（可边生成边gzip压缩）供Web接口流式下载
+
+查询条件在SQL中过滤（走created_at、(search_keyword, created_at)索引或全文索引），记录按入库时间倒序
+从SQLite游标逐批读出，每批转为一个Arrow RecordBatch或一段文本后立即写出，
+内存占用只与批大小有关，与导出的总行数无关。传入归档分区时一并导出与日期条件相交的归档记录。
+
+Parquet/Feather导出依赖可选的pyarrow，未安装时导出函数抛出ExportUnavailable；CSV/NDJSON只使用标准库。
+
+用法:
+    python export.py --format parquet --output repository.parquet --date-from 2024-01-01
+    python export.py --format csv --gzip --output repository.csv.gz --search-keyword 成都
+"""
+
+import argparse
+import csv
+import io
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import time
+import zlib
+
+from repository import REPOSITORY_FIELDS, search_repository
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = pq = None
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 每批读取和写入的行数（Parquet中每批为一个行组）
+BATCH_ROWS = 50000
+
+# 导出格式 -> (文件扩展名, MIME类型)
+ARROW_FORMATS = {
+    'parquet': ('.parquet', 'application/vnd.apache.parquet'),
+    'feather': ('.feather', 'application/vnd.apache.arrow.file'),
+}
+
+# 文本导出格式 -> (文件扩展名, MIME类型)
+TEXT_FORMATS = {
+    'csv': ('.csv', 'text/csv; charset=utf-8'),
+    'ndjson': ('.ndjson', 'application/x-ndjson; charset=utf-8'),
+}
+
+# 文本导出每批读取的行数
+TEXT_BATCH_ROWS = 1000
+
+# gzip压缩级别，流式导出时兼顾速度和压缩率
+GZIP_LEVEL = 6
+
+# created_at的存储格式（SQLite CURRENT_TIMESTAMP，UTC）
+CREATED_AT_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class ExportUnavailable(RuntimeError):
+    """缺少导出格式所需的可选依赖"""
+
+
+def iter_rows(conn, keyword='', date_from='', date_to='', search_keyword='', archive=None):
+    """
+    按入库时间倒序逐行读取符合条件的记录，查询条件同repository.search_repository
+
+    Args:
+        archive: partitions.RepositoryArchive，传入时包含相关归档分区中的记录
+
+    Returns:
+        iterator: 逐行返回 (id, title, url, summary, search_keyword, created_at)
+    """
+    if archive is not None:
+        return archive.search(conn, keyword, date_from, date_to, search_keyword=search_keyword)
+    return search_repository(conn, keyword, date_from, date_to, 'time', search_keyword=search_keyword)
+
+
+def iter_chunks(rows, size=BATCH_ROWS):
+    """把行迭代器（SQLite游标或生成器）切分为每批最多size行的列表"""
+    fetchmany = getattr(rows, 'fetchmany', None)
+    while True:
+        chunk = fetchmany(size) if fetchmany is not None else list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _require_arrow():
+    if pa is None:
+        raise ExportUnavailable('导出Parquet/Feather需要安装pyarrow: pip install pyarrow')
+
+
+def arrow_schema():
+    """导出文件的Arrow表结构，created_at转为秒精度的时间戳"""
+    _require_arrow()
+    return pa.schema([
+        ('id', pa.int64()),
+        ('title', pa.string()),
+        ('url', pa.string()),
+        ('summary', pa.string()),
+        ('search_keyword', pa.string()),
+        ('created_at', pa.timestamp('s')),
+    ])
+
+
+def to_record_batch(chunk, schema):
+    """把一批行转为RecordBatch，按列整体转换，不逐行构造对象"""
+    columns = list(zip(*chunk))
+    arrays = [pa.array(columns[i], type=schema.field(i).type) for i in range(len(REPOSITORY_FIELDS) - 1)]
+    created_at = pa.array(columns[-1], type=pa.string())
+    arrays.append(pc.strptime(created_at, format=CREATED_AT_FORMAT, unit='s', error_is_null=True))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def write_arrow(sink, rows, fmt='parquet', batch_rows=BATCH_ROWS):
+    """
+    把记录逐批写入Parquet或Feather文件
+
+    Args:
+        sink: 文件路径或可写的二进制文件对象
+        rows: iter_rows返回的行迭代器，写完后关闭
+        fmt: parquet或feather
+        batch_rows: 每批的行数
+
+    Returns:
+        int: 导出的行数
+    """
+    if fmt not in ARROW_FORMATS:
+        raise ValueError(f'不支持的导出格式: {fmt}')
+    _require_arrow()
+    schema = arrow_schema()
+    if fmt == 'parquet':
+        writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    else:
+        writer = pa.ipc.new_file(sink, schema, options=pa.ipc.IpcWriteOptions(compression='zstd'))
+    count = 0
+    try:
+        for chunk in iter_chunks(rows, batch_rows):
+            writer.write_batch(to_record_batch(chunk, schema))
+            count += len(chunk)
+    finally:
+        writer.close()
+        rows.close()
+    return count
+
+
+def export_repository(conn, sink, fmt='parquet', keyword='', date_from='', date_to='', search_keyword='',
+                      archive=None, batch_rows=BATCH_ROWS):
+    """
+    按查询条件导出数据仓库
+
+    Returns:
+        int: 导出的行数
+    """
+    if fmt not in ARROW_FORMATS:
+        raise ValueError(f'不支持的导出格式: {fmt}')
+    _require_arrow()
+    start = time.perf_counter()
+    rows = iter_rows(conn, keyword, date_from, date_to, search_keyword, archive)
+    count = write_arrow(sink, rows, fmt, batch_rows)
+    logger.info(f"数据仓库导出{fmt}: {count} 条，耗时 {time.perf_counter() - start:.2f}s")
+    return count
+
+
+def iter_text(rows, fmt='ndjson', batch_rows=TEXT_BATCH_ROWS):
+    """
+    把记录逐批序列化为CSV或NDJSON文本
+
+    CSV以UTF-8 BOM开头（Excel打开中文不乱码），第一行为列名；NDJSON每行一个JSON对象。
+
+    Args:
+        rows: iter_rows返回的行迭代器，生成结束或关闭时关闭
+        fmt: csv或ndjson
+        batch_rows: 每批的行数，每批生成一段文本
+
+    Returns:
+        generator: 逐段返回str
+    """
+    if fmt not in TEXT_FORMATS:
+        raise ValueError(f'不支持的导出格式: {fmt}')
+    return _iter_text(rows, fmt, batch_rows)
+
+
+def _iter_text(rows, fmt, batch_rows):
+    try:
+        if fmt == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(REPOSITORY_FIELDS)
+            yield '\ufeff' + buffer.getvalue()
+            for chunk in iter_chunks(rows, batch_rows):
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows(chunk)
+                yield buffer.getvalue()
+        else:
+            for chunk in iter_chunks(rows, batch_rows):
+                yield ''.join(json.dumps(dict(zip(REPOSITORY_FIELDS, row)), ensure_ascii=False) + '\n'
+                              for row in chunk)
+    finally:
+        rows.close()
+
+
+def encode_stream(chunks, compress=False, level=GZIP_LEVEL):
+    """
+    把文本片段编码为UTF-8字节，compress为True时边生成边gzip压缩
+
+    压缩器只保留内部窗口，已压缩的数据随即输出，不在内存中累积
+
+    Returns:
+        generator: 逐段返回bytes
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31) if compress else None
+    try:
+        for chunk in chunks:
+            data = chunk.encode('utf-8')
+            if compressor is not None:
+                data = compressor.compress(data)
+            if data:
+                yield data
+        if compressor is not None:
+            yield compressor.flush()
+    finally:
+        chunks.close()
+
+
+def export_text(conn, fmt='ndjson', keyword='', date_from='', date_to='', search_keyword='', archive=None,
+                compress=False, batch_rows=TEXT_BATCH_ROWS):
+    """
+    按查询条件把数据仓库导出为CSV/NDJSON字节流
+
+    查询在调用时执行（参数错误在此时抛出ValueError），迭代返回的生成器时逐批读取游标
+
+    Returns:
+        generator: 逐段返回bytes
+    """
+    if fmt not in TEXT_FORMATS:
+        raise ValueError(f'不支持的导出格式: {fmt}')
+    rows = iter_rows(conn, keyword, date_from, date_to, search_keyword, archive)
+    return encode_stream(iter_text(rows, fmt, batch_rows), compress)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='导出数据仓库为Parquet、Feather、CSV或NDJSON文件')
+    parser.add_argument('--database', default=os.path.join(BASE_DIR, 'database.db'), help='数据库路径')
+    parser.add_argument('--format', choices=sorted({**ARROW_FORMATS, **TEXT_FORMATS}), default='parquet',
+                        help='导出格式')
+    parser.add_argument('--gzip', action='store_true', help='CSV/NDJSON导出时gzip压缩')
+    parser.add_argument('--output', required=True, help='输出文件路径')
+    parser.add_argument('--keyword', default='', help='查询关键词')
+    parser.add_argument('--search-keyword', default='', help='抓取时使用的搜索关键词（精确匹配）')
+    parser.add_argument('--date-from', default='', help='起始时间')
+    parser.add_argument('--date-to', default='', help='结束时间')
+    parser.add_argument('--with-archive', action='store_true', help='包含归档分区中的记录')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    archive = None
+    if args.with_archive:
+        from partitions import RepositoryArchive
+        archive = RepositoryArchive()
+    conn = sqlite3.connect(args.database)
+    try:
+        if args.format in TEXT_FORMATS:
+            with open(args.output, 'wb') as output:
+                for data in export_text(conn, args.format, args.keyword, args.date_from, args.date_to,
+                                        args.search_keyword, archive, compress=args.gzip):
+                    output.write(data)
+            print(f"已导出到 {args.output}")
+            return
+        count = export_repository(conn, args.output, args.format, args.keyword, args.date_from, args.date_to,
+                                  args.search_keyword, archive)
+    except ExportUnavailable as e:
+        raise SystemExit(str(e))
+    finally:
+        conn.close()
+    print(f"已导出 {count} 条记录到 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
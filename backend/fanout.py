@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+多爬虫并行调度 - 智能瞭望数据分析处理系统
+功能: 在共享连接池的事件循环中同时运行多个爬虫，并以一个总截止时间约束整体耗时
+
+截止时间到达时已返回的爬虫结果照常使用，仍未返回的爬虫被取消并记为超时；
+每个爬虫的耗时和结果状态都会被记录，便于观察哪个来源拖慢了搜索。
+搜索的整体耗时因此取决于截止时间，而不是各爬虫耗时之和。
+"""
+
+import asyncio
+import collections
+import logging
+import math
+import threading
+import time
+
+from http_pool import get_pool
+
+logger = logging.getLogger(__name__)
+
+# 默认的总截止时间（秒）
+DEFAULT_DEADLINE = 8.0
+
+# 运行状态
+OK = 'ok'
+ERROR = 'error'
+TIMEOUT = 'timeout'
+
+# 每个爬虫保留的最近耗时样本数
+TIMING_SAMPLES = 200
+
+
+class SpiderTimings:
+    """
+    记录各爬虫最近的耗时和状态计数
+
+    Args:
+        samples: 每个爬虫保留的耗时样本数
+    """
+
+    def __init__(self, samples=TIMING_SAMPLES):
+        self.samples = samples
+        self._lock = threading.Lock()
+        self._elapsed = {}
+        self._counts = {}
+
+    def record(self, run):
+        """记录一次运行结果"""
+        with self._lock:
+            self._elapsed.setdefault(run['name'], collections.deque(maxlen=self.samples)).append(run['elapsed'])
+            counts = self._counts.setdefault(run['name'], {OK: 0, ERROR: 0, TIMEOUT: 0})
+            counts[run['status']] += 1
+
+    def stats(self):
+        """
+        返回各爬虫的统计信息
+
+        Returns:
+            dict: 爬虫名 -> 调用次数、各状态次数以及耗时的p50/p95/最大值（秒）
+        """
+        with self._lock:
+            snapshot = {name: (sorted(values), dict(self._counts[name])) for name, values in self._elapsed.items()}
+        stats = {}
+        for name, (values, counts) in snapshot.items():
+            stats[name] = dict(
+                counts,
+                calls=sum(counts.values()),
+                p50=round(_percentile(values, 0.5), 4),
+                p95=round(_percentile(values, 0.95), 4),
+                max=round(values[-1], 4)
+            )
+        return stats
+
+
+def _percentile(values, q):
+    """已排序样本的最近秩百分位数"""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+_timings = SpiderTimings()
+
+
+def get_timings():
+    """获取进程内共享的爬虫耗时统计"""
+    return _timings
+
+
+async def afan_out(tasks, deadline=DEFAULT_DEADLINE, timings=None):
+    """
+    同时运行多个爬虫任务，截止时间到达后取消未完成的任务
+
+    Args:
+        tasks: 爬虫名 -> 无参可调用对象；协程函数直接在当前事件循环中运行，
+            普通函数放到线程池中执行（超时后只能放弃其结果，无法中断）
+        deadline: 总截止时间（秒）
+        timings: 记录耗时的SpiderTimings，默认使用共享实例
+
+    Returns:
+        list: 按tasks顺序排列的运行记录字典，包含name、status、elapsed、result、error
+    """
+    timings = _timings if timings is None else timings
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    finished_at = {}
+
+    futures = {}
+    for name, func in tasks.items():
+        if asyncio.iscoroutinefunction(func):
+            future = asyncio.ensure_future(func())
+        else:
+            future = loop.run_in_executor(None, func)
+        future.add_done_callback(lambda _, name=name: finished_at.setdefault(name, time.perf_counter()))
+        futures[name] = future
+
+    if futures:
+        _, pending = await asyncio.wait(futures.values(), timeout=deadline)
+        for future in pending:
+            future.cancel()
+        if pending:
+            # 等待被取消的协程完成清理（释放连接等）
+            await asyncio.wait(pending, timeout=1.0)
+
+    runs = []
+    for name, future in futures.items():
+        run = {'name': name, 'status': OK, 'result': None, 'error': None}
+        if future.cancelled() or not future.done():
+            run['status'], run['error'] = TIMEOUT, f'超过截止时间 {deadline}s 未返回'
+            run['elapsed'] = deadline
+        else:
+            run['elapsed'] = finished_at.get(name, time.perf_counter()) - start
+            error = future.exception()
+            if error is None:
+                run['result'] = future.result()
+            else:
+                run['status'], run['error'] = ERROR, f'{error.__class__.__name__}: {error}'
+        timings.record(run)
+        if run['status'] == OK:
+            logger.info(f"爬虫 {name} 完成，耗时: {run['elapsed']:.2f}s")
+        else:
+            logger.warning(f"爬虫 {name} {run['status']}，耗时: {run['elapsed']:.2f}s, {run['error']}")
+        runs.append(run)
+    return runs
+
+
+def fan_out(tasks, deadline=DEFAULT_DEADLINE, timings=None, pool=None):
+    """afan_out的同步包装，在共享连接池的事件循环中执行"""
+    pool = get_pool() if pool is None else pool
+    return pool.run(afan_out(tasks, deadline, timings))
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+流式HTML读取 - 智能瞭望数据分析处理系统
+功能: 对分块到达的HTML字节流增量识别编码、解码并交给解析器，不在内存中保留完整页面
+
+编码识别顺序: 响应头声明的charset → BOM → 页面开头<meta>声明的charset → utf-8。
+gb2312和gbk统一按其超集gb18030解码。
+"""
+
+import codecs
+import re
+from html.parser import HTMLParser
+
+# 在页面开头多少字节内查找<meta>声明的编码
+SNIFF_BYTES = 2048
+
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([a-zA-Z0-9_\-]+)', re.IGNORECASE)
+
+BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+# 按超集解码的编码
+CHARSET_ALIASES = {'gb2312': 'gb18030', 'gbk': 'gb18030', 'x-gbk': 'gb18030'}
+
+
+def normalize_charset(charset):
+    """规范化编码名，无法识别时返回None"""
+    if not charset:
+        return None
+    charset = charset.strip().strip('"\'').lower()
+    charset = CHARSET_ALIASES.get(charset, charset)
+    try:
+        return codecs.lookup(charset).name
+    except LookupError:
+        return None
+
+
+def sniff_charset(head):
+    """根据页面开头的字节识别编码，无法识别时返回None"""
+    for bom, charset in BOMS:
+        if head.startswith(bom):
+            return charset
+    match = META_CHARSET_RE.search(head)
+    return normalize_charset(match.group(1).decode('ascii')) if match else None
+
+
+class StreamDecoder:
+    """
+    增量解码器
+
+    没有声明编码时先缓存页面开头最多SNIFF_BYTES字节用于识别编码，之后逐块解码。
+
+    Args:
+        charset: 响应头声明的编码，None表示需要识别
+    """
+
+    def __init__(self, charset=None):
+        self.charset = normalize_charset(charset)
+        self._decoder = codecs.getincrementaldecoder(self.charset)('replace') if self.charset else None
+        self._head = b''
+
+    def _start(self, head):
+        self.charset = sniff_charset(head) or 'utf-8'
+        self._decoder = codecs.getincrementaldecoder(self.charset)('replace')
+        return self._decoder.decode(head)
+
+    def decode(self, chunk):
+        """解码一块字节，返回目前可以输出的文本"""
+        if self._decoder is not None:
+            return self._decoder.decode(chunk)
+        self._head += chunk
+        if len(self._head) < SNIFF_BYTES:
+            return ''
+        head, self._head = self._head, b''
+        return self._start(head)
+
+    def flush(self):
+        """输入结束，返回剩余的文本"""
+        if self._decoder is None:
+            head, self._head = self._head, b''
+            return self._start(head) + self._decoder.decode(b'', final=True)
+        return self._decoder.decode(b'', final=True)
+
+
+class MainTextExtractor(HTMLParser):
+    """
+    流式提取网页正文
+
+    跳过脚本、样式、导航、页眉页脚等区域，按块级元素切分文本；
+    页面有<article>或<main>且其中文字足够多时只取其中的文本，否则取长度不小于min_block_chars的文本块。
+
+    Args:
+        max_chars: 正文最多保留的字符数，达到后done为True，调用方可以停止读取
+        min_block_chars: 没有正文区域时保留的文本块的最短长度
+    """
+
+    SKIP_TAGS = frozenset(('script', 'style', 'noscript', 'iframe', 'svg', 'template', 'head',
+                           'nav', 'header', 'footer', 'aside', 'form', 'select', 'button'))
+    BLOCK_TAGS = frozenset(('p', 'div', 'article', 'section', 'main', 'li', 'ul', 'ol', 'table', 'tr', 'td', 'th',
+                            'br', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'pre', 'dd', 'dt'))
+    MAIN_TAGS = frozenset(('article', 'main'))
+
+    # 正文区域至少需要的字符数
+    MIN_MAIN_CHARS = 200
+
+    def __init__(self, max_chars=20000, min_block_chars=20):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.min_block_chars = min_block_chars
+        self.title = ''
+        self.done = False
+        self._blocks = []
+        self._buffer = []
+        self._skip_depth = 0
+        self._main_depth = 0
+        self._in_title = False
+        self._chars = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'title':
+            self._in_title = True
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self._flush_block()
+        if tag in self.MAIN_TAGS:
+            self._flush_block()
+            self._main_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag == 'title':
+            self._in_title = False
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.BLOCK_TAGS:
+            self._flush_block()
+        if tag in self.MAIN_TAGS:
+            self._flush_block()
+            self._main_depth = max(0, self._main_depth - 1)
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title = (self.title + data).strip()
+            return
+        if self._skip_depth or self.done:
+            return
+        self._buffer.append(data)
+
+    def _flush_block(self):
+        if not self._buffer:
+            return
+        text = ' '.join(''.join(self._buffer).split())
+        self._buffer = []
+        if not text:
+            return
+        self._blocks.append((text, self._main_depth > 0))
+        self._chars += len(text)
+        # 已收集的文本足够多时停止，正文区域之外的文本会被过滤，因此预留一倍余量
+        if self._chars >= self.max_chars * 2:
+            self.done = True
+
+    def close(self):
+        super().close()
+        self._flush_block()
+
+    @property
+    def text(self):
+        """提取的正文，文本块之间以换行分隔"""
+        main = [text for text, in_main in self._blocks if in_main]
+        if sum(map(len, main)) >= self.MIN_MAIN_CHARS:
+            blocks = main
+        else:
+            blocks = [text for text, _ in self._blocks if len(text) >= self.min_block_chars]
+            if not blocks:
+                blocks = [text for text, _ in self._blocks]
+        return '\n'.join(blocks)[:self.max_chars]
+
+
+class HtmlStreamReader:
+    """
+    把HTML字节分块增量解码并交给解析器
+
+    Args:
+        parser: 提供feed(text)和close()的解析器（HTMLParser、serp_parser.SerpStreamParser），
+            可以提供done属性表示无需继续读取
+        charset: 响应头声明的编码
+    """
+
+    def __init__(self, parser, charset=None):
+        self.parser = parser
+        self.decoder = StreamDecoder(charset)
+
+    @property
+    def done(self):
+        return getattr(self.parser, 'done', False)
+
+    def feed(self, chunk):
+        """
+        输入一块字节
+
+        Returns:
+            bool: 解析器已获得足够内容时返回True，可以直接用作HttpPool.stream的consumer
+        """
+        text = self.decoder.decode(chunk)
+        if text:
+            self.parser.feed(text)
+        return self.done
+
+    def close(self):
+        """输入结束，解析剩余内容"""
+        text = self.decoder.flush()
+        if text:
+            self.parser.feed(text)
+        self.parser.close()
+        return self.parser
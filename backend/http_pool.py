@@ -0,0 +1,597 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+共享HTTP连接池 - 智能瞭望数据分析处理系统
+功能: 为所有爬虫提供一个基于asyncio的长连接池
+
+连接池运行在独立的后台事件循环线程中：
+- 异步代码可以直接 await pool.get(...)，无论调用方处于哪个事件循环
+- 同步代码（Flask视图、命令行）通过 pool.run(coro) 提交协程并等待结果
+因此同一进程内的所有爬虫实例共享同一组keep-alive连接。
+
+压缩与条件请求:
+- 所有请求统一协商压缩（安装了brotli时为br、gzip、deflate，否则为gzip、deflate），
+  响应体由连接池自行解压，从而能统计实际传输的字节数；流式读取时每次解压输出不超过MAX_DECODE_CHUNK
+  和剩余的max_bytes额度，高压缩率的响应不会在内存中一次展开
+- 传入ValidatorStore时按URL保存ETag/Last-Modified，再次抓取同一URL时发送条件请求，
+  服务器返回304时不传输响应体，调用方可直接复用上次的解析结果
+节省的字节数（压缩节省和304节省）记录在连接池的统计信息中。
+"""
+
+import asyncio
+import atexit
+import logging
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+import aiohttp
+import requests
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+logger = logging.getLogger(__name__)
+
+# 请求时协商的压缩算法，只声明能够解压的算法
+ACCEPT_ENCODING = 'br, gzip, deflate' if brotli is not None else 'gzip, deflate'
+
+# 每个连接池最多保存验证器的URL数
+DEFAULT_VALIDATOR_SIZE = 5000
+
+
+# 流式读取时每次解压输出的最大字节数
+MAX_DECODE_CHUNK = 64 * 1024
+
+# 不支持output_buffer_limit的brotli绑定每次送入解压器的输入字节数
+BROTLI_INPUT_SLICE = 1024
+
+
+class _ZlibDecompressor:
+    """gzip/zlib增量解压，限制单次输出时未处理的输入保留在unconsumed_tail中"""
+
+    def __init__(self, wbits):
+        self._obj = zlib.decompressobj(wbits)
+
+    @property
+    def pending(self):
+        return bool(self._obj.unconsumed_tail)
+
+    def decompress(self, data, max_length=0):
+        if self._obj.unconsumed_tail:
+            data = self._obj.unconsumed_tail + data
+        return self._obj.decompress(data, max_length)
+
+    def flush(self):
+        return self._obj.flush()
+
+
+class _DeflateDecompressor(_ZlibDecompressor):
+    """deflate增量解压，按首字节识别是否带zlib头（部分服务器发送原始deflate数据）"""
+
+    def __init__(self):
+        self._obj = None
+
+    @property
+    def pending(self):
+        return self._obj is not None and super().pending
+
+    def decompress(self, data, max_length=0):
+        if self._obj is None:
+            if not data:
+                return b''
+            self._obj = zlib.decompressobj(zlib.MAX_WBITS if data[0] == 0x78 else -zlib.MAX_WBITS)
+        return super().decompress(data, max_length)
+
+    def flush(self):
+        return self._obj.flush() if self._obj is not None else b''
+
+
+class _BrotliDecompressor:
+    """
+    brotli增量解压，兼容brotli和brotlicffi
+
+    新版brotli支持output_buffer_limit，由解压器限制单次输出；
+    其他绑定把输入切成小段逐段解压，输出达到上限即停止，剩余输入留到下次
+    """
+
+    def __init__(self):
+        self._decompressor = brotli.Decompressor()
+        self._process = getattr(self._decompressor, 'process', None) or self._decompressor.decompress
+        self._limited = hasattr(self._decompressor, 'can_accept_more_data')
+        self._tail = b''
+
+    @property
+    def pending(self):
+        return bool(self._tail) or (self._limited and not self._decompressor.can_accept_more_data())
+
+    def decompress(self, data, max_length=0):
+        data, self._tail = self._tail + data, b''
+        if not max_length:
+            return self._process(data) if data else b''
+        if self._limited:
+            if not self._decompressor.can_accept_more_data():
+                # 上次的输出还没有取完，先取输出，新数据留到下次送入
+                self._tail = data
+                data = b''
+            return self._process(data, output_buffer_limit=max_length)
+        output = []
+        size = position = 0
+        while position < len(data) and size < max_length:
+            piece = self._process(data[position:position + BROTLI_INPUT_SLICE])
+            position += BROTLI_INPUT_SLICE
+            output.append(piece)
+            size += len(piece)
+        self._tail = data[position:]
+        return b''.join(output)
+
+    def flush(self):
+        return b''
+
+
+class ContentDecoder:
+    """
+    按Content-Encoding增量解压响应体
+
+    decompress和flush可以限制单次输出的字节数，未输出的数据保留在解压器中，
+    压缩率极高的响应（如几十KB解压为几十MB）也不会一次占用大量内存
+
+    Args:
+        content_encoding: 响应的Content-Encoding头，可能包含多个以逗号分隔的编码
+    """
+
+    def __init__(self, content_encoding):
+        encodings = [e.strip().lower() for e in (content_encoding or '').split(',') if e.strip()]
+        self._chain = []
+        self._flushed = False
+        # 多重编码按应用顺序的逆序解压
+        for encoding in reversed(encodings):
+            if encoding == 'identity':
+                continue
+            if encoding in ('gzip', 'x-gzip'):
+                self._chain.append(_ZlibDecompressor(16 + zlib.MAX_WBITS))
+            elif encoding == 'deflate':
+                self._chain.append(_DeflateDecompressor())
+            elif encoding == 'br' and brotli is not None:
+                self._chain.append(_BrotliDecompressor())
+            else:
+                logger.warning(f"无法解压的响应编码: {encoding}")
+                break
+
+    @property
+    def pending(self):
+        """解压器中是否还有因输出上限而未处理的数据"""
+        return any(decompressor.pending for decompressor in self._chain)
+
+    def decompress(self, data, max_length=0):
+        """解压一段数据，返回目前可以输出的字节，max_length大于0时最多返回max_length字节"""
+        for decompressor in self._chain:
+            data = decompressor.decompress(data, max_length)
+        return data
+
+    def flush(self, max_length=0):
+        """
+        数据读取完毕，返回剩余的字节
+
+        max_length大于0时每次最多返回max_length字节，需要重复调用直到返回空字节且pending为False
+        """
+        if self.pending:
+            return self.decompress(b'', max_length)
+        if self._flushed:
+            return b''
+        self._flushed = True
+        data = b''
+        for decompressor in self._chain:
+            data = (decompressor.decompress(data) if data else b'') + decompressor.flush()
+        return data[:max_length] if max_length else data
+
+
+def decode_content(raw, content_encoding):
+    """
+    按Content-Encoding解压完整的响应体
+
+    Returns:
+        bytes: 解压后的响应体，无法识别的编码原样返回
+    """
+    decoder = ContentDecoder(content_encoding)
+    return decoder.decompress(raw) + decoder.flush()
+
+
+def _request_headers(url, headers, validators):
+    """
+    添加压缩协商头，有验证器记录时添加条件请求头
+
+    Returns:
+        tuple: (请求头, 验证器记录或None)
+    """
+    headers = dict(headers or {})
+    headers['Accept-Encoding'] = ACCEPT_ENCODING
+    entry = validators.get(url) if validators is not None else None
+    if entry is not None:
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+    return headers, entry
+
+
+class ValidatorStore:
+    """
+    按URL保存的缓存验证器（ETag、Last-Modified）及上次响应对应的解析结果
+
+    进程内LRU，容量满时淘汰最久未使用的URL
+
+    Args:
+        size: 最多保存的URL数
+    """
+
+    def __init__(self, size=DEFAULT_VALIDATOR_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        """
+        Returns:
+            dict: etag、last_modified、size（上次响应体字节数）、payload（调用方保存的解析结果），
+                没有记录时返回None
+        """
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+                return dict(entry)
+        return None
+
+    def update(self, url, etag, last_modified, size):
+        """记录新的验证器，响应内容已变化，原有的解析结果作废"""
+        if not etag and not last_modified:
+            self.discard(url)
+            return
+        with self._lock:
+            self._entries[url] = {'etag': etag, 'last_modified': last_modified, 'size': size, 'payload': None}
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def set_payload(self, url, payload):
+        """为URL当前的验证器附加解析结果，收到304时直接复用"""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                entry['payload'] = payload
+
+    def discard(self, url):
+        with self._lock:
+            self._entries.pop(url, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FetchResponse:
+    """
+    已读取完毕的HTTP响应
+
+    属性命名与requests.Response保持一致，便于爬虫代码平滑迁移。
+    """
+
+    def __init__(self, status_code, url, headers, content, encoding=None, wire_bytes=None, validators=None,
+                 body_bytes=None, truncated=False):
+        self.status_code = status_code
+        self.url = url
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding
+        # 实际传输的响应体字节数（压缩后）
+        self.wire_bytes = len(content) if wire_bytes is None else wire_bytes
+        # 解压后的响应体字节数，流式读取时content为空，由此记录读取量
+        self.body_bytes = len(content) if body_bytes is None else body_bytes
+        # 流式读取是否在响应结束前停止（达到字节上限或调用方提前结束）
+        self.truncated = truncated
+        # 条件请求使用的验证器记录，收到304时包含上次的解析结果
+        self.validators = validators
+
+    @property
+    def not_modified(self):
+        """条件请求命中，服务器返回304"""
+        return self.status_code == 304
+
+    @property
+    def text(self):
+        """按响应声明的编码解码，未声明时使用utf-8"""
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+    def raise_for_status(self):
+        """状态码为4xx/5xx时抛出requests.HTTPError"""
+        if 400 <= self.status_code < 600:
+            raise requests.exceptions.HTTPError(
+                f"{self.status_code} Error for url: {self.url}", response=self
+            )
+
+
+class HttpPool:
+    """
+    进程内共享的异步HTTP连接池
+
+    Args:
+        limit: 连接池总连接数上限
+        limit_per_host: 单个主机的连接数上限
+        timeout: 默认请求超时时间（秒）
+    """
+
+    def __init__(self, limit=100, limit_per_host=20, timeout=20):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self._loop = None
+        self._thread = None
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'requests': 0, 'compressed': 0, 'conditional': 0, 'not_modified': 0,
+            'wire_bytes': 0, 'body_bytes': 0, 'compression_saved_bytes': 0, 'not_modified_saved_bytes': 0
+        }
+
+    def _ensure_loop(self):
+        """启动后台事件循环线程（fork后的子进程会重新创建）"""
+        with self._lock:
+            if self._loop is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return self._loop
+
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name='http-pool', daemon=True)
+            thread.start()
+
+            self._loop = loop
+            self._thread = thread
+            self._session = None
+            self._pid = os.getpid()
+            logger.info("HTTP连接池事件循环已启动")
+            return loop
+
+    async def _get_session(self):
+        """在连接池事件循环内惰性创建ClientSession"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=300
+            )
+            # 响应体由_get自行解压，以便统计传输字节数
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                trust_env=True,
+                auto_decompress=False
+            )
+        return self._session
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for name, value in deltas.items():
+                self._stats[name] += value
+
+    def _record(self, url, result, validators, entry, etag, last_modified):
+        """统计传输字节数，并按响应状态复用或更新验证器"""
+        wire_bytes, body_bytes = result.wire_bytes, result.body_bytes
+        self._count(requests=1, wire_bytes=wire_bytes, body_bytes=body_bytes,
+                    compressed=int(wire_bytes < body_bytes),
+                    compression_saved_bytes=max(0, body_bytes - wire_bytes),
+                    conditional=int(entry is not None))
+        if validators is None:
+            return
+        if result.not_modified and entry is not None:
+            result.validators = entry
+            self._count(not_modified=1, not_modified_saved_bytes=entry['size'])
+        elif 200 <= result.status_code < 300:
+            validators.update(url, etag, last_modified, body_bytes)
+
+    async def _get(self, url, headers=None, cookies=None, timeout=None, allow_redirects=True, validators=None):
+        session = await self._get_session()
+        request_timeout = aiohttp.ClientTimeout(total=timeout or self.timeout)
+        headers, entry = _request_headers(url, headers, validators)
+        try:
+            async with session.get(url, headers=headers, cookies=cookies, timeout=request_timeout,
+                                   allow_redirects=allow_redirects) as response:
+                raw = await response.read()
+                content = decode_content(raw, response.headers.get('Content-Encoding'))
+                result = FetchResponse(
+                    status_code=response.status,
+                    url=str(response.url),
+                    headers=dict(response.headers),
+                    content=content,
+                    encoding=response.charset,
+                    wire_bytes=len(raw)
+                )
+                # 转为dict后响应头不再忽略大小写，验证器在此读取
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+        except asyncio.TimeoutError as e:
+            raise requests.exceptions.Timeout(f"请求超时: {url}") from e
+        except aiohttp.ClientConnectionError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+        except aiohttp.ClientError as e:
+            raise requests.exceptions.RequestException(str(e)) from e
+        except zlib.error as e:
+            raise requests.exceptions.ContentDecodingError(f"响应解压失败: {url}: {e}") from e
+
+        self._record(url, result, validators, entry, etag, last_modified)
+        return result
+
+    async def get(self, url, headers=None, cookies=None, timeout=None, allow_redirects=True, validators=None):
+        """
+        发送GET请求并读取完整响应
+
+        网络异常统一转换为requests.exceptions中的对应异常，
+        调用方沿用原有的异常处理逻辑即可。
+
+        Args:
+            validators: ValidatorStore，传入时对该URL发送条件请求并在成功响应后更新验证器；
+                返回304时response.validators为上次保存的记录
+
+        Returns:
+            FetchResponse: 已读取完毕的响应（响应体已解压）
+        """
+        return await self._submit(self._get(url, headers=headers, cookies=cookies, timeout=timeout,
+                                            allow_redirects=allow_redirects, validators=validators))
+
+    async def _stream(self, url, open_consumer, headers=None, cookies=None, timeout=None, allow_redirects=True,
+                      max_bytes=None, chunk_size=16384, validators=None):
+        session = await self._get_session()
+        request_timeout = aiohttp.ClientTimeout(total=timeout or self.timeout)
+        headers, entry = _request_headers(url, headers, validators)
+        wire_bytes = body_bytes = 0
+        truncated = False
+        try:
+            async with session.get(url, headers=headers, cookies=cookies, timeout=request_timeout,
+                                   allow_redirects=allow_redirects) as response:
+                decoder = ContentDecoder(response.headers.get('Content-Encoding'))
+                result = FetchResponse(response.status, str(response.url), dict(response.headers), b'',
+                                       encoding=response.charset)
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+                consumer = open_consumer(result) if 200 <= response.status < 300 else None
+                if consumer is None:
+                    # 不需要响应体时直接关闭连接，不读取剩余数据
+                    response.close()
+                else:
+                    def deliver(data):
+                        # 解压输出比剩余额度多取1字节，用于判断是否超过上限
+                        nonlocal body_bytes, truncated
+                        if max_bytes is not None and body_bytes + len(data) > max_bytes:
+                            data = data[:max_bytes - body_bytes]
+                            truncated = True
+                        body_bytes += len(data)
+                        if data and consumer(data):
+                            truncated = True
+
+                    def limit():
+                        if max_bytes is None:
+                            return MAX_DECODE_CHUNK
+                        return min(MAX_DECODE_CHUNK, max_bytes - body_bytes + 1)
+
+                    async for chunk in response.content.iter_chunked(chunk_size):
+                        wire_bytes += len(chunk)
+                        deliver(decoder.decompress(chunk, limit()))
+                        # 单个分块解压后超过单次输出上限时，剩余数据留在解压器中，逐次取出
+                        while not truncated and decoder.pending:
+                            deliver(decoder.decompress(b'', limit()))
+                        if truncated:
+                            break
+                    else:
+                        while not truncated:
+                            data = decoder.flush(limit())
+                            if not data and not decoder.pending:
+                                break
+                            deliver(data)
+                    if truncated:
+                        # 提前结束时不再读取剩余数据，关闭连接而不是放回连接池
+                        response.close()
+        except asyncio.TimeoutError as e:
+            raise requests.exceptions.Timeout(f"请求超时: {url}") from e
+        except aiohttp.ClientConnectionError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+        except aiohttp.ClientError as e:
+            raise requests.exceptions.RequestException(str(e)) from e
+        except zlib.error as e:
+            raise requests.exceptions.ContentDecodingError(f"响应解压失败: {url}: {e}") from e
+
+        result.wire_bytes, result.body_bytes, result.truncated = wire_bytes, body_bytes, truncated
+        self._record(url, result, validators, entry, etag, last_modified)
+        return result
+
+    async def stream(self, url, open_consumer, headers=None, cookies=None, timeout=None, allow_redirects=True,
+                     max_bytes=None, chunk_size=16384, validators=None):
+        """
+        发送GET请求并把解压后的响应体分块交给consumer，不在内存中保留完整响应
+
+        只读取2xx响应的响应体；网络异常的转换与get一致
+
+        Args:
+            open_consumer: 收到2xx响应头后调用，参数为FetchResponse（content为空），
+                返回接收bytes分块的consumer函数，返回None时不读取响应体；
+                两者都在连接池事件循环中调用，consumer返回True时停止读取
+            max_bytes: 最多读取的解压后字节数，None表示不限
+            chunk_size: 每次从连接读取的字节数
+            validators: 与get相同
+
+        Returns:
+            FetchResponse: content为空，body_bytes为交给consumer的字节数，
+                truncated表示是否在响应结束前停止读取
+        """
+        return await self._submit(self._stream(url, open_consumer, headers=headers, cookies=cookies, timeout=timeout,
+                                               allow_redirects=allow_redirects, max_bytes=max_bytes,
+                                               chunk_size=chunk_size, validators=validators))
+
+    async def _submit(self, coro):
+        """在连接池事件循环中执行协程"""
+        loop = self._ensure_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is loop:
+            return await coro
+        # 调用方处于其他事件循环：把请求交给连接池所在的循环执行
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    def run(self, coro, timeout=None):
+        """
+        在连接池事件循环中执行协程并同步等待结果，供同步包装方法使用
+
+        Args:
+            coro: 要执行的协程
+            timeout: 最长等待时间（秒），None表示不限
+        """
+        loop = self._ensure_loop()
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("不能在连接池事件循环内同步等待，请直接await异步方法")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+    def stats(self):
+        """返回请求数、传输字节数以及压缩和304节省的字节数"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['saved_bytes'] = stats['compression_saved_bytes'] + stats['not_modified_saved_bytes']
+        total = stats['wire_bytes'] + stats['saved_bytes']
+        stats['saved_ratio'] = round(stats['saved_bytes'] / total, 4) if total else 0.0
+        return stats
+
+    def close(self):
+        """关闭连接池和后台事件循环"""
+        with self._lock:
+            loop, session = self._loop, self._session
+            self._loop = self._thread = self._session = None
+        if loop is None or self._pid != os.getpid():
+            return
+        if session is not None and not session.closed:
+            asyncio.run_coroutine_threadsafe(session.close(), loop).result(5)
+        loop.call_soon_threadsafe(loop.stop)
+
+
+_default_pool = HttpPool()
+atexit.register(_default_pool.close)
+
+_default_validators = ValidatorStore()
+
+
+def get_pool():
+    """获取进程内共享的默认连接池"""
+    return _default_pool
+
+
+def get_validator_store():
+    """获取进程内共享的默认验证器存储"""
+    return _default_validators
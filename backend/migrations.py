@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+数据库结构迁移 - 智能瞭望数据分析处理系统
+功能: 按登记顺序执行各模块的结构变更，每个迁移在一个数据库中只执行一次
+
+已执行的迁移记录在schema_migrations表中，迁移名以模块名为前缀，各模块维护自己的迁移列表。
+每个迁移与它的执行记录在同一个事务中提交，迁移失败时回滚并抛出异常，之前已完成的迁移不受影响。
+迁移函数只执行SQL，不自行提交事务。
+"""
+
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    name TEXT PRIMARY KEY,
+    applied_at REAL NOT NULL
+)
+'''
+
+
+def applied_migrations(conn):
+    """已执行的迁移名集合"""
+    conn.execute(MIGRATIONS_SCHEMA)
+    return {row[0] for row in conn.execute("SELECT name FROM schema_migrations")}
+
+
+def apply_migrations(conn, migrations):
+    """
+    执行尚未执行的迁移
+
+    Args:
+        conn: SQLite连接，调用时不能处于未提交的事务中（不会替调用方提交未完成的修改）
+        migrations: (迁移名, 迁移函数) 列表，按顺序执行，迁移函数的参数为conn
+
+    Returns:
+        list: 本次执行的迁移名；连接处于未提交的事务中时抛出RuntimeError
+    """
+    if conn.in_transaction:
+        raise RuntimeError('执行数据库迁移前需要先提交或回滚当前事务')
+    done = applied_migrations(conn)
+    applied = []
+    for name, migrate in migrations:
+        if name in done:
+            continue
+        start = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # 获得写锁后再次确认，避免多个进程同时启动时重复执行
+            if conn.execute("SELECT 1 FROM schema_migrations WHERE name = ?", (name,)).fetchone() is None:
+                migrate(conn)
+                conn.execute("INSERT INTO schema_migrations (name, applied_at) VALUES (?, ?)", (name, time.time()))
+                applied.append(name)
+                logger.info(f"已执行数据库迁移: {name}，耗时 {time.perf_counter() - start:.2f}s")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.exception(f"数据库迁移失败: {name}")
+            raise
+    return applied
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+近似重复检测索引 - 智能瞭望数据分析处理系统
+功能: 基于MinHash-LSH的标题近似去重，用于单次搜索内去重和数据仓库全库去重
+
+标题被切分为字符片段集合，每个集合计算MinHash签名并按band分桶；
+查询时只与落入相同桶的候选结果计算精确的Jaccard相似度，
+不再把每个新标题与所有已见标题逐一比较，去重耗时随数据量近似线性增长。
+
+用法:
+    python near_dup.py database.db            # 报告数据仓库中的近似重复记录
+    python near_dup.py database.db -t 0.9     # 指定相似度阈值
+"""
+
+import argparse
+import logging
+import random
+import sqlite3
+import threading
+import unicodedata
+import zlib
+
+from repository import normalize_url
+
+logger = logging.getLogger(__name__)
+
+# 默认相似度阈值（Jaccard）
+DEFAULT_THRESHOLD = 0.8
+# 默认签名长度与分段数：32个哈希分为8段，每段4个；相似度0.8的重复漏检概率约1.5%，
+# 0.85时约0.3%，相似度0.5的标题成为候选的概率约40%（候选再做精确比较，不影响准确率）
+DEFAULT_NUM_PERM = 32
+DEFAULT_BANDS = 8
+
+_MASK64 = (1 << 64) - 1
+
+
+def normalize_title(text):
+    """统一大小写与全半角，并去除空白、标点和符号"""
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKC', str(text)).lower()
+    return ''.join(ch for ch in text if unicodedata.category(ch)[0] not in 'PSZC')
+
+
+def shingles(text, size=1):
+    """
+    把标准化后的标题切分为字符片段集合
+
+    Args:
+        text: 标题
+        size: 片段长度，1为字符集合，2为相邻字符对
+
+    Returns:
+        frozenset: 片段集合，标题为空时为空集合
+    """
+    normalized = normalize_title(text)
+    if len(normalized) <= size:
+        return frozenset([normalized]) if normalized else frozenset()
+    return frozenset(normalized[i:i + size] for i in range(len(normalized) - size + 1))
+
+
+def jaccard(a, b):
+    """两个集合的Jaccard相似度"""
+    if not a or not b:
+        return 0
+    intersection = len(a & b)
+    return intersection / (len(a) + len(b) - intersection)
+
+
+class NearDupIndex:
+    """
+    MinHash-LSH近似重复索引
+
+    Args:
+        threshold: 判定为重复的Jaccard相似度阈值
+        num_perm: MinHash签名长度
+        bands: LSH分段数，须能整除num_perm；分段越多召回越高、候选越多
+        shingle_size: 字符片段长度
+        seed: 哈希族随机种子，相同种子的索引签名一致
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM, bands=DEFAULT_BANDS,
+                 shingle_size=1, seed=1):
+        if num_perm % bands:
+            raise ValueError('num_perm必须能被bands整除')
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = random.Random(seed)
+        # 片段哈希先乘以奇数打散到64位，再与各随机掩码异或，模拟num_perm个独立排列
+        self._multiplier = rng.getrandbits(64) | 1
+        self._masks = [rng.getrandbits(64) for _ in range(num_perm)]
+        self._buckets = [{} for _ in range(bands)]
+        self._shingles = {}
+
+    def __len__(self):
+        return len(self._shingles)
+
+    def __contains__(self, key):
+        return key in self._shingles
+
+    def signature(self, shingle_set):
+        """计算片段集合的MinHash签名"""
+        multiplier = self._multiplier
+        hashes = [(zlib.crc32(s.encode('utf-8')) * multiplier) & _MASK64 for s in shingle_set]
+        return tuple(min(map(mask.__xor__, hashes)) for mask in self._masks)
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        return [signature[i * rows:(i + 1) * rows] for i in range(self.bands)]
+
+    def _find(self, shingle_set, band_keys):
+        checked = set()
+        for bucket, band_key in zip(self._buckets, band_keys):
+            for key in bucket.get(band_key, ()):
+                if key in checked:
+                    continue
+                checked.add(key)
+                if jaccard(shingle_set, self._shingles[key]) >= self.threshold:
+                    return key
+        return None
+
+    def query(self, text):
+        """
+        查找与标题近似重复的已索引条目
+
+        Returns:
+            已索引条目的键，没有重复时返回None
+        """
+        shingle_set = shingles(text, self.shingle_size)
+        if not shingle_set:
+            return None
+        return self._find(shingle_set, self._band_keys(self.signature(shingle_set)))
+
+    def add(self, key, text):
+        """把标题加入索引，标题为空时不索引"""
+        shingle_set = shingles(text, self.shingle_size)
+        if not shingle_set:
+            return
+        self._insert(key, shingle_set, self._band_keys(self.signature(shingle_set)))
+
+    def _insert(self, key, shingle_set, band_keys):
+        self._shingles[key] = shingle_set
+        for bucket, band_key in zip(self._buckets, band_keys):
+            bucket.setdefault(band_key, []).append(key)
+
+    def check_and_add(self, key, text):
+        """
+        增量去重：有重复时返回已有条目的键，否则把标题加入索引并返回None
+
+        签名只计算一次，适合在遍历结果时逐条调用
+        """
+        shingle_set = shingles(text, self.shingle_size)
+        if not shingle_set:
+            return None
+        band_keys = self._band_keys(self.signature(shingle_set))
+        duplicate = self._find(shingle_set, band_keys)
+        if duplicate is None:
+            self._insert(key, shingle_set, band_keys)
+        return duplicate
+
+
+class RepositoryIndex:
+    """
+    数据仓库的近似重复索引
+
+    首次使用时流式读取data_repository中的全部记录和archived_urls中已归档记录的URL与标题，
+    之后每次refresh只读取新增的记录，其他进程写入或归档的数据也会被增量加载。
+
+    Args:
+        db_path: SQLite数据库路径
+        threshold: 标题相似度阈值
+        shingle_size: 字符片段长度
+    """
+
+    def __init__(self, db_path, threshold=DEFAULT_THRESHOLD, shingle_size=2):
+        self.db_path = db_path
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """丢弃已加载的索引，下次refresh时重新全量加载"""
+        self.index = NearDupIndex(self.threshold, shingle_size=self.shingle_size)
+        self.urls = {}
+        self.last_id = 0
+        self.last_archived = 0
+
+    def refresh(self, conn=None):
+        """
+        加载上次刷新之后新增的记录
+
+        Args:
+            conn: 使用的数据库连接，None时临时打开一个连接
+        """
+        with self.lock:
+            own_conn = conn is None
+            if own_conn:
+                conn = sqlite3.connect(self.db_path)
+            try:
+                rows = conn.execute(
+                    "SELECT id, title, url FROM data_repository WHERE id > ? ORDER BY id",
+                    (self.last_id,)
+                )
+                loaded = 0
+                for row_id, title, url in rows:
+                    self.add(row_id, title, url)
+                    loaded += 1
+                loaded += self._refresh_archived(conn)
+            finally:
+                if own_conn:
+                    conn.close()
+            if loaded:
+                logger.info(f"近似重复索引加载 {loaded} 条记录，共 {len(self.index)} 条")
+
+    def _refresh_archived(self, conn):
+        """加载新归档的记录，返回加载条数；数据库中没有archived_urls表时跳过"""
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='archived_urls'").fetchone() is None:
+            return 0
+        loaded = 0
+        for rowid, row_id, title, normalized in conn.execute(
+                "SELECT rowid, id, title, normalized_url FROM archived_urls WHERE rowid > ? ORDER BY rowid",
+                (self.last_archived,)
+        ).fetchall():
+            self.last_archived = rowid
+            self.urls.setdefault(normalized, row_id)
+            # 归档前已从data_repository加载的记录不重复索引
+            if row_id not in self.index:
+                self.index.add(row_id, title)
+                loaded += 1
+        return loaded
+
+    def find_duplicate(self, title, url):
+        """返回与给定结果重复的记录id，规范化URL相同或标题近似重复都视为重复"""
+        with self.lock:
+            normalized = normalize_url(url)
+            if normalized and normalized in self.urls:
+                return self.urls[normalized]
+            return self.index.query(title)
+
+    def has_url(self, url):
+        """规范化URL是否已入库"""
+        return normalize_url(url) in self.urls
+
+    def add(self, row_id, title, url):
+        """登记一条已入库的记录"""
+        with self.lock:
+            normalized = normalize_url(url)
+            if normalized:
+                self.urls.setdefault(normalized, row_id)
+            self.index.add(row_id, title)
+            self.last_id = max(self.last_id, row_id)
+
+
+_repository_indexes = {}
+_repository_lock = threading.Lock()
+
+
+def get_repository_index(db_path, threshold=DEFAULT_THRESHOLD, conn=None):
+    """获取（并增量刷新）数据库对应的共享仓库索引，conn为刷新时使用的连接"""
+    with _repository_lock:
+        index = _repository_indexes.get(db_path)
+        if index is None or index.threshold != threshold:
+            index = RepositoryIndex(db_path, threshold)
+            _repository_indexes[db_path] = index
+    index.refresh(conn)
+    return index
+
+
+def find_repository_duplicates(db_path, threshold=DEFAULT_THRESHOLD, shingle_size=2):
+    """
+    对数据仓库做全库去重检查
+
+    Returns:
+        list: (重复记录id, 保留记录id) 列表，保留的是较早入库的记录
+    """
+    index = NearDupIndex(threshold, shingle_size=shingle_size)
+    seen_urls = {}
+    duplicates = []
+    conn = sqlite3.connect(db_path)
+    try:
+        for row_id, title, url in conn.execute("SELECT id, title, url FROM data_repository ORDER BY id"):
+            url = normalize_url(url)
+            original = seen_urls.get(url) if url else None
+            if original is None:
+                original = index.check_and_add(row_id, title)
+            if original is not None:
+                duplicates.append((row_id, original))
+            elif url:
+                seen_urls[url] = row_id
+    finally:
+        conn.close()
+    return duplicates
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据仓库近似重复检查')
+    parser.add_argument('database', help='SQLite数据库路径')
+    parser.add_argument('-t', '--threshold', type=float, default=DEFAULT_THRESHOLD, help='标题相似度阈值')
+    args = parser.parse_args()
+
+    duplicates = find_repository_duplicates(args.database, args.threshold)
+    for row_id, original in duplicates:
+        print(f"{row_id}\t重复于\t{original}")
+    print(f"共发现 {len(duplicates)} 条重复记录")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
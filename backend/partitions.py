@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+数据仓库按月归档 - 智能瞭望数据分析处理系统
+功能: 把data_repository中较早月份的记录移到按月划分的归档文件，查询时按日期条件裁剪分区并合并结果
+
+data_repository只保留最近HOT_MONTHS个月的记录，是当前写入的分区，全文索引和BM25统计都只针对它；
+更早的月份各自存放在ARCHIVE_DIR下的repository_YYYY_MM.db中（同样的列，保留原记录id），
+分区清单登记在主库的repository_partitions表中。归档记录的规范化URL和标题保留在主库的archived_urls表中，
+入库时的URL去重和近似重复检查仍然覆盖已归档的记录。归档完成的文件设为只读，可以整体移到冷存储，
+文件不在原位置时查询跳过该分区并记录警告，查询代码不需要修改。
+
+按时间排序的查询先按date_from/date_to裁剪出相关的分区，每个分区按 (created_at, id) 倒序最多读取limit条，
+再与data_repository的结果归并；记录id全局唯一（AUTOINCREMENT不复用id），键集分页游标在各分区间通用。
+归档分区没有全文索引，关键词按LIKE子串匹配，结果与全文检索一致；相关性排序只在data_repository中进行，
+有关键词但未指定排序方式的查询涉及归档分区时改为按时间排序（repository.RepositoryPage）。
+
+用法:
+    python partitions.py list
+    python partitions.py archive --before 2024-06
+"""
+
+import argparse
+import heapq
+import logging
+import os
+import re
+import sqlite3
+import stat
+import time
+import urllib.request
+
+from ranking import sync_ranking
+from repository import REPOSITORY_COLUMNS, decode_cursor, normalize_url, search_repository
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 归档文件所在目录
+ARCHIVE_DIR = os.environ.get('REPOSITORY_ARCHIVE_DIR', os.path.join(BASE_DIR, 'archive'))
+
+# data_repository中保留的月数（含当月）
+HOT_MONTHS = 3
+
+MONTH_RE = re.compile(r'^(\d{4})-(\d{2})')
+
+PARTITIONS_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS repository_partitions (
+    month TEXT PRIMARY KEY,
+    file_name TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    min_created_at TEXT,
+    max_created_at TEXT,
+    frozen INTEGER NOT NULL DEFAULT 0,
+    archived_at REAL NOT NULL
+)
+'''
+
+# 归档文件中的表结构（与data_repository相同的列，id沿用原记录）
+ARCHIVE_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS archive.data_repository (
+        id INTEGER PRIMARY KEY,
+        title TEXT NOT NULL,
+        url TEXT NOT NULL,
+        summary TEXT,
+        search_keyword TEXT NOT NULL,
+        created_at TIMESTAMP,
+        normalized_url TEXT,
+        seen_count INTEGER NOT NULL DEFAULT 1
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS archive.idx_data_repository_created_at ON data_repository (created_at)',
+    '''
+    CREATE INDEX IF NOT EXISTS archive.idx_data_repository_keyword_created_at
+    ON data_repository (search_keyword, created_at)
+    '''
+]
+
+ARCHIVE_COLUMNS = 'id, title, url, summary, search_keyword, created_at, normalized_url, seen_count'
+
+PARTITION_FIELDS = ('month', 'file_name', 'row_count', 'min_created_at', 'max_created_at', 'frozen', 'archived_at')
+
+
+def month_of(value):
+    """取日期时间字符串的年月（YYYY-MM），格式不符时返回None"""
+    match = MONTH_RE.match(value or '')
+    return f'{match.group(1)}-{match.group(2)}' if match else None
+
+
+def next_month(month):
+    """下一个月的YYYY-MM"""
+    year, mon = int(month[:4]), int(month[5:7])
+    return f'{year + mon // 12:04d}-{mon % 12 + 1:02d}'
+
+
+def shift_month(month, count):
+    """向前（count为负）或向后移动若干个月"""
+    year, mon = int(month[:4]), int(month[5:7])
+    index = year * 12 + mon - 1 + count
+    return f'{index // 12:04d}-{index % 12 + 1:02d}'
+
+
+def _archive_filters(keyword, date_from, date_to, search_keyword):
+    """归档分区的查询条件：没有全文索引，每个词都按LIKE子串匹配"""
+    conditions = []
+    params = []
+    for term in (keyword or '').split():
+        conditions.append("(title LIKE ? OR summary LIKE ? OR search_keyword LIKE ?)")
+        params.extend([f'%{term}%'] * 3)
+    if date_from:
+        conditions.append("created_at >= ?")
+        params.append(date_from)
+    if date_to:
+        conditions.append("created_at <= ?")
+        params.append(date_to)
+    if search_keyword:
+        conditions.append("search_keyword = ?")
+        params.append(search_keyword)
+    return conditions, params
+
+
+class RepositoryArchive:
+    """
+    数据仓库的按月归档分区
+
+    Args:
+        archive_dir: 归档文件所在目录
+    """
+
+    def __init__(self, archive_dir=ARCHIVE_DIR):
+        self.archive_dir = archive_dir
+
+    def init_schema(self, conn):
+        """创建分区清单表"""
+        conn.execute(PARTITIONS_SCHEMA)
+        conn.commit()
+
+    def path(self, month):
+        return os.path.join(self.archive_dir, f"repository_{month.replace('-', '_')}.db")
+
+    def partitions(self, conn):
+        """已归档的分区，按月份倒序"""
+        rows = conn.execute(
+            f"SELECT {', '.join(PARTITION_FIELDS)} FROM repository_partitions ORDER BY month DESC"
+        ).fetchall()
+        return [dict(zip(PARTITION_FIELDS, row)) for row in rows]
+
+    def prune(self, conn, date_from='', date_to=''):
+        """
+        与日期条件相交的分区月份，按月份倒序
+
+        日期条件无法识别年月时不裁剪该端
+        """
+        query = "SELECT month FROM repository_partitions"
+        conditions = []
+        params = []
+        if month_of(date_from):
+            conditions.append("month >= ?")
+            params.append(month_of(date_from))
+        if month_of(date_to):
+            conditions.append("month <= ?")
+            params.append(month_of(date_to))
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        return [row[0] for row in conn.execute(query + " ORDER BY month DESC", params)]
+
+    # ---- 归档 ----
+
+    def archive_month(self, conn, month, freeze=True):
+        """
+        把data_repository中某个月的记录移到归档文件
+
+        复制和删除在同一个事务中完成；WAL模式下跨文件的提交不保证原子性，
+        中途失败后重新执行即可（复制使用INSERT OR REPLACE，查询合并时按id去重）。
+        已抓取的落地页正文一并归档，规范化URL和标题在同一事务中写入主库的archived_urls。
+
+        Args:
+            conn: 主库连接，调用时不能处于未提交的事务中
+            month: YYYY-MM
+            freeze: 归档后把文件设为只读
+
+        Returns:
+            int: 归档的记录数
+        """
+        if month_of(month) != month:
+            raise ValueError(f'无效的月份: {month}')
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = self.path(month)
+        if os.path.exists(path):
+            os.chmod(path, stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
+        if conn.in_transaction:
+            conn.commit()
+
+        bounds = (month, next_month(month))
+        conn.execute("ATTACH DATABASE ? AS archive", (path,))
+        try:
+            # 归档文件是单个文件，便于整体移动
+            conn.execute("PRAGMA archive.journal_mode=DELETE")
+            for statement in ARCHIVE_SCHEMA:
+                conn.execute(statement)
+            has_content = conn.execute(
+                "SELECT 1 FROM main.sqlite_master WHERE type='table' AND name='repository_content'"
+            ).fetchone() is not None
+            if has_content:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS archive.repository_content AS "
+                    "SELECT * FROM main.repository_content WHERE 0"
+                )
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                moved = conn.execute(
+                    f"INSERT OR REPLACE INTO archive.data_repository ({ARCHIVE_COLUMNS}) "
+                    f"SELECT {ARCHIVE_COLUMNS} FROM main.data_repository WHERE created_at >= ? AND created_at < ?",
+                    bounds
+                ).rowcount
+                if has_content:
+                    conn.execute(
+                        "DELETE FROM archive.repository_content WHERE doc_id IN "
+                        "(SELECT id FROM main.data_repository WHERE created_at >= ? AND created_at < ?)", bounds
+                    )
+                    conn.execute(
+                        "INSERT INTO archive.repository_content SELECT c.* FROM main.repository_content c "
+                        "JOIN main.data_repository r ON r.id = c.doc_id WHERE r.created_at >= ? AND r.created_at < ?",
+                        bounds
+                    )
+                # 早期记录可能没有登记规范化URL，按原URL计算；同一URL保留最早归档的记录
+                archived_urls = []
+                for row_id, title, url, normalized in conn.execute(
+                        "SELECT id, title, url, normalized_url FROM main.data_repository "
+                        "WHERE created_at >= ? AND created_at < ? ORDER BY id", bounds
+                ).fetchall():
+                    normalized = normalized or normalize_url(url)
+                    if normalized:
+                        archived_urls.append((normalized, row_id, title, month))
+                conn.executemany(
+                    "INSERT OR IGNORE INTO main.archived_urls (normalized_url, id, title, month) VALUES (?, ?, ?, ?)",
+                    archived_urls
+                )
+                # 删除触发器同步全文索引、BM25统计和正文表
+                conn.execute("DELETE FROM main.data_repository WHERE created_at >= ? AND created_at < ?", bounds)
+                sync_ranking(conn)
+                row_count, min_created, max_created = conn.execute(
+                    "SELECT COUNT(*), MIN(created_at), MAX(created_at) FROM archive.data_repository"
+                ).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO main.repository_partitions "
+                    "(month, file_name, row_count, min_created_at, max_created_at, frozen, archived_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (month, os.path.basename(path), row_count, min_created, max_created, int(freeze), time.time())
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        finally:
+            conn.execute("DETACH DATABASE archive")
+
+        if freeze:
+            os.chmod(path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        logger.info(f"已归档 {month} 的 {moved} 条记录到 {path}")
+        return moved
+
+    def archive_before(self, conn, before_month):
+        """
+        归档早于before_month（YYYY-MM）的所有月份
+
+        Returns:
+            dict: 月份 -> 归档的记录数
+        """
+        if month_of(before_month) != before_month:
+            raise ValueError(f'无效的月份: {before_month}')
+        months = [row[0] for row in conn.execute(
+            "SELECT DISTINCT substr(created_at, 1, 7) FROM data_repository WHERE created_at < ? ORDER BY 1",
+            (before_month,)
+        )]
+        return {month: self.archive_month(conn, month) for month in months if month_of(month) == month}
+
+    def archive_expired(self, conn, hot_months=HOT_MONTHS, now=None):
+        """归档data_repository中超出保留月数的记录"""
+        current = time.strftime('%Y-%m', time.gmtime(now))
+        return self.archive_before(conn, shift_month(current, 1 - hot_months))
+
+    # ---- 查询 ----
+
+    def _open(self, month):
+        """以只读方式打开分区文件，文件不存在（已移到冷存储）时返回None"""
+        path = self.path(month)
+        if not os.path.exists(path):
+            logger.warning(f"归档分区 {month} 的文件不存在，查询时跳过: {path}")
+            return None
+        return sqlite3.connect(f'file:{urllib.request.pathname2url(path)}?mode=ro', uri=True, check_same_thread=False)
+
+    def search(self, conn, keyword='', date_from='', date_to='', limit=None, after=None, search_keyword=''):
+        """
+        按时间倒序查询data_repository和相关的归档分区，归并各分区的结果
+
+        参数和游标格式同repository.search_repository（sort固定为time）
+
+        Returns:
+            generator: 逐行返回 (id, title, url, summary, search_keyword, created_at)，
+                迭代结束或调用close()时关闭分区连接
+        """
+        streams = [search_repository(conn, keyword, date_from, date_to, 'time', limit, after, search_keyword)]
+        conditions, params = _archive_filters(keyword, date_from, date_to, search_keyword)
+        if after:
+            position = decode_cursor(after)
+            if len(position) != 2:
+                raise ValueError(f'无效的分页游标: {after}')
+            conditions.append("(created_at, id) < (?, ?)")
+            params.extend(position)
+        query = f"SELECT {REPOSITORY_COLUMNS.replace('r.', '')} FROM data_repository"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY created_at DESC, id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        archives = []
+        try:
+            for month in self.prune(conn, date_from, date_to):
+                archive = self._open(month)
+                if archive is not None:
+                    archives.append(archive)
+                    streams.append(archive.execute(query, params))
+        except Exception:
+            for archive in archives:
+                archive.close()
+            raise
+        return self._merge(streams, archives, limit)
+
+    @staticmethod
+    def _merge(streams, archives, limit):
+        merged = heapq.merge(*streams, key=lambda row: (row[5] or '', row[0]), reverse=True)
+        try:
+            last_id = None
+            count = 0
+            for row in merged:
+                # 归档中途失败时同一条记录可能同时存在于两个分区
+                if row[0] == last_id:
+                    continue
+                last_id = row[0]
+                yield row
+                count += 1
+                if limit is not None and count >= limit:
+                    break
+        finally:
+            merged.close()
+            for stream in streams:
+                stream.close()
+            for archive in archives:
+                archive.close()
+
+    def count(self, conn, keyword='', date_from='', date_to='', search_keyword=''):
+        """统计相关归档分区中符合条件的记录数（不含data_repository）"""
+        conditions, params = _archive_filters(keyword, date_from, date_to, search_keyword)
+        query = "SELECT COUNT(*) FROM data_repository"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        total = 0
+        for month in self.prune(conn, date_from, date_to):
+            archive = self._open(month)
+            if archive is None:
+                continue
+            try:
+                total += archive.execute(query, params).fetchone()[0]
+            finally:
+                archive.close()
+        return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据仓库按月归档')
+    parser.add_argument('--database', default=os.path.join(BASE_DIR, 'database.db'), help='主库路径')
+    parser.add_argument('--archive-dir', default=ARCHIVE_DIR, help='归档文件目录')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='列出已归档的分区')
+    archive_parser = commands.add_parser('archive', help='归档较早月份的记录')
+    archive_parser.add_argument('--before', help='归档早于该月份（YYYY-MM）的记录，默认保留最近HOT_MONTHS个月')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    conn = sqlite3.connect(args.database)
+    archive = RepositoryArchive(args.archive_dir)
+    archive.init_schema(conn)
+    try:
+        if args.command == 'archive':
+            moved = archive.archive_before(conn, args.before) if args.before else archive.archive_expired(conn)
+            for month, count in moved.items():
+                print(f"{month}: {count}")
+        for partition in archive.partitions(conn):
+            print(f"{partition['month']}  {partition['row_count']:>8}  {partition['file_name']}"
+                  + ('  只读' if partition['frozen'] else ''))
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PDF写出 - 智能瞭望数据分析处理系统
+功能: 逐页写出PDF文件，不依赖第三方库
+
+每页的内容流和页面对象生成后立即写入输出，内存中只保留各对象的偏移量和页面对象编号，
+页面树、交叉引用表和文件尾在关闭时写出，因此输出可以是不能回退的流。
+中文使用PDF阅读器内置的Adobe-GB1字体STSong-Light（UniGB-UCS2-H编码），不嵌入字体文件，
+文字按UTF-16BE编码为两字节的字符码，基本多文种平面以外的字符替换为问号。
+"""
+
+import zlib
+
+# A4纸张尺寸（点）
+A4 = (595.28, 841.89)
+
+FONT_NAME = 'STSong-Light'
+
+# 字体宽度以1000为一个字号：汉字为全角，ASCII字符按半角计
+FULL_WIDTH = 1000
+HALF_WIDTH = 500
+
+# 固定对象编号，页面从FIRST_PAGE_OBJECT开始依次编号
+CATALOG_OBJECT = 1
+PAGES_OBJECT = 2
+FONT_OBJECT = 3
+CID_FONT_OBJECT = 4
+FONT_DESCRIPTOR_OBJECT = 5
+INFO_OBJECT = 6
+FIRST_PAGE_OBJECT = 7
+
+
+def char_width(char):
+    """字符宽度（千分之一字号）"""
+    return HALF_WIDTH if ord(char) < 0x80 else FULL_WIDTH
+
+
+def text_width(text, size):
+    """文字在指定字号下的宽度（点）"""
+    return sum(char_width(char) for char in text) * size / 1000
+
+
+def encode_text(text):
+    """把文字编码为内容流中的十六进制字符串"""
+    text = ''.join(char if ord(char) <= 0xFFFF else '?' for char in text)
+    return '<' + text.encode('utf-16-be').hex().upper() + '>'
+
+
+def _literal(value):
+    """文档信息中的字符串，使用带BOM的UTF-16BE十六进制形式"""
+    return '<FEFF' + value.encode('utf-16-be').hex().upper() + '>'
+
+
+class PageCanvas:
+    """
+    单页的绘制指令
+
+    坐标原点在页面左下角，单位为点
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self._ops = []
+
+    def text(self, x, y, text, size, color=None):
+        """在(x, y)处写一行文字，color为0~1的RGB三元组"""
+        if not text:
+            return
+        fill = '%.3f %.3f %.3f rg ' % color if color else ''
+        self._ops.append(f'BT {fill}/F1 {size:g} Tf {x:.2f} {y:.2f} Td {encode_text(text)} Tj ET')
+
+    def line(self, x1, y1, x2, y2, width=0.5, gray=0.6):
+        """画一条直线"""
+        self._ops.append(f'q {gray:g} G {width:g} w {x1:.2f} {y1:.2f} m {x2:.2f} {y2:.2f} l S Q')
+
+    def content(self):
+        """页面内容流"""
+        return '\n'.join(self._ops).encode('ascii')
+
+
+class PdfWriter:
+    """
+    逐页写出PDF
+
+    Args:
+        sink: 可写的二进制文件对象
+        page_size: 页面尺寸 (宽, 高)
+        title: 文档标题
+        compress: 是否用Flate压缩页面内容流
+    """
+
+    def __init__(self, sink, page_size=A4, title='', compress=True):
+        self.sink = sink
+        self.page_size = page_size
+        self.compress = compress
+        self.page_count = 0
+        self._position = 0
+        self._offsets = {}
+        self._kids = []
+        self._next_object = FIRST_PAGE_OBJECT
+        self._closed = False
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self._write_object(CATALOG_OBJECT, f'<< /Type /Catalog /Pages {PAGES_OBJECT} 0 R >>')
+        self._write_object(FONT_OBJECT, (
+            f'<< /Type /Font /Subtype /Type0 /BaseFont /{FONT_NAME} /Encoding /UniGB-UCS2-H '
+            f'/DescendantFonts [{CID_FONT_OBJECT} 0 R] >>'
+        ))
+        self._write_object(CID_FONT_OBJECT, (
+            f'<< /Type /Font /Subtype /CIDFontType0 /BaseFont /{FONT_NAME} '
+            '/CIDSystemInfo << /Registry (Adobe) /Ordering (GB1) /Supplement 2 >> '
+            f'/FontDescriptor {FONT_DESCRIPTOR_OBJECT} 0 R /DW {FULL_WIDTH} '
+            f'/W [1 95 {HALF_WIDTH} 814 939 {HALF_WIDTH}] >>'
+        ))
+        self._write_object(FONT_DESCRIPTOR_OBJECT, (
+            f'<< /Type /FontDescriptor /FontName /{FONT_NAME} /Flags 6 /FontBBox [-25 -254 1000 880] '
+            '/ItalicAngle 0 /Ascent 880 /Descent -120 /CapHeight 880 /StemV 93 >>'
+        ))
+        self._write_object(INFO_OBJECT, f'<< /Title {_literal(title)} /Producer (GovInfo report) >>')
+
+    def new_page(self):
+        """返回一个空白页面，绘制完成后用add_page写出"""
+        return PageCanvas(*self.page_size)
+
+    def add_page(self, page):
+        """写出一页，页面内容写出后不再保留"""
+        content = page.content()
+        stream_object = self._allocate()
+        page_object = self._allocate()
+        if self.compress:
+            content = zlib.compress(content)
+            header = f'<< /Length {len(content)} /Filter /FlateDecode >>'
+        else:
+            header = f'<< /Length {len(content)} >>'
+        self._write_object(stream_object, header.encode('ascii') + b'\nstream\n' + content + b'\nendstream')
+        self._write_object(page_object, (
+            f'<< /Type /Page /Parent {PAGES_OBJECT} 0 R /MediaBox [0 0 {page.width:g} {page.height:g}] '
+            f'/Resources << /Font << /F1 {FONT_OBJECT} 0 R >> >> /Contents {stream_object} 0 R >>'
+        ))
+        self._kids.append(page_object)
+        self.page_count += 1
+
+    def close(self):
+        """写出页面树、交叉引用表和文件尾，不关闭sink"""
+        if self._closed:
+            return
+        self._closed = True
+        kids = ' '.join(f'{number} 0 R' for number in self._kids)
+        self._write_object(PAGES_OBJECT, f'<< /Type /Pages /Kids [{kids}] /Count {len(self._kids)} >>')
+        xref_position = self._position
+        size = self._next_object
+        lines = [f'xref\n0 {size}\n', '0000000000 65535 f \n']
+        for number in range(1, size):
+            lines.append(f'{self._offsets[number]:010d} 00000 n \n')
+        lines.append(
+            f'trailer\n<< /Size {size} /Root {CATALOG_OBJECT} 0 R /Info {INFO_OBJECT} 0 R >>\n'
+            f'startxref\n{xref_position}\n%%EOF\n'
+        )
+        self._write(''.join(lines).encode('ascii'))
+
+    def _allocate(self):
+        number = self._next_object
+        self._next_object += 1
+        return number
+
+    def _write_object(self, number, body):
+        if isinstance(body, str):
+            body = body.encode('ascii')
+        self._offsets[number] = self._position
+        self._write(f'{number} 0 obj\n'.encode('ascii') + body + b'\nendobj\n')
+
+    def _write(self, data):
+        self.sink.write(data)
+        self._position += len(data)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+查询计划检查 - 智能瞭望数据分析处理系统
+功能: 用EXPLAIN QUERY PLAN检查查询的访问路径，拒绝对指定表做全表扫描或对整表排序的计划
+
+EXPLAIN QUERY PLAN只编译语句、不执行，代价与一次prepare相当。
+计划中的"SCAN 表名"（没有USING INDEX）表示逐行扫描整张表，
+"USE TEMP B-TREE FOR ORDER BY"表示排序无法利用索引顺序，需要先读出所有符合条件的行再排序。
+"""
+
+import re
+
+# SCAN r / SCAN data_repository，不含USING INDEX等后缀
+FULL_SCAN_RE = re.compile(r'^SCAN (\w+)$')
+TEMP_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+class QueryPlanError(RuntimeError):
+    """查询计划需要全表扫描或整表排序"""
+
+    def __init__(self, message, plan):
+        super().__init__(message)
+        self.plan = plan
+
+
+def explain(conn, sql, params=()):
+    """
+    获取查询计划
+
+    Returns:
+        list: 计划各步骤的说明文字，如 'SEARCH r USING INDEX idx_data_repository_created_at (created_at>?)'
+    """
+    return [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+
+
+def plan_problems(plan, tables, allow_sort=False):
+    """
+    找出计划中不允许的步骤
+
+    Args:
+        plan: explain返回的步骤列表
+        tables: 不允许全表扫描的表名或别名
+        allow_sort: 是否允许使用临时B树排序
+
+    Returns:
+        list: 不允许的步骤
+    """
+    problems = []
+    for detail in plan:
+        match = FULL_SCAN_RE.match(detail)
+        if match and match.group(1) in tables:
+            problems.append(detail)
+        elif detail == TEMP_SORT and not allow_sort:
+            problems.append(detail)
+    return problems
+
+
+def check_plan(conn, sql, params, tables, allow_sort=False):
+    """
+    检查查询计划，有不允许的步骤时抛出QueryPlanError
+
+    Returns:
+        list: 查询计划
+    """
+    plan = explain(conn, sql, params)
+    problems = plan_problems(plan, tables, allow_sort)
+    if problems:
+        raise QueryPlanError(f"查询没有使用索引: {'; '.join(problems)}", plan)
+    return plan
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+数据仓库BM25排序 - 智能瞭望数据分析处理系统
+功能: 维护data_repository标题和摘要的词项统计，按BM25计算查询相关性
+
+文本切分为词项：连续汉字切为相邻二字组，连续字母数字作为一个词。
+每条记录的词频、文档长度，以及每个词项的文档频率和全库文档数、总长度都预先存放在SQLite中，
+查询时只读取查询词项的倒排记录计算分数，不再对语料重新分词。
+
+数据表上的触发器只把新增、修改、删除的记录id写入待处理队列
+（触发器中不用INSERT OR IGNORE：外层UPSERT语句的冲突处理会覆盖触发器内的OR IGNORE），
+由sync_ranking在入库事务中（或查询前）增量更新统计，
+因此直接用SQL写入的数据和其他进程写入的数据同样会被计入。
+"""
+
+import logging
+import math
+import re
+import unicodedata
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# BM25参数
+K1 = 1.2
+B = 0.75
+
+# 标题、摘要的词频权重（BM25F）
+FIELD_WEIGHTS = (3.0, 1.0)
+
+# 单条SQL中绑定变量的数量上限
+MAX_SQL_VARIABLES = 900
+
+TERM_RE = re.compile(r'[一-鿿]+|[a-z0-9]+')
+
+RANKING_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS repository_terms (
+        term TEXT PRIMARY KEY,
+        df INTEGER NOT NULL
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS repository_postings (
+        term TEXT NOT NULL,
+        doc_id INTEGER NOT NULL,
+        tf_title INTEGER NOT NULL,
+        tf_summary INTEGER NOT NULL,
+        PRIMARY KEY (term, doc_id)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_repository_postings_doc ON repository_postings (doc_id)
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS repository_doc_stats (
+        doc_id INTEGER PRIMARY KEY,
+        title_len INTEGER NOT NULL,
+        summary_len INTEGER NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS repository_rank_stats (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        doc_count INTEGER NOT NULL,
+        title_len INTEGER NOT NULL,
+        summary_len INTEGER NOT NULL
+    )
+    ''',
+    '''
+    INSERT OR IGNORE INTO repository_rank_stats (id, doc_count, title_len, summary_len) VALUES (1, 0, 0, 0)
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS repository_rank_queue (
+        doc_id INTEGER PRIMARY KEY
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS data_repository_rank_ai AFTER INSERT ON data_repository BEGIN
+        INSERT INTO repository_rank_queue (doc_id) SELECT new.id
+        WHERE NOT EXISTS (SELECT 1 FROM repository_rank_queue WHERE doc_id = new.id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS data_repository_rank_au
+    AFTER UPDATE OF title, summary ON data_repository BEGIN
+        INSERT INTO repository_rank_queue (doc_id) SELECT new.id
+        WHERE NOT EXISTS (SELECT 1 FROM repository_rank_queue WHERE doc_id = new.id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS data_repository_rank_ad AFTER DELETE ON data_repository BEGIN
+        INSERT INTO repository_rank_queue (doc_id) SELECT old.id
+        WHERE NOT EXISTS (SELECT 1 FROM repository_rank_queue WHERE doc_id = old.id);
+    END
+    '''
+]
+
+
+def tokenize(text):
+    """
+    把文本切分为词项
+
+    Returns:
+        list: 词项列表（保留重复，用于统计词频）
+    """
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKC', str(text)).lower()
+    terms = []
+    for run in TERM_RE.findall(text):
+        if run[0].isascii() or len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def query_terms(keyword):
+    """查询关键词的词项（去重，保持顺序）"""
+    return list(dict.fromkeys(tokenize(keyword)))
+
+
+def init_ranking(conn):
+    """
+    创建排序统计表和触发器，首次创建时把已有记录加入待处理队列并建立统计
+
+    Args:
+        conn: 已创建data_repository表的SQLite连接
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='repository_rank_queue'"
+    ).fetchone()
+    for statement in RANKING_SCHEMA:
+        conn.execute(statement)
+    if not exists:
+        conn.execute("INSERT OR IGNORE INTO repository_rank_queue (doc_id) SELECT id FROM data_repository")
+    conn.commit()
+    synced = sync_ranking(conn)
+    if synced and not exists:
+        logger.info(f"已为 {synced} 条记录建立BM25统计")
+
+
+def sync_ranking(conn):
+    """
+    处理待处理队列，增量更新词项统计
+
+    conn已处于事务中时在该事务内完成（入库时与写入一起提交），否则自行开启写事务
+
+    Returns:
+        int: 处理的记录数
+    """
+    if conn.execute("SELECT 1 FROM repository_rank_queue LIMIT 1").fetchone() is None:
+        return 0
+    if conn.in_transaction:
+        return _sync(conn)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        return _sync(conn)
+
+
+def _sync(conn):
+    doc_ids = [row[0] for row in conn.execute("SELECT doc_id FROM repository_rank_queue")]
+    for start in range(0, len(doc_ids), MAX_SQL_VARIABLES):
+        chunk = doc_ids[start:start + MAX_SQL_VARIABLES]
+        placeholders = ','.join('?' * len(chunk))
+
+        # 先扣除这些记录原有的统计
+        df_delta = Counter()
+        for (term,) in conn.execute(f"SELECT term FROM repository_postings WHERE doc_id IN ({placeholders})", chunk):
+            df_delta[term] -= 1
+        old_count, old_title_len, old_summary_len = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(title_len), 0), COALESCE(SUM(summary_len), 0) "
+            f"FROM repository_doc_stats WHERE doc_id IN ({placeholders})", chunk
+        ).fetchone()
+        conn.execute(f"DELETE FROM repository_postings WHERE doc_id IN ({placeholders})", chunk)
+        conn.execute(f"DELETE FROM repository_doc_stats WHERE doc_id IN ({placeholders})", chunk)
+
+        # 再按记录的当前内容重新统计，已删除的记录不再计入
+        postings = []
+        doc_stats = []
+        for doc_id, title, summary in conn.execute(
+            f"SELECT id, title, summary FROM data_repository WHERE id IN ({placeholders})", chunk
+        ):
+            title_tf = Counter(tokenize(title))
+            summary_tf = Counter(tokenize(summary))
+            for term in title_tf.keys() | summary_tf.keys():
+                postings.append((term, doc_id, title_tf[term], summary_tf[term]))
+                df_delta[term] += 1
+            doc_stats.append((doc_id, sum(title_tf.values()), sum(summary_tf.values())))
+
+        conn.executemany(
+            "INSERT INTO repository_postings (term, doc_id, tf_title, tf_summary) VALUES (?, ?, ?, ?)", postings
+        )
+        conn.executemany(
+            "INSERT INTO repository_doc_stats (doc_id, title_len, summary_len) VALUES (?, ?, ?)", doc_stats
+        )
+        conn.executemany(
+            "INSERT INTO repository_terms (term, df) VALUES (?, ?) "
+            "ON CONFLICT (term) DO UPDATE SET df = df + excluded.df",
+            [(term, delta) for term, delta in df_delta.items() if delta]
+        )
+        conn.execute(
+            "UPDATE repository_rank_stats SET doc_count = doc_count + ?, title_len = title_len + ?, "
+            "summary_len = summary_len + ? WHERE id = 1",
+            (len(doc_stats) - old_count,
+             sum(row[1] for row in doc_stats) - old_title_len,
+             sum(row[2] for row in doc_stats) - old_summary_len)
+        )
+        conn.execute(f"DELETE FROM repository_rank_queue WHERE doc_id IN ({placeholders})", chunk)
+    conn.execute("DELETE FROM repository_terms WHERE df <= 0")
+    return len(doc_ids)
+
+
+def idf(doc_count, df):
+    """BM25的逆文档频率（非负形式）"""
+    return math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+
+
+def bm25_query(conn, keyword):
+    """
+    生成按BM25计算分数的子查询
+
+    Args:
+        conn: SQLite连接，查询前先处理待处理队列
+        keyword: 查询关键词
+
+    Returns:
+        tuple: (WITH子句, 子查询SQL, 参数列表)，子查询返回 (doc_id, score)；
+            关键词没有任何已索引的词项时返回None
+    """
+    sync_ranking(conn)
+    terms = query_terms(keyword)
+    if not terms:
+        return None
+    doc_count, title_len, summary_len = conn.execute(
+        "SELECT doc_count, title_len, summary_len FROM repository_rank_stats WHERE id = 1"
+    ).fetchone()
+    if not doc_count:
+        return None
+    dfs = {}
+    for start in range(0, len(terms), MAX_SQL_VARIABLES):
+        chunk = terms[start:start + MAX_SQL_VARIABLES]
+        dfs.update(conn.execute(
+            f"SELECT term, df FROM repository_terms WHERE term IN ({','.join('?' * len(chunk))})", chunk
+        ).fetchall())
+    weights = [(term, idf(doc_count, dfs[term])) for term in terms if term in dfs]
+    if not weights:
+        return None
+
+    title_weight, summary_weight = FIELD_WEIGHTS
+    avgdl = (title_weight * title_len + summary_weight * summary_len) / doc_count or 1.0
+    tf = f"({title_weight} * p.tf_title + {summary_weight} * p.tf_summary)"
+    dl = f"({title_weight} * d.title_len + {summary_weight} * d.summary_len)"
+    with_clause = "WITH bm25_terms(term, idf) AS (VALUES " + ', '.join('(?, ?)' for _ in weights) + ")"
+    subquery = (
+        f"SELECT p.doc_id AS doc_id, SUM(q.idf * {tf} * {K1 + 1} / ({tf} + {K1} * (1 - {B} + {B} * {dl} / ?))) AS score "
+        "FROM bm25_terms q JOIN repository_postings p ON p.term = q.term "
+        "JOIN repository_doc_stats d ON d.doc_id = p.doc_id GROUP BY p.doc_id"
+    )
+    params = [value for pair in weights for value in pair] + [avgdl]
+    return with_clause, subquery, params
+
+
+def rank_stats(conn):
+    """返回排序统计概况：文档数、词项数、平均标题和摘要长度、待处理记录数"""
+    doc_count, title_len, summary_len = conn.execute(
+        "SELECT doc_count, title_len, summary_len FROM repository_rank_stats WHERE id = 1"
+    ).fetchone()
+    return {
+        'doc_count': doc_count,
+        'term_count': conn.execute("SELECT COUNT(*) FROM repository_terms").fetchone()[0],
+        'avg_title_len': round(title_len / doc_count, 2) if doc_count else 0,
+        'avg_summary_len': round(summary_len / doc_count, 2) if doc_count else 0,
+        'pending': conn.execute("SELECT COUNT(*) FROM repository_rank_queue").fetchone()[0]
+    }
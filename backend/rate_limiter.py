@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+按主机划分的令牌桶限速器 - 智能瞭望数据分析处理系统
+功能: 让所有爬虫实例（包括多个gunicorn工作进程）共享同一份请求速率预算
+
+- MemoryBackend: 进程内共享，适用于单进程部署和测试
+- SqliteBackend: 状态保存在SQLite文件中，多个工作进程共享
+检测到验证码时按乘法降低该主机的速率并进入冷却期，之后每次成功请求按加法恢复（AIMD）。
+异步方法（aacquire、areport_captcha、areport_success）把SqliteBackend的事务放到线程池中执行，
+其他进程持有文件锁时只等待当前协程，不阻塞事件循环中的其他请求。
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 默认限速配置
+DEFAULT_RATE = 0.5          # 每秒令牌数（请求数）
+DEFAULT_BURST = 2           # 令牌桶容量
+DEFAULT_MIN_RATE = 0.05     # 退避后的最低速率
+DEFAULT_COOLDOWN = 30.0     # 首次检测到验证码后的冷却时间（秒）
+MAX_COOLDOWN = 600.0        # 冷却时间上限（秒）
+RATE_LIMIT_DB = os.path.join(BASE_DIR, 'rate_limit.db')
+
+
+class MemoryBackend:
+    """进程内状态存储"""
+
+    # 事务只占用进程内锁，异步调用时直接在事件循环中执行
+    blocking = False
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def transaction(self, host):
+        """加锁读取host的状态，退出时写回"""
+        with self._lock:
+            state = self._states.get(host)
+            state = dict(state) if state else None
+            holder = {'state': state}
+            yield holder
+            if holder['state'] is not None:
+                self._states[host] = holder['state']
+
+
+class SqliteBackend:
+    """
+    基于SQLite文件的跨进程状态存储
+
+    每次预约都在BEGIN IMMEDIATE事务中完成读-改-写，
+    由SQLite的文件锁保证多个进程之间的原子性。
+    """
+
+    # 等待文件锁最长可达timeout秒，异步调用时在线程池中执行
+    blocking = True
+
+    def __init__(self, path=RATE_LIMIT_DB):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS rate_limit_state (
+            host TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            rate REAL NOT NULL,
+            blocked_until REAL NOT NULL,
+            strikes INTEGER NOT NULL
+        )
+        ''')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def transaction(self, host):
+        """在写事务中读取host的状态，退出时写回"""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated_at, rate, blocked_until, strikes FROM rate_limit_state WHERE host=?",
+                (host,)
+            ).fetchone()
+            state = None
+            if row:
+                state = dict(zip(('tokens', 'updated_at', 'rate', 'blocked_until', 'strikes'), row))
+            holder = {'state': state}
+            yield holder
+            state = holder['state']
+            if state is not None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO rate_limit_state (host, tokens, updated_at, rate, blocked_until, strikes) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (host, state['tokens'], state['updated_at'], state['rate'], state['blocked_until'], state['strikes'])
+                )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+
+class TokenBucketLimiter:
+    """
+    按主机划分的令牌桶限速器
+
+    Args:
+        backend: 状态存储（MemoryBackend或SqliteBackend）
+        rate: 每个主机的最大速率（请求/秒）
+        burst: 令牌桶容量，允许的突发请求数
+        min_rate: 验证码退避后的最低速率
+        backoff_factor: 每次检测到验证码时速率乘以的系数
+        recovery_step: 每次成功请求后速率增加的量，默认为rate的十分之一
+        cooldown: 首次检测到验证码后的冷却时间，连续触发时翻倍
+    """
+
+    def __init__(self, backend=None, rate=DEFAULT_RATE, burst=DEFAULT_BURST, min_rate=DEFAULT_MIN_RATE,
+                 backoff_factor=0.5, recovery_step=None, cooldown=DEFAULT_COOLDOWN):
+        if rate <= 0:
+            raise ValueError("rate必须大于0")
+        self.backend = backend or MemoryBackend()
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min(min_rate, rate)
+        self.backoff_factor = backoff_factor
+        self.recovery_step = recovery_step if recovery_step is not None else rate / 10
+        self.cooldown = cooldown
+
+    def _initial_state(self, now):
+        return {'tokens': float(self.burst), 'updated_at': now, 'rate': self.rate, 'blocked_until': 0.0, 'strikes': 0}
+
+    def reserve(self, host):
+        """
+        预约一个令牌
+
+        令牌数允许为负，表示已排队的预约；调用方按返回值等待后即可发送请求。
+        updated_at可能在未来（冷却结束时刻），此前不积累令牌，排队的预约从冷却结束起按速率依次错开。
+
+        Returns:
+            float: 需要等待的秒数
+        """
+        now = time.time()
+        with self.backend.transaction(host) as holder:
+            state = holder['state'] or self._initial_state(now)
+            rate = state['rate']
+            start = max(now, state['updated_at'])
+            elapsed = now - state['updated_at'] if now > state['updated_at'] else 0.0
+            tokens = min(float(self.burst), state['tokens'] + elapsed * rate) - 1
+            state['tokens'] = tokens
+            state['updated_at'] = start
+            holder['state'] = state
+
+            wait = start - now + (-tokens / rate if tokens < 0 else 0.0)
+            return max(wait, state['blocked_until'] - now)
+
+    def acquire(self, host):
+        """阻塞直到可以向host发送请求"""
+        wait = self.reserve(host)
+        if wait > 0:
+            logger.info(f"限速等待 {wait:.2f} 秒: {host}")
+            time.sleep(wait)
+        return wait
+
+    async def _call(self, method, host):
+        """在事件循环中调用会访问后端的方法，后端可能阻塞时放到线程池中执行"""
+        if getattr(self.backend, 'blocking', True):
+            return await asyncio.to_thread(method, host)
+        return method(host)
+
+    async def aacquire(self, host):
+        """acquire的非阻塞版本"""
+        wait = await self._call(self.reserve, host)
+        if wait > 0:
+            logger.info(f"限速等待 {wait:.2f} 秒: {host}")
+            await asyncio.sleep(wait)
+        return wait
+
+    def report_captcha(self, host):
+        """检测到验证码：速率乘法退避，并进入指数增长的冷却期"""
+        now = time.time()
+        with self.backend.transaction(host) as holder:
+            state = holder['state'] or self._initial_state(now)
+            state['strikes'] += 1
+            state['rate'] = max(self.min_rate, state['rate'] * self.backoff_factor)
+            cooldown = min(MAX_COOLDOWN, self.cooldown * 2 ** (state['strikes'] - 1))
+            state['blocked_until'] = max(state['blocked_until'], now + cooldown)
+            # 清空令牌，冷却期间不积累，冷却结束后按新速率重新积累
+            state['tokens'] = min(state['tokens'], 0.0)
+            state['updated_at'] = max(state['updated_at'], state['blocked_until'])
+            holder['state'] = state
+            logger.warning(f"{host} 触发验证码，速率降至 {state['rate']:.3f}/s，冷却 {cooldown:.0f} 秒")
+
+    async def areport_captcha(self, host):
+        """report_captcha的非阻塞版本"""
+        await self._call(self.report_captcha, host)
+
+    async def areport_success(self, host):
+        """report_success的非阻塞版本"""
+        await self._call(self.report_success, host)
+
+    def report_success(self, host):
+        """请求成功：速率按加法逐步恢复到上限"""
+        now = time.time()
+        with self.backend.transaction(host) as holder:
+            state = holder['state']
+            if state is None or (state['strikes'] == 0 and state['rate'] >= self.rate):
+                return
+            state['strikes'] = 0
+            state['rate'] = min(self.rate, state['rate'] + self.recovery_step)
+            holder['state'] = state
+
+    def current_rate(self, host):
+        """返回host当前的允许速率"""
+        with self.backend.transaction(host) as holder:
+            state = holder['state']
+            return state['rate'] if state else self.rate
+
+
+_default_limiter = None
+_default_lock = threading.Lock()
+
+
+def get_limiter():
+    """
+    获取所有爬虫共享的默认限速器
+
+    默认使用SQLite后端，使多个工作进程共享同一份速率预算；
+    环境变量SPIDER_RATE_LIMIT_BACKEND=memory时改用进程内后端。
+    """
+    global _default_limiter
+    with _default_lock:
+        if _default_limiter is None:
+            if os.environ.get('SPIDER_RATE_LIMIT_BACKEND', 'sqlite') == 'memory':
+                backend = MemoryBackend()
+            else:
+                backend = SqliteBackend(os.environ.get('SPIDER_RATE_LIMIT_DB', RATE_LIMIT_DB))
+            rate = float(os.environ.get('SPIDER_RATE_LIMIT', DEFAULT_RATE))
+            _default_limiter = TokenBucketLimiter(backend, rate=rate)
+        return _default_limiter
@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PDF报告 - 智能瞭望数据分析处理系统
+功能: 按关键词和时间范围查询数据仓库，生成PDF简报；后台线程生成完整报告并缓存，预览只生成前几页
+
+记录按入库时间倒序从游标逐行读取，排版满一页即由pdf_writer写出，内存占用与报告页数无关。
+报告文件以查询条件的指纹加数据仓库修改版本号（repository.repository_watermark）命名，
+数据仓库没有变化时相同条件的报告直接使用缓存文件，有新增、删除或修改时版本号变化，重新生成。
+提交时的版本号只用于查找缓存和任务去重，生成时在读事务中重新读取版本号并以此命名文件，
+提交后数据仓库发生变化时任务的key随之更新，按提交时的编号仍能查到该任务。
+预览在请求线程中生成，读到指定页数即停止读取游标。
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+
+from crawl_jobs import ACTIVE_STATUSES, DONE, FAILED, QUEUED, RUNNING
+from export import iter_rows
+from pdf_writer import A4, PdfWriter, char_width
+from repository import count_repository, repository_watermark
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 报告缓存目录
+REPORT_DIR = os.environ.get('REPORT_DIR', os.path.join(BASE_DIR, 'reports'))
+
+# 缓存的报告文件数上限，超出时删除最早生成的
+MAX_REPORTS = 50
+
+# 预览的默认页数和最大页数
+PREVIEW_PAGES = 2
+MAX_PREVIEW_PAGES = 10
+
+# 排版变化时递增，使旧版缓存失效
+REPORT_VERSION = 1
+
+# 版面（点）
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN = 50
+FOOTER_Y = 30
+CONTENT_WIDTH = PAGE_WIDTH - 2 * MARGIN
+
+# 字号和行距倍数
+TITLE_SIZE = 18
+HEADING_SIZE = 11.5
+BODY_SIZE = 10
+META_SIZE = 8.5
+LEADING = 1.45
+RECORD_GAP = 8
+
+# 每条记录的URL和摘要最多显示的行数
+MAX_URL_LINES = 2
+MAX_SUMMARY_LINES = 12
+
+BLACK = (0, 0, 0)
+GRAY = (0.4, 0.4, 0.4)
+LINK = (0.1, 0.3, 0.7)
+
+# 报告文件名: 20位指纹-修改版本号
+KEY_RE = re.compile(r'^[0-9a-f]{20}-\d+$')
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def report_query(keyword='', date_from='', date_to='', search_keyword=''):
+    """整理报告的查询条件"""
+    return {
+        'keyword': (keyword or '').strip(),
+        'date_from': (date_from or '').strip(),
+        'date_to': (date_to or '').strip(),
+        'search_keyword': (search_keyword or '').strip(),
+    }
+
+
+def fingerprint(query):
+    """查询条件的指纹，与排版版本一起计算"""
+    payload = json.dumps([REPORT_VERSION, query['keyword'], query['date_from'], query['date_to'],
+                          query['search_keyword']], ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:20]
+
+
+def wrap_text(text, size, width=CONTENT_WIDTH, max_lines=None):
+    """
+    按宽度折行，中文逐字折行，超出max_lines时最后一行以省略号结尾
+
+    Returns:
+        list: 各行文字
+    """
+    limit = width * 1000 / size
+    lines = []
+    line = []
+    used = 0
+    for char in text:
+        w = char_width(char)
+        if line and used + w > limit:
+            lines.append(''.join(line))
+            if max_lines and len(lines) == max_lines:
+                lines[-1] = lines[-1][:-1] + '…'
+                return lines
+            line = []
+            used = 0
+        line.append(char)
+        used += w
+    if line:
+        lines.append(''.join(line))
+    return lines
+
+
+def _clean(text):
+    return WHITESPACE_RE.sub(' ', text or '').strip()
+
+
+class _Layout:
+    """自上而下排版，放不下时换页，每页写完立即交给PdfWriter"""
+
+    def __init__(self, writer, title, max_pages=None):
+        self.writer = writer
+        self.title = title
+        self.max_pages = max_pages
+        self.page = None
+        self.empty = True
+        self.y = 0
+
+    @property
+    def full(self):
+        return self.max_pages is not None and self.writer.page_count >= self.max_pages
+
+    def _start_page(self):
+        self.page = self.writer.new_page()
+        self.empty = True
+        self.y = PAGE_HEIGHT - MARGIN
+
+    def finish_page(self):
+        if self.page is None:
+            return
+        number = f'第 {self.writer.page_count + 1} 页'
+        if self.max_pages is not None:
+            number += '（预览）'
+        self.page.text(MARGIN, FOOTER_Y, self.title, META_SIZE, GRAY)
+        self.page.text(PAGE_WIDTH - MARGIN - sum(char_width(c) for c in number) * META_SIZE / 1000,
+                       FOOTER_Y, number, META_SIZE, GRAY)
+        self.writer.add_page(self.page)
+        self.page = None
+
+    def block(self, lines, gap=0):
+        """
+        放置一组行 (文字, 字号, 颜色)，尽量不跨页
+
+        Returns:
+            bool: 达到max_pages而未能放置时为False
+        """
+        height = sum(size * LEADING for _, size, _ in lines)
+        if self.page is not None and not self.empty and self.y - height < MARGIN:
+            self.finish_page()
+        for text, size, color in lines:
+            if self.page is not None and self.y - size * LEADING < MARGIN:
+                self.finish_page()
+            if self.page is None:
+                if self.full:
+                    return False
+                self._start_page()
+            self.y -= size * LEADING
+            self.page.text(MARGIN, self.y, text, size, color)
+            self.empty = False
+        self.y -= gap
+        return True
+
+    def rule(self, gap=10):
+        """在当前位置画一条横线"""
+        if self.page is not None:
+            self.y -= gap / 2
+            self.page.line(MARGIN, self.y, PAGE_WIDTH - MARGIN, self.y)
+            self.y -= gap / 2
+
+
+def _record_lines(number, row):
+    _, title, url, summary, search_keyword, created_at = row
+    lines = [(text, HEADING_SIZE, BLACK) for text in wrap_text(f'{number}. {_clean(title)}', HEADING_SIZE)]
+    lines.append((f'{created_at or ""}    搜索关键词: {_clean(search_keyword)}', META_SIZE, GRAY))
+    lines.extend((text, META_SIZE, LINK) for text in wrap_text(_clean(url), META_SIZE, max_lines=MAX_URL_LINES))
+    lines.extend((text, BODY_SIZE, BLACK)
+                 for text in wrap_text(_clean(summary), BODY_SIZE, max_lines=MAX_SUMMARY_LINES))
+    return lines
+
+
+def render_report(rows, sink, query, total=None, watermark=None, max_pages=None, generated_at=None):
+    """
+    把记录逐页排版写入PDF
+
+    Args:
+        rows: 行迭代器，逐行返回 (id, title, url, summary, search_keyword, created_at)，结束或中止时关闭
+        sink: 可写的二进制文件对象
+        query: report_query返回的查询条件，显示在首页
+        total: 符合条件的记录总数，显示在首页
+        watermark: 数据仓库修改版本号，显示在首页
+        max_pages: 最多生成的页数，达到后停止读取记录（预览）
+        generated_at: 生成时间，默认为当前时间
+
+    Returns:
+        dict: pages（页数）、rows（写入的记录数）、truncated（是否因max_pages截断）
+    """
+    title = '数据仓库报告'
+    writer = PdfWriter(sink, title=title)
+    layout = _Layout(writer, title, max_pages)
+    count = 0
+    truncated = False
+    try:
+        conditions = [
+            ('查询关键词', query['keyword'] or '全部'),
+            ('搜索关键词', query['search_keyword'] or '全部'),
+            ('时间范围', f"{query['date_from'] or '不限'} 至 {query['date_to'] or '不限'}"),
+        ]
+        if total is not None:
+            conditions.append(('记录数', str(total)))
+        conditions.append(('生成时间', generated_at or time.strftime('%Y-%m-%d %H:%M:%S')))
+        if watermark is not None:
+            conditions.append(('数据版本', str(watermark)))
+        layout.block([(title, TITLE_SIZE, BLACK)], gap=6)
+        layout.block([(f'{name}: {value}', BODY_SIZE, GRAY) for name, value in conditions])
+        layout.rule()
+
+        for row in rows:
+            if not layout.block(_record_lines(count + 1, row), gap=RECORD_GAP):
+                truncated = True
+                break
+            count += 1
+        if not count and not truncated:
+            layout.block([('没有符合条件的记录', BODY_SIZE, GRAY)])
+        layout.finish_page()
+        writer.close()
+    finally:
+        rows.close()
+    return {'pages': writer.page_count, 'rows': count, 'truncated': truncated}
+
+
+class ReportService:
+    """
+    报告的后台生成与缓存
+
+    Args:
+        db_pool: db.ConnectionPool，后台线程使用本线程的连接
+        report_dir: 报告缓存目录
+        archive: partitions.RepositoryArchive，传入时报告包含相关归档分区中的记录
+        max_reports: 缓存的报告文件数上限
+    """
+
+    def __init__(self, db_pool, report_dir=REPORT_DIR, archive=None, max_reports=MAX_REPORTS):
+        self.db_pool = db_pool
+        self.report_dir = report_dir
+        self.archive = archive
+        self.max_reports = max_reports
+        self._jobs = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def key(self, conn, query):
+        """报告的缓存键: 查询指纹-数据仓库修改版本号"""
+        return f'{fingerprint(query)}-{repository_watermark(conn)}'
+
+    def path(self, key):
+        """报告文件路径，key格式不正确时抛出ValueError"""
+        if not KEY_RE.match(key or ''):
+            raise ValueError(f'无效的报告编号: {key}')
+        return os.path.join(self.report_dir, key + '.pdf')
+
+    def render(self, conn, query, sink, max_pages=None):
+        """按查询条件生成报告写入sink，返回render_report的结果"""
+        total = count_repository(conn, query['keyword'], query['date_from'], query['date_to'],
+                                 query['search_keyword'], archive=self.archive)
+        rows = iter_rows(conn, query['keyword'], query['date_from'], query['date_to'], query['search_keyword'],
+                         self.archive)
+        return render_report(rows, sink, query, total, repository_watermark(conn), max_pages)
+
+    def preview(self, conn, query, pages=PREVIEW_PAGES):
+        """
+        生成报告的前几页
+
+        Returns:
+            bytes: PDF内容
+        """
+        pages = max(1, min(int(pages), MAX_PREVIEW_PAGES))
+        output = io.BytesIO()
+        self.render(conn, query, output, max_pages=pages)
+        return output.getvalue()
+
+    def submit(self, query):
+        """
+        提交报告生成任务
+
+        Returns:
+            tuple: (报告信息字典, 是否新建任务)；已有缓存或相同报告正在生成时不新建
+        """
+        key = self.key(self.db_pool.connect(), query)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job['status'] in ACTIVE_STATUSES:
+                return dict(job), False
+            if os.path.exists(self.path(key)):
+                return self._cached(key, job), False
+            job = {
+                'key': key,
+                'status': QUEUED,
+                'query': query,
+                'pages': None,
+                'rows': None,
+                'error': None,
+                'created_at': time.time(),
+                'finished_at': None,
+            }
+            self._jobs[key] = job
+            report = dict(job)
+        self.start()
+        self._queue.put(key)
+        logger.info(f"提交报告任务 {key}: {query}")
+        return report, True
+
+    def get(self, key):
+        """查询报告状态，报告不存在时返回None；返回值中的key是报告文件实际的编号"""
+        path = self.path(key)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None:
+                if job['status'] != DONE:
+                    return dict(job)
+                path = self.path(job['key'])
+        if os.path.exists(path):
+            return self._cached(key, job)
+        return None
+
+    def _cached(self, key, job):
+        report = dict(job) if job is not None else {'key': key}
+        report['status'] = DONE
+        return report
+
+    def start(self):
+        """启动后台线程（重复调用无副作用）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='reports', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """停止后台线程，正在生成的报告完成后退出"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                key = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            self.run(key)
+
+    def run(self, key):
+        """
+        生成一份已提交的报告，先写入临时文件，完成后改名
+
+        文件按读事务中的版本号命名：提交后数据仓库发生变化时，报告内容和文件名都对应生成时的数据，
+        任务的key更新为实际的编号，并同时登记在两个编号下
+        """
+        with self._lock:
+            job = self._jobs[key]
+            job['status'] = RUNNING
+        partial = None
+        start = time.perf_counter()
+        conn = self.db_pool.connect()
+        try:
+            os.makedirs(self.report_dir, exist_ok=True)
+            # 版本号、统计和记录在同一个读事务中读取，生成期间的入库不影响报告内容
+            conn.execute("BEGIN")
+            try:
+                actual = self.key(conn, job['query'])
+                path = self.path(actual)
+                partial = path + '.part'
+                with open(partial, 'wb') as output:
+                    result = self.render(conn, job['query'], output)
+            finally:
+                conn.rollback()
+            os.replace(partial, path)
+        except Exception as e:
+            logger.exception(f"报告 {key} 生成失败")
+            if partial and os.path.exists(partial):
+                os.remove(partial)
+            with self._lock:
+                job.update(status=FAILED, error=str(e), finished_at=time.time())
+            return
+        if actual != key:
+            logger.info(f"报告 {key} 提交后数据仓库已变化，按当前数据生成为 {actual}")
+        with self._lock:
+            job.update(key=actual, status=DONE, pages=result['pages'], rows=result['rows'], finished_at=time.time())
+            self._jobs[actual] = job
+        logger.info(f"报告 {actual} 生成完成: {result['pages']} 页，{result['rows']} 条记录，"
+                    f"耗时 {time.perf_counter() - start:.2f}s")
+        self._prune(actual)
+
+    def _prune(self, key):
+        """删除同一查询的旧版本报告，以及超出数量上限的最早报告"""
+        current = fingerprint(self._jobs[key]['query'])
+        files = []
+        for name in os.listdir(self.report_dir):
+            stem, ext = os.path.splitext(name)
+            if ext != '.pdf' or not KEY_RE.match(stem) or stem == key:
+                continue
+            path = os.path.join(self.report_dir, name)
+            if stem.startswith(current + '-'):
+                os.remove(path)
+            else:
+                files.append((os.path.getmtime(path), stem, path))
+        files.sort(reverse=True)
+        removed = set()
+        for _, stem, path in files[max(self.max_reports - 1, 0):]:
+            os.remove(path)
+            removed.add(stem)
+        with self._lock:
+            for stem in list(self._jobs):
+                if self._jobs[stem] is not self._jobs[key] and (stem.startswith(current + '-') or stem in removed) \
+                        and self._jobs[stem]['status'] not in ACTIVE_STATUSES:
+                    del self._jobs[stem]
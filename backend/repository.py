@@ -0,0 +1,622 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+数据仓库存储层 - 智能瞭望数据分析处理系统
+功能: data_repository表的建表、批量入库、全文索引与查询
+
+全文索引使用FTS5外部内容表，以data_repository为内容来源，由触发器保持同步；
+分词器使用trigram，按三字滑动窗口切分，中文无需分词即可做子串检索。
+trigram无法检索少于三个字符的词，这类词退回到LIKE条件。
+相关性排序使用ranking模块维护的BM25统计（标题和摘要），两字的中文词同样可以参与排序。
+
+入库以规范化URL为唯一键：同一批次的结果用executemany在一个事务中写入，
+已存在的URL只更新摘要、搜索关键词并累加seen_count，不再重复插入。
+归档到分区文件的记录在archived_urls中保留规范化URL和标题（partitions模块在归档的删除事务中写入），
+这些URL再次入库时跳过，不在data_repository中产生重复记录。
+
+表结构变更登记在REPOSITORY_MIGRATIONS中，由migrations模块在初始化时按顺序执行一次。
+按时间的查询使用created_at索引和 (search_keyword, created_at) 索引，查询执行前用EXPLAIN QUERY PLAN
+确认走了预期的索引，需要全表扫描或整表排序时抛出query_plan.QueryPlanError。
+数据表的每次插入、删除和内容修改由触发器累加repository_watermark中的版本号，用作派生数据（如报告缓存）的失效标记。
+"""
+
+import base64
+import json
+import logging
+import urllib.parse
+
+from migrations import apply_migrations
+from query_plan import check_plan
+from ranking import bm25_query, init_ranking, query_terms, sync_ranking
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'data_repository_fts'
+
+# trigram分词器可检索的最短词长
+MIN_FTS_TERM_LENGTH = 3
+
+DATA_REPOSITORY_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS data_repository (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    url TEXT NOT NULL,
+    summary TEXT,
+    search_keyword TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    normalized_url TEXT,
+    seen_count INTEGER NOT NULL DEFAULT 1
+)
+'''
+
+NORMALIZED_URL_INDEX = '''
+CREATE UNIQUE INDEX IF NOT EXISTS idx_data_repository_normalized_url
+ON data_repository (normalized_url)
+'''
+
+# 时间范围查询和按时间倒序的分页；索引项末尾隐含rowid，因此同时覆盖 ORDER BY created_at, id
+CREATED_AT_INDEX = '''
+CREATE INDEX IF NOT EXISTS idx_data_repository_created_at
+ON data_repository (created_at)
+'''
+
+# 按搜索关键词查询某段时间内的结果（关键词监测、报告）
+KEYWORD_CREATED_AT_INDEX = '''
+CREATE INDEX IF NOT EXISTS idx_data_repository_keyword_created_at
+ON data_repository (search_keyword, created_at)
+'''
+
+# 已归档记录的规范化URL和标题，用于入库去重和近似重复检查
+ARCHIVED_URLS_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS archived_urls (
+    normalized_url TEXT PRIMARY KEY,
+    id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    month TEXT NOT NULL
+)
+'''
+
+# 修改版本号，单行表；触发器在同一事务中更新，回滚时一并撤销，内容未变的更新（重复入库）不计入
+WATERMARK_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS repository_watermark (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL,
+        modified_at TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS data_repository_watermark_ai AFTER INSERT ON data_repository BEGIN
+        UPDATE repository_watermark SET version = version + 1, modified_at = CURRENT_TIMESTAMP WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS data_repository_watermark_au
+    AFTER UPDATE OF title, url, summary, search_keyword, created_at ON data_repository
+    WHEN old.title IS NOT new.title OR old.url IS NOT new.url OR old.summary IS NOT new.summary
+        OR old.search_keyword IS NOT new.search_keyword OR old.created_at IS NOT new.created_at
+    BEGIN
+        UPDATE repository_watermark SET version = version + 1, modified_at = CURRENT_TIMESTAMP WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS data_repository_watermark_ad AFTER DELETE ON data_repository BEGIN
+        UPDATE repository_watermark SET version = version + 1, modified_at = CURRENT_TIMESTAMP WHERE id = 1;
+    END
+    '''
+]
+
+UPSERT_SQL = '''
+INSERT INTO data_repository (title, url, normalized_url, summary, search_keyword, seen_count)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (normalized_url) DO UPDATE SET
+    summary = CASE WHEN excluded.summary != '' THEN excluded.summary ELSE data_repository.summary END,
+    search_keyword = excluded.search_keyword,
+    seen_count = data_repository.seen_count + excluded.seen_count
+'''
+
+# URL中不影响页面内容的跟踪参数
+TRACKING_PARAMS = ('utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content', 'spm', 'from')
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# 单条SQL中绑定变量的数量上限（SQLite旧版本默认999）
+MAX_SQL_VARIABLES = 900
+
+FTS_SCHEMA = [
+    f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, summary, search_keyword,
+        content='data_repository', content_rowid='id',
+        tokenize='trigram'
+    )
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS data_repository_fts_ai AFTER INSERT ON data_repository BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, summary, search_keyword)
+        VALUES (new.id, new.title, new.summary, new.search_keyword);
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS data_repository_fts_ad AFTER DELETE ON data_repository BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, summary, search_keyword)
+        VALUES ('delete', old.id, old.title, old.summary, old.search_keyword);
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS data_repository_fts_au
+    AFTER UPDATE OF title, summary, search_keyword ON data_repository BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, summary, search_keyword)
+        VALUES ('delete', old.id, old.title, old.summary, old.search_keyword);
+        INSERT INTO {FTS_TABLE}(rowid, title, summary, search_keyword)
+        VALUES (new.id, new.title, new.summary, new.search_keyword);
+    END
+    '''
+]
+
+REPOSITORY_COLUMNS = 'r.id, r.title, r.url, r.summary, r.search_keyword, r.created_at'
+REPOSITORY_FIELDS = ('id', 'title', 'url', 'summary', 'search_keyword', 'created_at')
+
+# 分页查询的默认和最大每页条数
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# 查询的访问路径
+ACCESS_FTS = 'fts'
+ACCESS_KEYWORD_DATE = 'keyword_date'
+ACCESS_DATE = 'date'
+# 只有少于三个字的词且不按时间排序：LIKE无法使用索引，只能扫描全表
+ACCESS_SCAN = 'scan'
+
+# 查询计划检查中不允许全表扫描的表（含别名）
+REPOSITORY_TABLES = ('r', 'data_repository')
+
+# 是否在执行查询前检查查询计划
+CHECK_QUERY_PLANS = True
+
+
+def init_repository(conn):
+    """创建数据仓库表，执行结构迁移，创建全文索引和BM25统计"""
+    conn.execute(DATA_REPOSITORY_SCHEMA)
+    apply_migrations(conn, REPOSITORY_MIGRATIONS)
+    init_fts(conn)
+    init_ranking(conn)
+
+
+def _add_upsert_columns(conn):
+    """为旧版数据表补充normalized_url和seen_count列并创建唯一索引"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(data_repository)")}
+    if 'seen_count' not in columns:
+        conn.execute("ALTER TABLE data_repository ADD COLUMN seen_count INTEGER NOT NULL DEFAULT 1")
+    if 'normalized_url' not in columns:
+        conn.execute("ALTER TABLE data_repository ADD COLUMN normalized_url TEXT")
+        # 已有的重复URL只有最早的一条登记规范化URL，其余保持NULL，不删除历史数据
+        seen = set()
+        updates = []
+        for row_id, url in conn.execute("SELECT id, url FROM data_repository ORDER BY id"):
+            normalized = normalize_url(url)
+            if normalized and normalized not in seen:
+                seen.add(normalized)
+                updates.append((normalized, row_id))
+        conn.executemany("UPDATE data_repository SET normalized_url = ? WHERE id = ?", updates)
+        logger.info(f"已为 {len(updates)} 条记录补充规范化URL")
+    conn.execute(NORMALIZED_URL_INDEX)
+
+
+def _add_date_indexes(conn):
+    """创建按时间查询的索引"""
+    conn.execute(CREATED_AT_INDEX)
+    conn.execute(KEYWORD_CREATED_AT_INDEX)
+
+
+def _add_watermark(conn):
+    """创建修改版本号表和维护版本号的触发器"""
+    for statement in WATERMARK_SCHEMA:
+        conn.execute(statement)
+    conn.execute("INSERT OR IGNORE INTO repository_watermark (id, version) VALUES (1, 0)")
+
+
+def _add_archived_urls(conn):
+    """创建已归档URL表"""
+    conn.execute(ARCHIVED_URLS_SCHEMA)
+
+
+# 数据仓库的结构迁移，按顺序执行，已发布的迁移不再修改
+REPOSITORY_MIGRATIONS = [
+    ('repository_0001_upsert_columns', _add_upsert_columns),
+    ('repository_0002_date_indexes', _add_date_indexes),
+    ('repository_0003_watermark', _add_watermark),
+    ('repository_0004_archived_urls', _add_archived_urls),
+]
+
+
+def repository_watermark(conn):
+    """
+    数据仓库的修改版本号
+
+    Returns:
+        int: 每插入、删除或修改（标题、URL、摘要、搜索关键词、入库时间）一条记录加1；
+             内容不变的重复入库不改变版本号
+    """
+    row = conn.execute("SELECT version FROM repository_watermark WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+
+def normalize_url(url):
+    """
+    规范化URL，作为数据仓库的去重键
+
+    协议和域名转为小写，去掉默认端口、片段、跟踪参数和路径末尾的斜杠，查询参数按名称排序
+
+    Returns:
+        str: 规范化后的URL，无法解析时返回去除空白后的原URL
+    """
+    url = (url or '').strip()
+    if not url:
+        return ''
+    try:
+        parts = urllib.parse.urlsplit(url)
+        scheme = parts.scheme.lower()
+        host = (parts.hostname or '').lower()
+        port = parts.port
+    except ValueError:
+        return url
+    if not host:
+        return url
+    netloc = host if port is None or DEFAULT_PORTS.get(scheme) == port else f'{host}:{port}'
+    path = parts.path.rstrip('/') if parts.path not in ('', '/') else ''
+    query = urllib.parse.urlencode(sorted(
+        (name, value) for name, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        if name.lower() not in TRACKING_PARAMS
+    ))
+    return urllib.parse.urlunsplit((scheme, netloc, path, query, ''))
+
+
+def upsert_results(conn, results, keyword):
+    """
+    批量写入搜索结果，按规范化URL插入或更新
+
+    整批结果在一个事务中用executemany写入；同一批次中URL相同的结果合并为一条，
+    seen_count按出现次数累加。新增和更新记录的BM25统计在同一事务中更新。
+    已归档的URL跳过，归档文件只读，原记录保持不变
+
+    Args:
+        conn: SQLite连接
+        results: SearchResult列表
+        keyword: 搜索关键词
+
+    Returns:
+        dict: inserted（新增条数）、updated（更新条数）、archived（已归档而跳过的条数）
+    """
+    merged = {}
+    for item in results:
+        normalized = normalize_url(item.url)
+        if not normalized:
+            continue
+        if normalized in merged:
+            row = merged[normalized]
+            row[3] = item.summary or row[3]
+            row[5] += 1
+        else:
+            merged[normalized] = [item.title, item.url, normalized, item.summary or '', keyword, 1]
+    if not merged:
+        return {'inserted': 0, 'updated': 0, 'archived': 0}
+
+    keys = list(merged)
+    existing = 0
+    archived = 0
+    with conn:
+        # 立即获取写锁，保证统计的已有条数与随后的写入一致
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        for start in range(0, len(keys), MAX_SQL_VARIABLES):
+            chunk = keys[start:start + MAX_SQL_VARIABLES]
+            placeholders = ','.join('?' * len(chunk))
+            existing += conn.execute(
+                f"SELECT COUNT(*) FROM data_repository WHERE normalized_url IN ({placeholders})", chunk
+            ).fetchone()[0]
+            for (normalized,) in conn.execute(
+                    f"SELECT normalized_url FROM archived_urls WHERE normalized_url IN ({placeholders})", chunk
+            ).fetchall():
+                del merged[normalized]
+                archived += 1
+        conn.executemany(UPSERT_SQL, merged.values())
+        sync_ranking(conn)
+    return {'inserted': len(keys) - existing - archived, 'updated': existing, 'archived': archived}
+
+
+def init_fts(conn):
+    """
+    创建全文索引表和同步触发器，首次创建时为已有数据建立索引
+
+    Args:
+        conn: 已创建data_repository表的SQLite连接
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (FTS_TABLE,)
+    ).fetchone()
+    for statement in FTS_SCHEMA:
+        conn.execute(statement)
+    if not exists:
+        conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        logger.info("已为data_repository建立全文索引")
+    conn.commit()
+
+
+def split_keyword(keyword):
+    """
+    把查询关键词拆分为全文检索词和LIKE检索词
+
+    Returns:
+        tuple: (FTS5 MATCH表达式或None, 短词列表)
+    """
+    terms = [term for term in (keyword or '').split() if term]
+    fts_terms = [term for term in terms if len(term) >= MIN_FTS_TERM_LENGTH]
+    short_terms = [term for term in terms if len(term) < MIN_FTS_TERM_LENGTH]
+    # 每个词作为短语引用，避免用户输入被解析为FTS5语法；多个词之间为AND关系
+    match = ' '.join('"' + term.replace('"', '""') + '"' for term in fts_terms) or None
+    return match, short_terms
+
+
+def _build_filters(keyword, date_from, date_to, search_keyword='', ordered=True):
+    """
+    构造查询条件并确定访问路径
+
+    优先级: 全文索引 → (search_keyword, created_at)索引 → created_at索引；
+    只有短词LIKE条件时，按时间排序的查询沿created_at索引倒序读取并在LIMIT处停止，
+    其余查询（统计、相关性排序）只能扫描全表
+
+    Args:
+        ordered: 查询是否按时间排序
+
+    Returns:
+        tuple: (FROM子句, WHERE条件列表, 参数列表, 访问路径)
+    """
+    match, short_terms = split_keyword(keyword)
+    conditions = []
+    params = []
+    if match:
+        source = f"{FTS_TABLE} f JOIN data_repository r ON r.id = f.rowid"
+        conditions.append(f"{FTS_TABLE} MATCH ?")
+        params.append(match)
+    else:
+        source = "data_repository r"
+
+    for term in short_terms:
+        conditions.append("(r.title LIKE ? OR r.summary LIKE ? OR r.search_keyword LIKE ?)")
+        params.extend([f'%{term}%'] * 3)
+
+    if date_from:
+        conditions.append("r.created_at >= ?")
+        params.append(date_from)
+
+    if date_to:
+        conditions.append("r.created_at <= ?")
+        params.append(date_to)
+
+    if search_keyword:
+        conditions.append("r.search_keyword = ?")
+        params.append(search_keyword)
+
+    if match:
+        access = ACCESS_FTS
+    elif search_keyword:
+        access = ACCESS_KEYWORD_DATE
+    elif date_from or date_to or ordered or not short_terms:
+        access = ACCESS_DATE
+    else:
+        access = ACCESS_SCAN
+    return source, conditions, params, access
+
+
+def _execute(conn, query, params, access, allow_sort):
+    """执行查询；访问路径可以使用索引时先检查查询计划"""
+    if CHECK_QUERY_PLANS and access != ACCESS_SCAN:
+        check_plan(conn, query, params, REPOSITORY_TABLES, allow_sort=allow_sort)
+    return conn.execute(query, params)
+
+
+def encode_cursor(values):
+    """把分页位置编码为不透明的游标字符串"""
+    raw = json.dumps(values, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析游标字符串，格式错误时抛出ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f'无效的分页游标: {cursor}') from e
+    if not isinstance(values, list):
+        raise ValueError(f'无效的分页游标: {cursor}')
+    return values
+
+
+def resolve_sort(keyword, sort=None):
+    """
+    确定实际的排序方式：默认关键词可切分出BM25词项时按相关性，否则按时间；
+    没有词项时相关性排序退化为时间排序
+    """
+    if sort not in (None, '', 'time', 'relevance'):
+        raise ValueError(f'不支持的排序方式: {sort}')
+    if sort == 'time' or not query_terms(keyword):
+        return 'time'
+    return 'relevance'
+
+
+def build_search_query(conn, keyword='', date_from='', date_to='', sort=None, limit=None, after=None,
+                       search_keyword=''):
+    """
+    构造数据仓库查询语句，参数同search_repository
+
+    Returns:
+        tuple: (SQL, 参数列表, 访问路径, 是否允许临时B树排序)
+    """
+    relevance = resolve_sort(keyword, sort) == 'relevance'
+    source, conditions, params, access = _build_filters(keyword, date_from, date_to, search_keyword,
+                                                        ordered=not relevance)
+
+    offset = 0
+    if after:
+        position = decode_cursor(after)
+        if relevance:
+            if len(position) != 1 or not isinstance(position[0], int) or position[0] < 0:
+                raise ValueError(f'无效的分页游标: {after}')
+            offset = position[0]
+        else:
+            if len(position) != 2:
+                raise ValueError(f'无效的分页游标: {after}')
+            conditions.append("(r.created_at, r.id) < (?, ?)")
+            params.extend(position)
+
+    columns = REPOSITORY_COLUMNS
+    prefix = ''
+    if relevance:
+        ranked = bm25_query(conn, keyword)
+        if ranked is None:
+            # 词项在库中都不存在，所有记录分数为0
+            columns += ", 0.0 AS score"
+        else:
+            prefix, subquery, rank_params = ranked
+            prefix += ' '
+            columns += ", COALESCE(s.score, 0.0) AS score"
+            source += f" LEFT JOIN ({subquery}) s ON s.doc_id = r.id"
+            params[:0] = rank_params
+        order = " ORDER BY score DESC, r.id DESC"
+    else:
+        order = " ORDER BY r.created_at DESC, r.id DESC"
+
+    query = f"{prefix}SELECT {columns} FROM {source}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += order
+    if limit is not None or offset:
+        query += " LIMIT ? OFFSET ?"
+        params.extend([-1 if limit is None else limit, offset])
+    # 相关性按计算出的分数排序、全文检索的命中行按时间排序，都只能先取出再排序
+    return query, params, access, relevance or access == ACCESS_FTS
+
+
+def search_repository(conn, keyword='', date_from='', date_to='', sort=None, limit=None, after=None,
+                      search_keyword=''):
+    """
+    查询数据仓库
+
+    按时间排序时使用 (created_at, id) 键集分页，翻页代价与页码无关；
+    按相关性排序时使用标题和摘要的BM25分数，游标记录已返回的条数
+
+    Args:
+        conn: SQLite连接
+        keyword: 查询关键词，多个词以空格分隔，需同时出现在标题、摘要或搜索关键词中
+        date_from: 起始时间
+        date_to: 结束时间
+        sort: 'time'按入库时间倒序，'relevance'按BM25相关性，见resolve_sort
+        limit: 返回条数，None表示不限
+        after: 上一页返回的游标
+        search_keyword: 抓取时使用的搜索关键词（精确匹配）
+
+    Returns:
+        cursor: 逐行返回 (id, title, url, summary, search_keyword, created_at)，
+                相关性排序时行末附加排名分数
+    """
+    query, params, access, allow_sort = build_search_query(conn, keyword, date_from, date_to, sort, limit, after,
+                                                           search_keyword)
+    return _execute(conn, query, params, access, allow_sort)
+
+
+class RepositoryPage:
+    """
+    一页查询结果
+
+    创建时即执行查询（参数或游标错误在此时抛出ValueError），迭代时逐行读取SQLite游标，
+    不把整页结果读入内存。迭代结束后next_cursor为下一页游标，没有下一页时为None。
+
+    Args:
+        conn: SQLite连接，迭代结束前不能关闭
+        limit: 每页条数，限制在1到MAX_PAGE_SIZE之间
+        archive: partitions.RepositoryArchive，按时间排序时同时查询相关的归档分区；
+            相关性排序只查询data_repository，此时archive属性为None。未指定排序方式且有相关的归档分区时
+            按时间排序，不漏掉归档分区中的记录，notice说明排序方式的变化
+        其余参数同search_repository
+    """
+
+    def __init__(self, conn, keyword='', date_from='', date_to='', sort=None,
+                 limit=DEFAULT_PAGE_SIZE, after=None, search_keyword='', archive=None):
+        self.sort = resolve_sort(keyword, sort)
+        self.notice = None
+        if self.sort == 'relevance' and archive is not None and archive.prune(conn, date_from, date_to):
+            if sort:
+                self.notice = '相关性排序只包含最近的记录，不包含已归档的记录'
+            else:
+                self.sort = 'time'
+                self.notice = '查询范围包含已归档的记录，归档分区不支持相关性排序，结果按时间排序'
+        self.limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        self.offset = decode_cursor(after)[0] if after and self.sort == 'relevance' else 0
+        self.archive = archive if self.sort == 'time' else None
+        self.next_cursor = None
+        self.count = 0
+        # 多取一行用于判断是否还有下一页
+        if self.archive is not None:
+            self._cursor = self.archive.search(conn, keyword, date_from, date_to, self.limit + 1, after,
+                                               search_keyword)
+        else:
+            self._cursor = search_repository(conn, keyword, date_from, date_to, self.sort, self.limit + 1, after,
+                                             search_keyword)
+
+    def __iter__(self):
+        last = None
+        for row in self._cursor:
+            if self.count >= self.limit:
+                if self.sort == 'relevance':
+                    self.next_cursor = encode_cursor([self.offset + self.count])
+                else:
+                    self.next_cursor = encode_cursor([last[5], last[0]])
+                break
+            self.count += 1
+            last = row
+            yield dict(zip(REPOSITORY_FIELDS, row))
+        self._cursor.close()
+
+
+def stream_page_json(page, conn=None, total=None):
+    """
+    把一页查询结果逐行序列化为JSON文本片段
+
+    输出格式为 {"status": "success", "data": [...], "count": n, "sort": ..., "next_cursor": ..., "total": ...}，
+    排序方式有变化或结果不完整时附带notice说明，
+    行在读出游标时即被序列化输出，next_cursor等分页信息放在末尾
+
+    Args:
+        page: RepositoryPage
+        conn: 输出结束后关闭的连接
+        total: 记录总数，None表示未统计
+    """
+    try:
+        yield '{"status": "success", "data": ['
+        for index, item in enumerate(page):
+            yield (',' if index else '') + json.dumps(item, ensure_ascii=False)
+        trailer = {'count': page.count, 'sort': page.sort, 'next_cursor': page.next_cursor, 'total': total}
+        if page.notice:
+            trailer['notice'] = page.notice
+        yield '], ' + json.dumps(trailer, ensure_ascii=False)[1:]
+    except Exception as e:
+        # 响应头已发出，无法再返回错误状态码，只能截断输出
+        logger.error(f"数据仓库查询输出中断: {str(e)}")
+        raise
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+def count_repository(conn, keyword='', date_from='', date_to='', search_keyword='', archive=None):
+    """统计符合条件的记录总数，传入archive（partitions.RepositoryArchive）时包含相关归档分区中的记录"""
+    source, conditions, params, access = _build_filters(keyword, date_from, date_to, search_keyword, ordered=False)
+    query = f"SELECT COUNT(*) FROM {source}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    total = _execute(conn, query, params, access, allow_sort=False).fetchone()[0]
+    if archive is not None:
+        total += archive.count(conn, keyword, date_from, date_to, search_keyword)
+    return total
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+统一的搜索结果记录 - 智能瞭望数据分析处理系统
+功能: 所有爬虫、结果验证、去重和入库共用的单条搜索结果类型
+
+使用__slots__的紧凑记录代替字典，批量抓取产生数万条结果时减少每条结果的内存分配；
+结果在整个处理流程中原地传递，只在HTTP响应、缓存等边界处序列化一次。
+为兼容已有的调用代码，同时支持result['title']、result.get('summary')形式的访问。
+"""
+
+import json
+
+
+class SearchResult:
+    """
+    单条搜索结果
+
+    Args:
+        title: 标题
+        url: 落地页URL
+        summary: 摘要
+        source: 来源（网站名或爬虫名）
+        cover_url: 封面图URL
+        relevance_score: 相关性分数（0-100）
+    """
+
+    __slots__ = ('title', 'url', 'summary', 'source', 'cover_url', 'relevance_score')
+
+    # 各爬虫历史上使用过的字段别名
+    ALIASES = {'abstract': 'summary'}
+
+    def __init__(self, title='', url='', summary='', source='', cover_url='', relevance_score=0):
+        self.title = title
+        self.url = url
+        self.summary = summary
+        self.source = source
+        self.cover_url = cover_url
+        self.relevance_score = relevance_score
+
+    @classmethod
+    def from_dict(cls, data):
+        """从字典创建结果，兼容abstract/summary两种摘要字段"""
+        if isinstance(data, cls):
+            return data
+        return cls(
+            title=str(data.get('title') or '').strip(),
+            url=str(data.get('url') or '').strip(),
+            summary=str(data.get('summary') or data.get('abstract') or '').strip(),
+            source=str(data.get('source') or ''),
+            cover_url=str(data.get('cover_url') or ''),
+            relevance_score=data.get('relevance_score') or 0
+        )
+
+    def to_dict(self):
+        """序列化为字典（HTTP响应、缓存等边界处使用）"""
+        return {
+            'title': self.title,
+            'url': self.url,
+            'summary': self.summary,
+            'source': self.source,
+            'cover_url': self.cover_url,
+            'relevance_score': self.relevance_score
+        }
+
+    def _field(self, key):
+        key = self.ALIASES.get(key, key)
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return key
+
+    def __getitem__(self, key):
+        return getattr(self, self._field(key))
+
+    def __setitem__(self, key, value):
+        setattr(self, self._field(key), value)
+
+    def __contains__(self, key):
+        return self.ALIASES.get(key, key) in self.__slots__
+
+    def get(self, key, default=None):
+        try:
+            value = self[key]
+        except KeyError:
+            return default
+        return default if value is None else value
+
+    def __eq__(self, other):
+        if not isinstance(other, SearchResult):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return f"SearchResult(title={self.title!r}, url={self.url!r}, source={self.source!r})"
+
+
+def to_json_default(obj):
+    """json.dumps的default参数，使SearchResult可以直接序列化"""
+    if isinstance(obj, SearchResult):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
+
+
+def dumps(data, **kwargs):
+    """序列化包含SearchResult的数据，默认保留中文"""
+    kwargs.setdefault('ensure_ascii', False)
+    return json.dumps(data, default=to_json_default, **kwargs)
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+搜索结果页缓存 - 智能瞭望数据分析处理系统
+功能: 按规范化关键词和页码缓存爬虫的解析结果，减少对百度的重复请求
+
+两级缓存：
+- 内存LRU层：进程内，命中时毫秒级返回
+- SQLite磁盘层：多个工作进程共享，进程重启后仍然有效
+两层使用相同的TTL，并各自按容量上限淘汰最久未使用的条目。
+磁盘层的过期清理和容量淘汰每写入evict_every次执行一次，不在每次写入时统计条目数。
+异步调用方（搜索来源的协程）使用aget/aset：内存层直接在事件循环中读写，磁盘层放到线程池中执行。
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 默认缓存配置
+SERP_CACHE_DB = os.path.join(BASE_DIR, 'serp_cache.db')
+DEFAULT_TTL = 3600          # 缓存有效期（秒）
+DEFAULT_MEMORY_SIZE = 256   # 内存层最多条目数
+DEFAULT_DISK_SIZE = 20000   # 磁盘层最多条目数
+DEFAULT_EVICT_EVERY = 100   # 磁盘层每写入多少次清理一次
+
+
+def normalize_keyword(keyword):
+    """规范化关键词：全角转半角、转小写、合并空白"""
+    keyword = unicodedata.normalize('NFKC', str(keyword or ''))
+    return re.sub(r'\s+', ' ', keyword).strip().lower()
+
+
+class SerpCache:
+    """
+    两级搜索结果页缓存
+
+    Args:
+        path: SQLite缓存文件路径，None表示只使用内存层
+        ttl: 缓存有效期（秒）
+        memory_size: 内存层容量
+        disk_size: 磁盘层容量，两次清理之间最多超出evict_every条
+        evict_every: 磁盘层每写入多少次清理一次
+    """
+
+    def __init__(self, path=SERP_CACHE_DB, ttl=DEFAULT_TTL, memory_size=DEFAULT_MEMORY_SIZE,
+                 disk_size=DEFAULT_DISK_SIZE, evict_every=DEFAULT_EVICT_EVERY):
+        self.path = path
+        self.ttl = ttl
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.evict_every = max(1, int(evict_every))
+        self._disk_writes = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0}
+        if self.path:
+            self._connect().execute('''
+            CREATE TABLE IF NOT EXISTS serp_cache (
+                cache_key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            ''')
+            self._connect().execute('CREATE INDEX IF NOT EXISTS idx_serp_cache_accessed ON serp_cache(accessed_at)')
+            self._connect().execute('CREATE INDEX IF NOT EXISTS idx_serp_cache_expires ON serp_cache(expires_at)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def make_key(namespace, keyword, page=0):
+        """缓存键：爬虫命名空间 + 规范化关键词 + 页码"""
+        return f"{namespace}\x1f{normalize_keyword(keyword)}\x1f{int(page)}"
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._counters[name] += n
+
+    def _remember(self, key, payload, expires_at):
+        """写入内存层并按LRU淘汰"""
+        with self._lock:
+            self._memory[key] = (expires_at, payload)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def _get_memory(self, key, now):
+        """从内存层读取，未命中时返回None"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self._counters['memory_hits'] += 1
+                    return json.loads(entry[1])
+                del self._memory[key]
+        return None
+
+    def _get_disk(self, key, now):
+        """从磁盘层读取并回填内存层，未命中时返回None"""
+        if self.path:
+            try:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT value, expires_at FROM serp_cache WHERE cache_key=?", (key,)
+                ).fetchone()
+                if row and row[1] > now:
+                    conn.execute("UPDATE serp_cache SET accessed_at=? WHERE cache_key=?", (now, key))
+                    self._remember(key, row[0], row[1])
+                    self._count('disk_hits')
+                    return json.loads(row[0])
+                if row:
+                    conn.execute("DELETE FROM serp_cache WHERE cache_key=?", (key,))
+            except sqlite3.Error as e:
+                logger.error(f"读取磁盘缓存失败: {e}")
+
+        self._count('misses')
+        return None
+
+    def get(self, namespace, keyword, page=0):
+        """
+        读取缓存
+
+        Returns:
+            缓存的值（每次返回独立的副本），未命中或已过期时返回None
+        """
+        key = self.make_key(namespace, keyword, page)
+        now = time.time()
+        value = self._get_memory(key, now)
+        return value if value is not None else self._get_disk(key, now)
+
+    async def aget(self, namespace, keyword, page=0):
+        """get的异步版本，内存层未命中时在线程池中读取磁盘层"""
+        key = self.make_key(namespace, keyword, page)
+        now = time.time()
+        value = self._get_memory(key, now)
+        if value is not None:
+            return value
+        if not self.path:
+            return self._get_disk(key, now)
+        return await asyncio.to_thread(self._get_disk, key, now)
+
+    def _prepare(self, namespace, keyword, page, value):
+        """写入内存层，返回写入磁盘层所需的参数"""
+        key = self.make_key(namespace, keyword, page)
+        payload = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        expires_at = now + self.ttl
+
+        self._remember(key, payload, expires_at)
+        self._count('sets')
+        return key, payload, expires_at, now
+
+    def _set_disk(self, key, payload, expires_at, now):
+        """写入磁盘层，每evict_every次写入清理一次"""
+        if not self.path:
+            return
+        with self._lock:
+            self._disk_writes += 1
+            evict = self._disk_writes % self.evict_every == 0
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO serp_cache (cache_key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, payload, expires_at, now)
+            )
+            if evict:
+                self._evict_disk(conn, now)
+        except sqlite3.Error as e:
+            logger.error(f"写入磁盘缓存失败: {e}")
+
+    def set(self, namespace, keyword, page, value):
+        """写入缓存（两级同时写入）"""
+        self._set_disk(*self._prepare(namespace, keyword, page, value))
+
+    async def aset(self, namespace, keyword, page, value):
+        """set的异步版本，磁盘层在线程池中写入"""
+        args = self._prepare(namespace, keyword, page, value)
+        if self.path:
+            await asyncio.to_thread(self._set_disk, *args)
+
+    def _evict_disk(self, conn, now):
+        """清除过期条目，并在超出容量时淘汰最久未访问的条目"""
+        conn.execute("DELETE FROM serp_cache WHERE expires_at <= ?", (now,))
+        count = conn.execute("SELECT COUNT(*) FROM serp_cache").fetchone()[0]
+        overflow = count - self.disk_size
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM serp_cache WHERE cache_key IN "
+                "(SELECT cache_key FROM serp_cache ORDER BY accessed_at LIMIT ?)",
+                (overflow,)
+            )
+            self._count('evictions', overflow)
+
+    def clear(self):
+        """清空两级缓存"""
+        with self._lock:
+            self._memory.clear()
+        if self.path:
+            self._connect().execute("DELETE FROM serp_cache")
+
+    def stats(self):
+        """返回命中统计"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+class NullCache:
+    """关闭缓存时使用的空实现"""
+
+    def get(self, namespace, keyword, page=0):
+        return None
+
+    def set(self, namespace, keyword, page, value):
+        pass
+
+    async def aget(self, namespace, keyword, page=0):
+        return None
+
+    async def aset(self, namespace, keyword, page, value):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {}
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    获取所有爬虫共享的默认缓存
+
+    环境变量SERP_CACHE_TTL可调整有效期（秒），设为0时关闭缓存。
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            ttl = float(os.environ.get('SERP_CACHE_TTL', DEFAULT_TTL))
+            if ttl <= 0:
+                _default_cache = NullCache()
+            else:
+                _default_cache = SerpCache(os.environ.get('SERP_CACHE_DB', SERP_CACHE_DB), ttl=ttl)
+        return _default_cache
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+百度搜索结果页解析器 - 智能瞭望数据分析处理系统
+功能: 从百度搜索结果页HTML中提取标题、URL、摘要、来源和封面图
+
+所有正则表达式在模块加载时预编译。解析时先用一次finditer定位所有结果块的起点，
+再把文档切成互不重叠的结果块，字段提取只在各自的结果块内进行，
+因此总工作量与页面大小成线性关系，不会再对整篇文档做逐结果的重复扫描。
+"""
+
+import html
+import re
+
+# 类名匹配片段：要求目标类名是class属性中的一个完整词，避免惰性\b回溯
+def _class_token(names):
+    return r'class=["\'](?:[^"\']*\s)?(?:' + names + r')(?:\s[^"\']*)?["\']'
+
+
+# 标签内容片段：用展开循环代替惰性的(.*?)，匹配到指定结束标签为止，
+# 正文部分由字符集重复一次跳过，不再逐字符尝试结束标签
+def _content_until(closing):
+    return r'([^<]*(?:<(?!' + closing + r')[^<]*)*)'
+
+
+# 结果块起点：<div class="result c-container ..." ...>
+RESULT_BLOCK_RE = re.compile(r'<div [^>]*?' + _class_token(r'result|result-op') + r'[^>]*>')
+# 结果块上的真实落地页地址（百度新版页面在mu属性中给出）
+MU_ATTR_RE = re.compile(r'\smu=["\'](https?://[^"\']+)["\']')
+# 标题与链接
+TITLE_RE = re.compile(
+    r'<h3[^>]*>[^<]*(?:<(?!a )[^<]*)*<a [^>]*?href=["\']([^"\']*)["\'][^>]*>' + _content_until(r'/a>') + r'</a>'
+)
+# 摘要（新版和旧版的类名）
+ABSTRACT_RE = re.compile(
+    _class_token(r'c-abstract|content-right_[\w-]+|c-span-last|content') + r'[^>]*>'
+    + _content_until(r'/(?:div|span)>') + r'</(?:div|span)>'
+)
+# 来源/显示网址
+SOURCE_RE = re.compile(
+    _class_token(r'c-showurl|c-color-gray|source_[\w-]+|siteLink_[\w-]+') + r'[^>]*>'
+    + _content_until(r'/(?:span|a|div)>') + r'</(?:span|a|div)>'
+)
+# 封面图
+COVER_RE = re.compile(r'<img [^>]*?src=["\'](https?://[^"\']+|//[^"\']+)["\']')
+# 结果块识别失败时的备用方案：带结果标题类名的链接
+FALLBACK_LINK_RE = re.compile(
+    r'<a [^>]*?href=["\'](https?://[^"\']*)["\'][^>]*?class=["\'](?:mnav|c-title-text|result-title)["\'][^>]*>'
+    + _content_until(r'/a>') + r'</a>'
+)
+# 旧版页面的标题结构 <h3 class="t"><a href=...>
+LEGACY_TITLE_RE = re.compile(
+    r'<h3[^>]*class=["\']t["\'][^>]*>[^<]*(?:<(?!a )[^<]*)*<a [^>]*?href=["\']([^"\']*)["\'][^>]*>'
+    + _content_until(r'/a>') + r'</a>'
+)
+
+TAG_RE = re.compile(r'<[^>]+>')
+
+# 备用方案中在链接之后查找摘要的窗口大小（字符）
+FALLBACK_WINDOW = 2000
+
+
+def clean_text(fragment):
+    """去除HTML标签、反转义实体并合并空白"""
+    if not fragment:
+        return ''
+    if '<' in fragment:
+        fragment = TAG_RE.sub('', fragment)
+    return ' '.join(html.unescape(fragment).split())
+
+
+def _make_result(url, title_html, block, abstract_limit, start=0):
+    """
+    从单个结果块中提取各字段
+
+    摘要和来源位于标题之后，从start（标题结束位置）开始查找；
+    来源一般在摘要之后，先从摘要结束处查找，找不到时再从标题之后查找
+    """
+    abstract_match = ABSTRACT_RE.search(block, start)
+    source_match = SOURCE_RE.search(block, abstract_match.end()) if abstract_match else None
+    if source_match is None:
+        source_match = SOURCE_RE.search(block, start)
+    cover_match = COVER_RE.search(block)
+    mu_match = MU_ATTR_RE.search(block, 0, block.find('>') + 1)
+
+    cover_url = cover_match.group(1) if cover_match else ''
+    if cover_url.startswith('//'):
+        cover_url = 'https:' + cover_url
+
+    abstract = ''
+    if abstract_match:
+        fragment = abstract_match.group(1)
+        if abstract_limit:
+            # 只清理足够生成摘要的前缀，并去掉被截断的半个标签
+            fragment = fragment[:abstract_limit * 4]
+            if fragment.rfind('<') > fragment.rfind('>'):
+                fragment = fragment[:fragment.rfind('<')]
+        abstract = clean_text(fragment)
+    return {
+        'title': clean_text(title_html),
+        'url': html.unescape(url.strip()),
+        'real_url': mu_match.group(1) if mu_match else '',
+        'abstract': abstract[:abstract_limit] if abstract_limit else abstract,
+        'source': clean_text(source_match.group(1)) if source_match else '',
+        'cover_url': cover_url
+    }
+
+
+def parse_serp(html_content, max_results=None, abstract_limit=200):
+    """
+    解析百度搜索结果页
+
+    Args:
+        html_content: 搜索结果页HTML
+        max_results: 最多返回的结果数，None表示不限
+        abstract_limit: 摘要最大长度，0表示不截断
+
+    Returns:
+        list: 结果字典列表，包含title、url、real_url、abstract、source、cover_url
+    """
+    results = []
+    if not html_content:
+        return results
+
+    starts = [m.start() for m in RESULT_BLOCK_RE.finditer(html_content)]
+    if starts:
+        starts.append(len(html_content))
+        for begin, end in zip(starts, starts[1:]):
+            block = html_content[begin:end]
+            title_match = TITLE_RE.search(block)
+            if not title_match:
+                continue
+            results.append(_make_result(title_match.group(1), title_match.group(2), block, abstract_limit,
+                                        title_match.end()))
+            if max_results and len(results) >= max_results:
+                break
+        if results:
+            return results
+
+    # 备用方案：按链接定位结果，摘要只在链接之后的固定窗口内查找
+    for pattern in (LEGACY_TITLE_RE, FALLBACK_LINK_RE):
+        for match in pattern.finditer(html_content):
+            window = html_content[match.end():match.end() + FALLBACK_WINDOW]
+            results.append(_make_result(match.group(1), match.group(2), window, abstract_limit))
+            if max_results and len(results) >= max_results:
+                return results
+        if results:
+            break
+
+    return results
+
+
+# 结果区域之后的页面元素（分页、相关搜索、页脚），流式解析遇到时结束
+RESULT_REGION_END_RE = re.compile(r'<div [^>]*?id=["\'](?:page|rs|foot)["\']')
+
+# 结果块起始标签的最大长度，跨分块查找时回退这么多字符，避免漏掉被分块切断的标签
+MAX_TAG_CHARS = 1024
+
+
+class SerpStreamParser:
+    """
+    百度搜索结果页的流式解析器
+
+    文本分块输入，每当后一个结果块的起点出现，就解析前一个已完整的结果块并丢弃其文本，
+    缓冲区只保留尚未结束的结果块；遇到分页等结果区域之后的元素、结果数达到上限或发现验证码标记时
+    done为True，调用方可以停止读取。页面中没有结果块时在close时对已缓冲的全文使用备用方案。
+
+    解析结果与parse_serp一致（最后一个结果块在结果区域结束处截止，而不是延伸到页面末尾）。
+
+    Args:
+        max_results: 最多解析的结果数，None表示不限
+        abstract_limit: 摘要最大长度，0表示不截断
+        blocked_markers: 出现其中任一字符串时视为验证码页面
+    """
+
+    def __init__(self, max_results=None, abstract_limit=200, blocked_markers=()):
+        self.max_results = max_results
+        self.abstract_limit = abstract_limit
+        self.blocked_markers = tuple(blocked_markers)
+        self.results = []
+        self.blocked = False
+        self.done = False
+        # 缓冲区中文本的最大长度，用于观察内存占用
+        self.peak_buffer = 0
+        self._buffer = ''
+        self._in_blocks = False
+        self._scan = 0
+        self._tail = ''
+        self._marker_overlap = max((len(m) for m in self.blocked_markers), default=1) - 1
+
+    def feed(self, text):
+        """
+        输入一段文本
+
+        Returns:
+            bool: 是否已无需继续读取
+        """
+        if self.done or not text:
+            return self.done
+        if self.blocked_markers:
+            window = self._tail + text
+            if any(marker in window for marker in self.blocked_markers):
+                self.blocked = self.done = True
+                self._buffer = ''
+                return True
+            self._tail = window[-self._marker_overlap:] if self._marker_overlap else ''
+        self._buffer += text
+        self.peak_buffer = max(self.peak_buffer, len(self._buffer))
+        self._consume()
+        return self.done
+
+    def _consume(self):
+        buffer = self._buffer
+        if not self._in_blocks:
+            match = RESULT_BLOCK_RE.search(buffer, self._scan)
+            if match is None:
+                self._scan = max(0, len(buffer) - MAX_TAG_CHARS)
+                return
+            # 找到第一个结果块，之前的页面头部不再需要
+            self._in_blocks = True
+            buffer = self._buffer = buffer[match.start():]
+            self._scan = 1
+
+        while not self.done:
+            match = RESULT_BLOCK_RE.search(buffer, self._scan)
+            end = RESULT_REGION_END_RE.search(buffer, self._scan, match.start() if match else len(buffer))
+            if end is not None:
+                self._parse_block(buffer[:end.start()])
+                self.done = True
+                buffer = ''
+                break
+            if match is None:
+                self._scan = max(1, len(buffer) - MAX_TAG_CHARS)
+                break
+            self._parse_block(buffer[:match.start()])
+            buffer = buffer[match.start():]
+            self._scan = 1
+        self._buffer = buffer
+
+    def _parse_block(self, block):
+        title_match = TITLE_RE.search(block)
+        if title_match:
+            self.results.append(_make_result(title_match.group(1), title_match.group(2), block, self.abstract_limit,
+                                             title_match.end()))
+            if self.max_results and len(self.results) >= self.max_results:
+                self.done = True
+
+    def close(self):
+        """输入结束，解析最后一个结果块；没有结果块时对缓冲的全文使用备用方案"""
+        if self.done:
+            return self.results
+        if self._in_blocks:
+            self._parse_block(self._buffer)
+        else:
+            self.results = parse_serp(self._buffer, self.max_results, self.abstract_limit)
+        self._buffer = ''
+        self.done = True
+        return self.results
@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+搜索来源插件 - 智能瞭望数据分析处理系统
+功能: 定义搜索来源的统一流水线（fetch → parse → normalize）和来源注册表
+
+每个搜索来源只需声明如何构造请求、如何解析页面以及如何把解析结果规范化为SearchResult，
+缓存查询、限速、并发控制、验证码检测和分页合并由基类统一完成，
+所有来源共享同一个HTTP连接池、限速器和搜索结果页缓存。
+缓存过期后再次抓取同一页面时发送条件请求，服务器返回304时直接复用上次的解析结果，不再解析页面。
+使用默认解析的来源流式读取结果页：响应体边解码边解析，读完结果区域即停止，不在内存中保留完整页面。
+
+新增来源:
+    @register_source
+    class GovSiteSource(SearchSource):
+        name = 'gov_site'
+        host = 'www.gov.cn'
+        concurrency = 2
+        rate = 0.2
+
+        def build_url(self, keyword, page):
+            ...
+"""
+
+import asyncio
+import importlib
+import logging
+import os
+import random
+import sys
+import threading
+import weakref
+
+from html_stream import HtmlStreamReader
+from http_pool import get_pool, get_validator_store
+from rate_limiter import MemoryBackend, TokenBucketLimiter, get_limiter
+from serp_cache import get_cache
+from serp_parser import SerpStreamParser, parse_serp
+from search_result import SearchResult
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 来源插件所在的额外目录，加载插件模块前加入sys.path
+PLUGIN_DIRS = [os.path.join(os.path.dirname(BASE_DIR), 'codedemo')]
+
+# 默认加载的来源插件模块，导入时通过register_source注册
+DEFAULT_SOURCE_MODULES = ('baidu_search_spider', 'baidu_spider', 'baidu_search_dify')
+
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0'
+]
+
+# 流式读取单个结果页时最多读取的字节数（解压后）
+MAX_PAGE_BYTES = 2 * 1024 * 1024
+
+# 页面抓取状态
+SUCCESS = 'success'
+CAPTCHA = 'captcha'
+ERROR = 'error'
+
+
+class SearchSource:
+    """
+    搜索来源基类
+
+    子类至少需要设置name、host并实现build_url；解析和规范化有基于serp_parser的默认实现。
+
+    类属性:
+        name: 注册表中的来源名
+        host: 限速器按主机计数使用的主机名
+        concurrency: 本来源同时在途的请求数上限（同一进程内所有实例共享）
+        rate: 本来源额外的速率上限（请求/秒），None表示只受共享限速器约束
+        cache_namespace: 缓存命名空间，默认与name相同
+        result_source: 写入SearchResult.source的来源标识
+        max_results: 单页最多保留的结果数
+        timeout: 请求超时时间（秒）
+        captcha_markers: 页面包含其中任一字符串时视为触发验证码
+        stream_results: 是否流式读取并解析结果页（覆盖了parse或is_blocked的来源始终完整读取）
+        max_page_bytes: 流式读取时单页最多读取的字节数
+    """
+
+    name = None
+    host = None
+    concurrency = 4
+    rate = None
+    cache_namespace = None
+    result_source = None
+    max_results = 10
+    timeout = 10
+    captcha_markers = ('验证码', '请输入验证码')
+    stream_results = True
+    max_page_bytes = MAX_PAGE_BYTES
+    cookies = None
+
+    def __init__(self, pool=None, limiter=None, cache=None, validators=None):
+        # 所有来源共享进程内的连接池、验证器存储，跨进程的限速器和搜索结果缓存
+        self.pool = get_pool() if pool is None else pool
+        self.limiter = get_limiter() if limiter is None else limiter
+        self.cache = get_cache() if cache is None else cache
+        self.validators = get_validator_store() if validators is None else validators
+        settings = SOURCE_SETTINGS.get(self.name) or {}
+        self.concurrency = settings.get('concurrency', self.concurrency)
+        self.rate = settings.get('rate', self.rate)
+
+    # ---- 子类扩展点 ----
+
+    def build_url(self, keyword, page):
+        """构造第page页（从0开始）的搜索URL"""
+        raise NotImplementedError
+
+    def get_headers(self):
+        """请求头"""
+        return {
+            'User-Agent': random.choice(USER_AGENTS),
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'zh-CN,zh;q=0.9',
+            'Connection': 'keep-alive'
+        }
+
+    async def prepare(self):
+        """首次搜索前的准备工作（如初始化Cookie），默认不做任何事"""
+
+    async def throttle(self):
+        """发送请求前的限速：先满足本来源的速率上限，再向共享限速器领取令牌"""
+        source_limiter = _source_limiter(self.name, self.rate)
+        if source_limiter is not None:
+            await source_limiter.aacquire(self.host)
+        await self.limiter.aacquire(self.host)
+
+    def is_blocked(self, html):
+        """页面是否为验证码或反爬页面"""
+        return any(marker in html for marker in self.captcha_markers)
+
+    def parse(self, html):
+        """把页面解析为原始结果字典列表"""
+        return parse_serp(html)
+
+    def open_parser(self):
+        """流式读取时使用的解析器，与parse、is_blocked的默认实现等价"""
+        return SerpStreamParser(blocked_markers=self.captcha_markers)
+
+    def normalize(self, items, keyword):
+        """
+        把原始结果规范化为SearchResult列表
+
+        默认保留http(s)链接，按URL去重，并截取前max_results条
+        """
+        results = []
+        seen_urls = set()
+        for item in items:
+            url = item['url']
+            if not url.startswith('http') or url in seen_urls:
+                continue
+            seen_urls.add(url)
+            results.append(SearchResult(
+                title=item['title'],
+                url=url,
+                summary=item['abstract'],
+                source=self.result_source or self.name,
+                cover_url=item['cover_url']
+            ))
+            if len(results) >= self.max_results:
+                break
+        return results
+
+    def fallback_results(self, keyword):
+        """所有分页都没有结果时返回的结果，默认为空"""
+        return []
+
+    # ---- 统一流水线 ----
+
+    @property
+    def namespace(self):
+        return self.cache_namespace or self.name
+
+    @property
+    def streaming(self):
+        """是否使用流式读取：自定义了parse或is_blocked的来源需要完整页面"""
+        cls = type(self)
+        return (self.stream_results and cls.parse is SearchSource.parse
+                and cls.is_blocked is SearchSource.is_blocked)
+
+    async def fetch(self, keyword, page, timeout=None):
+        """
+        抓取单个搜索结果页
+
+        对之前抓取过且带有ETag/Last-Modified的页面发送条件请求
+
+        Returns:
+            FetchResponse: 已读取完毕的响应，状态码为4xx/5xx时抛出requests.HTTPError，
+                页面未变化时状态码为304
+        """
+        async with _source_slots(self.name, self.concurrency):
+            await self.throttle()
+            response = await self.pool.get(
+                self.build_url(keyword, page), headers=self.get_headers(), cookies=self.cookies,
+                timeout=timeout or self.timeout, validators=self.validators
+            )
+        response.raise_for_status()
+        return response
+
+    async def fetch_stream(self, keyword, page, timeout=None):
+        """
+        流式抓取并解析单个搜索结果页
+
+        响应体分块解码后交给open_parser返回的解析器，结果区域读完、发现验证码标记
+        或达到max_page_bytes时停止读取，内存中只保留尚未解析完的结果块
+
+        Returns:
+            tuple: (FetchResponse, 解析器)，状态码为4xx/5xx时抛出requests.HTTPError，
+                页面未变化时状态码为304且解析器为空
+        """
+        parser = self.open_parser()
+        readers = []
+
+        def open_reader(response):
+            reader = HtmlStreamReader(parser, charset=response.encoding)
+            readers.append(reader)
+            return reader.feed
+
+        async with _source_slots(self.name, self.concurrency):
+            await self.throttle()
+            response = await self.pool.stream(
+                self.build_url(keyword, page), open_reader, headers=self.get_headers(), cookies=self.cookies,
+                timeout=timeout or self.timeout, max_bytes=self.max_page_bytes, validators=self.validators
+            )
+        response.raise_for_status()
+        if readers:
+            readers[0].close()
+        return response, parser
+
+    async def _fetch_parsed(self, keyword, page, timeout):
+        """
+        抓取并解析单个结果页
+
+        Returns:
+            tuple: (FetchResponse, 是否为验证码页面, 原始结果字典列表)，页面未变化时结果为None
+        """
+        if self.streaming:
+            response, parser = await self.fetch_stream(keyword, page, timeout)
+            if response.not_modified:
+                return response, False, None
+            return response, parser.blocked, parser.results
+        response = await self.fetch(keyword, page, timeout)
+        if response.not_modified:
+            return response, False, None
+        html = response.text
+        if self.is_blocked(html):
+            return response, True, []
+        return response, False, self.parse(html)
+
+    async def fetch_page(self, keyword, page=0, timeout=None):
+        """
+        抓取、解析并规范化单个结果页（各来源共用的最小任务单元）
+
+        先查询搜索结果页缓存，未命中时才发送请求；验证码和成功的请求都会反馈给限速器。
+        条件请求返回304时直接复用上次的解析结果（not_modified为True）。
+
+        Returns:
+            dict: status为success/captcha/error，results为SearchResult列表；
+                请求过的页面还包含url和status_code，失败时包含error
+        """
+        cached = await self.cache.aget(self.namespace, keyword, page)
+        if cached is not None:
+            logger.info(f"{self.name} 命中缓存: {keyword} (第{page+1}页)")
+            return {'status': SUCCESS, 'results': [SearchResult.from_dict(r) for r in cached], 'cached': True}
+
+        url = self.build_url(keyword, page)
+        try:
+            logger.info(f"{self.name} 正在搜索: {keyword} (第{page+1}页)")
+            response, blocked, items = await self._fetch_parsed(keyword, page, timeout)
+            if response.not_modified:
+                payload = response.validators['payload']
+                if payload is not None:
+                    logger.info(f"{self.name} 页面未变化，复用上次的解析结果: {keyword} (第{page+1}页)")
+                    await self.limiter.areport_success(self.host)
+                    await self.cache.aset(self.namespace, keyword, page, payload)
+                    return {'status': SUCCESS, 'results': [SearchResult.from_dict(r) for r in payload],
+                            'cached': False, 'not_modified': True, 'url': url, 'status_code': response.status_code}
+                # 没有可复用的解析结果时放弃验证器，重新完整抓取
+                self.validators.discard(url)
+                response, blocked, items = await self._fetch_parsed(keyword, page, timeout)
+            if blocked:
+                logger.warning(f"{self.name} 检测到反爬机制: {keyword} (第{page+1}页)")
+                await self.limiter.areport_captcha(self.host)
+                return {'status': CAPTCHA, 'results': [], 'url': url, 'status_code': response.status_code,
+                        'error': '检测到验证码或反爬机制'}
+            await self.limiter.areport_success(self.host)
+
+            results = self.normalize(items, keyword)
+            payload = [r.to_dict() for r in results]
+            self.validators.set_payload(url, payload)
+            if results:
+                await self.cache.aset(self.namespace, keyword, page, payload)
+            return {'status': SUCCESS, 'results': results, 'cached': False, 'url': url,
+                    'status_code': response.status_code}
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"{self.name} 搜索请求失败: {keyword} (第{page+1}页): {e}")
+            return {'status': ERROR, 'results': [], 'url': url, 'error': str(e)}
+
+    def _merge_pages(self, keyword, page_results):
+        """
+        按页码顺序合并单个关键词的分页结果：
+        遇到验证码、请求失败或空页即停止，没有任何结果时返回fallback_results
+        """
+        merged = []
+        seen_urls = set()
+
+        for page_result in page_results:
+            if page_result['status'] != SUCCESS or not page_result['results']:
+                break
+            for result in page_result['results']:
+                if result.url in seen_urls:
+                    continue
+                seen_urls.add(result.url)
+                merged.append(result)
+
+        if not merged:
+            return self.fallback_results(keyword)
+        return merged
+
+    async def acollect(self, keyword, pages=1):
+        """
+        搜索关键词的前pages页，返回合并后的SearchResult列表
+
+        这是并行调度和后台任务使用的统一入口
+        """
+        await self.prepare()
+        page_results = []
+        for page in range(pages):
+            page_result = await self.fetch_page(keyword, page)
+            page_results.append(page_result)
+            # 遇到验证码、请求失败或没有更多结果时停止翻页
+            if page_result['status'] != SUCCESS or not page_result['results']:
+                break
+        results = self._merge_pages(keyword, page_results)
+        logger.info(f"{self.name} 搜索完成: {keyword}，共获取 {len(results)} 条结果")
+        return results
+
+    def collect(self, keyword, pages=1):
+        """acollect的同步包装"""
+        return self.pool.run(self.acollect(keyword, pages))
+
+
+# ---- 来源注册表 ----
+
+SOURCES = {}
+
+# 按来源名覆盖concurrency、rate等设置，在创建实例时生效
+SOURCE_SETTINGS = {}
+
+_state_lock = threading.Lock()
+_slots = weakref.WeakKeyDictionary()   # 事件循环 -> {来源名: 并发信号量}
+_limiters = {}
+_loaded = False
+
+
+def register_source(cls):
+    """注册搜索来源类（可用作类装饰器）"""
+    if not cls.name:
+        raise ValueError(f'{cls.__name__} 未设置来源名')
+    SOURCES[cls.name] = cls
+    return cls
+
+
+def configure_source(name, **settings):
+    """
+    修改来源的并发和速率设置
+
+    Args:
+        name: 来源名
+        **settings: concurrency、rate
+    """
+    unknown = set(settings) - {'concurrency', 'rate'}
+    if unknown:
+        raise ValueError(f'未知的来源设置: {", ".join(sorted(unknown))}')
+    SOURCE_SETTINGS.setdefault(name, {}).update(settings)
+    with _state_lock:
+        for loop_slots in list(_slots.values()):
+            loop_slots.pop(name, None)
+        _limiters.pop(name, None)
+
+
+def _source_slots(name, concurrency):
+    """
+    本来源在当前事件循环中的并发信号量
+
+    信号量按事件循环保存，循环被回收后随之丢弃；等待过的信号量会引用所在的循环，
+    因此为新的事件循环创建信号量时顺带清理已关闭的循环
+    """
+    loop = asyncio.get_running_loop()
+    with _state_lock:
+        loop_slots = _slots.get(loop)
+        if loop_slots is None:
+            for closed in [other for other in _slots if other.is_closed()]:
+                del _slots[closed]
+            loop_slots = _slots[loop] = {}
+        slots = loop_slots.get(name)
+        if slots is None:
+            slots = loop_slots[name] = asyncio.Semaphore(concurrency)
+        return slots
+
+
+def _source_limiter(name, rate):
+    """本来源专用的进程内限速器，rate为None时返回None"""
+    if not rate:
+        return None
+    with _state_lock:
+        limiter = _limiters.get(name)
+        if limiter is None or limiter.rate != rate:
+            limiter = _limiters[name] = TokenBucketLimiter(MemoryBackend(), rate=rate, burst=1)
+        return limiter
+
+
+def load_sources(modules=DEFAULT_SOURCE_MODULES):
+    """导入来源插件模块，导入失败的模块记录日志后跳过"""
+    global _loaded
+    for path in PLUGIN_DIRS:
+        if path not in sys.path:
+            sys.path.append(path)
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            logger.error(f"加载搜索来源模块 {module} 失败: {e}")
+    _loaded = True
+
+
+def source_names():
+    """已注册的来源名列表"""
+    if not _loaded:
+        load_sources()
+    return list(SOURCES)
+
+
+def create_sources(names=None, **kwargs):
+    """
+    按来源名创建来源实例
+
+    Args:
+        names: 来源名列表，None表示全部已注册来源
+        **kwargs: 传给来源构造函数的参数（pool、limiter、cache、validators）
+
+    Returns:
+        list: 来源实例列表，未注册的来源名记录日志后跳过
+    """
+    if not _loaded:
+        load_sources()
+    sources = []
+    for name in (list(SOURCES) if names is None else names):
+        cls = SOURCES.get(name)
+        if cls is None:
+            logger.warning(f"未注册的搜索来源: {name}")
+            continue
+        sources.append(cls(**kwargs))
+    return sources
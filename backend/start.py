@@ -16,12 +16,18 @@ print("智能瞭望数据分析处理系统启动中...")
 print("正在启动Flask应用服务器...")
 
 # 导入并运行app
-from app import app, init_db
+from app import app, init_db, watch_scheduler, WATCH_SCHEDULER, enricher, ENRICHMENT
 
 if __name__ == '__main__':
     # 确保数据库已初始化
     init_db()
     print("数据库初始化完成")
+    
+    # 启动关键词监测调度和落地页正文补全
+    if WATCH_SCHEDULER:
+        watch_scheduler.start()
+    if ENRICHMENT:
+        enricher.start()
     print("应用服务正在运行...")
     print("访问地址: http://localhost:5000")
     print("登录账户: admin / admin888")
@@ -30,6 +30,12 @@ document.getElementById('searchForm').addEventListener('submit', function(e) {
         return response.json();
     })
     .then(data => {
+        // 实时搜索在后台任务中执行，等待任务完成后再显示结果
+        if (data.status === 'queued') {
+            waitForJob(data, keyword);
+            return;
+        }
+        
         showLoading(false);
         
         if (data.status === 'success') {
@@ -62,6 +68,54 @@ document.getElementById('searchForm').addEventListener('submit', function(e) {
     });
 });
 
+// 通过事件流跟踪抓取任务进度，完成后获取并显示结果
+function waitForJob(job, keyword) {
+    const events = new EventSource(job.events_url);
+    showStatus('搜索任务已提交，正在抓取...', 'info');
+    
+    const fail = (message) => {
+        events.close();
+        showLoading(false);
+        showStatus(message, 'error');
+        document.getElementById('searchResults').innerHTML = `
+            <div class="empty-state">
+                <p>${message}</p>
+            </div>
+        `;
+    };
+    
+    events.addEventListener('progress', function(e) {
+        const progress = JSON.parse(e.data);
+        showStatus(`正在抓取... (${progress.done}/${progress.total})`, 'info');
+    });
+    
+    events.addEventListener('done', function(e) {
+        events.close();
+        fetch(job.status_url)
+            .then(response => response.json())
+            .then(data => {
+                const result = data.data || {};
+                if (result.status !== 'done') {
+                    fail(result.error || '搜索失败，请稍后重试');
+                    return;
+                }
+                showLoading(false);
+                showStatus('', '');
+                const results = [];
+                (result.results || []).forEach(item => results.push(...item.results));
+                displaySearchResults(results, keyword);
+            })
+            .catch(() => fail('获取搜索结果失败，请稍后重试'));
+    });
+    
+    events.addEventListener('error', function(e) {
+        // 服务端发送的error事件带有数据；连接断开时EventSource会自动重连
+        if (e.data) {
+            fail(JSON.parse(e.data).message || '搜索失败，请稍后重试');
+        }
+    });
+}
+
 // 带重试和超时的fetch函数
 const fetchWithRetry = async (url, options, retries = 3) => {
     try {
@@ -12,6 +12,10 @@ document.getElementById('resetQuery').addEventListener('click', function() {
     document.getElementById('dateFrom').value = '';
     document.getElementById('dateTo').value = '';
     
+    // 丢弃进行中的请求结果
+    repositoryState.params = null;
+    repositoryState.nextCursor = null;
+    
     document.getElementById('repositoryData').innerHTML = `
         <div class="empty-state">
             <p>请输入查询条件获取数据</p>
@@ -21,6 +25,20 @@ document.getElementById('resetQuery').addEventListener('click', function() {
     showQueryStatus('', '');
 });
 
+// 每页加载的条数
+const REPOSITORY_PAGE_SIZE = 100;
+
+// 当前查询的分页状态
+const repositoryState = {
+    params: null,
+    nextCursor: null,
+    loaded: 0,
+    total: null,
+    notice: '',
+    loading: false,
+    observer: null
+};
+
 // 查询数据仓库
 function queryRepositoryData() {
     const keyword = document.getElementById('searchKeyword').value.trim();
@@ -37,20 +55,62 @@ function queryRepositoryData() {
     if (keyword) params.append('keyword', keyword);
     if (dateFrom) params.append('date_from', dateFrom);
     if (dateTo) params.append('date_to', dateTo);
+    params.append('limit', REPOSITORY_PAGE_SIZE);
+    
+    repositoryState.params = params;
+    repositoryState.nextCursor = null;
+    repositoryState.loaded = 0;
+    repositoryState.total = null;
+    repositoryState.loading = false;
     
-    const queryString = params.toString();
-    const url = `/get_repository_data${queryString ? `?${queryString}` : ''}`;
+    loadRepositoryPage(true);
+}
+
+// 加载一页数据，首页同时请求总数
+function loadRepositoryPage(firstPage) {
+    if (repositoryState.loading) return;
+    repositoryState.loading = true;
+    
+    const params = new URLSearchParams(repositoryState.params);
+    if (firstPage) {
+        params.append('total', '1');
+    } else {
+        params.append('after', repositoryState.nextCursor);
+    }
+    const url = `/get_repository_data?${params.toString()}`;
+    const requestParams = repositoryState.params;
     
     // 发送查询请求
     fetch(url)
         .then(response => response.json())
         .then(data => {
+            // 查询条件已变化时丢弃旧请求的结果
+            if (requestParams !== repositoryState.params) return;
             showQueryLoading(false);
             
             if (data.status === 'success') {
-                displayRepositoryData(data.data);
+                repositoryState.nextCursor = data.next_cursor;
+                if (firstPage) {
+                    repositoryState.total = data.total;
+                    // 排序方式有变化时（如涉及归档数据时按时间排序）附在状态消息后
+                    repositoryState.notice = data.notice || '';
+                }
+                displayRepositoryData(data.data, firstPage);
             } else {
                 showQueryStatus(data.message || '查询失败', 'error');
+                if (firstPage) {
+                    document.getElementById('repositoryData').innerHTML = `
+                        <div class="empty-state">
+                            <p>查询失败，请稍后重试</p>
+                        </div>
+                    `;
+                }
+            }
+        })
+        .catch(error => {
+            showQueryLoading(false);
+            showQueryStatus('网络错误，请检查您的连接', 'error');
+            if (firstPage) {
                 document.getElementById('repositoryData').innerHTML = `
                     <div class="empty-state">
                         <p>查询失败，请稍后重试</p>
@@ -58,14 +118,10 @@ function queryRepositoryData() {
                 `;
             }
         })
-        .catch(error => {
-            showQueryLoading(false);
-            showQueryStatus('网络错误，请检查您的连接', 'error');
-            document.getElementById('repositoryData').innerHTML = `
-                <div class="empty-state">
-                    <p>查询失败，请稍后重试</p>
-                </div>
-            `;
+        .finally(() => {
+            if (requestParams === repositoryState.params) {
+                repositoryState.loading = false;
+            }
         });
 }
 
@@ -91,11 +147,11 @@ function showQueryStatus(message, type) {
     }
 }
 
-// 显示数据仓库数据
-function displayRepositoryData(data) {
+// 显示数据仓库数据，首页创建表格，之后的页追加到表格末尾
+function displayRepositoryData(data, firstPage) {
     const dataContainer = document.getElementById('repositoryData');
     
-    if (!data || data.length === 0) {
+    if (firstPage && (!data || data.length === 0)) {
         dataContainer.innerHTML = `
             <div class="empty-state">
                 <p>没有找到符合条件的数据</p>
@@ -104,21 +160,32 @@ function displayRepositoryData(data) {
         return;
     }
     
-    // 创建表格
-    let html = `
-        <table class="data-table">
-            <thead>
-                <tr>
-                    <th>标题</th>
-                    <th>URL</th>
-                    <th>摘要</th>
-                    <th>搜索关键词</th>
-                    <th>创建时间</th>
-                </tr>
-            </thead>
-            <tbody>
-    `;
+    if (firstPage) {
+        // 创建表格
+        dataContainer.innerHTML = `
+            <table class="data-table">
+                <thead>
+                    <tr>
+                        <th>标题</th>
+                        <th>URL</th>
+                        <th>摘要</th>
+                        <th>搜索关键词</th>
+                        <th>创建时间</th>
+                    </tr>
+                </thead>
+                <tbody></tbody>
+            </table>
+            <div class="load-more">
+                <button type="button" id="loadMoreButton" class="btn btn-secondary">加载更多</button>
+            </div>
+        `;
+        document.getElementById('loadMoreButton').addEventListener('click', function() {
+            loadRepositoryPage(false);
+        });
+        observeLoadMore();
+    }
     
+    let html = '';
     data.forEach(item => {
         const formattedDate = formatDateTime(item.created_at);
         html += `
@@ -140,15 +207,37 @@ function displayRepositoryData(data) {
         `;
     });
     
-    html += `
-            </tbody>
-        </table>
-    `;
+    // 只插入本页的行，已渲染的行保持不变
+    dataContainer.querySelector('tbody').insertAdjacentHTML('beforeend', html);
+    repositoryState.loaded += data.length;
     
-    dataContainer.innerHTML = html;
+    const loadMore = dataContainer.querySelector('.load-more');
+    loadMore.style.display = repositoryState.nextCursor ? 'block' : 'none';
     
     // 显示成功消息
-    showQueryStatus(`共找到 ${data.length} 条数据`, 'info');
+    const notice = repositoryState.notice ? `（${repositoryState.notice}）` : '';
+    if (repositoryState.total !== null && repositoryState.total !== undefined) {
+        showQueryStatus(`共找到 ${repositoryState.total} 条数据，已加载 ${repositoryState.loaded} 条${notice}`, 'info');
+    } else {
+        showQueryStatus(`已加载 ${repositoryState.loaded} 条数据${notice}`, 'info');
+    }
+}
+
+// 滚动到“加载更多”按钮时自动加载下一页
+function observeLoadMore() {
+    if (!('IntersectionObserver' in window)) return;
+    
+    if (repositoryState.observer) {
+        repositoryState.observer.disconnect();
+    }
+    const loadMore = document.querySelector('#repositoryData .load-more');
+    const observer = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting) && repositoryState.nextCursor) {
+            loadRepositoryPage(false);
+        }
+    });
+    observer.observe(loadMore);
+    repositoryState.observer = observer;
 }
 
 // 格式化日期时间
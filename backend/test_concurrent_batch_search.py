@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+并发批量搜索测试脚本
+使用伪造的页面抓取函数离线验证并发批量搜索的合并、去重和限速逻辑
+"""
+
+from baidu_search_spider import BaiduSearchSpider
+from rate_limiter import MemoryBackend, TokenBucketLimiter
+from search_result import SearchResult
+
+
+def _make_spider(monkeypatch, fake_fetch):
+    """创建不访问网络的爬虫实例"""
+    spider = BaiduSearchSpider()
+    spider._cookies_ready = True
+    spider.limiter = TokenBucketLimiter(MemoryBackend(), rate=1000, burst=100)
+    monkeypatch.setattr(spider, 'fetch_page', fake_fetch)
+    return spider
+
+
+def _page(keyword, page, count=2):
+    return [
+        SearchResult(title=f'{keyword}-{page}-{i}', url=f'https://example.com/{keyword}/{i + page}', source='baidu')
+        for i in range(count)
+    ]
+
+
+def test_concurrent_matches_sequential_merge(monkeypatch):
+    """并发结果应与顺序搜索的去重结果一致，并按关键词给出耗时"""
+    async def fake_fetch(keyword, page):
+        if keyword == '空结果':
+            return {'status': 'success', 'results': []}
+        return {'status': 'success', 'results': _page(keyword, page)}
+
+    spider = _make_spider(monkeypatch, fake_fetch)
+    results, timings = spider.concurrent_batch_search(
+        ['成都', '四川', '成都', '空结果'], pages=2, max_workers=4
+    )
+
+    urls = [r.url for r in results]
+    assert len(urls) == len(set(urls))
+    # 第二页与第一页有一条重复URL，合并后每个关键词3条
+    assert urls[:3] == ['https://example.com/成都/0', 'https://example.com/成都/1', 'https://example.com/成都/2']
+    assert set(timings) == {'成都', '四川', '空结果'}
+    assert timings['四川']['result_count'] == 3
+    assert timings['成都']['pages'] == 2
+    # 没有结果的关键词返回模拟结果
+    assert any('example.com/news/空结果' in url for url in urls)
+
+
+def test_captcha_stops_keyword(monkeypatch):
+    """遇到验证码的页面之后的结果不再合并"""
+    async def fake_fetch(keyword, page):
+        if page == 1:
+            return {'status': 'captcha', 'results': []}
+        return {'status': 'success', 'results': _page(keyword, page)}
+
+    spider = _make_spider(monkeypatch, fake_fetch)
+    results, timings = spider.concurrent_batch_search(['成都'], pages=3, max_workers=3)
+    assert len(results) == 2
+    assert timings['成都']['statuses'] == ['success', 'captcha', 'success']
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, '-q']))
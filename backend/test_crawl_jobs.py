@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+后台抓取任务队列测试脚本
+验证任务提交去重、工作线程执行、部分失败与全部失败的状态、重启后重新排队以及进度事件流
+"""
+
+import json
+import threading
+import time
+
+import pytest
+
+import crawl_jobs
+from crawl_jobs import DONE, FAILED, QUEUED, RUNNING, JobQueue
+from db import ConnectionPool
+from search_result import SearchResult
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'database.db'))
+    yield pool
+    pool.close_all()
+
+
+def fake_runner(keyword):
+    if keyword.startswith('bad'):
+        raise RuntimeError(f'{keyword} 抓取失败')
+    return [SearchResult(title=f'{keyword} 标题', url=f'https://example.com/{keyword}')]
+
+
+def wait_finished(queue, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job['status'] in (DONE, FAILED):
+            return job
+        time.sleep(0.02)
+    raise AssertionError('任务未在限定时间内完成')
+
+
+def test_submit_dedupes_active_jobs(pool):
+    queue = JobQueue(pool, fake_runner)
+    queue.init_schema()
+    # 不启动工作线程，任务保持排队状态
+    queue.start = lambda: None
+
+    job, created = queue.submit(['a', 'b', ' a '])
+    assert created and job['status'] == QUEUED
+    assert job['keywords'] == ['a', 'b'] and job['total'] == 2
+
+    again, created = queue.submit(['b', 'a'])
+    assert not created and again['job_id'] == job['job_id']
+
+    with pytest.raises(ValueError):
+        queue.submit(['', '  '])
+    with pytest.raises(ValueError):
+        queue.submit([str(i) for i in range(crawl_jobs.MAX_KEYWORDS + 1)])
+
+
+def test_workers_run_jobs(pool):
+    queue = JobQueue(pool, fake_runner, workers=2)
+    try:
+        job, _ = queue.submit(['a', 'b'])
+        partial, _ = queue.submit(['c', 'bad1'])
+        failed, _ = queue.submit(['bad2'])
+
+        job = wait_finished(queue, job['job_id'])
+        assert job['status'] == DONE and job['done'] == 2
+        assert [r['keyword'] for r in job['results']] == ['a', 'b']
+        assert job['results'][0]['results'][0]['url'] == 'https://example.com/a'
+
+        # 部分关键词失败时任务仍算完成，失败的关键词记录错误
+        partial = wait_finished(queue, partial['job_id'])
+        assert partial['status'] == DONE
+        assert [r['status'] for r in partial['results']] == [DONE, FAILED]
+        assert '抓取失败' in partial['results'][1]['error']
+
+        failed = wait_finished(queue, failed['job_id'])
+        assert failed['status'] == FAILED and failed['error']
+
+        # 已结束的任务不再参与去重
+        _, created = queue.submit(['a', 'b'])
+        assert created
+    finally:
+        queue.stop(timeout=5)
+
+
+def test_restart_requeues_running_job(pool):
+    queue = JobQueue(pool, fake_runner)
+    queue.init_schema()
+    queue.start = lambda: None
+    job, _ = queue.submit(['a', 'b'])
+    # 模拟进程在第一个关键词完成后退出
+    conn = pool.connect()
+    with conn:
+        conn.execute("UPDATE crawl_jobs SET status = ?, done = 1 WHERE id = ?", (RUNNING, job['job_id']))
+        conn.execute(
+            "INSERT INTO crawl_job_results (job_id, position, keyword, status, results, error, elapsed) "
+            "VALUES (?, 0, 'a', ?, '[]', NULL, 0)", (job['job_id'], DONE)
+        )
+
+    calls = []
+    restarted = JobQueue(pool, lambda keyword: calls.append(keyword) or [])
+    try:
+        restarted.start()
+        job = wait_finished(restarted, job['job_id'])
+    finally:
+        restarted.stop(timeout=5)
+    # 已完成的关键词不会重新抓取
+    assert calls == ['b']
+    assert job['status'] == DONE and job['done'] == 2
+
+
+def test_events_stream_progress(pool):
+    release = threading.Event()
+
+    def slow_runner(keyword):
+        release.wait(5)
+        return []
+
+    queue = JobQueue(pool, slow_runner, workers=1)
+    try:
+        job, _ = queue.submit(['a'])
+        events = queue.events(job['job_id'], timeout=10)
+        first = next(events)
+        assert first.startswith('event: progress\n')
+        release.set()
+        last = list(events)[-1]
+        assert last.startswith('event: done\n')
+        data = json.loads(last.split('data: ', 1)[1])
+        assert data['status'] == DONE and data['done'] == 1
+    finally:
+        queue.stop(timeout=5)
+
+    assert next(queue.events('missing')).startswith('event: error\n')
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
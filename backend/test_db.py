@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+数据库连接池测试脚本
+验证按线程复用连接、PRAGMA设置、请求结束归还连接、统计信息以及WAL下读写互不阻塞
+"""
+
+import sqlite3
+import threading
+
+import pytest
+from flask import Flask
+
+from db import ConnectionPool, get_db, init_app
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'database.db'))
+    yield pool
+    pool.close_all()
+
+
+def test_connection_reused_per_thread(pool):
+    conn = pool.connect()
+    assert pool.connect() is conn
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(pool.connect()))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+    stats = pool.stats()
+    # 已退出线程的连接在统计时被关闭
+    assert (stats['opened'], stats['reused'], stats['closed'], stats['open_connections']) == (2, 1, 1, 1)
+
+
+def test_release_rolls_back_open_transaction(pool):
+    conn = pool.connect()
+    conn.execute('CREATE TABLE t (x INTEGER)')
+    conn.commit()
+    conn.execute('INSERT INTO t VALUES (1)')
+    pool.release(conn)
+    assert conn.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 0
+    assert pool.stats()['rollbacks'] == 1
+
+
+def test_readers_not_blocked_by_writer(pool):
+    writer = pool.connect()
+    writer.execute('CREATE TABLE t (x INTEGER)')
+    writer.execute('INSERT INTO t VALUES (1)')
+    writer.commit()
+    writer.execute('BEGIN IMMEDIATE')
+    writer.execute('INSERT INTO t VALUES (2)')
+
+    result = []
+    reader_pool = ConnectionPool(pool.path, timeout=0.1)
+    thread = threading.Thread(target=lambda: result.append(
+        reader_pool.connect().execute('SELECT COUNT(*) FROM t').fetchone()[0]))
+    thread.start()
+    thread.join()
+    writer.commit()
+    reader_pool.close_all()
+    # 读到写事务开始前的快照，没有等待写锁
+    assert result == [1]
+
+
+def test_flask_app_context(tmp_path):
+    app = Flask(__name__)
+    pool = init_app(app, str(tmp_path / 'database.db'))
+
+    @app.route('/')
+    def index():
+        conn = get_db()
+        assert get_db() is conn
+        conn.execute('CREATE TABLE IF NOT EXISTS t (x INTEGER)')
+        conn.execute('INSERT INTO t VALUES (1)')  # 未提交，请求结束时回滚
+        return 'ok'
+
+    client = app.test_client()
+    assert client.get('/').data == b'ok'
+    assert client.get('/').data == b'ok'
+    stats = pool.stats()
+    assert stats['opened'] == 1 and stats['rollbacks'] == 2
+    assert sqlite3.connect(pool.path).execute('SELECT COUNT(*) FROM t').fetchone()[0] == 0
+    pool.close_all()
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+落地页正文补全测试脚本
+使用本地HTTP服务验证正文提取与入库、编码识别、非HTML页面跳过、读取字节上限、单域名并发上限和失败重试
+"""
+
+import asyncio
+import gzip
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import enrichment
+from db import ConnectionPool
+from enrichment import ERROR, OK, SKIPPED, Enricher
+from http_pool import HttpPool, get_pool
+from repository import init_repository
+
+ARTICLE = ('<html><head><title>运动会</title></head><body><nav>首页</nav><article><p>'
+           + '四川农业大学运动会在雅安校区举行。' * 20 + '</p></article></body></html>')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def _send(self, body, content_type, status=200, encoding=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/article':
+            self._send(gzip.compress(ARTICLE.encode('utf-8')), 'text/html; charset=utf-8', encoding='gzip')
+        elif self.path == '/gbk':
+            page = '<html><head><meta charset="gb2312"></head><body><p>成都平原今日多云，气温适宜出行。</p></body></html>'
+            self._send(page.encode('gbk'), 'text/html')
+        elif self.path == '/pdf':
+            self._send(b'%PDF-1.4' + b'0' * 1000, 'application/pdf')
+        elif self.path == '/huge':
+            self._send(('<html><body>' + '<div>无正文区域的很长的页面内容。</div>' * 20000).encode('utf-8'),
+                       'text/html; charset=utf-8')
+        elif self.path.startswith('/slow'):
+            with _Handler.lock:
+                _Handler.active += 1
+                _Handler.max_active = max(_Handler.max_active, _Handler.active)
+            time.sleep(0.1)
+            with _Handler.lock:
+                _Handler.active -= 1
+            self._send('<p>慢速页面的正文内容足够长。</p>'.encode('utf-8'), 'text/html; charset=utf-8')
+        else:
+            self._send(b'not found', 'text/plain', status=404)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_port():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address[1]
+    server.shutdown()
+
+
+@pytest.fixture
+def pools(tmp_path):
+    db_pool = ConnectionPool(str(tmp_path / 'database.db'))
+    init_repository(db_pool.connect())
+    http_pool = HttpPool()
+    yield db_pool, http_pool
+    http_pool.close()
+    db_pool.close_all()
+
+
+def _insert(db_pool, urls):
+    conn = db_pool.connect()
+    conn.executemany(
+        "INSERT INTO data_repository (title, url, summary, search_keyword) VALUES ('标题', ?, '', 'k')",
+        [(url,) for url in urls]
+    )
+    conn.commit()
+    return [row[0] for row in conn.execute("SELECT id FROM data_repository ORDER BY id")]
+
+
+def test_enrich_batch(pools, server_port):
+    db_pool, http_pool = pools
+    base = f'http://127.0.0.1:{server_port}'
+    paths = ['/article', '/gbk', '/pdf', '/missing', '/huge']
+    ids = dict(zip(paths, _insert(db_pool, [base + path for path in paths] + ['javascript:void(0)'])))
+    enricher = Enricher(db_pool, http_pool, max_bytes=64 * 1024)
+    enricher.init_schema()
+
+    assert enricher.run_batch() == {OK: 3, SKIPPED: 2, ERROR: 1}
+    article = enricher.get(ids['/article'])
+    assert article['page_title'] == '运动会'
+    assert article['content'].startswith('四川农业大学运动会') and '首页' not in article['content']
+    assert article['bytes_read'] == len(ARTICLE.encode('utf-8')) and not article['truncated']
+
+    assert enricher.get(ids['/gbk'])['content'] == '成都平原今日多云，气温适宜出行。'
+    assert enricher.get(ids['/pdf'])['status'] == SKIPPED
+    assert enricher.get(ids['/missing'])['error'] == 'HTTP 404'
+
+    huge = enricher.get(ids['/huge'])
+    assert huge['status'] == OK and huge['truncated']
+    assert huge['bytes_read'] <= 64 * 1024
+    assert 0 < huge['content_length'] <= enrichment.MAX_TEXT_CHARS
+
+    # 已抓取的记录不再处理；失败的记录在重试间隔之后重新抓取
+    assert enricher.run_batch() == {}
+    enrichment.RETRY_AFTER, retry_after = 0, enrichment.RETRY_AFTER
+    try:
+        assert enricher.run_batch() == {ERROR: 1}
+        assert enricher.get(ids['/missing'])['attempts'] == 2
+    finally:
+        enrichment.RETRY_AFTER = retry_after
+    stats = enricher.stats()
+    assert (stats[OK], stats['pending']) == (3, 0)
+
+    # 删除数据仓库记录时同时删除正文
+    conn = db_pool.connect()
+    conn.execute("DELETE FROM data_repository WHERE id = ?", (ids['/article'],))
+    conn.commit()
+    assert enricher.get(ids['/article']) is None
+
+
+def test_per_domain_concurrency(pools, server_port):
+    db_pool, http_pool = pools
+    _Handler.max_active = 0
+    _insert(db_pool, [f'http://127.0.0.1:{server_port}/slow{i}' for i in range(6)])
+    enricher = Enricher(db_pool, http_pool, concurrency=8, per_domain=2)
+    enricher.init_schema()
+    start = time.perf_counter()
+    assert enricher.run_batch() == {OK: 6}
+    assert _Handler.max_active == 2
+    assert time.perf_counter() - start >= 0.3
+
+
+def test_default_pool_is_dedicated(pools):
+    """默认使用专用连接池，正文解析不在实时搜索的共享事件循环中执行"""
+    db_pool, _ = pools
+    enricher = Enricher(db_pool, concurrency=4)
+    assert enricher.http_pool is not get_pool() and enricher.http_pool.limit == 4
+    enricher.http_pool.run(asyncio.sleep(0))
+    assert enricher.http_pool._loop is not None
+    enricher.stop()
+    assert enricher.http_pool._loop is None
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+数据仓库导出测试脚本
+验证查询条件下推、分批读取、未安装pyarrow时的提示，安装了pyarrow时Parquet/Feather文件的内容，
+以及CSV/NDJSON的流式生成和gzip压缩
+"""
+
+import csv
+import gzip
+import io
+import json
+import sqlite3
+
+import pytest
+
+import export
+from export import ExportUnavailable, export_repository, export_text, iter_chunks, iter_rows
+from partitions import RepositoryArchive
+from repository import init_repository
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    init_repository(conn)
+    conn.executemany(
+        "INSERT INTO data_repository (title, url, summary, search_keyword, created_at) VALUES (?, ?, ?, ?, ?)",
+        [(f'成都新闻第{i}条', f'https://a.com/{i}', '摘要' if i % 2 else None, '成都' if i % 3 else '雅安',
+          f'2024-01-{1 + i % 28:02d} 08:00:00') for i in range(25)]
+    )
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_rows_filtered_in_sql_and_chunked(conn):
+    rows = iter_rows(conn, search_keyword='雅安', date_from='2024-01-05')
+    chunks = list(iter_chunks(rows, size=2))
+    ids = [row[0] for chunk in chunks for row in chunk]
+    assert ids == [row[0] for row in conn.execute(
+        "SELECT id FROM data_repository WHERE search_keyword = '雅安' AND created_at >= '2024-01-05' "
+        "ORDER BY created_at DESC, id DESC")]
+    assert [len(chunk) for chunk in chunks][:-1] == [2] * (len(chunks) - 1)
+
+    # 生成器（含归档分区的查询）同样按批切分
+    assert [len(chunk) for chunk in iter_chunks(iter(range(5)), size=2)] == [2, 2, 1]
+
+
+def test_missing_pyarrow_reported(conn, monkeypatch):
+    monkeypatch.setattr(export, 'pa', None)
+    with pytest.raises(ExportUnavailable):
+        export_repository(conn, 'unused.parquet')
+    with pytest.raises(ValueError):
+        export_repository(conn, 'unused.csv', fmt='xlsx')
+
+
+@pytest.mark.parametrize('fmt', ['parquet', 'feather'])
+def test_arrow_export(conn, tmp_path, fmt):
+    pa = pytest.importorskip('pyarrow')
+    archive = RepositoryArchive(str(tmp_path / 'archive'))
+    archive.init_schema(conn)
+    path = str(tmp_path / f'repository.{fmt}')
+    assert export_repository(conn, path, fmt, keyword='成都', archive=archive, batch_rows=7) == 25
+
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        table = pq.read_table(path)
+        assert pq.ParquetFile(path).num_row_groups == 4
+    else:
+        import pyarrow.feather as feather
+        table = feather.read_table(path)
+    assert table.schema.field('created_at').type == pa.timestamp('s')
+    rows = table.to_pylist()
+    assert [row['id'] for row in rows] == [row[0] for row in conn.execute(
+        "SELECT id FROM data_repository ORDER BY created_at DESC, id DESC")]
+    assert rows[0]['created_at'].strftime('%Y-%m-%d %H:%M:%S') == '2024-01-25 08:00:00'
+
+
+def test_text_export_streams_in_batches(conn):
+    expected = [row[0] for row in conn.execute(
+        "SELECT id FROM data_repository WHERE search_keyword = '成都' ORDER BY created_at DESC, id DESC")]
+
+    # NDJSON每批一段，每行一个JSON对象
+    chunks = list(export_text(conn, 'ndjson', search_keyword='成都', batch_rows=5))
+    assert len(chunks) == 4
+    rows = [json.loads(line) for line in b''.join(chunks).decode('utf-8').splitlines()]
+    assert [row['id'] for row in rows] == expected
+    assert rows[0]['title'].startswith('成都新闻') and 'created_at' in rows[0]
+
+    # gzip压缩后内容一致，CSV带BOM和列名，空值输出为空字段
+    data = gzip.decompress(b''.join(export_text(conn, 'csv', compress=True, batch_rows=7)))
+    assert data.startswith('\ufeff'.encode('utf-8'))
+    records = list(csv.DictReader(io.StringIO(data.decode('utf-8-sig'))))
+    assert len(records) == 25
+    assert {record['summary'] for record in records} == {'摘要', ''}
+
+    # 中途停止读取时游标随生成器关闭
+    stream = export_text(conn, 'csv', batch_rows=1)
+    next(stream)
+    stream.close()
+    with pytest.raises(ValueError):
+        export_text(conn, 'xlsx')
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+多爬虫并行调度测试脚本
+验证爬虫并行执行、截止时间后取消未返回的爬虫、异常隔离以及耗时统计
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from fanout import ERROR, OK, TIMEOUT, SpiderTimings, fan_out
+
+
+def test_spiders_run_in_parallel_under_deadline():
+    cancelled = []
+
+    async def fast():
+        await asyncio.sleep(0.05)
+        return ['fast']
+
+    async def slow():
+        await asyncio.sleep(0.1)
+        return ['slow']
+
+    async def straggler():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def broken():
+        raise RuntimeError('解析失败')
+
+    def blocking():
+        time.sleep(0.05)
+        return ['blocking']
+
+    timings = SpiderTimings()
+    start = time.perf_counter()
+    runs = fan_out(
+        {'fast': fast, 'slow': slow, 'straggler': straggler, 'broken': broken, 'blocking': blocking},
+        deadline=0.5, timings=timings
+    )
+    elapsed = time.perf_counter() - start
+
+    # 总耗时由截止时间决定，而不是各爬虫耗时之和
+    assert elapsed < 2
+    assert [run['name'] for run in runs] == ['fast', 'slow', 'straggler', 'broken', 'blocking']
+    by_name = {run['name']: run for run in runs}
+    assert by_name['fast']['status'] == OK and by_name['fast']['result'] == ['fast']
+    assert by_name['slow']['result'] == ['slow']
+    assert by_name['blocking']['result'] == ['blocking']
+    assert by_name['straggler']['status'] == TIMEOUT and by_name['straggler']['elapsed'] == 0.5
+    assert by_name['broken']['status'] == ERROR and 'RuntimeError' in by_name['broken']['error']
+    assert cancelled == [True]
+    assert 0.05 <= by_name['slow']['elapsed'] < 0.5
+
+    stats = timings.stats()
+    assert stats['straggler'][TIMEOUT] == 1 and stats['straggler']['calls'] == 1
+    assert stats['fast'][OK] == 1
+
+
+def test_timing_percentiles():
+    timings = SpiderTimings(samples=100)
+    for i in range(1, 101):
+        timings.record({'name': 'spider', 'status': OK, 'elapsed': i / 100})
+    stats = timings.stats()['spider']
+    assert (stats['p50'], stats['p95'], stats['max']) == (0.5, 0.95, 1.0)
+    # 只保留最近的样本
+    timings.record({'name': 'spider', 'status': OK, 'elapsed': 2.0})
+    assert timings.stats()['spider']['calls'] == 101
+    assert timings.stats()['spider']['max'] == 2.0
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
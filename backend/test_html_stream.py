@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+流式HTML读取测试脚本
+验证分块输入时的编码识别（多字节字符被切断、meta声明、BOM）和正文提取
+"""
+
+import pytest
+
+from html_stream import HtmlStreamReader, MainTextExtractor, StreamDecoder, normalize_charset, sniff_charset
+
+
+def _chunks(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def _decode(data, charset=None, size=7):
+    decoder = StreamDecoder(charset)
+    return ''.join(decoder.decode(chunk) for chunk in _chunks(data, size)) + decoder.flush(), decoder.charset
+
+
+def test_charset_detection():
+    assert normalize_charset('GB2312') == 'gb18030'
+    assert normalize_charset('"UTF-8"') == 'utf-8'
+    assert normalize_charset('no-such-charset') is None
+    assert sniff_charset(b'<html><meta http-equiv="Content-Type" content="text/html; charset=gbk">') == 'gb18030'
+    assert sniff_charset(b'\xef\xbb\xbf<html>') == 'utf-8-sig'
+    assert sniff_charset(b'<html>') is None
+
+
+@pytest.mark.parametrize('size', [1, 3, 7, 4096])
+def test_decoder_handles_split_multibyte_characters(size):
+    page = '<html><head><meta charset="gbk"></head><body>四川农业大学' + '成都' * 2000 + '</body></html>'
+    text, charset = _decode(page.encode('gbk'), size=size)
+    assert text == page and charset == 'gb18030'
+
+    # 响应头声明的编码优先于页面内的声明
+    text, charset = _decode(page.encode('utf-8'), charset='utf-8', size=size)
+    assert text == page and charset == 'utf-8'
+
+    # 短页面没有声明编码时按utf-8解码
+    assert _decode('短页面'.encode('utf-8'), size=size) == ('短页面', 'utf-8')
+
+
+def test_main_text_prefers_article():
+    page = (
+        '<html><head><title>新闻标题</title><style>p {color: red}</style></head><body>'
+        '<nav><a href="/">首页</a><a href="/news">新闻</a></nav>'
+        '<div>广告</div>'
+        '<article><h1>四川农业大学举办运动会</h1><p>' + '运动会在雅安校区举行。' * 30 + '</p>'
+        '<script>var x = "不应出现";</script><p>第二段&amp;结尾</p></article>'
+        '<footer>版权所有</footer></body></html>'
+    )
+    reader = HtmlStreamReader(MainTextExtractor())
+    for chunk in _chunks(page.encode('utf-8'), 50):
+        reader.feed(chunk)
+    extractor = reader.close()
+    assert extractor.title == '新闻标题'
+    assert extractor.text.startswith('四川农业大学举办运动会\n运动会在雅安校区举行。')
+    assert extractor.text.endswith('第二段&结尾')
+    for noise in ('首页', '广告', '不应出现', '版权所有', 'color'):
+        assert noise not in extractor.text
+
+
+def test_main_text_without_article_keeps_long_blocks_and_stops_early():
+    extractor = MainTextExtractor(max_chars=100, min_block_chars=10)
+    reader = HtmlStreamReader(extractor, charset='utf-8')
+    done = reader.feed('<div>菜单</div><p>这是一个足够长的正文段落，应当被保留下来。</p>'.encode('utf-8'))
+    assert not done
+    assert reader.close().text == '这是一个足够长的正文段落，应当被保留下来。'
+
+    extractor = MainTextExtractor(max_chars=100)
+    reader = HtmlStreamReader(extractor, charset='utf-8')
+    chunks = ['<p>' + '正文' * 20 + '</p>' for _ in range(20)]
+    fed = 0
+    for chunk in chunks:
+        fed += 1
+        if reader.feed(chunk.encode('utf-8')):
+            break
+    assert fed < len(chunks)
+    assert len(reader.close().text) == 100
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+共享HTTP连接池测试脚本
+使用本地HTTP服务验证同步包装、跨事件循环调用、异常转换，以及压缩协商、条件请求（含流式读取）和节省字节统计
+"""
+
+import asyncio
+import gzip
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from http_pool import ACCEPT_ENCODING, MAX_DECODE_CHUNK, ContentDecoder, HttpPool, ValidatorStore, decode_content
+
+
+PAGE = ('<html>' + '成都新闻 ' * 500 + '</html>').encode('utf-8')
+# 16MB的0压缩后只有十几KB
+BOMB = gzip.compress(b'\0' * (16 * 1024 * 1024))
+ETAG = '"page-v1"'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/page':
+            self._send_page()
+            return
+        if self.path == '/bomb':
+            self.send_response(200)
+            self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(BOMB)))
+            self.end_headers()
+            self.wfile.write(BOMB)
+            return
+        if self.path == '/missing':
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = '百度一下'.encode('gbk')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=gbk')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_page(self):
+        """支持gzip和ETag校验的页面"""
+        if self.headers.get('If-None-Match') == ETAG:
+            self.send_response(304)
+            self.send_header('ETag', ETAG)
+            self.end_headers()
+            return
+        body = PAGE
+        gzipped = 'gzip' in self.headers.get('Accept-Encoding', '')
+        if gzipped:
+            body = gzip.compress(body)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('ETag', ETAG)
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+
+
+def test_sync_and_async_callers_share_pool(server_url):
+    """同步调用和其他事件循环中的await都通过同一个连接池完成"""
+    pool = HttpPool(limit=4)
+    try:
+        response = pool.run(pool.get(server_url + '/'))
+        assert response.status_code == 200
+        assert response.text == '百度一下'
+
+        async def many():
+            return await asyncio.gather(*[pool.get(server_url + '/') for _ in range(10)])
+
+        responses = asyncio.run(many())
+        assert all(r.status_code == 200 for r in responses)
+    finally:
+        pool.close()
+
+
+def test_errors_map_to_requests_exceptions(server_url):
+    """HTTP错误和连接错误转换为requests异常"""
+    pool = HttpPool()
+    try:
+        response = pool.run(pool.get(server_url + '/missing'))
+        with pytest.raises(requests.exceptions.HTTPError):
+            response.raise_for_status()
+
+        with pytest.raises(requests.exceptions.ConnectionError):
+            pool.run(pool.get('http://127.0.0.1:1/'))
+    finally:
+        pool.close()
+
+
+def test_compression_and_conditional_requests(server_url):
+    """协商gzip并解压；带验证器再次抓取时收到304，统计节省的字节数"""
+    pool = HttpPool()
+    validators = ValidatorStore()
+    url = server_url + '/page'
+    try:
+        first = pool.run(pool.get(url, validators=validators))
+        assert first.status_code == 200 and first.content == PAGE
+        assert first.wire_bytes < len(PAGE)
+        assert 'gzip' in ACCEPT_ENCODING
+        assert validators.get(url)['etag'] == ETAG
+        validators.set_payload(url, ['解析结果'])
+
+        second = pool.run(pool.get(url, validators=validators))
+        assert second.not_modified and second.content == b''
+        assert second.validators['payload'] == ['解析结果']
+
+        # 不传验证器时不发送条件请求
+        assert pool.run(pool.get(url)).status_code == 200
+
+        stats = pool.stats()
+        assert (stats['requests'], stats['conditional'], stats['not_modified']) == (3, 1, 1)
+        assert stats['not_modified_saved_bytes'] == len(PAGE)
+        assert stats['compression_saved_bytes'] == 2 * (len(PAGE) - first.wire_bytes)
+        assert 0 < stats['saved_ratio'] < 1
+    finally:
+        pool.close()
+
+
+def test_stream_with_validators(server_url):
+    """流式读取同样发送条件请求，304时不调用consumer"""
+    pool = HttpPool()
+    validators = ValidatorStore()
+    url = server_url + '/page'
+    chunks = []
+    try:
+        first = pool.run(pool.stream(url, lambda response: chunks.append, validators=validators, chunk_size=256))
+        assert b''.join(chunks) == PAGE and first.body_bytes == len(PAGE)
+        assert validators.get(url)['etag'] == ETAG
+
+        second = pool.run(pool.stream(url, lambda response: pytest.fail('304时不应读取响应体'),
+                                      validators=validators))
+        assert second.not_modified and second.validators['etag'] == ETAG
+        assert pool.stats()['not_modified'] == 1
+    finally:
+        pool.close()
+
+
+def test_decode_content():
+    assert decode_content(gzip.compress(b'abc'), 'gzip') == b'abc'
+    assert decode_content(zlib.compress(b'abc'), 'deflate') == b'abc'
+    raw_deflate = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    assert decode_content(raw_deflate.compress(b'abc') + raw_deflate.flush(), 'deflate') == b'abc'
+    assert decode_content(b'abc', None) == b'abc'
+    assert decode_content(b'', 'gzip') == b''
+
+
+def test_decoder_output_is_bounded():
+    decoder = ContentDecoder('gzip')
+    sizes = [len(decoder.decompress(BOMB[:16384], 1000))]
+    while decoder.pending:
+        sizes.append(len(decoder.decompress(b'', 1000)))
+    data = decoder.decompress(BOMB[16384:], 1000)
+    sizes.append(len(data))
+    while True:
+        data = decoder.flush(1000)
+        if not data and not decoder.pending:
+            break
+        sizes.append(len(data))
+    assert max(sizes) <= 1000 and sum(sizes) == 16 * 1024 * 1024
+
+
+def test_stream_limits_decompressed_bytes(server_url):
+    """高压缩率的响应按解压后的字节数截断，每次交给consumer的数据不超过单次输出上限"""
+    pool = HttpPool()
+    sizes = []
+    try:
+        response = pool.run(pool.stream(server_url + '/bomb', lambda response: lambda data: sizes.append(len(data)),
+                                        max_bytes=512 * 1024))
+        assert response.truncated and response.body_bytes == sum(sizes) == 512 * 1024
+        assert max(sizes) <= MAX_DECODE_CHUNK
+
+        sizes.clear()
+        response = pool.run(pool.stream(server_url + '/bomb', lambda response: lambda data: sizes.append(len(data))))
+        assert not response.truncated and sum(sizes) == 16 * 1024 * 1024
+        assert max(sizes) <= MAX_DECODE_CHUNK
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
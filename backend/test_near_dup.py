@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+近似重复检测索引测试脚本
+验证标题标准化、增量去重、阈值以及数据仓库的全量和增量加载
+"""
+
+import os
+import sqlite3
+import sys
+
+import pytest
+
+from near_dup import NearDupIndex, RepositoryIndex, find_repository_duplicates, jaccard, normalize_title, shingles
+from search_result import SearchResult
+
+
+def test_normalize_title_strips_punctuation():
+    assert normalize_title('四川农业大学 - 官方网站！') == '四川农业大学官方网站'
+    assert normalize_title('ＡＢＣ, abc') == 'abcabc'
+    assert shingles('') == frozenset()
+
+
+def test_incremental_dedup_with_threshold():
+    index = NearDupIndex(threshold=0.8, shingle_size=2)
+    assert index.check_and_add(1, '四川农业大学2024年招生简章发布') is None
+    # 只有标点和空白不同
+    assert index.check_and_add(2, '四川农业大学 2024年招生简章发布！') == 1
+    assert index.check_and_add(3, '成都市今日天气预报') is None
+    assert len(index) == 2
+    # 空标题不参与去重
+    assert index.check_and_add(4, '——') is None
+    assert 4 not in index
+
+    strict = NearDupIndex(threshold=0.95, shingle_size=2)
+    strict.add(1, '四川农业大学2024年招生简章发布')
+    assert strict.query('四川农业大学2024年招生简章正式发布') is None
+    loose = NearDupIndex(threshold=0.6, shingle_size=2)
+    loose.add(1, '四川农业大学2024年招生简章发布')
+    assert loose.query('四川农业大学2024年招生简章正式发布') == 1
+
+
+def test_lsh_agrees_with_exact_comparison():
+    """LSH候选筛选不漏掉高相似度的重复"""
+    titles = [f'四川农业大学第{i}届学术年会在雅安召开' for i in range(200)]
+    index = NearDupIndex(threshold=0.8, shingle_size=1)
+    for i, title in enumerate(titles):
+        index.add(i, title)
+    probe = '四川农业大学第7届学术年会在雅安隆重召开'
+    expected = any(jaccard(shingles(probe), shingles(t)) >= 0.8 for t in titles)
+    assert expected and index.query(probe) is not None
+
+
+def _make_repository(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE data_repository (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT, url TEXT, summary TEXT)')
+    conn.executemany('INSERT INTO data_repository (title, url) VALUES (?, ?)', rows)
+    conn.commit()
+    conn.close()
+
+
+def test_repository_index_loads_incrementally(tmp_path):
+    path = str(tmp_path / 'database.db')
+    _make_repository(path, [('四川农业大学招生简章发布', 'https://a.com/1'), ('成都天气', 'https://a.com/2')])
+    repo = RepositoryIndex(path)
+    repo.refresh()
+    assert repo.find_duplicate('四川农业大学 招生简章发布', 'https://b.com') == 1
+    assert repo.find_duplicate('完全不同的标题', 'https://a.com/2') == 2
+    assert repo.find_duplicate('完全不同的标题', 'https://b.com') is None
+
+    # 其他进程写入的记录在下次刷新时增量加载
+    conn = sqlite3.connect(path)
+    conn.execute('INSERT INTO data_repository (title, url) VALUES (?, ?)', ('雅安大熊猫基地开放', 'https://a.com/3'))
+    conn.commit()
+    conn.close()
+    repo.refresh()
+    assert repo.last_id == 3
+    assert repo.find_duplicate('雅安大熊猫基地开放！', None) == 3
+
+
+def test_find_repository_duplicates(tmp_path):
+    path = str(tmp_path / 'database.db')
+    _make_repository(path, [
+        ('四川农业大学招生简章发布', 'https://a.com/1'),
+        ('四川农业大学——招生简章发布', 'https://a.com/2'),
+        ('成都天气', 'https://a.com/3'),
+        ('另一个标题', 'https://a.com/3'),
+    ])
+    assert find_repository_duplicates(path) == [(2, 1), (4, 3)]
+
+
+def test_spider_dedup_uses_index():
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'codedemo'))
+    from baidu_spider import BaiduSpider
+    results = [
+        SearchResult(title='四川农业大学官网', url='https://a.com/1'),
+        SearchResult(title='四川农业大学 官网', url='https://a.com/2'),
+        SearchResult(title='雅安天气预报', url='https://a.com/3'),
+    ]
+    unique = BaiduSpider()._deduplicate_results(results)
+    # 去重后不足5条时放宽条件补回URL不同的结果
+    assert [r.url for r in unique] == ['https://a.com/1', 'https://a.com/3', 'https://a.com/2']
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
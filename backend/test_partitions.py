@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+数据仓库按月归档测试脚本
+验证归档后全文索引和统计同步、按日期裁剪分区、跨分区按时间归并与键集分页、关键词查询涉及归档分区时的排序、
+只读文件和冷存储分区的跳过，以及已归档记录的URL去重和近似重复检查
+"""
+
+import json
+import os
+import sqlite3
+import stat
+
+import pytest
+
+from near_dup import RepositoryIndex
+from partitions import RepositoryArchive, month_of, next_month, shift_month
+from repository import (FTS_TABLE, RepositoryPage, count_repository, init_repository, search_repository,
+                        stream_page_json, upsert_results)
+from ranking import rank_stats
+from search_result import SearchResult
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'database.db'))
+    init_repository(conn)
+    # 2024年1月到4月，每月5条，同一时刻有多条记录
+    conn.executemany(
+        "INSERT INTO data_repository (title, url, summary, search_keyword, created_at) VALUES (?, ?, ?, ?, ?)",
+        [(f'成都新闻{month}月第{i}条', f'https://a.com/{month}/{i}', '四川农业大学动态', '成都' if i % 2 else '雅安',
+          f'2024-{month:02d}-{1 + i // 2:02d} 08:00:00')
+         for month in range(1, 5) for i in range(5)]
+    )
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def archive(tmp_path, conn):
+    archive = RepositoryArchive(str(tmp_path / 'archive'))
+    archive.init_schema(conn)
+    return archive
+
+
+def _all_ids(conn, archive, **filters):
+    ids = []
+    after = None
+    while True:
+        page = RepositoryPage(conn, sort='time', limit=3, after=after, archive=archive, **filters)
+        ids.extend(row['id'] for row in page)
+        after = page.next_cursor
+        if after is None:
+            return ids
+
+
+def test_month_helpers():
+    assert month_of('2024-03-05 10:00:00') == '2024-03' and month_of('昨天') is None
+    assert next_month('2024-12') == '2025-01'
+    assert shift_month('2024-02', -2) == '2023-12'
+
+
+def test_archive_moves_rows_and_routes_queries(conn, archive):
+    expected = _all_ids(conn, None)
+    expected_keyword = _all_ids(conn, None, keyword='成都新闻', search_keyword='成都')
+    assert len(expected_keyword) == 8
+    assert archive.archive_before(conn, '2024-03') == {'2024-01': 5, '2024-02': 5}
+    assert conn.execute("SELECT COUNT(*) FROM data_repository").fetchone()[0] == 10
+    assert [p['month'] for p in archive.partitions(conn)] == ['2024-02', '2024-01']
+    # 删除触发器同步了全文索引和BM25统计
+    conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('integrity-check')")
+    assert rank_stats(conn)['doc_count'] == 10
+
+    # 跨分区归并后的顺序与归档前一致，键集分页不重不漏
+    assert _all_ids(conn, archive) == expected
+    # 归档分区的LIKE匹配与data_repository的全文检索结果一致
+    assert _all_ids(conn, archive, keyword='成都新闻', search_keyword='成都') == expected_keyword
+    assert count_repository(conn, '农业大学', archive=archive) == 20
+    assert count_repository(conn, date_from='2024-01-03', date_to='2024-02-02', archive=archive) == 3
+
+    # 相关性排序只查询data_repository；未指定排序方式时涉及归档分区则按时间排序并说明
+    page = RepositoryPage(conn, '成都新闻', sort='relevance', archive=archive)
+    assert page.sort == 'relevance' and page.archive is None and len(list(page)) == 10 and page.notice
+    page = RepositoryPage(conn, '成都新闻', archive=archive)
+    assert page.sort == 'time' and page.archive is archive and len(list(page)) == 20 and page.notice
+    page = RepositoryPage(conn, '成都新闻', date_from='2024-03-01', archive=archive)
+    assert page.sort == 'relevance' and page.notice is None
+    trailer = json.loads(''.join(stream_page_json(RepositoryPage(conn, '成都新闻', limit=5, archive=archive))))
+    assert trailer['sort'] == 'time' and trailer['notice'] and len(trailer['data']) == 5
+
+
+def test_prune_and_cold_storage(conn, archive):
+    archive.archive_before(conn, '2024-04')
+    assert archive.prune(conn, '2024-02-10', '2024-03-01') == ['2024-03', '2024-02']
+    assert archive.prune(conn, date_to='2024-01-31') == ['2024-01']
+
+    # 归档文件设为只读
+    path = archive.path('2024-01')
+    assert not os.stat(path).st_mode & stat.S_IWUSR
+
+    # 不相关的分区不会被打开：移走1月的文件不影响2月的查询
+    os.rename(path, path + '.cold')
+    rows = list(RepositoryPage(conn, date_from='2024-02-01', date_to='2024-02-28', archive=archive))
+    assert [row['created_at'][:7] for row in rows] == ['2024-02'] * 5
+    # 查询范围包含已移到冷存储的分区时跳过该分区
+    assert len(list(RepositoryPage(conn, limit=100, archive=archive))) == 15
+
+    # 再次归档同一个月份（如中途失败后重试）不会产生重复记录
+    os.rename(path + '.cold', path)
+    conn.execute(
+        "INSERT INTO data_repository (title, url, summary, search_keyword, created_at) "
+        "VALUES ('迟到的记录', 'https://late.com', '', '成都', '2024-01-20 00:00:00')"
+    )
+    conn.commit()
+    assert archive.archive_month(conn, '2024-01') == 1
+    assert archive.partitions(conn)[-1]['row_count'] == 6
+    assert len(_all_ids(conn, archive)) == 21
+    assert search_repository(conn, date_to='2024-03-31').fetchall() == []
+
+    with pytest.raises(ValueError):
+        archive.archive_month(conn, '2024-1')
+
+
+def test_archived_urls_still_deduplicated(conn, archive, tmp_path):
+    """已归档的URL再次入库时跳过，近似重复索引仍包含已归档记录的标题"""
+    archive.archive_before(conn, '2024-02')
+    assert conn.execute("SELECT COUNT(*) FROM archived_urls WHERE month = '2024-01'").fetchone()[0] == 5
+
+    counts = upsert_results(conn, [
+        SearchResult(title='成都新闻1月第0条', url='https://A.com/1/0/?utm_source=x'),
+        SearchResult(title='全新的记录', url='https://b.com/new'),
+    ], '成都')
+    assert counts == {'inserted': 1, 'updated': 0, 'archived': 1}
+    assert conn.execute("SELECT COUNT(*) FROM data_repository WHERE url LIKE '%utm_source%'").fetchone()[0] == 0
+    assert len(_all_ids(conn, archive)) == 21
+
+    index = RepositoryIndex(str(tmp_path / 'database.db'))
+    index.refresh(conn)
+    assert index.has_url('https://a.com/1/3')
+    assert index.find_duplicate('成都新闻1月第3条', 'https://c.com/other') is not None
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
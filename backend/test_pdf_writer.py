@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PDF写出测试脚本
+验证逐页写出、交叉引用表的偏移量、页面树和中文文字编码
+"""
+
+import io
+import re
+import zlib
+
+import pytest
+
+from pdf_writer import PdfWriter, encode_text, text_width
+
+
+def test_encode_text():
+    assert encode_text('成都A') == '<621090FD0041>'
+    # 基本多文种平面以外的字符替换为问号
+    assert encode_text('\U0001F600') == '<003F>'
+    assert text_width('成都ab', 10) == 30
+
+
+def test_pages_written_incrementally():
+    sink = io.BytesIO()
+    writer = PdfWriter(sink, title='测试')
+    sizes = []
+    for i in range(3):
+        page = writer.new_page()
+        page.text(50, 700, f'第{i + 1}页', 12, (0, 0, 0))
+        page.line(50, 690, 500, 690)
+        writer.add_page(page)
+        sizes.append(len(sink.getvalue()))
+    # 每页在add_page时即写出
+    assert sizes[0] < sizes[1] < sizes[2]
+    assert b'/Kids' not in sink.getvalue()
+    writer.close()
+    writer.close()
+
+    data = sink.getvalue()
+    assert data.startswith(b'%PDF-1.4') and data.endswith(b'%%EOF\n')
+    assert b'/Type /Pages /Kids [8 0 R 10 0 R 12 0 R] /Count 3' in data
+    startxref = int(re.search(rb'startxref\n(\d+)', data).group(1))
+    assert data[startxref:].startswith(b'xref\n0 13\n')
+    offsets = re.findall(rb'(\d{10}) 00000 n', data[startxref:])
+    assert len(offsets) == 12
+    for number, offset in enumerate(offsets, start=1):
+        assert data[int(offset):].startswith(f'{number} 0 obj'.encode())
+
+    stream = re.search(rb'stream\n(.*?)\nendstream', data, re.S).group(1)
+    assert encode_text('第1页').encode() in zlib.decompress(stream)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+BM25排序测试脚本
+验证分词、入库时的增量统计与全量重建一致、BM25分数与直接计算一致，以及两字中文词的相关性排序
+"""
+
+import math
+import sqlite3
+from collections import Counter
+
+import pytest
+
+from ranking import B, FIELD_WEIGHTS, K1, query_terms, rank_stats, tokenize
+from repository import RepositoryPage, init_repository, resolve_sort, search_repository, upsert_results
+from search_result import SearchResult
+
+DOCS = [
+    ('成都天气预报', '今日成都多云，成都平原有雾'),
+    ('四川农业大学招生简章', '四川农业大学2024年本科招生'),
+    ('雅安新闻', '四川农业大学雅安校区举办运动会'),
+    ('Python 教程', '成都 Python 开发者大会'),
+]
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    init_repository(conn)
+    upsert_results(conn, [
+        SearchResult(title=title, url=f'https://a.com/{i}', summary=summary) for i, (title, summary) in enumerate(DOCS)
+    ], '测试')
+    yield conn
+    conn.close()
+
+
+def _stats_tables(conn):
+    return (
+        conn.execute("SELECT * FROM repository_terms ORDER BY term").fetchall(),
+        conn.execute("SELECT * FROM repository_postings ORDER BY term, doc_id").fetchall(),
+        conn.execute("SELECT * FROM repository_doc_stats ORDER BY doc_id").fetchall(),
+        conn.execute("SELECT * FROM repository_rank_stats").fetchall(),
+    )
+
+
+def _reference_scores(conn, keyword):
+    """逐条记录直接计算BM25F分数"""
+    docs = {doc_id: (Counter(tokenize(title)), Counter(tokenize(summary)))
+            for doc_id, title, summary in conn.execute("SELECT id, title, summary FROM data_repository")}
+    wt, ws = FIELD_WEIGHTS
+    lengths = {doc_id: wt * sum(t.values()) + ws * sum(s.values()) for doc_id, (t, s) in docs.items()}
+    avgdl = sum(lengths.values()) / len(docs)
+    scores = {}
+    for doc_id, (title_tf, summary_tf) in docs.items():
+        score = 0.0
+        for term in query_terms(keyword):
+            df = sum(1 for t, s in docs.values() if term in t or term in s)
+            tf = wt * title_tf[term] + ws * summary_tf[term]
+            if tf:
+                idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+                score += idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * lengths[doc_id] / avgdl))
+        scores[doc_id] = score
+    return scores
+
+
+def test_tokenize():
+    assert tokenize('四川农业大学') == ['四川', '川农', '农业', '业大', '大学']
+    assert tokenize('Ｐython3 教程，成') == ['python3', '教程', '成']
+    assert query_terms('成都 成都') == ['成都']
+    assert tokenize(None) == []
+
+
+def test_scores_match_reference(conn):
+    for keyword in ('成都', '四川农业大学', 'python 大会'):
+        expected = _reference_scores(conn, keyword)
+        for row in search_repository(conn, keyword, sort='relevance'):
+            assert row[-1] == pytest.approx(expected[row[0]])
+
+
+def test_short_chinese_terms_rank_by_relevance(conn):
+    assert resolve_sort('成都') == 'relevance'
+    # 标题和摘要中多次出现的记录排在只在摘要出现一次的记录之前
+    assert [row[0] for row in search_repository(conn, '成都')] == [1, 4]
+    assert [row['id'] for row in RepositoryPage(conn, '农业')] == [2, 3]
+    assert resolve_sort('，，') == 'time'
+
+
+def test_incremental_stats_match_rebuild(conn):
+    upsert_results(conn, [SearchResult(title='新标题', url='https://a.com/0', summary='成都暴雨预警')], '成都')
+    conn.execute("UPDATE data_repository SET title = '雅安熊猫' WHERE id = 3")
+    conn.execute("DELETE FROM data_repository WHERE id = 2")
+    conn.commit()
+    list(search_repository(conn, '成都'))
+    assert rank_stats(conn)['pending'] == 0
+    incremental = _stats_tables(conn)
+
+    rebuilt = sqlite3.connect(':memory:')
+    init_repository(rebuilt)
+    rebuilt.executemany(
+        "INSERT INTO data_repository (id, title, url, summary, search_keyword) VALUES (?, ?, ?, ?, '')",
+        conn.execute("SELECT id, title, url, summary FROM data_repository").fetchall()
+    )
+    rebuilt.commit()
+    list(search_repository(rebuilt, '成都'))
+    assert _stats_tables(rebuilt) == incremental
+    assert rank_stats(conn)['doc_count'] == 3
+    rebuilt.close()
+
+
+def test_existing_rows_ranked_on_first_init():
+    conn = sqlite3.connect(':memory:')
+    conn.execute(
+        "CREATE TABLE data_repository (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, url TEXT NOT NULL, "
+        "summary TEXT, search_keyword TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+    )
+    conn.executemany("INSERT INTO data_repository (title, url, summary, search_keyword) VALUES (?, ?, ?, 'k')",
+                     [('成都', 'https://a.com/1', ''), ('其他', 'https://a.com/2', '成都')])
+    conn.commit()
+    init_repository(conn)
+    assert rank_stats(conn)['pending'] == 0
+    assert rank_stats(conn)['doc_count'] == 2
+    assert [row[0] for row in search_repository(conn, '成都')] == [1, 2]
+    conn.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
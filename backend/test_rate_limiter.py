@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+令牌桶限速器测试脚本
+验证速率上限、验证码退避恢复、冷却结束后排队请求的间隔、SQLite后端的跨实例共享，以及等待文件锁时不阻塞事件循环
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from rate_limiter import MemoryBackend, SqliteBackend, TokenBucketLimiter
+
+
+def test_concurrent_callers_share_rate():
+    """多个线程共享同一限速器时，总速率不超过上限"""
+    limiter = TokenBucketLimiter(MemoryBackend(), rate=50, burst=1)
+    stamps = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(5):
+            limiter.acquire('www.baidu.com')
+            with lock:
+                stamps.append(time.monotonic())
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stamps.sort()
+    # 20个请求按每秒50个的速率至少需要19个间隔
+    assert stamps[-1] - stamps[0] >= 19 / 50 - 0.02
+
+
+def test_burst_then_wait():
+    """令牌桶容量内的请求无需等待，之后按速率排队"""
+    limiter = TokenBucketLimiter(MemoryBackend(), rate=10, burst=3)
+    waits = [limiter.reserve('a.com') for _ in range(5)]
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert waits[3] == pytest.approx(0.1, abs=0.01)
+    assert waits[4] == pytest.approx(0.2, abs=0.01)
+    # 不同主机的预算互不影响
+    assert limiter.reserve('b.com') == 0.0
+
+
+def test_captcha_backoff_and_recovery():
+    """触发验证码后速率减半并进入冷却，成功请求后逐步恢复"""
+    limiter = TokenBucketLimiter(MemoryBackend(), rate=1.0, cooldown=5, recovery_step=0.25)
+    limiter.report_captcha('www.baidu.com')
+    assert limiter.current_rate('www.baidu.com') == 0.5
+    assert limiter.reserve('www.baidu.com') >= 4.9
+
+    limiter.report_captcha('www.baidu.com')
+    assert limiter.current_rate('www.baidu.com') == 0.25
+
+    for _ in range(10):
+        limiter.report_success('www.baidu.com')
+    assert limiter.current_rate('www.baidu.com') == 1.0
+
+
+def test_queued_requests_spaced_after_cooldown(monkeypatch):
+    """冷却期间不积累令牌，排队的请求在冷却结束后按速率依次发出，不会同时到达"""
+    monkeypatch.setattr(time, 'time', lambda: 1000.0)
+    limiter = TokenBucketLimiter(MemoryBackend(), rate=0.5, burst=2, cooldown=30)
+    limiter.report_captcha('www.baidu.com')
+    assert limiter.current_rate('www.baidu.com') == 0.25
+
+    waits = [limiter.reserve('www.baidu.com') for _ in range(4)]
+    assert waits == pytest.approx([30 + 4 * i for i in range(1, 5)])
+
+    # 从冷却结束时刻起积累令牌：20秒补回5个，抵消排队的4个后还剩1个，可以立即发送
+    monkeypatch.setattr(time, 'time', lambda: 1050.0)
+    assert limiter.reserve('www.baidu.com') == 0.0
+
+
+def test_sqlite_backend_shared_between_instances(tmp_path):
+    """两个使用同一SQLite文件的限速器（模拟两个工作进程）共享预算"""
+    path = str(tmp_path / 'rate_limit.db')
+    first = TokenBucketLimiter(SqliteBackend(path), rate=10, burst=2)
+    second = TokenBucketLimiter(SqliteBackend(path), rate=10, burst=2)
+
+    assert first.reserve('www.baidu.com') == 0.0
+    assert second.reserve('www.baidu.com') == 0.0
+    assert first.reserve('www.baidu.com') == pytest.approx(0.1, abs=0.02)
+
+    second.report_captcha('www.baidu.com')
+    assert first.current_rate('www.baidu.com') == 5.0
+
+
+def test_async_calls_do_not_block_event_loop(tmp_path):
+    """其他进程持有SQLite写锁时，异步预约只让当前协程等待"""
+    path = str(tmp_path / 'rate_limit.db')
+    limiter = TokenBucketLimiter(SqliteBackend(path), rate=10, burst=2)
+    holder = sqlite3.connect(path, isolation_level=None)
+    holder.execute('BEGIN IMMEDIATE')
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        async def release():
+            await asyncio.sleep(0.3)
+            holder.execute('COMMIT')
+
+        task = asyncio.ensure_future(ticker())
+        asyncio.ensure_future(release())
+        assert await limiter.aacquire('www.baidu.com') == 0.0
+        await limiter.areport_captcha('www.baidu.com')
+        task.cancel()
+        return ticks
+
+    # 等待写锁的0.3秒内事件循环中的其他协程照常运行
+    assert asyncio.run(main()) >= 10
+    assert limiter.current_rate('www.baidu.com') == 5.0
+    holder.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
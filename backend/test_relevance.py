@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+批量相关性评分测试脚本
+与原逐条评分实现对比，验证批量评分结果完全一致
+"""
+
+import random
+import re
+
+import pytest
+
+from relevance import RelevanceScorer, TitleMatchScorer, keyword_parts, score_texts
+
+
+def legacy_calculate_relevance(text, keyword):
+    """原app.calculate_relevance的实现"""
+    if not text or not keyword:
+        return 0
+    text_lower = text.lower()
+    keyword_lower = keyword.lower()
+    score = 0
+    if keyword_lower in text_lower:
+        score += 30
+        if text_lower.startswith(keyword_lower):
+            score += 20
+    for part in re.findall(r'[一-龥]+|[a-zA-Z0-9]+', keyword_lower):
+        if len(part) > 1:
+            score += text_lower.count(part) * 5
+    return min(score, 100)
+
+
+def legacy_title_score(title, abstract, keyword):
+    """原BaiduSpider._validate_results中的评分"""
+    keyword_lower = keyword.lower()
+    variations = [keyword_lower]
+    if '大学' in keyword_lower:
+        variations.append(keyword_lower.replace('大学', ''))
+    title_lower, abstract_lower = title.lower(), abstract.lower()
+    score = 0
+    for variation in variations:
+        if variation in title_lower:
+            score += 10
+            if variation == title_lower:
+                score += 20
+            if title_lower.startswith(variation):
+                score += 5
+    for variation in variations:
+        score += abstract_lower.count(variation) * 2
+    return score
+
+
+def _random_texts(count, seed=7):
+    rng = random.Random(seed)
+    alphabet = '四川农业大学成都科研 Python PY 新闻'
+    return [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 60))) for _ in range(count)]
+
+
+@pytest.mark.parametrize('keyword', ['四川农业大学', '四川农业大学 成都', 'Python 教程', 'py py', '成都', '', 'a'])
+def test_batch_scores_match_legacy(keyword):
+    texts = _random_texts(500) + ['四川农业大学', 'PYTHON py教程', '']
+    assert score_texts(texts, keyword) == [legacy_calculate_relevance(t, keyword) for t in texts]
+
+
+@pytest.mark.parametrize('keyword', ['四川农业大学', 'Python', '成都'])
+def test_title_scores_match_legacy(keyword):
+    titles = _random_texts(300, seed=1) + [keyword]
+    abstracts = _random_texts(301, seed=2)
+    scorer = TitleMatchScorer(keyword)
+    assert scorer.score_batch(titles, abstracts) == [
+        legacy_title_score(t, a, keyword) for t, a in zip(titles, abstracts)
+    ]
+
+
+def test_scores_are_capped():
+    scorer = RelevanceScorer('成都')
+    assert scorer.score('成都' * 50) == 100
+    assert scorer.score('成都平原') == 55
+    assert keyword_parts('四川 a Python') == ['四川', 'python']
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
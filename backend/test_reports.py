@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PDF报告测试脚本
+验证折行、逐页生成与预览截断、按查询指纹和修改版本号缓存报告，以及数据变化后重新生成和按生成时的数据命名
+"""
+
+import io
+import os
+
+import pytest
+
+from db import ConnectionPool
+from reports import KEY_RE, ReportService, fingerprint, render_report, report_query, wrap_text
+from repository import init_repository
+
+
+def _insert(conn, count, keyword='成都'):
+    conn.executemany(
+        "INSERT INTO data_repository (title, url, summary, search_keyword, created_at) VALUES (?, ?, ?, ?, ?)",
+        [(f'{keyword}新闻第{i}条', f'https://a.com/{keyword}/{i}', '四川农业大学动态' * 10, keyword,
+          f'2024-01-{1 + i % 28:02d} 08:00:00') for i in range(count)]
+    )
+    conn.commit()
+
+
+class Rows:
+    """记录读取行数和是否关闭的行迭代器"""
+
+    def __init__(self, count):
+        self.read = 0
+        self.closed = False
+        self.count = count
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.read >= self.count:
+            raise StopIteration
+        self.read += 1
+        return (self.read, f'标题{self.read}', 'https://a.com', '摘要' * 50, '成都', '2024-01-01 08:00:00')
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def service(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'database.db'))
+    init_repository(pool.connect())
+    _insert(pool.connect(), 60)
+    service = ReportService(pool, str(tmp_path / 'reports'))
+    # 测试中直接调用run，不启动后台线程
+    service.start = lambda: None
+    yield service
+    pool.close_all()
+
+
+def test_wrap_text():
+    assert wrap_text('成都' * 10, 10, width=50) == ['成都成都成', '都成都成都'] * 2
+    assert wrap_text('abcdefghij', 10, width=50) == ['abcdefghij']
+    assert wrap_text('成都' * 10, 10, width=50, max_lines=2) == ['成都成都成', '都成都成…']
+    assert wrap_text('', 10) == []
+
+
+def test_render_streams_pages_and_truncates_preview():
+    rows = Rows(100)
+    result = render_report(rows, io.BytesIO(), report_query(), total=100)
+    assert result['rows'] == 100 and result['pages'] > 5 and not result['truncated']
+    assert rows.closed
+
+    # 预览达到页数后停止读取
+    rows = Rows(100)
+    output = io.BytesIO()
+    result = render_report(rows, output, report_query(), max_pages=2)
+    assert result['pages'] == 2 and result['truncated']
+    assert rows.read == result['rows'] + 1 < 100 and rows.closed
+    assert output.getvalue().count(b'/Type /Page ') == 2
+
+    result = render_report(Rows(0), io.BytesIO(), report_query())
+    assert result == {'pages': 1, 'rows': 0, 'truncated': False}
+
+
+def test_reports_cached_by_fingerprint_and_watermark(service):
+    query = report_query(search_keyword=' 成都 ')
+    report, created = service.submit(query)
+    assert created and report['status'] == 'queued' and KEY_RE.match(report['key'])
+    assert report['key'].startswith(fingerprint(query))
+    # 生成期间重复提交返回同一任务
+    assert service.submit(query) == (report, False)
+
+    service.run(report['key'])
+    done = service.get(report['key'])
+    assert done['status'] == 'done' and done['rows'] == 60
+    with open(service.path(report['key']), 'rb') as f:
+        assert f.read(8) == b'%PDF-1.4'
+    assert service.submit(query)[0]['status'] == 'done'
+
+    # 数据仓库变化后重新生成，旧版本报告删除
+    _insert(service.db_pool.connect(), 5, '雅安')
+    _insert(service.db_pool.connect(), 1)
+    newer, created = service.submit(query)
+    assert created and newer['key'] != report['key']
+    service.run(newer['key'])
+    assert service.get(newer['key'])['rows'] == 61
+    assert service.get(report['key']) is None
+    assert os.listdir(service.report_dir) == [newer['key'] + '.pdf']
+
+    with pytest.raises(ValueError):
+        service.get('../database')
+
+    preview = service.preview(service.db_pool.connect(), query, pages=1)
+    assert preview.startswith(b'%PDF') and preview.count(b'/Type /Page ') == 1
+
+
+def test_report_keyed_by_data_at_render_time(service):
+    """提交后数据仓库变化时，报告按生成时的数据命名，按提交时的编号仍能查到"""
+    query = report_query(search_keyword='成都')
+    report, _ = service.submit(query)
+    _insert(service.db_pool.connect(), 1, '雅安')
+
+    service.run(report['key'])
+    done = service.get(report['key'])
+    assert done['status'] == 'done' and done['rows'] == 60
+    assert done['key'] != report['key'] and done['key'].startswith(fingerprint(query))
+    assert os.listdir(service.report_dir) == [done['key'] + '.pdf']
+    # 再次提交直接使用按当前数据生成的报告
+    assert service.submit(query) == (service.get(done['key']), False)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
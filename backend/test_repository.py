@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+数据仓库存储层测试脚本
+验证全文索引与数据表的触发器同步、中文检索、bm25排序和短词退回LIKE，
+以及键集分页、流式JSON输出、按规范化URL的批量入库、结构迁移、修改版本号和按时间查询的索引使用
+"""
+
+import json
+import sqlite3
+
+import pytest
+
+from migrations import applied_migrations, apply_migrations
+from query_plan import QueryPlanError, explain
+from repository import (ACCESS_DATE, ACCESS_KEYWORD_DATE, ACCESS_SCAN, FTS_TABLE, REPOSITORY_MIGRATIONS, RepositoryPage,
+                        build_search_query, count_repository, init_repository, normalize_url, repository_watermark,
+                        search_repository, split_keyword, stream_page_json, upsert_results)
+from search_result import SearchResult
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    init_repository(conn)
+    rows = [
+        ('成都天气预报', 'https://a.com/1', '今日成都多云', '成都', '2024-01-01 10:00:00'),
+        ('四川农业大学招生简章', 'https://a.com/2', '四川农业大学2024年本科招生', '四川农业大学', '2024-01-02 10:00:00'),
+        ('雅安新闻', 'https://a.com/3', '四川农业大学雅安校区举办运动会', '雅安', '2024-01-03 10:00:00'),
+    ]
+    conn.executemany(
+        "INSERT INTO data_repository (title, url, summary, search_keyword, created_at, normalized_url) "
+        "VALUES (?, ?, ?, ?, ?, ?)", [row + (normalize_url(row[1]),) for row in rows]
+    )
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def _ids(cursor):
+    return [row[0] for row in cursor]
+
+
+def test_split_keyword():
+    assert split_keyword('四川农业 成都') == ('"四川农业"', ['成都'])
+    assert split_keyword('a"bc') == ('"a""bc"', [])
+    assert split_keyword('') == (None, [])
+
+
+def test_fts_search_ranks_title_matches_first(conn):
+    # 标题命中的记录排在只有摘要命中的记录之前
+    assert _ids(search_repository(conn, '四川农业大学')) == [2, 3]
+    assert _ids(search_repository(conn, '农业大学 运动会')) == [3]
+    assert _ids(search_repository(conn, '农业大学', date_from='2024-01-03')) == [3]
+
+
+def test_short_terms_fall_back_to_like(conn):
+    assert _ids(search_repository(conn, '成都')) == [1]
+    assert _ids(search_repository(conn, '农业大学 雅安')) == [3]
+    # 没有关键词时按入库时间倒序
+    assert _ids(search_repository(conn)) == [3, 2, 1]
+
+
+def test_triggers_keep_index_in_sync(conn):
+    conn.execute("UPDATE data_repository SET title='成都大熊猫基地' WHERE id=1")
+    conn.execute("DELETE FROM data_repository WHERE id=2")
+    conn.commit()
+    assert _ids(search_repository(conn, '大熊猫')) == [1]
+    assert _ids(search_repository(conn, '招生简章')) == []
+    conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('integrity-check')")
+
+
+def test_existing_rows_indexed_on_first_init(tmp_path):
+    """升级已有数据库时为已有数据建立索引"""
+    path = str(tmp_path / 'database.db')
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE data_repository (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, url TEXT NOT NULL, "
+        "summary TEXT, search_keyword TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+    )
+    conn.executemany(
+        "INSERT INTO data_repository (title, url, summary, search_keyword) VALUES (?, ?, '', 'k')",
+        [('旧数据标题', 'https://a.com/x'), ('重复URL', 'HTTPS://A.com/x/'), ('另一条', 'https://a.com/y')]
+    )
+    conn.commit()
+    init_repository(conn)
+    assert _ids(search_repository(conn, '旧数据标题')) == [1]
+    # 已有的重复URL不删除，只有最早的一条参与唯一约束
+    assert conn.execute("SELECT id, normalized_url FROM data_repository ORDER BY id").fetchall() == [
+        (1, 'https://a.com/x'), (2, None), (3, 'https://a.com/y')
+    ]
+    assert upsert_results(conn, [SearchResult(title='t', url='https://a.com/x')], 'k') == {'inserted': 0, 'updated': 1, 'archived': 0}
+    conn.close()
+
+
+def _fill(conn, count):
+    # 多条记录的入库时间相同，验证 (created_at, id) 组合键分页不重不漏
+    conn.executemany(
+        "INSERT INTO data_repository (title, url, summary, search_keyword, created_at) VALUES (?, ?, ?, ?, ?)",
+        [(f'成都新闻第{i}条', f'https://b.com/{i}', '', '成都', f'2024-02-{1 + i // 3:02d} 00:00:00')
+         for i in range(count)]
+    )
+    conn.commit()
+
+
+def test_keyset_pagination_by_time(conn):
+    _fill(conn, 20)
+    seen = []
+    after = None
+    while True:
+        page = RepositoryPage(conn, limit=7, after=after)
+        rows = list(page)
+        seen.extend(row['id'] for row in rows)
+        after = page.next_cursor
+        if after is None:
+            break
+    expected = [row[0] for row in conn.execute(
+        "SELECT id FROM data_repository ORDER BY created_at DESC, id DESC")]
+    assert seen == expected and len(seen) == 23
+
+
+def test_relevance_pagination_and_total(conn):
+    _fill(conn, 10)
+    first = RepositoryPage(conn, '成都新闻', limit=4)
+    first_ids = [row['id'] for row in first]
+    second = RepositoryPage(conn, '成都新闻', limit=4, after=first.next_cursor)
+    second_ids = [row['id'] for row in second]
+    assert first.sort == 'relevance' and len(first_ids) == 4
+    assert not set(first_ids) & set(second_ids)
+    assert count_repository(conn, '成都新闻') == 10
+    assert count_repository(conn, '成都', date_from='2024-02-04') == 1
+
+
+def test_invalid_parameters(conn):
+    with pytest.raises(ValueError):
+        RepositoryPage(conn, after='not-a-cursor')
+    with pytest.raises(ValueError):
+        RepositoryPage(conn, sort='random')
+
+
+def test_stream_page_json(conn):
+    _fill(conn, 5)
+    page = RepositoryPage(conn, limit=3)
+    body = json.loads(''.join(stream_page_json(page, total=8)))
+    assert body['status'] == 'success'
+    assert [row['title'] for row in body['data']] == ['成都新闻第4条', '成都新闻第3条', '成都新闻第2条']
+    assert (body['count'], body['total'], body['sort']) == (3, 8, 'time')
+    assert body['next_cursor'] == page.next_cursor is not None
+
+    empty = json.loads(''.join(stream_page_json(RepositoryPage(conn, '不存在的词'))))
+    assert empty['data'] == [] and empty['next_cursor'] is None
+
+
+def test_normalize_url():
+    assert normalize_url('HTTPS://Example.COM:443/a/b/?b=2&a=1&utm_source=x#frag') == 'https://example.com/a/b?a=1&b=2'
+    assert normalize_url('http://example.com/') == 'http://example.com'
+    assert normalize_url('http://example.com:8080/a') == 'http://example.com:8080/a'
+    assert normalize_url('  ') == ''
+
+
+def test_upsert_results(conn):
+    results = [
+        SearchResult(title='新标题', url='https://c.com/1', summary='摘要1'),
+        SearchResult(title='新标题重复', url='https://c.com/1/', summary='摘要1更新'),
+        SearchResult(title='成都天气预报', url='https://a.com/1?utm_source=baidu', summary=''),
+        SearchResult(title='另一条', url='https://c.com/2'),
+    ]
+    assert upsert_results(conn, results, '新关键词') == {'inserted': 2, 'updated': 1, 'archived': 0}
+    rows = dict((row[0], row[1:]) for row in conn.execute(
+        "SELECT url, summary, search_keyword, seen_count FROM data_repository"))
+    assert rows['https://c.com/1'] == ('摘要1更新', '新关键词', 2)
+    # 空摘要不覆盖已有摘要
+    assert rows['https://a.com/1'] == ('今日成都多云', '新关键词', 2)
+    assert count_repository(conn) == 5
+    # 更新的记录同步到全文索引
+    assert _ids(search_repository(conn, '新关键词')) != []
+    assert upsert_results(conn, [], 'k') == {'inserted': 0, 'updated': 0, 'archived': 0}
+
+
+def test_migrations_run_once(conn):
+    assert {name for name, _ in REPOSITORY_MIGRATIONS} <= applied_migrations(conn)
+    assert apply_migrations(conn, REPOSITORY_MIGRATIONS) == []
+
+    def failing(conn):
+        conn.execute("CREATE TABLE migration_probe (id INTEGER)")
+        raise RuntimeError('迁移出错')
+
+    with pytest.raises(RuntimeError):
+        apply_migrations(conn, [('test_0001_failing', failing)])
+    # 失败的迁移整体回滚，下次启动时重新执行
+    assert 'test_0001_failing' not in applied_migrations(conn)
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'migration_probe'").fetchone() is None
+    assert apply_migrations(conn, [('test_0001_ok', lambda conn: None)]) == ['test_0001_ok']
+
+    # 不替调用方提交未完成的修改
+    conn.execute("DELETE FROM data_repository")
+    with pytest.raises(RuntimeError):
+        apply_migrations(conn, [('test_0002_ok', lambda conn: None)])
+    conn.rollback()
+    assert count_repository(conn) == 3
+
+
+def test_watermark_tracks_content_changes(conn):
+    assert repository_watermark(conn) == 3
+    # 内容不变的重复入库只累加seen_count，不改变版本号
+    upsert_results(conn, [SearchResult(title='成都天气预报', url='https://a.com/1', summary='今日成都多云')], '成都')
+    assert repository_watermark(conn) == 3
+    upsert_results(conn, [SearchResult(title='成都天气预报', url='https://a.com/1', summary='明日成都小雨')], '成都')
+    assert repository_watermark(conn) == 4
+    conn.execute("DELETE FROM data_repository WHERE id = 3")
+    assert repository_watermark(conn) == 5
+    conn.rollback()
+    assert repository_watermark(conn) == 4
+
+
+@pytest.mark.parametrize('filters, access, index', [
+    ({}, ACCESS_DATE, 'idx_data_repository_created_at'),
+    ({'date_from': '2024-01-01', 'date_to': '2024-01-31'}, ACCESS_DATE, 'idx_data_repository_created_at'),
+    ({'search_keyword': '成都'}, ACCESS_KEYWORD_DATE, 'idx_data_repository_keyword_created_at'),
+    ({'search_keyword': '成都', 'date_from': '2024-01-01'}, ACCESS_KEYWORD_DATE,
+     'idx_data_repository_keyword_created_at'),
+    ({'keyword': '成都', 'sort': 'time'}, ACCESS_DATE, 'idx_data_repository_created_at'),
+])
+def test_time_queries_use_indexes(conn, filters, access, index):
+    """按时间排序的查询走索引，既不扫描全表也不对结果排序"""
+    query, params, path, _ = build_search_query(conn, limit=101, **filters)
+    plan = explain(conn, query, params)
+    assert path == access
+    assert any(index in step for step in plan), plan
+    assert not any(step == 'SCAN r' or 'TEMP B-TREE' in step for step in plan), plan
+
+    # 第二页的键集条件同样走索引
+    page = RepositoryPage(conn, limit=1, **filters)
+    list(page)
+    if page.next_cursor:
+        query, params, _, _ = build_search_query(conn, limit=2, after=page.next_cursor, **filters)
+        assert not any('TEMP B-TREE' in step for step in explain(conn, query, params))
+
+    count_plan = explain(conn, "SELECT COUNT(*) FROM data_repository r WHERE r.created_at >= ?", ['2024-01-01'])
+    assert count_plan == ['SEARCH r USING COVERING INDEX idx_data_repository_created_at (created_at>?)']
+
+
+def test_full_scan_plans_rejected(conn):
+    assert build_search_query(conn, '成都')[2] == ACCESS_SCAN
+    conn.execute("DROP INDEX idx_data_repository_created_at")
+    with pytest.raises(QueryPlanError) as excinfo:
+        search_repository(conn, date_from='2024-01-02')
+    assert 'SCAN r' in str(excinfo.value)
+    # 短词相关性检索没有可用的索引，不做检查
+    assert _ids(search_repository(conn, '成都')) == [1]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+统一搜索结果类型测试脚本
+验证字段别名、字典兼容访问、序列化以及爬虫返回的结果类型
+"""
+
+import json
+
+import pytest
+
+from baidu_search_spider import BaiduSearchSpider
+from bench_serp_parser import build_sample_serp
+from search_result import SearchResult, dumps
+
+
+def test_from_dict_accepts_abstract_and_summary():
+    """BaiduSpider旧的abstract字段和summary字段映射到同一属性"""
+    a = SearchResult.from_dict({'title': ' 成都 ', 'url': 'https://a.com', 'abstract': '简介'})
+    b = SearchResult.from_dict({'title': '成都', 'url': 'https://a.com', 'summary': '简介'})
+    assert a == b
+    assert a.summary == '简介' and a['abstract'] == '简介'
+    assert SearchResult.from_dict(a) is a
+
+
+def test_dict_compatible_access():
+    result = SearchResult(title='成都', url='https://a.com')
+    result['relevance_score'] = 80
+    assert result.relevance_score == 80
+    assert result.get('missing', 'x') == 'x'
+    assert 'summary' in result and 'missing' not in result
+    with pytest.raises(KeyError):
+        result['missing']
+    # __slots__记录不能添加任意属性
+    with pytest.raises(AttributeError):
+        result.extra = 1
+
+
+def test_dumps_serializes_nested_results():
+    data = {'data': [SearchResult(title='成都', url='https://a.com', source='模拟数据')], 'total': 1}
+    decoded = json.loads(dumps(data))
+    assert decoded['data'][0] == {
+        'title': '成都', 'url': 'https://a.com', 'summary': '', 'source': '模拟数据',
+        'cover_url': '', 'relevance_score': 0
+    }
+    assert '成都' in dumps(data)
+
+
+def test_spider_extracts_search_results():
+    spider = BaiduSearchSpider()
+    results = spider.normalize(spider.parse(build_sample_serp(3, padding=1)), '成都')
+    assert results and all(isinstance(r, SearchResult) for r in results)
+    assert results[0].source == 'baidu'
+    assert results[0].cover_url == 'https://img0.example.com/cover.jpg'
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
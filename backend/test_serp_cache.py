@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+搜索结果页缓存测试脚本
+验证关键词规范化、两级命中、TTL过期、容量淘汰、异步读写以及爬虫对缓存的使用
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from baidu_search_spider import BaiduSearchSpider
+from serp_cache import NullCache, SerpCache, normalize_keyword
+
+
+def test_normalize_keyword():
+    assert normalize_keyword('  Python　编程  ') == 'python 编程'
+    assert SerpCache.make_key('s', 'ＡＢＣ', 1) == SerpCache.make_key('s', 'abc ', 1)
+
+
+def test_memory_and_disk_tiers(tmp_path):
+    """内存层未命中时从磁盘层读取，并回填内存层"""
+    path = str(tmp_path / 'serp_cache.db')
+    cache = SerpCache(path, ttl=60)
+    cache.set('spider', '成都', 0, [{'title': '成都', 'url': 'https://a.com'}])
+
+    value = cache.get('spider', ' 成都 ', 0)
+    value[0]['title'] = '被调用方修改'
+    assert cache.get('spider', '成都', 0)[0]['title'] == '成都'
+
+    # 新实例（模拟另一个工作进程）只能从磁盘层命中
+    other = SerpCache(path, ttl=60)
+    assert other.get('spider', '成都', 0)[0]['url'] == 'https://a.com'
+    assert other.get('spider', '成都', 0) is not None
+    assert other.get('spider', '成都', 1) is None
+    stats = other.stats()
+    assert (stats['disk_hits'], stats['memory_hits'], stats['misses']) == (1, 1, 1)
+
+
+def test_ttl_expiry(tmp_path):
+    cache = SerpCache(str(tmp_path / 'serp_cache.db'), ttl=0.05)
+    cache.set('spider', '成都', 0, ['x'])
+    time.sleep(0.1)
+    assert cache.get('spider', '成都', 0) is None
+
+
+def test_lru_eviction(tmp_path):
+    """两层都按容量淘汰最久未使用的条目"""
+    cache = SerpCache(str(tmp_path / 'serp_cache.db'), ttl=60, memory_size=2, disk_size=3, evict_every=1)
+    for i in range(3):
+        cache.set('spider', f'k{i}', 0, i)
+    assert cache.stats()['memory_entries'] == 2
+    # k0已被挤出内存层，但仍在磁盘层
+    assert cache.get('spider', 'k0', 0) == 0
+
+    time.sleep(0.01)
+    cache.set('spider', 'k3', 0, 3)
+    # 磁盘层容量为3，最久未访问的k1被淘汰
+    cache._memory.clear()
+    assert cache.get('spider', 'k1', 0) is None
+    assert cache.get('spider', 'k0', 0) == 0
+
+
+def test_async_access_and_periodic_eviction(tmp_path):
+    """异步读写经由线程池访问磁盘层，磁盘层每evict_every次写入才清理一次"""
+    cache = SerpCache(str(tmp_path / 'serp_cache.db'), ttl=60, memory_size=1, disk_size=2, evict_every=4)
+
+    def disk_entries():
+        return cache._connect().execute('SELECT COUNT(*) FROM serp_cache').fetchone()[0]
+
+    async def scenario():
+        for i in range(3):
+            await cache.aset('spider', f'k{i}', 0, i)
+        # 第3次写入后尚未清理，磁盘层暂时超出容量
+        assert disk_entries() == 3
+        assert await cache.aget('spider', 'k0', 0) == 0
+        await cache.aset('spider', 'k3', 0, 3)
+
+    asyncio.run(scenario())
+    assert disk_entries() == 2
+    assert cache.stats()['disk_hits'] == 1
+    assert asyncio.run(NullCache().aget('spider', 'k0', 0)) is None
+
+
+def test_spider_serves_pages_from_cache(tmp_path, monkeypatch):
+    """缓存命中时爬虫不再发送请求"""
+    spider = BaiduSearchSpider()
+    spider._cookies_ready = True
+    spider.cache = SerpCache(str(tmp_path / 'serp_cache.db'), ttl=60)
+    spider.cache.set('baidu_search_spider', '成都', 0, [
+        {'title': '成都', 'url': 'https://a.com', 'summary': '', 'source': 'baidu'}
+    ])
+
+    async def no_network(*args, **kwargs):
+        raise AssertionError('不应发送请求')
+
+    monkeypatch.setattr(spider.pool, 'get', no_network)
+    results = spider.search('成都')
+    assert [r['url'] for r in results] == ['https://a.com']
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+搜索结果页解析器测试脚本
+验证新版结果块、旧版标题结构和备用链接结构的字段提取，以及流式解析与整页解析结果一致
+"""
+
+import pytest
+
+from bench_serp_parser import build_sample_serp
+from serp_parser import SerpStreamParser, parse_serp
+
+
+def test_modern_result_blocks():
+    """新版多类名结果块：提取标题、跳转链接、真实地址、摘要、来源和封面图"""
+    html_content = build_sample_serp(3, padding=1, block_class='result c-container xpath-log new-pmd')
+    results = parse_serp(html_content)
+
+    assert len(results) == 3
+    first = results[0]
+    assert first['title'] == '四川农业大学 第0条新闻 - 官方发布'
+    assert first['url'] == 'http://www.baidu.com/link?url=abc0'
+    assert first['real_url'] == 'https://site0.example.com/article/0.html'
+    assert first['abstract'].startswith('内容四川农业大学第0条摘要内容')
+    assert first['source'] == 'site0.example.com'
+    assert first['cover_url'] == 'https://img0.example.com/cover.jpg'
+    # 每个结果块的字段不会串到相邻结果
+    assert results[2]['cover_url'] == 'https://img2.example.com/cover.jpg'
+
+
+def test_legacy_title_structure():
+    """没有结果块时识别旧版<h3 class="t">结构，并反转义HTML实体"""
+    html_content = (
+        '<h3 class="t"><a href="https://a.com/1">A&amp;B <em>成都</em></a></h3>'
+        '<div class="c-abstract">成都&nbsp;简介</div>'
+        '<h3 class="t"><a href="https://a.com/2">第二条</a></h3>'
+    )
+    results = parse_serp(html_content)
+    assert [r['title'] for r in results] == ['A&B 成都', '第二条']
+    assert results[0]['abstract'] == '成都 简介'
+
+
+def test_fallback_links_and_limits():
+    """备用链接结构和结果数、摘要长度限制"""
+    html_content = build_sample_serp(20, padding=1, fallback=True)
+    results = parse_serp(html_content, max_results=5)
+    assert len(results) == 5
+    assert results[4]['url'] == 'https://site4.example.com/4'
+
+    long_page = build_sample_serp(1, padding=500)
+    assert len(parse_serp(long_page, abstract_limit=50)[0]['abstract']) == 50
+
+
+def test_empty_input():
+    assert parse_serp('') == []
+    assert parse_serp('<html><body>没有结果</body></html>') == []
+
+
+def _stream_parse(html_content, size, **kwargs):
+    parser = SerpStreamParser(**kwargs)
+    fed = 0
+    for offset in range(0, len(html_content), size):
+        fed += 1
+        if parser.feed(html_content[offset:offset + size]):
+            break
+    return parser, parser.close(), fed
+
+
+@pytest.mark.parametrize('size', [1, 37, 500, 100000])
+def test_stream_parser_matches_full_parse(size):
+    for html_content in (build_sample_serp(12, padding=5, block_class='result c-container new-pmd'),
+                         build_sample_serp(5, padding=1, fallback=True),
+                         '<h3 class="t"><a href="https://a.com/1">旧版</a></h3><div class="c-abstract">简介</div>',
+                         '<html><body>没有结果</body></html>'):
+        assert _stream_parse(html_content, size)[1] == parse_serp(html_content)
+
+
+def test_stream_parser_stops_after_result_region():
+    """结果区域结束后停止读取，缓冲区只保留当前结果块"""
+    page = build_sample_serp(10, padding=100).replace(
+        '</div></body></html>', '</div><div id="page">分页</div>' + '<p>页脚</p>' * 20000 + '</body></html>'
+    )
+    parser, results, fed = _stream_parse(page, 1024)
+    assert results == parse_serp(page)
+    assert fed < len(page) // 1024 // 2
+    assert parser.peak_buffer < 4096
+
+    parser, results, _ = _stream_parse(page, 1024, max_results=3)
+    assert results == parse_serp(page, max_results=3)
+
+
+def test_stream_parser_detects_markers_across_chunks():
+    page = build_sample_serp(0) + '<p>请输入验证码</p>'
+    parser, results, _ = _stream_parse(page, 3, blocked_markers=('验证码', '请输入验证码'))
+    assert parser.blocked and results == []
+    parser, _, _ = _stream_parse(build_sample_serp(3, padding=1), 3, blocked_markers=('验证码',))
+    assert not parser.blocked
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
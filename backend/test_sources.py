@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+搜索来源插件测试脚本
+使用伪造的连接池离线验证来源注册表、fetch → parse → normalize流水线、缓存、验证码处理和并发上限
+"""
+
+import asyncio
+import gc
+
+import pytest
+
+import sources
+from bench_serp_parser import build_sample_serp
+from http_pool import FetchResponse, ValidatorStore
+from rate_limiter import MemoryBackend, TokenBucketLimiter
+from search_result import SearchResult
+from serp_cache import NullCache, SerpCache
+from sources import CAPTCHA, ERROR, SUCCESS, SearchSource, configure_source, create_sources, register_source
+
+
+class FakePool:
+    """按URL返回固定页面的连接池，记录同时在途的请求数和流式读取的字节数"""
+
+    def __init__(self, pages, delay=0, etag=None):
+        self.pages = pages
+        self.delay = delay
+        self.etag = etag
+        self.requests = []
+        self.bytes_read = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def get(self, url, headers=None, cookies=None, timeout=None, allow_redirects=True, validators=None):
+        self.requests.append(url)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        page = self.pages(url) if callable(self.pages) else self.pages
+        if isinstance(page, Exception):
+            raise page
+        status, html = page
+        # 模拟服务器的ETag校验：验证器与当前ETag一致时返回304
+        entry = validators.get(url) if validators is not None and self.etag else None
+        if entry is not None and entry['etag'] == self.etag:
+            return FetchResponse(304, url, {}, b'', validators=entry)
+        if validators is not None and self.etag and status == 200:
+            validators.update(url, self.etag, None, len(html.encode('utf-8')))
+        return FetchResponse(status, url, {'ETag': self.etag} if self.etag else {}, html.encode('utf-8'), 'utf-8')
+
+    async def stream(self, url, open_consumer, headers=None, cookies=None, timeout=None, allow_redirects=True,
+                     max_bytes=None, chunk_size=64, validators=None):
+        response = await self.get(url, headers, cookies, timeout, allow_redirects, validators)
+        body, response.content, response.body_bytes = response.content, b'', 0
+        consumer = open_consumer(response) if 200 <= response.status_code < 300 else None
+        if consumer is not None:
+            for offset in range(0, len(body), chunk_size):
+                response.body_bytes += len(body[offset:offset + chunk_size])
+                if consumer(body[offset:offset + chunk_size]):
+                    response.truncated = offset + chunk_size < len(body)
+                    break
+        self.bytes_read += response.body_bytes
+        return response
+
+    def run(self, coro, timeout=None):
+        return asyncio.run(coro)
+
+
+@register_source
+class ExampleSource(SearchSource):
+    name = 'example_test'
+    host = 'search.example.com'
+    concurrency = 2
+
+    def build_url(self, keyword, page):
+        return f'https://search.example.com/?q={keyword}&page={page}'
+
+
+def _source(pool, cache=None, validators=None):
+    limiter = TokenBucketLimiter(MemoryBackend(), rate=1000, burst=100, cooldown=0)
+    return ExampleSource(pool=pool, limiter=limiter, cache=cache or NullCache(),
+                         validators=ValidatorStore() if validators is None else validators)
+
+
+def test_registry_loads_builtin_sources():
+    names = sources.source_names()
+    assert {'baidu', 'baidu_search', 'baidu_dify', 'example_test'} <= set(names)
+    created = create_sources(['baidu_search', 'missing', 'example_test'], cache=NullCache())
+    assert [source.name for source in created] == ['baidu_search', 'example_test']
+
+    # 所有内置来源都接受注入的验证器存储
+    store = ValidatorStore()
+    created = create_sources(['baidu', 'baidu_search', 'baidu_dify'], cache=NullCache(), validators=store)
+    assert len(created) == 3 and all(source.validators is store for source in created)
+
+
+def test_pipeline_parses_normalizes_and_caches(tmp_path):
+    pool = FakePool((200, build_sample_serp(3, padding=1)))
+    cache = SerpCache(str(tmp_path / 'cache.db'))
+    source = _source(pool, cache)
+
+    results = source.collect('成都')
+    assert results and all(isinstance(r, SearchResult) for r in results)
+    assert results[0].source == 'example_test'
+    assert len(pool.requests) == 1
+
+    # 第二次搜索命中缓存，不再发送请求
+    again = asyncio.run(source.fetch_page('成都', 0))
+    assert again['cached'] and again['results'] == results
+    assert len(pool.requests) == 1
+
+
+def test_captcha_and_errors_stop_paging():
+    captcha = _source(FakePool((200, '<html>请输入验证码</html>')))
+    page = asyncio.run(captcha.fetch_page('成都', 0))
+    assert page['status'] == CAPTCHA and page['results'] == []
+
+    failing = _source(FakePool((503, '')))
+    page = asyncio.run(failing.fetch_page('成都', 0))
+    assert page['status'] == ERROR and '503' in page['error']
+
+    # 第二页返回验证码时只合并第一页
+    html = build_sample_serp(3, padding=1)
+    source = _source(FakePool(lambda url: (200, html) if url.endswith('page=0') else (200, '验证码')))
+    assert len(source.collect('成都', pages=3)) == len(source.normalize(source.parse(html), '成都'))
+    assert asyncio.run(source.fetch_page('成都', 0))['status'] == SUCCESS
+
+
+def test_not_modified_reuses_parsed_results(monkeypatch):
+    pool = FakePool((200, build_sample_serp(3, padding=1)), etag='"v1"')
+    validators = ValidatorStore()
+    source = _source(pool, validators=validators)
+    first = asyncio.run(source.fetch_page('成都', 0))
+    assert first['status'] == SUCCESS and first['results']
+
+    # 再次抓取时服务器返回304，不再解析页面
+    monkeypatch.setattr(source, 'parse', lambda html: pytest.fail('304时不应解析页面'))
+    again = asyncio.run(source.fetch_page('成都', 0))
+    assert again['not_modified'] and again['status_code'] == 304
+    assert again['results'] == first['results']
+    assert len(pool.requests) == 2
+
+    # 页面内容变化（ETag不同）时重新解析
+    monkeypatch.undo()
+    pool.etag = '"v2"'
+    changed = asyncio.run(source.fetch_page('成都', 0))
+    assert changed['status_code'] == 200 and not changed.get('not_modified')
+    assert validators.get(source.build_url('成都', 0))['etag'] == '"v2"'
+
+
+def test_streaming_stops_after_result_region():
+    html = build_sample_serp(5, padding=1).replace(
+        '</div></body></html>', '</div><div id="page">分页</div>' + '<p>页脚</p>' * 5000 + '</body></html>'
+    )
+    pool = FakePool((200, html))
+    source = _source(pool)
+    assert source.streaming
+    page = asyncio.run(source.fetch_page('成都', 0))
+    assert page['results'] == source.normalize(source.parse(html), '成都')
+    assert pool.bytes_read < len(html.encode('utf-8')) // 4
+
+    # 自定义parse的来源仍然完整读取页面
+    class CustomParse(ExampleSource):
+        def parse(self, html):
+            return super().parse(html)[:1]
+
+    custom = CustomParse(pool=FakePool((200, html)), limiter=source.limiter, cache=NullCache(),
+                         validators=ValidatorStore())
+    assert not custom.streaming
+    assert len(asyncio.run(custom.fetch_page('成都', 0))['results']) == 1
+    assert custom.pool.bytes_read == 0
+
+
+def test_concurrency_limit_per_source():
+    pool = FakePool((200, build_sample_serp(1, padding=1)), delay=0.02)
+    source = _source(pool)
+
+    async def run():
+        await asyncio.gather(*(source.fetch_page(f'关键词{i}', 0) for i in range(6)))
+
+    asyncio.run(run())
+    assert len(pool.requests) == 6
+    assert pool.max_in_flight == 2
+
+    configure_source('example_test', concurrency=3)
+    try:
+        pool = FakePool((200, build_sample_serp(1, padding=1)), delay=0.02)
+        source = _source(pool)
+        asyncio.run(run())
+        assert pool.max_in_flight == 3
+    finally:
+        sources.SOURCE_SETTINGS.pop('example_test', None)
+
+    with pytest.raises(ValueError):
+        configure_source('example_test', workers=2)
+
+
+def test_slots_released_with_event_loops():
+    """每次asyncio.run使用新的事件循环，已关闭循环的信号量不会累积"""
+    pool = FakePool((200, build_sample_serp(1, padding=1)), delay=0.01)
+    source = _source(pool)
+
+    async def run():
+        await asyncio.gather(*(source.fetch_page(f'关键词{i}', 0) for i in range(4)))
+
+    for _ in range(5):
+        asyncio.run(run())
+    gc.collect()
+    assert len(sources._slots) <= 1
+    assert pool.max_in_flight == 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
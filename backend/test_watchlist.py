@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+关键词监测调度测试脚本
+验证执行时刻在间隔内均匀分布、按优先级领取到期关键词、只入库新URL或内容变化的结果，以及失败记录
+"""
+
+import pytest
+
+from db import ConnectionPool
+from repository import init_repository
+from search_result import SearchResult
+from watchlist import DONE, FAILED, WatchScheduler, next_slot
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'database.db'))
+    init_repository(pool.connect())
+    yield pool
+    pool.close_all()
+
+
+class FakeRunner:
+    """按关键词返回预设结果的抓取函数"""
+
+    def __init__(self):
+        self.pages = {}
+        self.calls = []
+
+    def __call__(self, keyword):
+        self.calls.append(keyword)
+        page = self.pages.get(keyword, [])
+        if isinstance(page, Exception):
+            raise page
+        return list(page)
+
+
+def _scheduler(pool, runner, **kwargs):
+    scheduler = WatchScheduler(pool, runner, **kwargs)
+    scheduler.init_schema()
+    return scheduler
+
+
+def test_next_slot_spreads_keywords_across_interval():
+    now = 1_700_000_000.0
+    slots = [next_slot(f'关键词{i}', 3600, now) - now for i in range(600)]
+    assert all(0 < slot <= 3600 for slot in slots)
+    # 600个关键词落在一小时的12个5分钟区间中，每个区间都有，且没有明显的集中
+    buckets = [0] * 12
+    for slot in slots:
+        buckets[min(int(slot // 300), 11)] += 1
+    assert min(buckets) > 25 and max(buckets) < 80
+    # 同一关键词的执行时刻相隔整数个间隔
+    later = next_slot('关键词1', 3600, now + 10_000)
+    assert (later - next_slot('关键词1', 3600, now)) % 3600 == pytest.approx(0)
+
+
+def test_add_validates_and_updates(pool):
+    scheduler = _scheduler(pool, FakeRunner())
+    watch = scheduler.add(' 成都 ', interval_minutes=30, priority=1)
+    assert watch['keyword'] == '成都' and watch['enabled'] == 1
+    again = scheduler.add('成都', interval_minutes=30, priority=5)
+    assert again['id'] == watch['id'] and again['priority'] == 5
+    assert again['next_run_at'] == watch['next_run_at']
+    with pytest.raises(ValueError):
+        scheduler.add('', interval_minutes=30)
+    with pytest.raises(ValueError):
+        scheduler.add('成都', interval_minutes=1)
+    assert scheduler.remove(watch['id']) and not scheduler.remove(watch['id'])
+
+
+def test_due_keywords_claimed_by_priority(pool):
+    runner = FakeRunner()
+    scheduler = _scheduler(pool, runner, max_per_tick=2)
+    ids = {keyword: scheduler.add(keyword, priority=priority)['id']
+           for keyword, priority in (('低', 0), ('高', 9), ('中', 5))}
+    scheduler.add('停用', enabled=False)
+    now = max(w['next_run_at'] for w in scheduler.list()) + 1
+
+    assert [s['keyword'] for s in scheduler.run_due(now)] == ['高', '中']
+    assert [s['keyword'] for s in scheduler.run_due(now)] == ['低']
+    assert scheduler.run_due(now) == []
+    # 执行后排定到下一个间隔
+    assert scheduler.get(ids['高'])['next_run_at'] > now
+
+    assert scheduler.trigger(ids['低'])
+    assert [s['keyword'] for s in scheduler.run_due()] == ['低']
+    assert runner.calls == ['高', '中', '低', '低']
+
+
+def test_only_new_or_changed_results_are_stored(pool):
+    runner = FakeRunner()
+    stored = []
+
+    def store(conn, results, keyword):
+        stored.append([r.url for r in results])
+        return {'inserted': len(results), 'updated': 0}
+
+    scheduler = _scheduler(pool, runner, store=store)
+    watch = scheduler.add('成都')
+    runner.pages['成都'] = [
+        SearchResult(title='a', url='https://a.com/1', summary='s1'),
+        SearchResult(title='b', url='https://a.com/2', summary='s2'),
+        SearchResult(title='b重复', url='https://a.com/2/', summary=''),
+    ]
+    first = scheduler.run_due(limit=1, now=watch['next_run_at'])[0]
+    assert (first['fetched'], first['new'], first['status']) == (3, 2, DONE)
+
+    runner.pages['成都'] = [
+        SearchResult(title='a', url='https://a.com/1?utm_source=x', summary='s1'),
+        SearchResult(title='b', url='https://a.com/2', summary='s2已更新'),
+        SearchResult(title='c', url='https://a.com/3', summary='s3'),
+    ]
+    scheduler.trigger(watch['id'])
+    second = scheduler.run_due()[0]
+    assert second['new'] == 2
+    assert stored == [['https://a.com/1', 'https://a.com/2'], ['https://a.com/2', 'https://a.com/3']]
+    assert scheduler.get(watch['id'])['last_new'] == 2
+
+    scheduler.trigger(watch['id'])
+    assert scheduler.run_due()[0]['new'] == 0
+    assert len(stored) == 2
+
+
+def test_results_stored_in_repository_and_failures_recorded(pool):
+    runner = FakeRunner()
+    scheduler = _scheduler(pool, runner)
+    ok = scheduler.add('四川农业大学', priority=1)
+    bad = scheduler.add('失败')
+    runner.pages['四川农业大学'] = [SearchResult(title='四川农业大学新闻', url='https://a.com/n', summary='')]
+    runner.pages['失败'] = RuntimeError('网络错误')
+    scheduler.trigger(ok['id'])
+    scheduler.trigger(bad['id'])
+
+    summaries = scheduler.run_due()
+    assert summaries[0]['inserted'] == 1
+    assert pool.connect().execute("SELECT title, search_keyword FROM data_repository").fetchall() == [
+        ('四川农业大学新闻', '四川农业大学')
+    ]
+    failed = scheduler.get(bad['id'])
+    assert failed['last_status'] == FAILED and '网络错误' in failed['last_error']
+    assert failed['run_count'] == 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
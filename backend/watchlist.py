@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+关键词监测列表与定时增量抓取 - 智能瞭望数据分析处理系统
+功能: 保存需要持续监测的关键词，按各自的间隔和优先级在后台定时抓取，只入库新出现或内容变化的结果
+
+负载均摊: 每个关键词的执行时刻由关键词的哈希值确定一个固定相位，
+间隔相同的关键词均匀分布在整个间隔内（如一小时内），而不是在整点集中触发；
+调度线程每轮最多执行MAX_PER_TICK个到期关键词，积压时按优先级先后执行。
+
+增量入库: 每个关键词记录上次抓到的规范化URL及其标题、摘要的内容哈希，
+本次结果中URL未出现过或内容哈希发生变化的才写入数据仓库。
+
+到期关键词在一个写事务中领取并同时排定下次执行时间，
+多个进程同时运行调度器也不会重复抓取同一个关键词。
+"""
+
+import hashlib
+import logging
+import threading
+import time
+import zlib
+
+from repository import MAX_SQL_VARIABLES, normalize_url, upsert_results
+
+logger = logging.getLogger(__name__)
+
+# 调度线程检查到期关键词的间隔（秒）
+TICK_INTERVAL = 30.0
+
+# 每轮最多执行的关键词数
+MAX_PER_TICK = 2
+
+# 默认抓取间隔和允许的范围（分钟）
+DEFAULT_INTERVAL_MINUTES = 60
+MIN_INTERVAL_MINUTES = 5
+MAX_INTERVAL_MINUTES = 7 * 24 * 60
+
+# 已抓取URL记录的保留天数，超过后视为新结果
+SEEN_RETENTION_DAYS = 30
+
+# 执行状态
+DONE = 'done'
+FAILED = 'failed'
+
+WATCH_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS watch_keywords (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        keyword TEXT NOT NULL UNIQUE,
+        interval_minutes INTEGER NOT NULL,
+        priority INTEGER NOT NULL DEFAULT 0,
+        enabled INTEGER NOT NULL DEFAULT 1,
+        next_run_at REAL NOT NULL,
+        last_run_at REAL,
+        last_status TEXT,
+        last_error TEXT,
+        last_fetched INTEGER,
+        last_new INTEGER,
+        run_count INTEGER NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL
+    )
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_watch_keywords_due ON watch_keywords (enabled, next_run_at)
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS watch_seen (
+        watch_id INTEGER NOT NULL,
+        url_key TEXT NOT NULL,
+        content_hash TEXT NOT NULL,
+        seen_at REAL NOT NULL,
+        PRIMARY KEY (watch_id, url_key)
+    ) WITHOUT ROWID
+    '''
+]
+
+WATCH_COLUMNS = ('id', 'keyword', 'interval_minutes', 'priority', 'enabled', 'next_run_at', 'last_run_at',
+                 'last_status', 'last_error', 'last_fetched', 'last_new', 'run_count', 'created_at')
+
+
+def next_slot(keyword, interval_seconds, now):
+    """
+    关键词在now之后的下一个执行时刻
+
+    执行时刻为 相位 + k * 间隔，相位由关键词的CRC32确定，同一关键词每次计算结果一致
+    """
+    interval_seconds = max(1, int(interval_seconds))
+    phase = zlib.crc32(keyword.encode('utf-8')) % interval_seconds
+    wait = (phase - now) % interval_seconds
+    return now + (wait or interval_seconds)
+
+
+def content_hash(result):
+    """搜索结果标题和摘要的内容哈希"""
+    text = f"{(result.title or '').strip()}\n{(result.summary or '').strip()}"
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _candidates(results):
+    """按规范化URL整理本次结果：{规范化URL: (SearchResult, 规范化URL, 内容哈希)}，相同URL只保留第一条"""
+    candidates = {}
+    for result in results:
+        url_key = normalize_url(result.url)
+        if url_key and url_key not in candidates:
+            candidates[url_key] = (result, url_key, content_hash(result))
+    return candidates
+
+
+def _validate(keyword, interval_minutes, priority):
+    keyword = (keyword or '').strip()
+    if not keyword:
+        raise ValueError('请输入监测关键词')
+    try:
+        interval_minutes = int(interval_minutes)
+        priority = int(priority)
+    except (TypeError, ValueError):
+        raise ValueError('抓取间隔和优先级必须是整数')
+    if not MIN_INTERVAL_MINUTES <= interval_minutes <= MAX_INTERVAL_MINUTES:
+        raise ValueError(f'抓取间隔须在 {MIN_INTERVAL_MINUTES} 到 {MAX_INTERVAL_MINUTES} 分钟之间')
+    return keyword, interval_minutes, priority
+
+
+class WatchScheduler:
+    """
+    关键词监测列表的定时抓取调度器
+
+    Args:
+        pool: db.ConnectionPool
+        runner: 抓取单个关键词的函数，参数为关键词，返回SearchResult列表
+        store: 入库函数，参数为 (conn, 结果列表, 关键词)，默认repository.upsert_results
+        tick: 调度线程检查到期关键词的间隔（秒）
+        max_per_tick: 每轮最多执行的关键词数
+    """
+
+    def __init__(self, pool, runner, store=upsert_results, tick=TICK_INTERVAL, max_per_tick=MAX_PER_TICK):
+        self.pool = pool
+        self.runner = runner
+        self.store = store
+        self.tick = tick
+        self.max_per_tick = max_per_tick
+        self._thread = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def init_schema(self):
+        """创建监测列表表"""
+        conn = self.pool.connect()
+        for statement in WATCH_SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+
+    # ---- 监测列表管理 ----
+
+    def add(self, keyword, interval_minutes=DEFAULT_INTERVAL_MINUTES, priority=0, enabled=True):
+        """
+        添加监测关键词，已存在时更新间隔、优先级和启用状态
+
+        Returns:
+            dict: 监测关键词信息
+        """
+        keyword, interval_minutes, priority = _validate(keyword, interval_minutes, priority)
+        now = time.time()
+        conn = self.pool.connect()
+        with conn:
+            row = conn.execute(
+                "INSERT INTO watch_keywords (keyword, interval_minutes, priority, enabled, next_run_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (keyword) DO UPDATE SET interval_minutes = excluded.interval_minutes, "
+                "priority = excluded.priority, enabled = excluded.enabled, "
+                "next_run_at = CASE WHEN watch_keywords.interval_minutes = excluded.interval_minutes "
+                "THEN watch_keywords.next_run_at ELSE excluded.next_run_at END "
+                "RETURNING id",
+                (keyword, interval_minutes, priority, int(bool(enabled)),
+                 next_slot(keyword, interval_minutes * 60, now), now)
+            ).fetchall()
+        logger.info(f"监测关键词 {keyword}: 每 {interval_minutes} 分钟抓取，优先级 {priority}")
+        return self.get(row[0][0])
+
+    def remove(self, watch_id):
+        """删除监测关键词及其已抓取记录，返回是否存在"""
+        conn = self.pool.connect()
+        with conn:
+            deleted = conn.execute("DELETE FROM watch_keywords WHERE id = ?", (watch_id,)).rowcount
+            conn.execute("DELETE FROM watch_seen WHERE watch_id = ?", (watch_id,))
+        return bool(deleted)
+
+    def trigger(self, watch_id):
+        """让监测关键词在下一轮调度时立即执行，返回是否存在"""
+        conn = self.pool.connect()
+        with conn:
+            updated = conn.execute(
+                "UPDATE watch_keywords SET next_run_at = ? WHERE id = ?", (time.time(), watch_id)
+            ).rowcount
+        return bool(updated)
+
+    def get(self, watch_id):
+        """查询单个监测关键词，不存在时返回None"""
+        row = self.pool.connect().execute(
+            f"SELECT {', '.join(WATCH_COLUMNS)} FROM watch_keywords WHERE id = ?", (watch_id,)
+        ).fetchone()
+        return dict(zip(WATCH_COLUMNS, row)) if row else None
+
+    def list(self):
+        """监测列表，按优先级和下次执行时间排序"""
+        return [dict(zip(WATCH_COLUMNS, row)) for row in self.pool.connect().execute(
+            f"SELECT {', '.join(WATCH_COLUMNS)} FROM watch_keywords ORDER BY priority DESC, next_run_at"
+        )]
+
+    # ---- 调度 ----
+
+    def start(self):
+        """启动调度线程（重复调用无副作用）"""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self.init_schema()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='watch-scheduler', daemon=True)
+            self._thread.start()
+            logger.info("关键词监测调度已启动")
+
+    def stop(self, timeout=None):
+        """停止调度线程，正在执行的关键词完成后退出"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_due()
+            except Exception:
+                logger.exception("关键词监测调度出错")
+            self._stop.wait(self.tick)
+
+    def _claim_due(self, now, limit):
+        """原子领取到期的关键词，同时排定下次执行时间"""
+        conn = self.pool.connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT id, keyword, interval_minutes FROM watch_keywords "
+                "WHERE enabled = 1 AND next_run_at <= ? ORDER BY priority DESC, next_run_at LIMIT ?",
+                (now, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE watch_keywords SET next_run_at = ? WHERE id = ?",
+                [(next_slot(keyword, interval * 60, now), watch_id) for watch_id, keyword, interval in rows]
+            )
+        return [(watch_id, keyword) for watch_id, keyword, _ in rows]
+
+    def run_due(self, now=None, limit=None):
+        """
+        执行一轮调度：领取并依次抓取到期的关键词
+
+        Args:
+            now: 当前时间戳，默认time.time()
+            limit: 本轮最多执行的关键词数，默认max_per_tick
+
+        Returns:
+            list: 每个关键词的执行摘要
+        """
+        now = time.time() if now is None else now
+        summaries = []
+        for watch_id, keyword in self._claim_due(now, self.max_per_tick if limit is None else limit):
+            if self._stop.is_set():
+                break
+            summaries.append(self._run_watch(watch_id, keyword))
+        return summaries
+
+    def _run_watch(self, watch_id, keyword):
+        start = time.perf_counter()
+        summary = {'id': watch_id, 'keyword': keyword, 'fetched': 0, 'new': 0, 'inserted': 0, 'updated': 0,
+                   'status': DONE, 'error': None}
+        try:
+            results = self.runner(keyword)
+            summary['fetched'] = len(results)
+            candidates = _candidates(results)
+            fresh = self._filter_new(watch_id, candidates)
+            summary['new'] = len(fresh)
+            if fresh:
+                summary.update(self.store(self.pool.connect(), [result for result, _, _ in fresh], keyword))
+            # 本次抓到的所有URL都刷新记录时间，持续出现的结果不会因超过保留期而被当作新结果
+            self._mark_seen(watch_id, candidates.values())
+        except Exception as e:
+            logger.error(f"监测关键词 {keyword} 抓取失败: {str(e)}")
+            summary['status'], summary['error'] = FAILED, str(e)
+
+        conn = self.pool.connect()
+        with conn:
+            conn.execute(
+                "UPDATE watch_keywords SET last_run_at = ?, last_status = ?, last_error = ?, last_fetched = ?, "
+                "last_new = ?, run_count = run_count + 1 WHERE id = ?",
+                (time.time(), summary['status'], summary['error'], summary['fetched'], summary['new'], watch_id)
+            )
+        logger.info(f"监测关键词 {keyword} 抓取完成: 共 {summary['fetched']} 条，新增或变化 {summary['new']} 条，"
+                    f"耗时 {time.perf_counter() - start:.2f}s")
+        return summary
+
+    def _filter_new(self, watch_id, candidates):
+        """
+        筛选URL未出现过或内容哈希变化的结果
+
+        Args:
+            candidates: _candidates的返回值
+
+        Returns:
+            list: (SearchResult, 规范化URL, 内容哈希) 列表
+        """
+        if not candidates:
+            return []
+
+        conn = self.pool.connect()
+        keys = list(candidates)
+        known = {}
+        cutoff = time.time() - SEEN_RETENTION_DAYS * 86400
+        for start in range(0, len(keys), MAX_SQL_VARIABLES):
+            chunk = keys[start:start + MAX_SQL_VARIABLES]
+            known.update(conn.execute(
+                f"SELECT url_key, content_hash FROM watch_seen WHERE watch_id = ? AND seen_at >= ? "
+                f"AND url_key IN ({','.join('?' * len(chunk))})", [watch_id, cutoff] + chunk
+            ).fetchall())
+        return [item for key, item in candidates.items() if known.get(key) != item[2]]
+
+    def _mark_seen(self, watch_id, items):
+        now = time.time()
+        conn = self.pool.connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO watch_seen (watch_id, url_key, content_hash, seen_at) VALUES (?, ?, ?, ?)",
+                [(watch_id, url_key, digest, now) for _, url_key, digest in items]
+            )
+            conn.execute("DELETE FROM watch_seen WHERE watch_id = ? AND seen_at < ?",
+                         (watch_id, now - SEEN_RETENTION_DAYS * 86400))
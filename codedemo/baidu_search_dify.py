@@ -3,15 +3,23 @@
 """
 百度搜索Dify逻辑代码
 用于在Dify平台中执行百度搜索功能
-移除了bs4依赖，使用正则表达式解析HTML
+抓取、解析、限速和缓存使用backend中共享的搜索来源流水线，本模块只负责URL清理、去重和结果格式化
 """
 
-import requests
+import os
+import sys
 import urllib.parse
 import re
-import time
 import random
 
+# 添加backend目录到系统路径，以便导入共享的搜索来源流水线
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
+
+from search_result import SearchResult
+from sources import CAPTCHA, SUCCESS, SearchSource, register_source
+
 # 禁用日志，使用print输出信息
 def log_info(msg):
     print(f"INFO: {msg}")
@@ -132,7 +140,7 @@ def _deduplicate_results(results):
     seen_urls = set()
     
     for result in results:
-        url = result['url']
+        url = result.url
         # 简化的URL去重（只使用域名+路径）
         try:
             from urllib.parse import urlparse
@@ -148,8 +156,6 @@ def _deduplicate_results(results):
     # 限制结果数量
     return unique_results[:10]
 
-# 删除_process_link函数，因为现在直接在main函数中使用正则处理
-
 def _get_headers():
     """生成随机的请求头"""
     # 随机选择一个User-Agent
@@ -167,6 +173,75 @@ def _get_headers():
         'Connection': 'keep-alive',
     }
 
+@register_source
+class BaiduDifySource(SearchSource):
+    """Dify平台使用的百度搜索来源：按域名+路径去重，过滤百度内部链接"""
+    
+    name = 'baidu_dify'
+    host = 'www.baidu.com'
+    result_source = 'baidu'
+    max_results = 10
+    timeout = 10
+    captcha_markers = ("验证码", "验证", "安全验证")
+    
+    def __init__(self, pool=None, limiter=None, cache=None, validators=None):
+        super().__init__(pool, limiter, cache, validators)
+        self.cookies = {'BDORZ': 'B490B5EBF6F3CD402E515D22BCDA1598'}
+        self._home_visited = False
+    
+    def get_headers(self):
+        return _get_headers()
+    
+    def build_url(self, keyword, page):
+        random_param = random.randint(1000000000, 9999999999)
+        search_url = f"https://www.baidu.com/s?wd={urllib.parse.quote(keyword)}&rsv_spt=1&rsv_iqid=0x{random_param:x}"
+        if page:
+            search_url += f"&pn={page * 10}"
+        return search_url
+    
+    async def prepare(self):
+        """访问百度首页获取cookie（可选，失败时继续搜索）"""
+        if self._home_visited:
+            return
+        self._home_visited = True
+        try:
+            home_headers = _get_headers()
+            home_headers['Referer'] = 'https://www.google.com/'
+            home_response = await self.pool.get('https://www.baidu.com', headers=home_headers,
+                                                cookies=self.cookies, timeout=5)
+            log_info(f"首页访问状态码: {home_response.status_code}")
+        except Exception as e:
+            log_info(f"首页访问失败，继续搜索: {e}")
+    
+    def normalize(self, items, keyword):
+        """清理URL，跳过百度内部链接和重复结果"""
+        results = []
+        seen_titles = set()
+        seen_urls = set()
+        for item in items:
+            title = item['title']
+            if not title or len(title) <= 5 or len(title) >= 150 or title in seen_titles:
+                continue
+            clean_url = _clean_url(item['real_url'] or item['url'])
+            # 跳过无效URL或百度内部非结果链接
+            if not clean_url or _is_baidu_internal(clean_url) or clean_url in seen_urls:
+                continue
+            results.append(SearchResult(
+                title=title,
+                summary=item['abstract'][:300],
+                url=clean_url,
+                source=self.result_source,
+                cover_url=item['cover_url']
+            ))
+            seen_titles.add(title)
+            seen_urls.add(clean_url)
+        return _deduplicate_results(results)[:self.max_results]
+    
+    async def asearch_page(self, keyword):
+        """抓取第一页结果，返回fetch_page的页面结果字典"""
+        await self.prepare()
+        return await self.fetch_page(keyword, 0)
+
 def main(arg1: str):
     """
     百度搜索主函数 - 用于Dify平台
@@ -187,143 +262,28 @@ def main(arg1: str):
         
         log_info(f"开始搜索关键词: {keyword}")
         
-        # 初始化会话
-        session = requests.Session()
-        session.allow_redirects = True
-        session.cookies.set('BDORZ', 'B490B5EBF6F3CD402E515D22BCDA1598')
-        
-        # 访问百度首页获取cookie（可选，这里简化）
-        try:
-            home_headers = _get_headers()
-            home_headers['Referer'] = 'https://www.google.com/'
-            home_response = session.get('https://www.baidu.com', headers=home_headers, timeout=5)
-            log_info(f"首页访问状态码: {home_response.status_code}")
-            time.sleep(random.uniform(0.5, 1.0))  # 简短延迟
-        except Exception as e:
-            log_info(f"首页访问失败，继续搜索: {e}")
-        
-        # 对关键词进行URL编码
-        encoded_keyword = urllib.parse.quote(keyword)
-        
-        # 构建搜索URL
-        random_param = random.randint(1000000000, 9999999999)
-        search_url = f"https://www.baidu.com/s?wd={encoded_keyword}&rsv_spt=1&rsv_iqid=0x{random_param:x}"
+        source = BaiduDifySource()
+        page = source.pool.run(source.asearch_page(keyword))
         
-        log_info(f"搜索URL: {search_url}")
-        
-        # 发送搜索请求
-        headers = _get_headers()
-        headers['Referer'] = 'https://www.baidu.com/'
-        
-        # 简短延迟后发送请求
-        time.sleep(random.uniform(0.3, 1.0))
-        
-        try:
-            response = session.get(search_url, headers=headers, timeout=10, allow_redirects=True)
-            response.encoding = 'utf-8'
-            response.raise_for_status()
-            log_info(f"搜索请求状态码: {response.status_code}")
-        except requests.exceptions.RequestException as e:
+        if page['status'] == CAPTCHA:
             return {
-                "result": f"错误: 搜索请求失败 - {str(e)}"
+                "result": "错误: 检测到百度验证码，搜索失败"
             }
-        
-        # 检查是否包含验证码
-        html_content = response.text
-        if "验证码" in html_content or "验证" in html_content or "安全验证" in html_content:
+        if page['status'] != SUCCESS:
             return {
-                "result": "错误: 检测到百度验证码，搜索失败"
+                "result": f"错误: 搜索请求失败 - {page.get('error', '')}"
             }
         
-        # 初始化结果
-        results = []
-        seen_titles = set()
-        seen_urls = set()
-        
-        # 使用正则表达式提取搜索结果
-        log_info("使用正则表达式提取搜索结果")
-        
-        # 尝试提取搜索结果的不同正则模式
-        # 模式1: 匹配带有标题和链接的搜索结果
-        pattern1 = r'<a[^>]*?href=["\'](.*?)["\'][^>]*?>(.*?)</a>'
-        matches = re.findall(pattern1, html_content, re.DOTALL)
-        
-        log_info(f"正则匹配1找到 {len(matches)} 个链接")
-        
-        for href, title_html in matches[:200]:  # 限制处理数量
-            # 清理标题，移除HTML标签
-            title = re.sub(r'<[^>]*>', '', title_html).strip()
-            href = href.strip()
-            
-            # 筛选条件
-            if title and len(title) > 5 and len(title) < 150 and href and len(href) > 8:
-                if title not in seen_titles:
-                    # 使用正则提取可能的摘要
-                    summary = ""
-                    # 查找标题附近的文本作为摘要
-                    summary_pattern = re.escape(title) + r'[^<]*</a>[^<]*<span[^>]*>(.*?)</span>'
-                    summary_match = re.search(summary_pattern, html_content, re.DOTALL)
-                    if summary_match:
-                        summary = re.sub(r'<[^>]*>', '', summary_match.group(1)).strip()
-                    
-                    # 清理URL
-                    clean_url = _clean_url(href)
-                    
-                    # 跳过无效URL或百度内部非结果链接
-                    if clean_url and not _is_baidu_internal(clean_url):
-                        if clean_url not in seen_urls:
-                            results.append({
-                                'title': title,
-                                'summary': summary[:300],
-                                'url': clean_url
-                            })
-                            seen_titles.add(title)
-                            seen_urls.add(clean_url)
-        
-        # 尝试额外的模式提取结果
-        # 模式2: 匹配特定的百度搜索结果格式
-        pattern2 = r'<div[^>]*class=["\'].*?(result|c-container).*?["\'][^>]*>.*?<a[^>]*?href=["\'](.*?)["\'][^>]*?>(.*?)</a>.*?</div>'
-        matches2 = re.findall(pattern2, html_content, re.DOTALL)
-        
-        log_info(f"正则匹配2找到 {len(matches2)} 个结果")
-        
-        for _, href, title_html in matches2[:100]:
-            title = re.sub(r'<[^>]*>', '', title_html).strip()
-            href = href.strip()
-            
-            if title and len(title) > 5 and title not in seen_titles:
-                clean_url = _clean_url(href)
-                if clean_url and not _is_baidu_internal(clean_url) and clean_url not in seen_urls:
-                    # 提取摘要
-                    summary = ""
-                    # 在结果块中查找可能的摘要
-                    result_block_pattern = re.escape(href) + r'[^<]*</a>.*?</div>'
-                    block_match = re.search(result_block_pattern, html_content, re.DOTALL)
-                    if block_match:
-                        block_content = block_match.group(0)
-                        # 尝试提取摘要文本
-                        text_matches = re.findall(r'<[^>]*class=["\'](?:c-abstract|content|summary)["\'][^>]*>(.*?)</div>', block_content, re.DOTALL)
-                        if text_matches:
-                            summary = re.sub(r'<[^>]*>', '', text_matches[0]).strip()[:300]
-                    
-                    results.append({
-                        'title': title,
-                        'summary': summary,
-                        'url': clean_url
-                    })
-                    seen_titles.add(title)
-                    seen_urls.add(clean_url)
-        
-        # 去重处理
-        unique_results = _deduplicate_results(results)
+        unique_results = page['results']
+        log_info(f"提取到 {len(unique_results)} 个有效结果")
         
         # 格式化结果
         formatted_results = []
         for i, item in enumerate(unique_results, 1):
-            formatted_results.append(f"[{i}] 标题: {item['title']}")
-            formatted_results.append(f"   URL: {item['url']}")
-            if item['summary']:
-                formatted_results.append(f"   摘要: {item['summary']}")
+            formatted_results.append(f"[{i}] 标题: {item.title}")
+            formatted_results.append(f"   URL: {item.url}")
+            if item.summary:
+                formatted_results.append(f"   摘要: {item.summary}")
             formatted_results.append("")
         
         # 构建返回结果
@@ -7,39 +7,59 @@
 目标接口: 百度搜索
 """
 
-import requests
+import os
+import sys
 import urllib.parse
 import re
 import time
 import random
-import json
+import asyncio
 import logging
 from urllib.parse import urlparse
 
+# 添加backend目录到系统路径，以便导入共享的搜索来源流水线
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
+
+from search_result import SearchResult
+from near_dup import NearDupIndex
+from relevance import TitleMatchScorer
+from sources import CAPTCHA, SUCCESS, SearchSource, register_source
+
+BAIDU_HOST = 'www.baidu.com'
+
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-class BaiduSpider:
+@register_source
+class BaiduSpider(SearchSource):
     """
     百度搜索爬虫类，用于抓取百度搜索结果，支持精准搜索和结果验证
     """
     
-    def __init__(self):
-        # 初始化会话，启用重定向跟踪
-        self.session = requests.Session()
-        self.session.allow_redirects = True
+    name = 'baidu'
+    host = BAIDU_HOST
+    # 验证和去重前最多保留的候选结果数
+    max_results = 15
+    timeout = 20
+    # 页面包含这些内容时视为触发验证码或反爬机制
+    captcha_markers = ("验证码", "验证", "antirobot", "安全验证", "请输入验证码", "确认您是用户", "您的访问过于频繁")
+    
+    def __init__(self, pool=None, limiter=None, cache=None, validators=None):
+        # 所有实例共享进程内的长连接池、跨进程的限速器和搜索结果缓存
+        super().__init__(pool, limiter, cache, validators)
         
         # 添加一些初始cookie以模拟已访问过百度
-        self.session.cookies.set('BDORZ', 'B490B5EBF6F3CD402E515D22BCDA1598')  # 百度常见cookie
-        self.session.cookies.set('BAIDUID', '0A1E45A76B7F15035D5D42A6B5A2F1F3:FG=1')
-        self.session.cookies.set('H_PS_PSSID', '38004_37989_38040_38091_38094')
-        
-        # 初始化访问计数和时间戳
-        self.visit_count = 0
-        self.last_visit_time = time.time()
+        self.cookies = {
+            'BDORZ': 'B490B5EBF6F3CD402E515D22BCDA1598',  # 百度常见cookie
+            'BAIDUID': '0A1E45A76B7F15035D5D42A6B5A2F1F3:FG=1',
+            'H_PS_PSSID': '38004_37989_38040_38091_38094'
+        }
+
     
-    def _get_headers(self):
+    def get_headers(self):
         """生成更接近真实浏览器的请求头，减少被检测到的风险"""
         # 随机选择一个User-Agent
         user_agents = [
@@ -78,35 +98,62 @@ class BaiduSpider:
             
         return headers
     
-    def _simulate_human_behavior(self):
-        """模拟人类行为，避免被反爬"""
-        # 更新访问计数
-        self.visit_count += 1
-        current_time = time.time()
-        time_since_last_visit = current_time - self.last_visit_time
-        self.last_visit_time = current_time
+    async def throttle(self):
+        """模拟人类行为，避免被反爬：向限速器领取令牌，并加入少量随机抖动"""
+        await super().throttle()
+        delay = random.uniform(0.1, 0.5)
+        logger.info(f"模拟人类行为，延迟 {delay:.2f} 秒")
+        await asyncio.sleep(delay)
+    
+    def build_url(self, keyword, page=0):
+        """构造优化的百度搜索URL，添加安全参数"""
+        encoded_keyword = urllib.parse.quote(keyword)
+        search_url = f"https://www.baidu.com/s?wd={encoded_keyword}&ie=utf-8&rsv_idx=1&rsv_pq=f2e85d230002a446&rsv_t=e0a21Bc5R8I4s4%2FhXr2Jvq%2FdDw"
+        if page:
+            search_url += f"&pn={page * 10}"
+        return search_url
+    
+    def normalize(self, items, keyword):
+        """清理URL、筛选标题，再做相关性验证和去重"""
+        logger.info(f"解析得到 {len(items)} 个候选结果")
+        results = []
+        seen_urls_temp = set()  # 用于临时URL去重
         
-        # 根据访问次数增加延迟
-        if self.visit_count <= 3:
-            # 初始访问，延迟较小
-            delay = random.uniform(1.5, 2.5)
-        elif self.visit_count <= 10:
-            # 多次访问，增加延迟
-            delay = random.uniform(3, 5)
-        else:
-            # 频繁访问，较大延迟
-            delay = random.uniform(5, 8)
+        for item in items:
+            title = item['title']
+            
+            # 验证和清理URL，优先使用结果块给出的真实落地页地址
+            clean_url = self._clean_url(item['real_url'] or item['url'])
+            if not clean_url:
+                continue
+            
+            # 筛选条件：确保标题不为空，长度合适
+            if title and len(title) > 2 and len(title) < 150 and clean_url not in seen_urls_temp:
+                results.append(SearchResult(
+                    title=title,
+                    summary=item['abstract'],
+                    url=clean_url,
+                    source=item['source'],
+                    cover_url=item['cover_url']
+                ))
+                seen_urls_temp.add(clean_url)
+                
+                # 限制结果数量
+                if len(results) >= self.max_results:
+                    break
         
-        # 确保两次访问之间至少有1秒间隔
-        if time_since_last_visit < 1:
-            delay += 1 - time_since_last_visit
+        # 对结果进行验证和过滤，确保与关键词相关
+        validated_results = self._validate_results(results, keyword)
         
-        logger.info(f"模拟人类行为，延迟 {delay:.2f} 秒")
-        time.sleep(delay)
+        # 实现高级去重逻辑
+        final_results = self._deduplicate_results(validated_results)
+        
+        logger.info(f"原始结果数: {len(results)}, 验证后结果数: {len(validated_results)}, 最终去重结果数: {len(final_results)}")
+        return final_results
     
     def search(self, keyword, timeout=20):
         """
-        根据关键词精准搜索百度
+        根据关键词精准搜索百度（asearch的同步包装）
         
         Args:
             keyword: 搜索关键词
@@ -115,245 +162,63 @@ class BaiduSpider:
         Returns:
             dict: 搜索结果字典，包含状态码和数据
         """
-        try:
-            logger.info(f"开始搜索关键词: {keyword}")
-            
-            # 模拟人类行为
-            self._simulate_human_behavior()
-            
-            # 对关键词进行URL编码
-            encoded_keyword = urllib.parse.quote(keyword)
-            
-            # 构造优化的百度搜索URL，添加安全参数
-            search_url = f"https://www.baidu.com/s?wd={encoded_keyword}&ie=utf-8&rsv_idx=1&rsv_pq=f2e85d230002a446&rsv_t=e0a21Bc5R8I4s4%2FhXr2Jvq%2FdDw"
-            
-            # 使用持久会话
-            session = self.session
-            
-            # 设置更真实的请求头
-            headers = self._get_headers()
-            
-            logger.info(f"搜索URL: {search_url}")
-            logger.info("发送搜索请求...")
-            
-            # 发送请求，使用HTTPS以提高安全性
-            response = session.get(search_url, headers=headers, timeout=timeout, allow_redirects=True)
-            
-            # 尝试多种方式解码响应内容
-            html_content = None
-            
-            # 方法1：让requests自动处理
-            try:
-                html_content = response.text
-                logger.info("使用requests自动解码获取HTML内容")
-            except Exception as e:
-                logger.error(f"自动解码失败: {e}")
-                # 如果自动解码失败，尝试手动解码
-                try:
-                    # 首先尝试GBK，百度常用
-                    html_content = response.content.decode('gbk', errors='replace')
-                    logger.info("使用gbk解码获取HTML内容")
-                except Exception as e:
-                    logger.error(f"gbk解码失败: {e}")
-                    # 尝试UTF-8
-                    try:
-                        html_content = response.content.decode('utf-8', errors='replace')
-                        logger.info("使用utf-8解码获取HTML内容")
-                    except Exception as e:
-                        logger.error(f"utf-8解码失败: {e}")
-                        # 最后使用原始内容
-                        html_content = str(response.content)
-                        logger.warning("使用原始内容字符串表示")
-            
-            # 确保html_content不为None
-            if html_content is None:
-                html_content = ''
-            
-            # 打印一些调试信息
-            logger.info(f"请求头中的User-Agent: {headers['User-Agent']}")
-            logger.info(f"Cookie数量: {len(session.cookies)}")
-            logger.info(f"响应状态码: {response.status_code}")
-            
-            response.raise_for_status()  # 检查请求是否成功
-            
-            # 保存响应文本用于调试
-            logger.info(f"HTML内容长度: {len(html_content)} 字符")
-            
-            # 检查是否包含验证码或反爬信息
-            anti_crawl_patterns = ["验证码", "验证", "antirobot", "安全验证", "请输入验证码", "确认您是用户", "您的访问过于频繁"]
-            anti_crawl_detected = any(pattern in html_content for pattern in anti_crawl_patterns)
-            
-            if anti_crawl_detected:
-                logger.warning("检测到可能的反爬机制或验证码")
-                return {
-                    'status': 'error',
-                    'error_type': 'captcha',
-                    'error_message': '检测到百度验证码或反爬机制',
-                    'keyword': keyword
-                }
-            
-            # 初始化结果列表和去重集合
-            results = []
-            seen_titles = set()  # 用于标题去重
-            seen_urls_temp = set()  # 用于临时URL去重
-            
-            # 使用正则表达式提取搜索结果 - 使用更精准的模式
-            logger.info("使用正则表达式提取搜索结果")
-            
-            # 显示页面的前300个字符，看看是否是正常的百度页面
-            logger.info(f"HTML前300字符: {repr(html_content[:300])}")
-            
-            # 使用更精准的正则表达式匹配百度搜索结果
-            # 匹配百度搜索结果的主要结构
-            result_blocks = re.findall(r'<div class=["\']result["\'][^>]*>(.*?)</div>', html_content, re.DOTALL)
-            logger.info(f"找到 {len(result_blocks)} 个结果块")
-            
-            # 对于每个结果块，提取标题、URL和摘要
-            for block in result_blocks:
-                # 提取标题和URL
-                title_url_match = re.search(r'<h3[^>]*>.*?<a[^>]*?href=["\'](.*?)["\'][^>]*?>(.*?)</a>.*?</h3>', block, re.DOTALL)
-                if title_url_match:
-                    url = title_url_match.group(1)
-                    title_html = title_url_match.group(2)
-                    # 清理标题
-                    title = re.sub(r'<[^>]*>', '', title_html).strip()
-                    
-                    # 提取摘要
-                    abstract = ''
-                    abstract_match = re.search(r'<div class=["\']c-abstract["\'][^>]*>(.*?)</div>', block, re.DOTALL)
-                    if not abstract_match:
-                        abstract_match = re.search(r'<div class=["\']content["\'][^>]*>(.*?)</div>', block, re.DOTALL)
-                    if abstract_match:
-                        abstract = re.sub(r'<[^>]*>', '', abstract_match.group(1)).strip()
-                    
-                    # 提取来源信息
-                    source = ''
-                    source_match = re.search(r'<span class=["\']c-showurl["\'][^>]*>(.*?)</span>', block, re.DOTALL)
-                    if source_match:
-                        source = re.sub(r'<[^>]*>', '', source_match.group(1)).strip()
-                    
-                    # 验证和清理URL
-                    clean_url = self._clean_url(url)
-                    if not clean_url:
-                        continue
-                    
-                    # 筛选条件：确保标题不为空，长度合适
-                    if title and len(title) > 2 and len(title) < 150 and clean_url not in seen_urls_temp:
-                        # 添加结果
-                        results.append({
-                            'title': title,
-                            'abstract': abstract[:200] if abstract else '',  # 限制摘要长度
-                            'url': clean_url,
-                            'source': source
-                        })
-                        seen_urls_temp.add(clean_url)
-                        
-                        # 限制结果数量
-                        if len(results) >= 15:
-                            break
-            
-            # 如果上述方法没有找到结果，尝试备用的正则表达式
-            if not results:
-                logger.info("尝试备用的结果提取方法")
-                # 尝试匹配更多可能的链接模式
-                pattern = r'<a[^>]*?href=["\'](https?://[^"\']*)["\'][^>]*?class=["\'](?:mnav|c-title-text|result-title)["\'][^>]*?>(.*?)</a>'
-                matches = re.findall(pattern, html_content, re.DOTALL)
-                
-                logger.info(f"备用正则匹配找到 {len(matches)} 个潜在链接")
-                
-                for href, title_html in matches[:50]:
-                    # 清理标题
-                    title = re.sub(r'<[^>]*>', '', title_html).strip()
-                    
-                    # 验证和清理URL
-                    clean_url = self._clean_url(href)
-                    if not clean_url:
-                        continue
-                    
-                    # 筛选条件
-                    if title and len(title) > 2 and len(title) < 150 and clean_url not in seen_urls_temp:
-                        # 提取摘要（如果可能）
-                        abstract = ''
-                        abstract_pattern = re.escape(title) + r'[^<]*<[^>]*>(.*?)<'  # 尝试找到标题附近的摘要
-                        abstract_match = re.search(abstract_pattern, html_content, re.DOTALL)
-                        if abstract_match:
-                            abstract = re.sub(r'<[^>]*>', '', abstract_match.group(1)).strip()[:200]
-                        
-                        results.append({
-                            'title': title,
-                            'abstract': abstract,
-                            'url': clean_url,
-                            'source': ''
-                        })
-                        seen_urls_temp.add(clean_url)
-                        
-                        if len(results) >= 10:
-                            break
-            
-            # 对结果进行验证和过滤，确保与关键词相关
-            validated_results = self._validate_results(results, keyword)
-            
-            # 实现高级去重逻辑
-            final_results = self._deduplicate_results(validated_results)
-            
-            logger.info(f"原始结果数: {len(results)}, 验证后结果数: {len(validated_results)}, 最终去重结果数: {len(final_results)}")
+        return self.pool.run(self.asearch(keyword, timeout))
+    
+    async def asearch(self, keyword, timeout=20):
+        """
+        根据关键词精准搜索百度
+        
+        Args:
+            keyword: 搜索关键词
+            timeout: 请求超时时间
             
+        Returns:
+            dict: 搜索结果字典，包含状态码和数据
+        """
+        logger.info(f"开始搜索关键词: {keyword}")
+        page = await self.fetch_page(keyword, 0, timeout)
+        
+        if page['status'] == CAPTCHA:
             return {
-                'status': 'success',
-                'status_code': response.status_code,
-                'keyword': keyword,
-                'search_url': search_url,
-                'result_count': len(final_results),
-                'results': final_results
+                'status': 'error',
+                'error_type': 'captcha',
+                'error_message': '检测到百度验证码或反爬机制',
+                'keyword': keyword
             }
-        except Exception as e:
-            logger.error(f"搜索过程中出错: {str(e)}")
+        if page['status'] != SUCCESS:
             return {
                 'status': 'error',
                 'error_type': 'exception',
-                'error_message': str(e),
+                'error_message': page.get('error', ''),
                 'keyword': keyword
             }
+        
+        final_results = page['results']
+        return {
+            'status': 'success',
+            'status_code': page.get('status_code', 200),
+            'keyword': keyword,
+            'search_url': page.get('url') or self.build_url(keyword),
+            'result_count': len(final_results),
+            'results': final_results
+        }
     
     def _validate_results(self, results, keyword):
         """验证搜索结果是否与关键词相关"""
-        validated_results = []
-        keyword_lower = keyword.lower()
-        
-        # 关键词变体，用于更灵活的匹配
-        keyword_variations = [keyword_lower]
-        if '大学' in keyword_lower:
-            keyword_variations.append(keyword_lower.replace('大学', ''))
+        # 关键词变体只计算一次，整批评分
+        scores = TitleMatchScorer(keyword).score_batch(
+            [result.title for result in results], [result.summary for result in results]
+        )
         
-        for result in results:
-            title_lower = result['title'].lower()
-            abstract_lower = result.get('abstract', '').lower()
-            
-            # 计算相关性分数
-            relevance_score = 0
-            
-            # 标题中包含关键词或其变体
-            for variation in keyword_variations:
-                if variation in title_lower:
-                    relevance_score += 10
-                    # 完全匹配加分
-                    if variation == title_lower:
-                        relevance_score += 20
-                    # 关键词出现在开头加分
-                    if title_lower.startswith(variation):
-                        relevance_score += 5
-            
-            # 摘要中包含关键词
-            for variation in keyword_variations:
-                relevance_score += abstract_lower.count(variation) * 2
-            
-            # 只保留相关性分数大于0的结果
+        # 只保留相关性分数大于0的结果
+        validated_results = []
+        for result, relevance_score in zip(results, scores):
             if relevance_score > 0:
-                result['relevance_score'] = relevance_score
+                result.relevance_score = relevance_score
                 validated_results.append(result)
         
         # 按相关性分数排序
-        return sorted(validated_results, key=lambda x: x.get('relevance_score', 0), reverse=True)
+        return sorted(validated_results, key=lambda x: x.relevance_score, reverse=True)
         
     def _deduplicate_results(self, results):
         """高级去重方法，基于URL和内容相似度"""
@@ -362,27 +227,17 @@ class BaiduSpider:
             
         unique_results = []
         seen_urls = set()
-        seen_titles = set()
+        # 标题近似重复索引：字符集合的Jaccard相似度超过80%视为重复（忽略标点符号和空格）
+        title_index = NearDupIndex(threshold=0.8, shingle_size=1)
         
         for result in results:
-            url = result.get('url', '')
-            title = result.get('title', '').strip().lower()
+            url = result.url
             
             # 基于URL去重
             if url and url not in seen_urls:
-                # 基于标题相似度去重（忽略标点符号和空格）
-                normalized_title = re.sub(r'[\s\p{P}]+', '', title)
-                title_duplicate = False
-                
-                for seen_title in seen_titles:
-                    # 如果相似度超过80%，视为重复
-                    if self._string_similarity(normalized_title, seen_title) > 0.8:
-                        title_duplicate = True
-                        break
-                
-                if not title_duplicate:
+                # 基于标题相似度去重
+                if title_index.check_and_add(len(unique_results), result.title) is None:
                     seen_urls.add(url)
-                    seen_titles.add(normalized_title)
                     unique_results.append(result)
                     
                     # 保留最多10个结果
@@ -393,7 +248,7 @@ class BaiduSpider:
         if len(unique_results) < 5 and len(results) > len(unique_results):
             logger.info("结果数量不足5个，放宽去重条件")
             for result in results:
-                url = result.get('url', '')
+                url = result.url
                 if url and url not in seen_urls:
                     seen_urls.add(url)
                     unique_results.append(result)
@@ -403,19 +258,6 @@ class BaiduSpider:
         # 保留前5-8个最相关的结果
         return unique_results[:min(8, len(unique_results))]
     
-    def _string_similarity(self, s1, s2):
-        """计算两个字符串的相似度"""
-        if not s1 or not s2:
-            return 0
-        
-        # 简单的基于交集的相似度计算
-        set1 = set(s1)
-        set2 = set(s2)
-        intersection = len(set1 & set2)
-        union = len(set1 | set2)
-        
-        return intersection / union if union > 0 else 0
-    
     # _process_and_add_result方法已移除，使用正则表达式直接处理结果
         
     def _clean_url(self, url):
@@ -568,20 +410,20 @@ class BaiduSpider:
         text.append("=== 搜索结果 ===")
         for i, item in enumerate(result['results'], 1):
             text.append(f"[{i}]")
-            text.append(f"标题: {item['title']}")
+            text.append(f"标题: {item.title}")
             
             # 处理概要显示
-            summary = item.get('summary', '')
+            summary = item.summary
             text.append(f"概要: {summary if summary else 'N/A'}")
             
             # 处理URL显示，避免过长
-            url = item.get('url', '')
+            url = item.url
             if len(url) > 100:
                 url = url[:97] + '...'
             text.append(f"URL: {url}")
             
             # 处理封面URL显示
-            cover_url = item.get('cover_url', '')
+            cover_url = item.cover_url or ''
             if len(cover_url) > 100:
                 cover_url = cover_url[:97] + '...'
             text.append(f"封面URL: {cover_url if cover_url else 'N/A'}")